@@ -0,0 +1,177 @@
+#!/usr/bin/env python3
+"""Hub round-trip benchmark for hubitat_tile_mover.
+
+Runs the hub code paths against benchmarks/fake_hub.py (a local stand-in listening on
+127.0.0.1:8080) and reports, per scenario, wall time, HTTP round-trips, TCP connections
+and bytes sent/received:
+
+  import.cold        token fetch + layout GET (new session)
+  import.warm        layout GET with the session's cached token
+  import.expired     cached token rejected -> refresh -> GET again
+  import.fail_once   layout GET answered 500 once -> refresh -> GET again
+  post               POST with a cached token
+  post.expired       POST rejected -> refresh -> POST again
+  post.stale_url     hub_post_layout_with_refresh with an expired last-run layout URL
+  cli.insert         one CLI run: --import:hub, --insert:rows, --output:hub
+  cli.undo_last      --undo_last against the hub (staleness check: layout GET + compare)
+  cli.undo_edited    --undo_last --force after an edit made on the hub since the run
+  cli.targets        --targets over several dashboards sharing one session
+
+Usage:
+  python benchmarks/bench_hub.py                           # default sizes
+  python benchmarks/bench_hub.py --sizes 1000,10000 --latency-ms 30 --repeat 3
+"""
+from __future__ import annotations
+
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+REPO_ROOT = os.path.dirname(HERE)
+sys.path.insert(0, REPO_ROOT)
+sys.path.insert(0, HERE)
+
+from fake_hub import FakeHub  # noqa: E402
+from layout_gen import make_layout  # noqa: E402
+
+DEFAULT_SIZES = "1000,10000"
+TARGET_DASHBOARDS = 4
+
+
+def _measure(hub: FakeHub, fn: Callable[[], Any], setup: Optional[Callable[[], Any]], repeat: int) -> Dict[str, Any]:
+    """Best wall time of fn over repeat runs (setup untimed), with the hub counters of the last run."""
+    best = float("inf")
+    snap: Dict[str, Any] = {}
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        hub.stats.reset()
+        t0 = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t0)
+        snap = hub.stats.snapshot()
+    snap["seconds"] = best
+    return snap
+
+
+def _cli(env: Dict[str, str], args: List[str]) -> None:
+    cmd = [sys.executable, os.path.join(REPO_ROOT, "hubitat_tile_mover.py")] + args
+    p = subprocess.run(cmd, env=env, stdin=subprocess.DEVNULL, capture_output=True, text=True)
+    if p.returncode != 0:
+        raise RuntimeError(f"{' '.join(args)} failed ({p.returncode}):\n{p.stderr}")
+
+
+def _scenarios(hub: FakeHub, layout: Dict[str, Any], env: Dict[str, str]) -> List[Any]:
+    from hubitat_tile_mover.hubio import HubSession, _build_layout_url, hub_post_layout_with_refresh
+
+    url = hub.dashboard_url(1)
+    warm = HubSession()
+    warm.import_layout(url)
+
+    def import_cold() -> None:
+        with HubSession() as s:
+            s.import_layout(url)
+
+    def import_expired() -> None:
+        hub.expire_tokens()
+        warm.import_layout(url)
+
+    def import_fail_once() -> None:
+        hub.fail_next(1)
+        warm.import_layout(url)
+
+    def post_expired() -> None:
+        hub.expire_tokens()
+        warm.post_layout(url, layout)
+
+    def post_stale_url() -> None:
+        stale = _build_layout_url(url, "expired-token")
+        hub_post_layout_with_refresh(url, stale, layout, session=warm)
+
+    def reset_layout() -> None:
+        for d in range(1, TARGET_DASHBOARDS + 1):
+            hub.set_layout(layout, d)
+
+    def cli_insert() -> None:
+        reset_layout()
+        _cli(env, ["--import:hub", url, "--output:hub", "--insert:rows", "1", "1", "--force"])
+
+    def undo_last() -> None:
+        _cli(env, ["--undo_last", "--force"])
+
+    def insert_then_edit() -> None:
+        cli_insert()
+        edited = hub.layout(1)
+        edited["tiles"] = edited["tiles"][1:]
+        hub.set_layout(edited, 1)
+
+    def cli_targets() -> None:
+        reset_layout()
+        urls = [hub.dashboard_url(d) for d in range(1, TARGET_DASHBOARDS + 1)]
+        _cli(env, ["--targets:hub"] + urls + ["--insert:rows", "1", "1", "--force"])
+
+    # (name, fn, setup): only fn is timed and counted.
+    return [
+        ("import.cold", import_cold, None),
+        ("import.warm", lambda: warm.import_layout(url), None),
+        ("import.expired", import_expired, None),
+        ("import.fail_once", import_fail_once, None),
+        ("post", lambda: warm.post_layout(url, layout), None),
+        ("post.expired", post_expired, None),
+        ("post.stale_url", post_stale_url, None),
+        ("cli.insert", cli_insert, None),
+        ("cli.undo_last", undo_last, cli_insert),
+        ("cli.undo_edited", undo_last, insert_then_edit),
+        ("cli.targets", cli_targets, None),
+    ]
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    ap = argparse.ArgumentParser(description="Count hub round-trips and bytes for hubitat_tile_mover against a local fake hub.")
+    ap.add_argument("--sizes", default=DEFAULT_SIZES, help=f"comma-separated tile counts (default {DEFAULT_SIZES})")
+    ap.add_argument("--repeat", type=int, default=3)
+    ap.add_argument("--latency-ms", type=float, default=0.0, help="delay the fake hub adds to every response")
+    ap.add_argument("--bandwidth-kbps", type=float, default=0.0, help="fake hub transfer rate in KB/s (0 = unlimited)")
+    ap.add_argument("--page-kb", type=float, default=8.0, help="dashboard HTML size (the token page)")
+    ap.add_argument("--host", default="127.0.0.1", help="loopback address for the fake hub (port 8080)")
+    ap.add_argument("--only", default="", help="comma-separated scenario names (default: all)")
+    ap.add_argument("--seed", type=int, default=1)
+    args = ap.parse_args(argv)
+
+    sizes = [int(s) for s in args.sizes.split(",") if s.strip()]
+    only = {s.strip() for s in args.only.split(",") if s.strip()}
+
+    print(f"{'scenario':<16} {'tiles':>6} {'ms':>9} {'trips':>6} {'conns':>6} {'KB out':>9} {'KB in':>9}  requests")
+    with tempfile.TemporaryDirectory(prefix="bench_hub_") as tmp:
+        env = dict(os.environ, HOME=tmp, XDG_STATE_HOME=tmp, NO_COLOR="1")
+        env.pop("XDG_DATA_HOME", None)
+        for n in sizes:
+            layout = make_layout(n, seed=args.seed)
+            with FakeHub(
+                host=args.host,
+                layout=layout,
+                latency=args.latency_ms / 1000.0,
+                bandwidth=args.bandwidth_kbps * 1024.0,
+                page_bytes=int(args.page_kb * 1024),
+                seed=args.seed,
+            ) as hub:
+                for name, fn, setup in _scenarios(hub, layout, env):
+                    if only and name not in only:
+                        continue
+                    r = _measure(hub, fn, setup, args.repeat)
+                    reqs = " ".join(f"{k}={v}" for k, v in sorted(r["requests"].items()))
+                    print(
+                        f"{name:<16} {n:>6} {r['seconds'] * 1000:>9.1f} {r['round_trips']:>6} {r['connections']:>6} "
+                        f"{r['bytes_out'] / 1024:>9.1f} {r['bytes_in'] / 1024:>9.1f}  {reqs}",
+                        flush=True,
+                    )
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""JSON backend benchmark for hubitat_tile_mover.
+
+Times the codec calls a run makes (input decode, --indent/--minify output, fingerprint,
+per-tile fingerprint leaves, hub POST body) with every installed backend on synthetic layouts
+(benchmarks/layout_gen.py), and checks that each backend's text is byte-identical to
+the stdlib's.
+
+Usage:
+  python benchmarks/bench_json.py                          # default sizes
+  python benchmarks/bench_json.py --sizes 1000,30000 --repeat 7
+"""
+from __future__ import annotations
+
+import argparse
+import os
+import sys
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+REPO_ROOT = os.path.dirname(HERE)
+sys.path.insert(0, REPO_ROOT)
+sys.path.insert(0, HERE)
+
+from layout_gen import DEFAULT_SPANS, make_layout  # noqa: E402
+
+DEFAULT_SIZES = "1000,10000,30000"
+
+# (name, fn(ctx) -> str | bytes); ctx holds the layout object and its indented text.
+Case = Tuple[str, Callable[[Dict[str, Any]], Any]]
+
+
+def _cases() -> List[Case]:
+    from hubitat_tile_mover import jsoncodec
+
+    return [
+        ("loads", lambda c: jsoncodec.loads(c["text"])),
+        ("dumps.indent2", lambda c: jsoncodec.dumps(c["obj"], indent=2)),
+        ("dumps.minify", lambda c: jsoncodec.dumps(c["obj"])),
+        ("dumps.sorted_bytes", lambda c: jsoncodec.dumps_bytes(c["obj"], sort_keys=True)),
+        ("dumps.post_bytes", lambda c: jsoncodec.dumps_bytes(c["obj"])),
+        ("dumps.each_tile", lambda c: jsoncodec.dumps_each(c["obj"]["tiles"], sort_keys=True)),
+    ]
+
+
+def _best(fn: Callable[[], Any], repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    ap = argparse.ArgumentParser(description="Compare hubitat_tile_mover JSON backends on synthetic layouts.")
+    ap.add_argument("--sizes", default=DEFAULT_SIZES, help=f"comma-separated tile counts (default {DEFAULT_SIZES})")
+    ap.add_argument("--spans", default=DEFAULT_SPANS)
+    ap.add_argument("--seed", type=int, default=1)
+    ap.add_argument("--repeat", type=int, default=5, help="runs per case; the best is reported")
+    args = ap.parse_args(argv)
+
+    import json
+
+    from hubitat_tile_mover import jsoncodec
+
+    backends = jsoncodec.available_backends()
+    sizes = [int(s) for s in args.sizes.split(",") if s.strip()]
+    cases = _cases()
+    print(f"backends: {', '.join(backends)}   sizes: {sizes}")
+    header = f"{'case':<22}{'tiles':>8}" + "".join(f"{b:>12}" for b in backends)
+    if len(backends) > 1:
+        header += f"{'speedup':>10}"
+    print(header)
+    print("-" * len(header))
+
+    mismatches = 0
+    for n in sizes:
+        obj = make_layout(n, spans=args.spans, seed=args.seed)
+        ctx = {"obj": obj, "text": json.dumps(obj, ensure_ascii=False, indent=2)}
+        for name, fn in cases:
+            times: List[float] = []
+            outputs: List[Any] = []
+            for b in backends:
+                jsoncodec.set_backend(b)
+                outputs.append(fn(ctx))
+                times.append(_best(lambda: fn(ctx), args.repeat))
+            same = all(o == outputs[0] for o in outputs[1:])
+            if not same:
+                mismatches += 1
+            row = f"{name:<22}{n:>8}" + "".join(f"{t * 1000:>10.2f}ms" for t in times)
+            if len(backends) > 1:
+                row += f"{times[-1] / times[0]:>9.1f}x"
+            print(row + ("" if same else "   OUTPUT DIFFERS"))
+    jsoncodec.set_backend()
+
+    if mismatches:
+        print(f"FAIL: {mismatches} case(s) produced output that differs from the stdlib.")
+        return 1
+    print("OK: all backends produced identical output.")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,313 @@
+#!/usr/bin/env python3
+"""Per-operation benchmark suite for hubitat_tile_mover.
+
+Times each public op entry point on synthetic layouts (benchmarks/layout_gen.py) of
+increasing size, prints a scaling table (with the empirical log-log exponent between
+the smallest and largest size) and compares against a stored baseline.
+
+Timings are normalized by a fixed pure-Python calibration workload, so a baseline
+recorded on one machine stays meaningful on another. A case regresses when its
+normalized time exceeds baseline * (1 + tolerance) and the slowdown is also larger
+than --min-delta-ms.
+
+Usage:
+  python benchmarks/bench_ops.py                          # default sizes, compare to baseline
+  python benchmarks/bench_ops.py --sizes 100,1000,10000,100000 --ops move,css
+  python benchmarks/bench_ops.py --save-baseline          # record benchmarks/baseline.json
+"""
+from __future__ import annotations
+
+import argparse
+import contextlib
+import io
+import json
+import math
+import os
+import random
+import sys
+import tempfile
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+REPO_ROOT = os.path.dirname(HERE)
+sys.path.insert(0, REPO_ROOT)
+sys.path.insert(0, HERE)
+
+from layout_gen import DEFAULT_SPANS, layout_bounds, make_layout  # noqa: E402
+
+DEFAULT_SIZES = "100,1000,10000"
+DEFAULT_BASELINE = os.path.join(HERE, "baseline.json")
+
+# A case: (name, setup(ctx) -> callable timed with a fresh tiles list).
+Case = Tuple[str, Callable[[Dict[str, Any]], Callable[[List[Dict[str, Any]]], Any]]]
+
+
+def _calibrate() -> float:
+    """Seconds for a fixed dict/list/sort workload (best of 5); the normalization unit."""
+    rng = random.Random(0)
+    data = [rng.random() for _ in range(200_000)]
+    best = float("inf")
+    for _ in range(5):
+        t0 = time.perf_counter()
+        d = {i: v for i, v in enumerate(data)}
+        s = sorted(d.values())
+        _ = sum(s[::7])
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+
+def _cases() -> List[Case]:
+    from hubitat_tile_mover import css_ops
+    from hubitat_tile_mover.list_views import render_list_tiles
+    from hubitat_tile_mover.overlaps import overlap_pairs
+    from hubitat_tile_mover.map_view import render_tile_map
+    from hubitat_tile_mover.ops_clear import clear_cols, clear_range, clear_rows
+    from hubitat_tile_mover.ops_copy import copy_cols, copy_range, copy_rows
+    from hubitat_tile_mover.ops_crop import crop_to_cols, crop_to_range, crop_to_rows, prune_devices, prune_ids
+    from hubitat_tile_mover.ops_delete import delete_cols, delete_rows
+    from hubitat_tile_mover.ops_insert import insert_cols, insert_rows
+    from hubitat_tile_mover.ops_merge import merge_cols, merge_range, merge_rows
+    from hubitat_tile_mover.ops_move import move_cols, move_range, move_rows
+    from hubitat_tile_mover.ops_spacing import adjust_tile_spacing, set_tile_spacing
+    from hubitat_tile_mover.ops_trim import trim_tiles
+    from hubitat_tile_mover.sort_tiles import sort_tiles
+
+    q = dict(verbose=False, debug=False)
+    mv = dict(include_overlap=False, allow_overlap=True, skip_overlap=False, show_map=False, **q)
+    rm = dict(include_overlap=False, force=True, **q)
+
+    def band(ctx: Dict[str, Any], axis: str) -> Tuple[int, int, int]:
+        hi = ctx["max_row"] if axis == "row" else ctx["max_col"]
+        a = max(1, hi // 4)
+        return a, a + max(1, hi // 10), max(1, hi // 2)
+
+    def swap(ctx: Dict[str, Any], axis: str) -> List[Tuple[int, int, int]]:
+        # The two moves of a band swap (what --swap:rows / --swap:cols expand to).
+        s, e, d = band(ctx, axis)
+        return [(s, e, d), (d, d + e - s, s)]
+
+    def spread(ctx: Dict[str, Any], axis: str, count: int) -> List[Tuple[int, int]]:
+        # Five (count, position) pairs spread over the axis, for the multi-range insert/delete cases.
+        hi = ctx["max_row"] if axis == "row" else ctx["max_col"]
+        return [(count, max(1, hi * k // 6)) for k in range(1, 6)]
+
+    return [
+        ("insert_rows", lambda c: lambda t: insert_rows(t, inserts=[(2, c["max_row"] // 2)], include_overlap=False, col_range=None, allow_overlap=True)),
+        ("insert_cols", lambda c: lambda t: insert_cols(t, inserts=[(2, c["max_col"] // 2)], include_overlap=False, row_range=None, allow_overlap=True)),
+        ("insert_rows.x5", lambda c: lambda t: insert_rows(t, inserts=spread(c, "row", 2), include_overlap=False, col_range=None, allow_overlap=True)),
+        ("move_rows", lambda c: lambda t: move_rows(t, moves=[band(c, "row")], **mv)),
+        ("move_cols", lambda c: lambda t: move_cols(t, moves=[band(c, "col")], **mv)),
+        ("move_range", lambda c: lambda t: move_range(
+            t, moves=[(band(c, "row")[0], band(c, "col")[0], band(c, "row")[1], band(c, "col")[1], band(c, "row")[2], band(c, "col")[2])], **mv)),
+        ("move_rows.swap", lambda c: lambda t: move_rows(t, moves=swap(c, "row"), **mv)),
+        ("copy_rows", lambda c: lambda t: copy_rows(t, start_row=band(c, "row")[0], end_row=band(c, "row")[1], dest_start_row=c["max_row"] + 1, **mv)),
+        ("copy_cols", lambda c: lambda t: copy_cols(t, start_col=band(c, "col")[0], end_col=band(c, "col")[1], dest_start_col=c["max_col"] + 1, **mv)),
+        ("copy_range", lambda c: lambda t: copy_range(
+            t, src_top_row=band(c, "row")[0], src_left_col=band(c, "col")[0], src_bottom_row=band(c, "row")[1],
+            src_right_col=band(c, "col")[1], dests=[(c["max_row"] + 1, 1)], **mv)),
+        ("copy_range.x4", lambda c: lambda t: copy_range(
+            t, src_top_row=band(c, "row")[0], src_left_col=band(c, "col")[0], src_bottom_row=band(c, "row")[1],
+            src_right_col=band(c, "col")[1], dests=[(c["max_row"] + 1 + k * (band(c, "row")[1] - band(c, "row")[0] + 1), 1) for k in range(4)], **mv)),
+        ("merge_rows", lambda c: lambda t: merge_rows(
+            t, merge_source_path=c["source_path"], start_row=band(c, "row")[0], end_row=band(c, "row")[1], dest_start_row=c["max_row"] + 1, **mv)),
+        ("merge_cols", lambda c: lambda t: merge_cols(
+            t, merge_source_path=c["source_path"], start_col=band(c, "col")[0], end_col=band(c, "col")[1], dest_start_col=c["max_col"] + 1, **mv)),
+        ("merge_range", lambda c: lambda t: merge_range(
+            t, merge_source_path=c["source_path"], src_top_row=band(c, "row")[0], src_left_col=band(c, "col")[0],
+            src_bottom_row=band(c, "row")[1], src_right_col=band(c, "col")[1], dest_top_row=c["max_row"] + 1, dest_left_col=1, **mv)),
+        ("delete_rows", lambda c: lambda t: delete_rows(t, bands=[band(c, "row")[:2]], col_range=None, allow_overlap=True, **rm)),
+        ("delete_cols", lambda c: lambda t: delete_cols(t, bands=[band(c, "col")[:2]], row_range=None, allow_overlap=True, **rm)),
+        ("delete_rows.x5", lambda c: lambda t: delete_rows(t, bands=[(a, a + 1) for _n, a in spread(c, "row", 0)], col_range=None, allow_overlap=True, **rm)),
+        ("clear_rows", lambda c: lambda t: clear_rows(t, start_row=band(c, "row")[0], end_row=band(c, "row")[1], **rm)),
+        ("clear_cols", lambda c: lambda t: clear_cols(t, start_col=band(c, "col")[0], end_col=band(c, "col")[1], **rm)),
+        ("clear_range", lambda c: lambda t: clear_range(
+            t, top_row=band(c, "row")[0], left_col=band(c, "col")[0], bottom_row=band(c, "row")[1], right_col=band(c, "col")[1], **rm)),
+        ("crop_to_rows", lambda c: lambda t: crop_to_rows(t, start_row=band(c, "row")[0], end_row=band(c, "row")[2], **rm)),
+        ("crop_to_cols", lambda c: lambda t: crop_to_cols(t, start_col=band(c, "col")[0], end_col=band(c, "col")[2], **rm)),
+        ("crop_to_range", lambda c: lambda t: crop_to_range(
+            t, top_row=band(c, "row")[0], left_col=band(c, "col")[0], bottom_row=band(c, "row")[2], right_col=band(c, "col")[2], **rm)),
+        ("prune_ids", lambda c: lambda t: prune_ids(t, ids_csv=f"1-{max(1, c['n'] // 10)},>{c['n'] - c['n'] // 10}", force=True, **q)),
+        ("prune_devices", lambda c: lambda t: prune_devices(t, devices_csv=f"<{1000 + max(1, c['n'] // 20)}", force=True, **q)),
+        ("adjust_tile_spacing", lambda c: lambda t: adjust_tile_spacing(t, 1, include_overlap=False, mode="all")),
+        ("set_tile_spacing", lambda c: lambda t: set_tile_spacing(t, 1, include_overlap=False, mode="all")),
+        ("trim_tiles", lambda c: lambda t: trim_tiles(t, do_left=True, do_top=True, debug=False)),
+        ("sort_tiles", lambda c: lambda t: sort_tiles(t, "rci")),
+        ("css.tile_ids_in_css", lambda c: lambda t: css_ops.tile_ids_in_css(c["css"])),
+        ("css.generate_css_for_id_map", lambda c: lambda t: css_ops.generate_css_for_id_map(c["css"], c["id_map"])),
+        ("css.cleanup_css_for_tile_ids", lambda c: lambda t: css_ops.cleanup_css_for_tile_ids(c["css"], c["removed_ids"])),
+        ("css.orphan_tile_ids_in_css", lambda c: lambda t: css_ops.orphan_tile_ids_in_css(c["css"], c["existing_ids"])),
+        ("css.compact_css_stylesheet", lambda c: lambda t: css_ops.compact_css_stylesheet(c["css"])),
+        ("render_list_tiles.plain", lambda c: lambda t: render_list_tiles(t, "plain", c["css"])),
+        ("render_list_tiles.overlap", lambda c: lambda t: render_list_tiles(t, "overlap", c["css"])),
+        ("render_list_tiles.nested", lambda c: lambda t: render_list_tiles(t, "nested", c["css"])),
+        # Every tile open on the same rows, none overlapping: the sweep's worst case for a row-only scan.
+        ("overlap_pairs.one_band", lambda c: lambda t: sum(1 for _ in overlap_pairs([(1, 10, i, i) for i in range(len(t))]))),
+        ("render_tile_map", lambda c: lambda t: render_tile_map(t, title="MAP")),
+    ]
+
+
+def _fresh_tiles(tiles_json: str) -> List[Dict[str, Any]]:
+    """A fresh, normalized tiles list (as main() would hand to an op)."""
+    from hubitat_tile_mover.css_ops import clear_css_document_cache
+    from hubitat_tile_mover.jsonio import normalize_tiles_list
+    from hubitat_tile_mover.tiles import clear_tile_geom_cache
+
+    clear_tile_geom_cache()
+    clear_css_document_cache()
+    return normalize_tiles_list(json.loads(tiles_json), verbose=False, debug=False)
+
+
+def _time_case(fn: Callable[[List[Dict[str, Any]]], Any], tiles_json: str, *, repeat: int, max_seconds: float) -> Tuple[Optional[float], str]:
+    """Best wall time over up to `repeat` runs (fewer if one run exceeds max_seconds)."""
+    best: Optional[float] = None
+    sink = io.StringIO()
+    for _ in range(repeat):
+        tiles = _fresh_tiles(tiles_json)
+        try:
+            with contextlib.redirect_stderr(sink), contextlib.redirect_stdout(sink):
+                t0 = time.perf_counter()
+                fn(tiles)
+                dt = time.perf_counter() - t0
+        except SystemExit:
+            msg = sink.getvalue().strip().splitlines()
+            return None, (msg[-1] if msg else "exited")
+        best = dt if best is None else min(best, dt)
+        if dt > max_seconds:
+            break
+    return best, ""
+
+
+def _context(n: int, args: argparse.Namespace, tmpdir: str) -> Dict[str, Any]:
+    obj = make_layout(n, overlap=args.overlap, spans=args.spans, css_rules=args.css_rules, seed=args.seed)
+    tiles = obj["tiles"]
+    max_row, max_col = layout_bounds(tiles)
+    source_path = os.path.join(tmpdir, f"merge_source_{n}.json")
+    with open(source_path, "w", encoding="utf-8") as f:
+        json.dump(make_layout(max(10, n // 10), seed=args.seed + 1), f)
+    ids = [t["id"] for t in tiles]
+    step = max(1, len(ids) // 10)
+    return {
+        "n": n,
+        "tiles_json": json.dumps(tiles),
+        "css": obj["customCSS"],
+        "max_row": max_row,
+        "max_col": max_col,
+        "source_path": source_path,
+        "id_map": {tid: n + 1 + k for k, tid in enumerate(ids[::step])},
+        "removed_ids": set(ids[::step]),
+        "existing_ids": set(ids[: len(ids) - step]),
+    }
+
+
+def _exponent(points: List[Tuple[int, float]]) -> Optional[float]:
+    pts = [(n, t) for n, t in points if t and t > 0]
+    if len(pts) < 2 or pts[0][0] == pts[-1][0]:
+        return None
+    (n0, t0), (n1, t1) = pts[0], pts[-1]
+    return math.log(t1 / t0) / math.log(n1 / n0)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    ap = argparse.ArgumentParser(description="Benchmark hubitat_tile_mover operations on synthetic layouts.")
+    ap.add_argument("--sizes", default=DEFAULT_SIZES, help=f"comma-separated tile counts (default {DEFAULT_SIZES})")
+    ap.add_argument("--ops", default="", help="comma-separated substrings; only matching cases run")
+    ap.add_argument("--overlap", type=float, default=0.05)
+    ap.add_argument("--spans", default=DEFAULT_SPANS)
+    ap.add_argument("--css-rules", type=int, default=None, help="tile-scoped CSS rules per layout (default tiles/2)")
+    ap.add_argument("--seed", type=int, default=1)
+    ap.add_argument("--repeat", type=int, default=5, help="runs per case; the best is kept")
+    ap.add_argument("--max-seconds", type=float, default=2.0, help="stop repeating a case once one run takes this long")
+    ap.add_argument("--baseline", default=DEFAULT_BASELINE)
+    ap.add_argument("--save-baseline", action="store_true", help="write the results as the new baseline")
+    ap.add_argument("--tolerance", type=float, default=0.5, help="allowed normalized slowdown (0.5 = +50%%)")
+    ap.add_argument("--min-delta-ms", type=float, default=2.0, help="ignore slowdowns smaller than this")
+    ap.add_argument("--json", dest="json_out", default=None, help="also write raw results to this file")
+    args = ap.parse_args(argv)
+
+    sizes = [int(s) for s in args.sizes.split(",") if s.strip()]
+    wanted = [s.strip() for s in args.ops.split(",") if s.strip()]
+    cases = [c for c in _cases() if not wanted or any(w in c[0] for w in wanted)]
+    if not cases:
+        print("No cases match --ops.", file=sys.stderr)
+        return 2
+
+    calib = _calibrate()
+    print(f"calibration unit: {calib * 1000:.1f} ms   sizes: {sizes}   cases: {len(cases)}")
+    results: Dict[str, Dict[str, Optional[float]]] = {name: {} for name, _ in cases}
+    notes: Dict[str, str] = {}
+    with tempfile.TemporaryDirectory(prefix="htm_bench_") as tmpdir:
+        for n in sizes:
+            ctx = _context(n, args, tmpdir)
+            for name, setup in cases:
+                secs, note = _time_case(setup(ctx), ctx["tiles_json"], repeat=args.repeat, max_seconds=args.max_seconds)
+                results[name][str(n)] = secs
+                if note:
+                    notes[f"{name}@{n}"] = note
+
+    # Scaling table.
+    head = f"{'case':32s}" + "".join(f"{n:>12d}" for n in sizes) + "   ~O(n^k)"
+    print(head)
+    print("-" * len(head))
+    for name, _ in cases:
+        row = results[name]
+        cells = "".join(f"{(row[str(n)] * 1000):10.2f}ms" if row.get(str(n)) is not None else f"{'n/a':>12s}" for n in sizes)
+        k = _exponent([(n, row.get(str(n)) or 0.0) for n in sizes])
+        print(f"{name:32s}{cells}   {('k=%.2f' % k) if k is not None else ''}")
+    for key, note in notes.items():
+        print(f"  note: {key}: {note}")
+
+    normalized = {name: {n: (v / calib if v is not None else None) for n, v in row.items()} for name, row in results.items()}
+    payload = {
+        "calibration_s": calib,
+        "generator": {"overlap": args.overlap, "spans": args.spans, "css_rules": args.css_rules, "seed": args.seed},
+        "seconds": results,
+        "normalized": normalized,
+    }
+    if args.json_out:
+        with open(args.json_out, "w", encoding="utf-8") as f:
+            json.dump(payload, f, indent=2, sort_keys=True)
+
+    if args.save_baseline:
+        base: Dict[str, Any] = {}
+        if os.path.exists(args.baseline):
+            with open(args.baseline, "r", encoding="utf-8") as f:
+                base = json.load(f)
+        base.setdefault("normalized", {})
+        for name, row in normalized.items():
+            base["normalized"].setdefault(name, {}).update(row)
+        base["generator"] = payload["generator"]
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(base, f, indent=2, sort_keys=True)
+            f.write("\n")
+        print(f"Baseline written: {args.baseline}")
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print(f"No baseline at {args.baseline}; run with --save-baseline to create one.")
+        return 0
+    with open(args.baseline, "r", encoding="utf-8") as f:
+        base = json.load(f)
+    if base.get("generator") != payload["generator"]:
+        print("Baseline was recorded with different generator settings; skipping comparison.")
+        return 0
+    regressions: List[str] = []
+    for name, row in normalized.items():
+        for n, cur in row.items():
+            ref = base.get("normalized", {}).get(name, {}).get(n)
+            if cur is None or ref is None:
+                continue
+            delta_ms = (cur - ref) * calib * 1000
+            if cur > ref * (1 + args.tolerance) and delta_ms > args.min_delta_ms:
+                regressions.append(f"{name} @ {n} tiles: {cur / ref:.2f}x baseline (+{delta_ms:.1f} ms)")
+    if regressions:
+        print("REGRESSIONS:", file=sys.stderr)
+        for r in regressions:
+            print(f"  {r}", file=sys.stderr)
+        return 1
+    print("OK: no regressions against baseline.")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
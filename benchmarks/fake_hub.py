@@ -0,0 +1,381 @@
+#!/usr/bin/env python3
+"""Local stand-in for a Hubitat hub's dashboard endpoints.
+
+Serves what hubitat_tile_mover's hub code talks to, on the hub's layout port (8080):
+  GET  /apps/api/<app>/dashboard/<id>?access_token=...          dashboard HTML with javascriptRequestToken
+  GET  /apps/api/<app>/dashboard/<id>/layout?requestToken=...   layout JSON
+  POST /apps/api/<app>/dashboard/<id>/layout?requestToken=...   save layout JSON
+
+and lets a benchmark or regression script inject what a real hub does to it:
+latency and bandwidth, request tokens that expire (by age or by use), failures
+(a rate, the next N requests, or one dashboard always) and payload size (synthetic
+layouts from layout_gen.py, padded dashboard pages). Every request is counted, with
+the bytes sent and received and the number of TCP connections accepted.
+
+Any address in 127.0.0.0/8 works as a host, so several stand-ins can run at once
+(127.0.0.1:8080, 127.0.0.2:8080, ...).
+
+Control endpoints (no token needed):
+  GET  /__fakehub/stats             request/byte/connection counters (JSON)
+  POST /__fakehub/reset             zero the counters
+  GET  /__fakehub/layout/<id>       current stored layout
+  POST /__fakehub/layout/<id>       replace it (an "edit made in the hub UI")
+  POST /__fakehub/expire_tokens     invalidate every issued token
+
+Usage:
+  python benchmarks/fake_hub.py --tiles 1000 [--latency-ms 20] [--token-ttl 60] [--fail-rate 0.05]
+                                [--layout big.json] [--host 127.0.0.1] [--port 8080]
+"""
+from __future__ import annotations
+
+import argparse
+import http.server
+import json
+import os
+import random
+import re
+import sys
+import threading
+import time
+import urllib.parse
+from typing import Any, Dict, Optional, Tuple
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, HERE)
+
+from layout_gen import make_layout  # noqa: E402
+
+_DASH_RE = re.compile(r"^/apps/api/(\d+)/dashboard/(\d+)(/layout)?/?$")
+_CTL_PREFIX = "/__fakehub/"
+
+
+class HubStats:
+    """Counters for one stand-in (thread-safe)."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self) -> None:
+        with self._lock:
+            self.requests: Dict[str, int] = {}
+            self.statuses: Dict[str, int] = {}
+            self.bytes_in = 0
+            self.bytes_out = 0
+            self.connections = 0
+
+    def count(self, kind: str, status: int, bytes_in: int, bytes_out: int) -> None:
+        with self._lock:
+            self.requests[kind] = self.requests.get(kind, 0) + 1
+            self.statuses[str(status)] = self.statuses.get(str(status), 0) + 1
+            self.bytes_in += bytes_in
+            self.bytes_out += bytes_out
+
+    def connected(self) -> None:
+        with self._lock:
+            self.connections += 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "requests": dict(self.requests),
+                "round_trips": sum(self.requests.values()),
+                "statuses": dict(self.statuses),
+                "bytes_in": self.bytes_in,
+                "bytes_out": self.bytes_out,
+                "connections": self.connections,
+            }
+
+
+class FakeHub:
+    """A threaded HTTP stand-in for one hub. Use as a context manager, or start()/stop().
+
+    latency: seconds added to every response; bandwidth: bytes/second applied to both
+    request and response bodies (0 = unlimited). token_ttl: seconds a request token is
+    accepted (0 = forever); token_uses: layout requests a token is accepted for (0 =
+    unlimited). fail_rate: fraction of dashboard/layout requests answered with
+    fail_status; fail_next(n) fails the next n; fail_dashboards always fail.
+    page_bytes pads the dashboard HTML to about that size.
+    """
+
+    def __init__(
+        self,
+        *,
+        host: str = "127.0.0.1",
+        port: int = 8080,
+        layout: Optional[Dict[str, Any]] = None,
+        tiles: int = 100,
+        latency: float = 0.0,
+        bandwidth: float = 0.0,
+        token_ttl: float = 0.0,
+        token_uses: int = 0,
+        fail_rate: float = 0.0,
+        fail_status: int = 500,
+        fail_dashboards: Tuple[str, ...] = (),
+        page_bytes: int = 0,
+        seed: int = 1,
+    ) -> None:
+        self.host = host
+        self.port = port
+        self.base_layout = layout if layout is not None else make_layout(tiles, seed=seed)
+        self.latency = latency
+        self.bandwidth = bandwidth
+        self.token_ttl = token_ttl
+        self.token_uses = token_uses
+        self.fail_rate = fail_rate
+        self.fail_status = fail_status
+        self.fail_dashboards = set(fail_dashboards)
+        self.page_bytes = page_bytes
+        self.stats = HubStats()
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._layouts: Dict[str, bytes] = {}
+        self._tokens: Dict[str, Tuple[float, int]] = {}  # token -> (issued at, uses)
+        self._token_seq = 0
+        self._fail_next = 0
+        self._server: Optional[http.server.ThreadingHTTPServer] = None
+        self._thread: Optional[threading.Thread] = None
+
+    # -- control --
+
+    def dashboard_url(self, dash: int = 1, app: int = 1) -> str:
+        return f"http://{self.host}:{self.port}/apps/api/{app}/dashboard/{dash}?access_token=fakehub"
+
+    def layout(self, dash: int = 1) -> Any:
+        return json.loads(self._layout_bytes(str(dash)))
+
+    def set_layout(self, obj: Any, dash: int = 1) -> None:
+        with self._lock:
+            self._layouts[str(dash)] = json.dumps(obj).encode("utf-8")
+
+    def expire_tokens(self) -> None:
+        with self._lock:
+            self._tokens.clear()
+
+    def fail_next(self, n: int = 1) -> None:
+        with self._lock:
+            self._fail_next += n
+
+    def _bind(self) -> http.server.ThreadingHTTPServer:
+        hub = self
+
+        class Handler(_Handler):
+            fake = hub
+
+        self._server = http.server.ThreadingHTTPServer((self.host, self.port), Handler)
+        self._server.daemon_threads = True
+        return self._server
+
+    def start(self) -> "FakeHub":
+        """Serve from a background thread."""
+        server = self._bind()
+        self._thread = threading.Thread(target=server.serve_forever, name="fake-hub", daemon=True)
+        self._thread.start()
+        return self
+
+    def serve(self) -> None:
+        """Serve in this thread until Ctrl+C."""
+        server = self._bind()
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
+            self._server = None
+
+    def stop(self) -> None:
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def __enter__(self) -> "FakeHub":
+        return self.start()
+
+    def __exit__(self, *exc: Any) -> None:
+        self.stop()
+
+    # -- behaviour --
+
+    def _layout_bytes(self, dash: str) -> bytes:
+        with self._lock:
+            data = self._layouts.get(dash)
+            if data is None:
+                data = json.dumps(self.base_layout).encode("utf-8")
+                self._layouts[dash] = data
+            return data
+
+    def _should_fail(self, dash: str) -> bool:
+        with self._lock:
+            if dash in self.fail_dashboards:
+                return True
+            if self._fail_next > 0:
+                self._fail_next -= 1
+                return True
+            return self.fail_rate > 0 and self._rng.random() < self.fail_rate
+
+    def _issue_token(self) -> str:
+        with self._lock:
+            self._token_seq += 1
+            token = f"tok-{self._token_seq:06d}"
+            self._tokens[token] = (time.monotonic(), 0)
+            return token
+
+    def _accept_token(self, token: str) -> bool:
+        with self._lock:
+            ent = self._tokens.get(token)
+            if ent is None:
+                return False
+            issued, uses = ent
+            if self.token_ttl and time.monotonic() - issued > self.token_ttl:
+                del self._tokens[token]
+                return False
+            if self.token_uses and uses >= self.token_uses:
+                del self._tokens[token]
+                return False
+            self._tokens[token] = (issued, uses + 1)
+            return True
+
+    def _page(self, token: str) -> bytes:
+        html = (
+            "<!DOCTYPE html><html><head><title>Dashboard</title></head><body>"
+            f"<script>var javascriptRequestToken = '{token}';</script>"
+        )
+        pad = self.page_bytes - len(html) - len("</body></html>")
+        if pad > 0:
+            html += "<!--" + "x" * max(0, pad - 7) + "-->"
+        return (html + "</body></html>").encode("utf-8")
+
+    def _wait(self, nbytes: int) -> None:
+        delay = self.latency + (nbytes / self.bandwidth if self.bandwidth else 0.0)
+        if delay > 0:
+            time.sleep(delay)
+
+
+class _Handler(http.server.BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # Headers and body go out as separate writes; without TCP_NODELAY the body waits on the
+    # client's delayed ACK (~40 ms per response), which would swamp the numbers being measured.
+    disable_nagle_algorithm = True
+    fake: FakeHub
+
+    def log_message(self, *args: Any) -> None:
+        pass
+
+    def setup(self) -> None:
+        super().setup()
+        self.fake.stats.connected()
+
+    def _reply(self, kind: str, status: int, body: bytes, ctype: str, bytes_in: int) -> None:
+        self.fake._wait(bytes_in + len(body))
+        # Count before replying: the client may read the stats as soon as it has the response.
+        self.fake.stats.count(kind, status, bytes_in, len(body))
+        self.send_response(status)
+        self.send_header("Content-Type", ctype)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _body(self) -> bytes:
+        n = int(self.headers.get("Content-Length") or 0)
+        return self.rfile.read(n) if n else b""
+
+    def _route(self, method: str) -> None:
+        fake = self.fake
+        u = urllib.parse.urlsplit(self.path)
+        body = self._body() if method == "POST" else b""
+        if u.path.startswith(_CTL_PREFIX):
+            return self._control(method, u.path[len(_CTL_PREFIX):], body)
+        m = _DASH_RE.match(u.path)
+        if m is None:
+            return self._reply("other", 404, b"Not Found", "text/plain", len(body))
+        dash, is_layout = m.group(2), bool(m.group(3))
+        kind = ("layout_post" if method == "POST" else "layout_get") if is_layout else "page"
+        if fake._should_fail(dash):
+            return self._reply(kind, fake.fail_status, b"Internal Server Error", "text/plain", len(body))
+        if not is_layout:
+            if method != "GET":
+                return self._reply(kind, 405, b"Method Not Allowed", "text/plain", len(body))
+            return self._reply(kind, 200, fake._page(fake._issue_token()), "text/html; charset=utf-8", len(body))
+        token = dict(urllib.parse.parse_qsl(u.query)).get("requestToken", "")
+        if not fake._accept_token(token):
+            return self._reply(kind, 401, b"Unauthorized", "text/plain", len(body))
+        if method == "GET":
+            return self._reply(kind, 200, fake._layout_bytes(dash), "application/json", 0)
+        try:
+            obj = json.loads(body)
+        except ValueError:
+            return self._reply(kind, 400, b"Bad Request", "text/plain", len(body))
+        fake.set_layout(obj, int(dash))
+        return self._reply(kind, 200, b'{"status":"ok"}', "application/json", len(body))
+
+    def _control(self, method: str, cmd: str, body: bytes) -> None:
+        fake = self.fake
+        if cmd == "stats" and method == "GET":
+            return self._reply("control", 200, json.dumps(fake.stats.snapshot()).encode("utf-8"), "application/json", 0)
+        if cmd == "reset" and method == "POST":
+            fake.stats.reset()
+            return self._reply("control", 200, b"{}", "application/json", len(body))
+        if cmd == "expire_tokens" and method == "POST":
+            fake.expire_tokens()
+            return self._reply("control", 200, b"{}", "application/json", len(body))
+        if cmd.startswith("layout/"):
+            dash = cmd.split("/", 1)[1]
+            if method == "GET":
+                return self._reply("control", 200, fake._layout_bytes(dash), "application/json", 0)
+            fake.set_layout(json.loads(body), int(dash))
+            return self._reply("control", 200, b"{}", "application/json", len(body))
+        return self._reply("control", 404, b"Not Found", "text/plain", len(body))
+
+    def do_GET(self) -> None:
+        self._route("GET")
+
+    def do_POST(self) -> None:
+        self._route("POST")
+
+
+def main(argv: Optional[list] = None) -> int:
+    ap = argparse.ArgumentParser(description="Run a local stand-in for a Hubitat hub's dashboard endpoints.")
+    ap.add_argument("--host", default="127.0.0.1", help="address to listen on (any 127.x.y.z)")
+    ap.add_argument("--port", type=int, default=8080, help="port (the tool always sends /layout requests to 8080)")
+    ap.add_argument("--layout", default=None, help="layout JSON file served for every dashboard (default: synthetic)")
+    ap.add_argument("--tiles", type=int, default=100, help="tiles in the synthetic layout")
+    ap.add_argument("--latency-ms", type=float, default=0.0, help="delay added to every response")
+    ap.add_argument("--bandwidth-kbps", type=float, default=0.0, help="body transfer rate in KB/s (0 = unlimited)")
+    ap.add_argument("--token-ttl", type=float, default=0.0, help="seconds a request token stays valid (0 = forever)")
+    ap.add_argument("--token-uses", type=int, default=0, help="layout requests per token (0 = unlimited)")
+    ap.add_argument("--fail-rate", type=float, default=0.0, help="fraction of hub requests that fail")
+    ap.add_argument("--fail-status", type=int, default=500)
+    ap.add_argument("--fail-dashboard", action="append", default=[], help="dashboard id that always fails (repeatable)")
+    ap.add_argument("--page-kb", type=float, default=0.0, help="pad the dashboard HTML to this size")
+    ap.add_argument("--seed", type=int, default=1)
+    args = ap.parse_args(argv)
+
+    layout = None
+    if args.layout:
+        with open(args.layout, "r", encoding="utf-8") as f:
+            layout = json.load(f)
+    hub = FakeHub(
+        host=args.host,
+        port=args.port,
+        layout=layout,
+        tiles=args.tiles,
+        latency=args.latency_ms / 1000.0,
+        bandwidth=args.bandwidth_kbps * 1024.0,
+        token_ttl=args.token_ttl,
+        token_uses=args.token_uses,
+        fail_rate=args.fail_rate,
+        fail_status=args.fail_status,
+        fail_dashboards=tuple(args.fail_dashboard),
+        page_bytes=int(args.page_kb * 1024),
+        seed=args.seed,
+    )
+    print(f"Fake hub listening; dashboard URL: {hub.dashboard_url(1)}", flush=True)
+    hub.serve()
+    print(json.dumps(hub.stats.snapshot(), indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
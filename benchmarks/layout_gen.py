@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+"""Deterministic synthetic dashboard layouts for benchmarking.
+
+The same arguments (and seed) always produce the same layout, so timings from
+different runs and machines are comparable.
+
+Usage:
+  python benchmarks/layout_gen.py --tiles 10000 [--overlap 0.05] [--spans 1x1:60,2x1:20,2x2:15,4x2:5]
+                                  [--css-rules 5000] [--width 0] [--seed 1] -o big.json
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import math
+import random
+import sys
+from typing import Any, Dict, List, Optional, Tuple
+
+# colSpan x rowSpan : weight
+DEFAULT_SPANS = "1x1:60,2x1:20,2x2:15,4x2:5"
+
+_TEMPLATES = ("switch", "attribute", "dimmer", "contact", "temperature", "motion")
+
+
+def parse_spans(spec: str) -> List[Tuple[int, int, int]]:
+    """'CxR:weight,...' -> [(colSpan, rowSpan, weight), ...]."""
+    out: List[Tuple[int, int, int]] = []
+    for part in spec.split(","):
+        part = part.strip()
+        if not part:
+            continue
+        size, _, weight = part.partition(":")
+        c, _, r = size.lower().partition("x")
+        out.append((int(c), int(r or c), int(weight or 1)))
+    if not out:
+        raise ValueError(f"empty span distribution: {spec!r}")
+    return out
+
+
+def make_layout(
+    n_tiles: int,
+    *,
+    overlap: float = 0.05,
+    spans: str = DEFAULT_SPANS,
+    css_rules: Optional[int] = None,
+    width: int = 0,
+    seed: int = 1,
+) -> Dict[str, Any]:
+    """Build a FULL layout object ({"name", "tiles", "customCSS"}).
+
+    Tiles are packed left to right in bands `width` columns wide (default about
+    2*sqrt(n)); a fraction `overlap` of them is instead dropped on top of an earlier
+    tile. css_rules tile-scoped rules (default n/2) are spread over random tiles, with
+    some comments and @media blocks mixed in.
+    """
+    rng = random.Random(seed)
+    dist = parse_spans(spans)
+    sizes = [(c, r) for c, r, _w in dist]
+    weights = [w for _c, _r, w in dist]
+    if width <= 0:
+        width = max(12, int(2 * math.sqrt(max(1, n_tiles))))
+
+    tiles: List[Dict[str, Any]] = []
+    row, col, band_h = 1, 1, 1
+    for i in range(n_tiles):
+        cs, rs = rng.choices(sizes, weights)[0]
+        cs = min(cs, width)
+        if tiles and rng.random() < overlap:
+            other = tiles[rng.randrange(len(tiles))]
+            t_row = other["row"] + rng.randrange(other["rowSpan"])
+            t_col = other["col"] + rng.randrange(other["colSpan"])
+        else:
+            if col + cs - 1 > width:
+                row += band_h
+                col, band_h = 1, 1
+            t_row, t_col = row, col
+            col += cs
+            band_h = max(band_h, rs)
+        tiles.append({
+            "id": i + 1,
+            "row": t_row,
+            "col": t_col,
+            "colSpan": cs,
+            "rowSpan": rs,
+            "template": _TEMPLATES[i % len(_TEMPLATES)],
+            "device": 1000 + rng.randrange(max(1, n_tiles // 2)),
+        })
+
+    if css_rules is None:
+        css_rules = n_tiles // 2
+    lines: List[str] = []
+    for k in range(css_rules):
+        tid = rng.randrange(1, n_tiles + 1) if n_tiles else k + 1
+        roll = rng.random()
+        if roll < 0.70:
+            lines.append(f"#tile-{tid} .tile-title {{ color: #{rng.randrange(0x1000000):06x}; }}")
+        elif roll < 0.85:
+            other = rng.randrange(1, n_tiles + 1) if n_tiles else tid
+            lines.append(f"#tile-{tid}, #tile-{other} {{ background: url('tile-{tid}.png'); }}")
+        elif roll < 0.95:
+            lines.append(f"/* tile-{tid}: custom styling */")
+            lines.append(f"#tile-{tid} .tile-contents {{ font-size: {10 + k % 8}px; }}")
+        else:
+            lines.append(f"@media (max-width: 800px) {{ #tile-{tid} {{ display: none; }} }}")
+    return {"name": f"synthetic-{n_tiles}", "tiles": tiles, "customCSS": "\n".join(lines) + ("\n" if lines else "")}
+
+
+def layout_bounds(tiles: List[Dict[str, Any]]) -> Tuple[int, int]:
+    """(max_row, max_col) covered by the tiles."""
+    max_r = max((t["row"] + t["rowSpan"] - 1 for t in tiles), default=1)
+    max_c = max((t["col"] + t["colSpan"] - 1 for t in tiles), default=1)
+    return max_r, max_c
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    ap = argparse.ArgumentParser(description="Generate a deterministic synthetic Hubitat dashboard layout.")
+    ap.add_argument("--tiles", type=int, required=True, help="number of tiles (e.g. 100 .. 100000)")
+    ap.add_argument("--overlap", type=float, default=0.05, help="fraction of tiles placed on top of another tile")
+    ap.add_argument("--spans", default=DEFAULT_SPANS, help="span distribution 'CxR:weight,...'")
+    ap.add_argument("--css-rules", type=int, default=None, help="tile-scoped customCSS rules (default tiles/2)")
+    ap.add_argument("--width", type=int, default=0, help="grid width in columns (default ~2*sqrt(tiles))")
+    ap.add_argument("--seed", type=int, default=1)
+    ap.add_argument("-o", "--output", default="-", help="output file (default stdout)")
+    args = ap.parse_args(argv)
+
+    obj = make_layout(
+        args.tiles, overlap=args.overlap, spans=args.spans, css_rules=args.css_rules, width=args.width, seed=args.seed
+    )
+    text = json.dumps(obj, indent=2, ensure_ascii=False) + "\n"
+    if args.output == "-":
+        sys.stdout.write(text)
+    else:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
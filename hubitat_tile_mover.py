@@ -1,7 +1,6 @@
 from __future__ import annotations
 
 import sys
-import traceback
 
 from hubitat_tile_mover.main import main
 
@@ -34,6 +33,7 @@ if __name__ == "__main__":
         raise SystemExit(130)
     except Exception as exc:
         if _debug_enabled(sys.argv[1:]):
+            import traceback
             traceback.print_exc()
         else:
             msg = _format_user_error(exc)
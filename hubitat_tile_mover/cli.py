@@ -1,6 +1,7 @@
 from __future__ import annotations
 
 import argparse
+import functools
 import sys
 
 from . import __version__
@@ -43,6 +44,7 @@ Usage:
 Main actions (choose one):
   --insert:rows / --insert:cols
   --move:rows / --move:cols / --move:range
+  --swap:rows / --swap:cols / --swap:range
   --copy:rows / --copy:cols / --copy:range
   --merge:rows / --merge:cols / --merge:range
   --delete:rows / --delete:cols
@@ -57,6 +59,10 @@ Main actions (choose one):
 Additional actions:
   --trim   --sort_json   --scrub_css   --compact_css   --show_map[:mode]   --list_tiles
 
+Batch:
+  --pipeline <filename>
+  --targets:hub <url> [<url> ...] / --targets:file <filename>
+
 Help:
   -h           very brief help
   --help       short help
@@ -67,34 +73,39 @@ SHORT_HELP = r'''Adjust and/or edit the "tiles" list in a Hubitat Dashboard layo
 
 Import (one; default: clipboard):
   --import:clipboard
+  --import:stdin                   read from a pipe (e.g. ... | hubitat_tile_mover.py --import:stdin)
   --import:file <filename>
   --import:hub <dashboard_url>
 
 Output destinations (repeatable; default: clipboard if none specified):
   --output:terminal
+  --output:stdout                  raw UTF-8 bytes for pipes (no newline translation)
   --output:clipboard
   --output:file <filename>
   --output:hub [dashboard_url]     FULL input only; URL optional if importing from hub
 
 Main actions (at most ONE per run):
-  Insert      --insert:rows COUNT AT_ROW
-              --insert:cols COUNT AT_COL
+  Insert      --insert:rows COUNT AT_ROW [COUNT AT_ROW ...]
+              --insert:cols COUNT AT_COL [COUNT AT_COL ...]
 
-  Move        --move:cols START END DEST
-              --move:rows START END DEST
-              --move:range SRC_TOP SRC_LEFT SRC_BOTTOM SRC_RIGHT DEST_TOP DEST_LEFT
+  Move        --move:cols START END DEST [START END DEST ...]
+              --move:rows START END DEST [START END DEST ...]
+              --move:range SRC_TOP SRC_LEFT SRC_BOTTOM SRC_RIGHT DEST_TOP DEST_LEFT [...]
+              --swap:cols START END OTHER_START
+              --swap:rows START END OTHER_START
+              --swap:range TOP LEFT BOTTOM RIGHT OTHER_TOP OTHER_LEFT
 
   Copy        --copy:cols START END DEST
               --copy:rows START END DEST
-              --copy:range SRC_TOP SRC_LEFT SRC_BOTTOM SRC_RIGHT DEST_TOP DEST_LEFT
+              --copy:range SRC_TOP SRC_LEFT SRC_BOTTOM SRC_RIGHT DEST_TOP DEST_LEFT [DEST_TOP DEST_LEFT ...]
 
   Merge       --merge:cols START END DEST
               --merge:rows START END DEST
               --merge:range SRC_TOP SRC_LEFT SRC_BOTTOM SRC_RIGHT DEST_TOP DEST_LEFT
               --merge_source:file <filename> OR --merge_source:hub <dashboard_url>
 
-  Delete      --delete:rows START END
-              --delete:cols START END
+  Delete      --delete:rows START END [START END ...]
+              --delete:cols START END [START END ...]
 
   Clear       --clear:rows START END
               --clear:cols START END
@@ -140,9 +151,23 @@ Modifiers:
 
 Hubitat direct mode:
   --undo_last
+  --undo[:N]  --redo[:N]  --history   step back / forward through the undo history, or list it
   --confirm_keep
   --lock_backup
 
+Interactive:
+  --shell                       import once, then type actions as commands; write when ready (type help)
+
+Batch:
+  --pipeline <filename>         run one action step per line; one backup, one output / hub POST
+  --targets:hub <url> [<url> ...]   run the same actions on each dashboard (needs --force)
+  --targets:file <filename>         dashboard URLs, one per line
+  --jobs:N  --per_hub:N         parallel dashboards (default 4) / requests per hub (default 2)
+
+Diagnostics:
+  --quiet  --verbose  --debug
+  --profile[:summary|:cprofile|:trace] [--profile_out <filename>]
+
 Maps / reports:
   --show_map[:full|:conflicts|:no_scale]   standalone map view if no action is given
   --show_ids
@@ -159,11 +184,13 @@ FULL_HELP = r'''hubitat_tile_mover - adjust a Hubitat Dashboard layout by operat
 
 Import (input) (only one; default: clipboard):
   --import:clipboard
+  --import:stdin                   read from a pipe (e.g. ... | hubitat_tile_mover.py --import:stdin)
   --import:file <filename>
   --import:hub <dashboard_url>
 
 Output destinations (repeatable; default: clipboard if none specified):
   --output:terminal
+  --output:stdout                  raw UTF-8 bytes for pipes (no newline translation)
   --output:clipboard
   --output:file <filename>
   --output:hub [dashboard_url]     FULL input only; URL optional if importing from hub
@@ -174,24 +201,74 @@ Hubitat direct mode:
   --lock_backup
   Note: undo files are maintained per dashboard.
 
+Undo history:
+  --undo[:N]       restore the layout from before the last N changing runs (default 1)
+  --redo[:N]       reapply N runs undone with --undo (default 1)
+  --history        list the history: time, --undo/--redo step, layout fingerprints and destination
+    Every run that changes the layout records its input and output as compressed snapshots,
+    stored once per layout content; a new run after --undo discards the steps it undid.
+    The oldest steps are dropped past 50 steps, 64 MiB of snapshots or 30 days.
+    Restores go to the outputs of the runs being undone unless --output is given.
+
+Interactive shell:
+  --shell
+    Imports the layout once, then reads commands until quit: any action switches (as on the command line),
+    map [mode], list [type] [keys], write [--output:...], undo, redo, reload, status and help.
+    The layout stays in memory between commands and is written (or POSTed) only by write, to the
+    command-line --output destinations unless write names others. Each write is one undo history step.
+    A command that fails leaves the layout unchanged. Commands can also be piped in (one per line).
+    Run-level switches (e.g. --force, --indent, --css:cleanup) apply to every command.
+    Not valid with actions on the command line, --pipeline, --targets, --confirm_keep or --import:stdin.
+
+Batch (pipeline):
+  --pipeline <filename>
+    Runs the action steps listed in the file, in order, on one in-memory layout.
+    One step per line using the same switches as the command line; '#' starts a comment.
+    The input is imported and backed up once; outputs (including --output:hub) are written once, after the last step.
+    Import / output switches, --undo_last, --undo, --redo, --confirm_keep and --lock_backup must be given on the command line.
+    Other command-line switches (e.g. --force, --show_map, --css:cleanup) apply to every step.
+
+Batch (multiple dashboards):
+  --targets:hub <dashboard_url> [<dashboard_url> ...]
+  --targets:file <filename>
+  --jobs:N        (default 4)
+  --per_hub:N     (default 2)
+    Runs the same actions (or --pipeline) against every listed dashboard: each layout is imported from
+    and saved back to its own dashboard, with its own undo backup file.
+    The targets file lists one dashboard URL per line; '#' starts a comment.
+    Up to --jobs dashboards are processed at once, with at most --per_hub concurrent requests to any one hub.
+    Output from each dashboard is printed as one block when it finishes, followed by a per-dashboard summary.
+    Requires --force (no per-dashboard prompts). Not valid with --import, --output, --undo_last, --undo, --redo or --confirm_keep.
+    --undo_last and the undo history do not apply to --targets runs; restore a dashboard from its backup file instead.
+
 Main actions (mutually exclusive; choose at most ONE per run)
 
   Insert empty rows / columns:
-    --insert:rows COUNT AT_ROW
-    --insert:cols COUNT AT_COL
+    --insert:rows COUNT AT_ROW [COUNT AT_ROW ...]
+    --insert:cols COUNT AT_COL [COUNT AT_COL ...]
     Modifiers: --select:include_partial, --col_range / --row_range
+    Several COUNT AT pairs insert at several places in one pass. Every AT is a position in the
+    original layout (later offsets are worked out for you), and each tile is shifted once.
 
   Move tiles:
-    --move:cols START_COL END_COL DEST_START_COL
-    --move:rows START_ROW END_ROW DEST_START_ROW
-    --move:range SRC_TOP_ROW SRC_LEFT_COL SRC_BOTTOM_ROW SRC_RIGHT_COL DEST_TOP_ROW DEST_LEFT_COL
+    --move:cols START_COL END_COL DEST_START_COL [START_COL END_COL DEST_START_COL ...]
+    --move:rows START_ROW END_ROW DEST_START_ROW [START_ROW END_ROW DEST_START_ROW ...]
+    --move:range SRC_TOP_ROW SRC_LEFT_COL SRC_BOTTOM_ROW SRC_RIGHT_COL DEST_TOP_ROW DEST_LEFT_COL [...]
+    --swap:cols START_COL END_COL OTHER_START_COL
+    --swap:rows START_ROW END_ROW OTHER_START_ROW
+    --swap:range TOP_ROW LEFT_COL BOTTOM_ROW RIGHT_COL OTHER_TOP_ROW OTHER_LEFT_COL
     Modifiers: --select:include_partial, --overlaps:allow, --overlaps:skip
+    Several mappings move several bands at once (source bands must not overlap). Conflicts are
+    checked once against the final arrangement, including bands landing on each other.
+    --swap:* exchanges a band or region with the same-size one starting at OTHER_START (one run, no parking area).
 
   Copy / duplicate existing tiles:
     --copy:cols START_COL END_COL DEST_START_COL
     --copy:rows START_ROW END_ROW DEST_START_ROW
-    --copy:range SRC_TOP_ROW SRC_LEFT_COL SRC_BOTTOM_ROW SRC_RIGHT_COL DEST_TOP_ROW DEST_LEFT_COL
+    --copy:range SRC_TOP_ROW SRC_LEFT_COL SRC_BOTTOM_ROW SRC_RIGHT_COL DEST_TOP_ROW DEST_LEFT_COL [DEST_TOP_ROW DEST_LEFT_COL ...]
     Modifiers: --select:include_partial, --overlaps:allow, --overlaps:skip, --css:ignore
+    Several DEST_TOP_ROW DEST_LEFT_COL pairs stamp the range at each origin in one run: new ids are
+    one block, tile CSS is generated once for all copies, and copies are checked against each other too.
 
   Merge / import tiles from another layout:
     --merge_source:file <filename>
@@ -202,9 +279,10 @@ Main actions (mutually exclusive; choose at most ONE per run)
     Modifiers: --select:include_partial, --overlaps:allow, --overlaps:skip, --css:ignore
 
   Delete rows / columns (removes matched tiles and shifts following tiles up / left):
-    --delete:rows START_ROW END_ROW
-    --delete:cols START_COL END_COL
+    --delete:rows START_ROW END_ROW [START_ROW END_ROW ...]
+    --delete:cols START_COL END_COL [START_COL END_COL ...]
     Modifiers: --select:include_partial, --row_range / --col_range, --overlaps:allow, --css:cleanup, --force
+    Several START END pairs delete several bands in one pass (original positions; overlapping bands merge).
 
   Clear tiles (removes matched tiles but does not shift anything):
     --clear:rows START_ROW END_ROW
@@ -337,6 +415,10 @@ Diagnostics
   --quiet              suppress the final one-line summary
   --verbose            planned actions summary to STDERR
   --debug              per-tile action logs to STDERR
+  --profile[:summary]  per-phase wall/CPU timings to STDERR (import, hub token/GET/POST, JSON, op, CSS, map, backup, output)
+  --profile:cprofile   timings plus a cProfile dump (default hubitat_tile_mover.pstats)
+  --profile:trace      timings plus a Chrome-trace JSON of every phase and op call (default hubitat_tile_mover_trace.json)
+  --profile_out <filename>   file for the cProfile / trace output
 
 Help
 
@@ -365,7 +447,48 @@ class _SpacingSetModeAction(argparse.Action):
         setattr(namespace, self.dest, (mode, gap))
 
 
+class _MoveBandsAction(argparse.Action):
+    """Store --move:* values, and the switch that set them in <dest>_switch (for error messages)."""
+
+    def __call__(self, parser, namespace, values, option_string=None):
+        setattr(namespace, self.dest, values)
+        setattr(namespace, self.dest + "_switch", self.option_strings[0])
+
+
+class _SwapBandsAction(argparse.Action):
+    """Store a swap of two same-size bands (or regions) as the two moves of one --move:* run.
+
+    --swap:rows S E O   -> --move:rows S E O  O O+(E-S) S
+    --swap:range T L B R OT OL -> the region moves to (OT, OL) and the same-size region there moves to (T, L).
+    The --swap:* switch is recorded in <dest>_switch, so errors name it rather than --move:*.
+    """
+
+    def __call__(self, parser, namespace, values, option_string=None):
+        if len(values) == 3:
+            s, e, o = values
+            if s > e:
+                s, e = e, s
+            moves = [s, e, o, o, o + (e - s), s]
+        else:
+            t, l, b, r, ot, ol = values
+            if t > b:
+                t, b = b, t
+            if l > r:
+                l, r = r, l
+            moves = [t, l, b, r, ot, ol, ot, ol, ot + (b - t), ol + (r - l), t, l]
+        setattr(namespace, self.dest, moves)
+        setattr(namespace, self.dest + "_switch", self.option_strings[0])
+
+
+class StepParseError(ValueError):
+    """A parse error raised (not printed) while the parser has raise_errors set."""
+
+
 class TileSorterArgumentParser(argparse.ArgumentParser):
+    # Set while parsing --pipeline steps: error() raises StepParseError so the caller can
+    # report the file and line instead of argparse printing usage and exiting.
+    raise_errors = False
+
     def format_brief_help(self) -> str:
         return BRIEF_HELP + "\n"
 
@@ -385,6 +508,8 @@ class TileSorterArgumentParser(argparse.ArgumentParser):
         self._print_message(self.format_full_help(), file or sys.stdout)
 
     def error(self, message: str) -> None:
+        if self.raise_errors:
+            raise StepParseError(message)
         self.print_usage(sys.stderr)
         self.exit(2, f"ERROR: {message}\nUse -h, --help, or --help:full for help.\n")
 
@@ -414,9 +539,9 @@ class _SetImportSpecAction(argparse.Action):
         super().__init__(option_strings, dest, **kwargs)
 
     def __call__(self, parser, namespace, values, option_string=None):
-        if self._kind in ("clipboard", "hub"):
-            if self._kind == "clipboard":
-                setattr(namespace, self.dest, ["clipboard"])
+        if self._kind in ("clipboard", "stdin", "hub"):
+            if self._kind in ("clipboard", "stdin"):
+                setattr(namespace, self.dest, [self._kind])
             else:
                 setattr(namespace, self.dest, ["hub", values])
         elif self._kind == "file":
@@ -435,7 +560,7 @@ class _AppendOutputToAction(argparse.Action):
         cur = getattr(namespace, self.dest, None)
         if cur is None:
             cur = []
-        if self._kind in ("terminal", "clipboard"):
+        if self._kind in ("terminal", "stdout", "clipboard"):
             cur.append([self._kind])
         elif self._kind == "file":
             cur.append(["file", values])
@@ -448,7 +573,9 @@ class _AppendOutputToAction(argparse.Action):
             cur.append([self._kind])
         setattr(namespace, self.dest, cur)
 
+@functools.lru_cache(maxsize=1)
 def build_parser() -> argparse.ArgumentParser:
+    """Build the argument parser (once per process; parse_args() does not mutate it)."""
     p = TileSorterArgumentParser(
         add_help=False,
         allow_abbrev=False,
@@ -471,17 +598,27 @@ def build_parser() -> argparse.ArgumentParser:
     # User-facing convenience switches (these appear in -h via SHORT_HELP / FULL_HELP)
     imp_vis = io_grp.add_mutually_exclusive_group(required=False)
     imp_vis.add_argument('--import:clipboard', dest='import_spec', nargs=0, action=_SetImportSpecAction, kind='clipboard', help='Read JSON from clipboard (default).')
+    imp_vis.add_argument('--import:stdin', dest='import_spec', nargs=0, action=_SetImportSpecAction, kind='stdin', help='Read JSON from standard input (pipe or redirect).')
     imp_vis.add_argument('--import:file', dest='import_spec', action=_SetImportSpecAction, kind='file', metavar='FILENAME', help='Read JSON from file.')
     imp_vis.add_argument('--import:hub', dest='import_spec', action=_SetImportSpecAction, kind='hub', metavar='DASHBOARD_URL', help='Read layout JSON from Hubitat dashboard URL.')
 
     out_vis = io_grp.add_argument_group('Output destinations')
     out_vis.add_argument('--output:terminal', dest='output_to', nargs=0, action=_AppendOutputToAction, kind='terminal', help='Write JSON to terminal. Repeatable.')
+    out_vis.add_argument('--output:stdout', dest='output_to', nargs=0, action=_AppendOutputToAction, kind='stdout', help='Write JSON to standard output as UTF-8 bytes (for pipes). Repeatable.')
     out_vis.add_argument('--output:clipboard', dest='output_to', nargs=0, action=_AppendOutputToAction, kind='clipboard', help='Write JSON to clipboard. Repeatable.')
     out_vis.add_argument('--output:file', dest='output_to', action=_AppendOutputToAction, kind='file', metavar='FILENAME', help='Write JSON to file. Repeatable.')
     out_vis.add_argument('--output:hub', dest='output_to', nargs='?', action=_AppendOutputToAction, kind='hub', metavar='DASHBOARD_URL', help='POST resulting FULL layout JSON back to Hubitat dashboard URL (URL optional if importing from hub).')
     io_grp.add_argument("--undo_last", dest="undo_last", action="store_true", help="Restore from the last backup (writes to requested outputs).")
+    io_grp.add_argument("--undo", dest="undo_steps", nargs="?", type=int, const=1, default=None, metavar="N", help="Restore the layout from before the last N changing runs in the undo history (default 1).")
+    io_grp.add_argument("--redo", dest="redo_steps", nargs="?", type=int, const=1, default=None, metavar="N", help="Reapply N runs undone with --undo (default 1).")
+    io_grp.add_argument("--history", dest="history", action="store_true", help="List the undo history.")
     io_grp.add_argument("--confirm_keep", dest="confirm_keep", action="store_true", help="After writing changed output(s), prompt to keep; if not, restore backup to the same outputs.")
     io_grp.add_argument("--lock_backup", dest="lock_backup", action="store_true", help="Do not overwrite an existing backup; reuse it as the restore point.")
+    io_grp.add_argument("--shell", dest="shell", action="store_true", help="Import once, then run action switches typed as commands against the in-memory layout (type help).")
+    io_grp.add_argument("--pipeline", dest="pipeline", default=None, metavar="FILENAME", help="Run the action steps listed in FILENAME (one per line) on one in-memory layout: one backup, one output / hub POST.")
+    io_grp.add_argument("--targets", dest="targets", nargs="+", default=None, help="(see --help:full for details)")
+    io_grp.add_argument("--jobs", dest="jobs", type=int, default=4, metavar="N", help="--targets: dashboards processed at once (default 4).")
+    io_grp.add_argument("--per_hub", dest="per_hub", type=int, default=2, metavar="N", help="--targets: concurrent requests to any one hub (default 2).")
 
     io_grp.add_argument(
         "--import",
@@ -528,7 +665,7 @@ def build_parser() -> argparse.ArgumentParser:
         "--insert_rows",
         "--insert-rows",
         dest="insert_rows",
-        nargs=2,
+        nargs="+",
         metavar=("COUNT", "AT_ROW"),
         type=int,
         help="(see --help:full for details)",
@@ -540,7 +677,7 @@ def build_parser() -> argparse.ArgumentParser:
         "--insert_columns",
         "--insert-columns",
         dest="insert_cols",
-        nargs=2,
+        nargs="+",
         metavar=("COUNT", "AT_COL"),
         type=int,
         help="(see --help:full for details)",
@@ -599,9 +736,10 @@ def build_parser() -> argparse.ArgumentParser:
         "--move_columns",
         "--move-columns",
         dest="move_cols",
-        nargs=3,
+        nargs="+",
         metavar=("START_COL", "END_COL", "DEST_START_COL"),
         type=int,
+        action=_MoveBandsAction,
         help="(see --help:full for details)",
     )
     ops.add_argument(
@@ -609,9 +747,10 @@ def build_parser() -> argparse.ArgumentParser:
         "--move_rows",
         "--move-rows",
         dest="move_rows",
-        nargs=3,
+        nargs="+",
         metavar=("START_ROW", "END_ROW", "DEST_START_ROW"),
         type=int,
+        action=_MoveBandsAction,
         help="(see --help:full for details)",
     )
     ops.add_argument(
@@ -619,9 +758,44 @@ def build_parser() -> argparse.ArgumentParser:
         "--move_range",
         "--move-range",
         dest="move_range",
-        nargs=6,
+        nargs="+",
         metavar=("SRC_TOP_ROW", "SRC_LEFT_COL", "SRC_BOTTOM_ROW", "SRC_RIGHT_COL", "DEST_TOP_ROW", "DEST_LEFT_COL"),
         type=int,
+        action=_MoveBandsAction,
+        help="(see --help:full for details)",
+    )
+
+    ops.add_argument(
+        "--swap:cols",
+        "--swap_cols",
+        "--swap-cols",
+        dest="move_cols",
+        nargs=3,
+        metavar=("START_COL", "END_COL", "OTHER_START_COL"),
+        type=int,
+        action=_SwapBandsAction,
+        help="(see --help:full for details)",
+    )
+    ops.add_argument(
+        "--swap:rows",
+        "--swap_rows",
+        "--swap-rows",
+        dest="move_rows",
+        nargs=3,
+        metavar=("START_ROW", "END_ROW", "OTHER_START_ROW"),
+        type=int,
+        action=_SwapBandsAction,
+        help="(see --help:full for details)",
+    )
+    ops.add_argument(
+        "--swap:range",
+        "--swap_range",
+        "--swap-range",
+        dest="move_range",
+        nargs=6,
+        metavar=("TOP_ROW", "LEFT_COL", "BOTTOM_ROW", "RIGHT_COL", "OTHER_TOP_ROW", "OTHER_LEFT_COL"),
+        type=int,
+        action=_SwapBandsAction,
         help="(see --help:full for details)",
     )
 
@@ -650,7 +824,7 @@ def build_parser() -> argparse.ArgumentParser:
         "--copy_range",
         "--copy-range",
         dest="copy_range",
-        nargs=6,
+        nargs="+",
         metavar=("SRC_TOP_ROW", "SRC_LEFT_COL", "SRC_BOTTOM_ROW", "SRC_RIGHT_COL", "DEST_TOP_ROW", "DEST_LEFT_COL"),
         type=int,
         help="(see --help:full for details)",
@@ -692,7 +866,7 @@ def build_parser() -> argparse.ArgumentParser:
         "--delete_rows",
         "--delete-rows",
         dest="delete_rows",
-        nargs=2,
+        nargs="+",
         metavar=("START_ROW", "END_ROW"),
         type=int,
         help="(see --help:full for details)",
@@ -704,7 +878,7 @@ def build_parser() -> argparse.ArgumentParser:
         "--delete_columns",
         "--delete-columns",
         dest="delete_cols",
-        nargs=2,
+        nargs="+",
         metavar=("START_COL", "END_COL"),
         type=int,
         help="(see --help:full for details)",
@@ -907,5 +1081,9 @@ def build_parser() -> argparse.ArgumentParser:
     diag_grp.add_argument("--verbose", action="store_true", help="Verbose output to STDERR")
     diag_grp.add_argument("--debug", action="store_true", help="Debug output (very verbose) to STDERR")
     diag_grp.add_argument("--quiet", action="store_true", help="Suppress final status line")
+    diag_grp.add_argument("--profile", "--profile:summary", dest="profile", action="store_const", const="summary", help="Per-phase wall/CPU timings to STDERR")
+    diag_grp.add_argument("--profile:cprofile", dest="profile", action="store_const", const="cprofile", help="Phase timings plus a cProfile .pstats dump")
+    diag_grp.add_argument("--profile:trace", dest="profile", action="store_const", const="trace", help="Phase timings plus a Chrome-trace JSON file")
+    diag_grp.add_argument("--profile_out", dest="profile_out", default=None, metavar="FILENAME", help="File for --profile:cprofile / --profile:trace output")
 
     return p
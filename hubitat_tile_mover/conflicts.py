@@ -0,0 +1,216 @@
+from __future__ import annotations
+
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from .overlaps import UnionFind
+from .profiling import profiled
+from .spatial import RectIndex, overlap_rect
+from .tiles import as_int, rect
+
+Rect = Tuple[int, int, int, int]  # inclusive (r1, r2, c1, c2)
+Node = Tuple[str, int]  # ('moving' | 'stationary', tile id)
+
+
+def _bounds(rects: List[Rect]) -> Rect:
+    return (
+        min(r[0] for r in rects),
+        max(r[1] for r in rects),
+        min(r[2] for r in rects),
+        max(r[3] for r in rects),
+    )
+
+
+class ConflictGroup:
+    """One connected set of conflicting tiles (moving and blocking), with its classification."""
+
+    __slots__ = ("moving_ids", "stationary_ids", "tile_bounds", "overlap_bounds", "kind", "severity")
+
+    def __init__(
+        self,
+        moving_ids: List[int],
+        stationary_ids: List[int],
+        tile_bounds: Rect,
+        overlap_bounds: Rect,
+        kind: str,
+        severity: str,
+    ) -> None:
+        self.moving_ids = moving_ids
+        self.stationary_ids = stationary_ids
+        self.tile_bounds = tile_bounds
+        self.overlap_bounds = overlap_bounds
+        self.kind = kind
+        self.severity = severity
+
+
+class ConflictModel:
+    """Destination conflicts of one move/copy/merge/shift, from a single indexed scan.
+
+    pairs holds (moving index, stationary index, overlap rect) in moving order, then
+    stationary order; by_mid is the same data keyed by moving tile id. The abort
+    message, the conflict map (overlap rects, destination footprints, map bounds)
+    and the detailed conflict report (groups) all read from here.
+    """
+
+    def __init__(
+        self,
+        moving: List[Dict[str, Any]],
+        stationary: List[Dict[str, Any]],
+        moved_rects: List[Rect],
+        stationary_rects: List[Rect],
+        pairs: List[Tuple[int, int, Rect]],
+    ) -> None:
+        self.moving = moving
+        self.stationary = stationary
+        self.moved_rects = moved_rects
+        self.stationary_rects = stationary_rects
+        self.pairs = pairs
+        self.by_mid: Dict[int, List[Tuple[int, Rect]]] = {}
+        for mi, si, orect in pairs:
+            self.by_mid.setdefault(as_int(moving[mi], "id"), []).append((as_int(stationary[si], "id"), orect))
+        self._groups: Optional[List[ConflictGroup]] = None
+        self._tiles_by_id: Optional[Dict[str, Dict[int, Dict[str, Any]]]] = None
+
+    def __bool__(self) -> bool:
+        return bool(self.pairs)
+
+    @property
+    def total_pairs(self) -> int:
+        return len(self.pairs)
+
+    @property
+    def overlap_rects(self) -> List[Rect]:
+        return [orect for _mi, _si, orect in self.pairs]
+
+    def map_bounds(self, map_focus: str, *, include_moved: bool = True) -> Optional[List[Rect]]:
+        """bounds_rects for the conflict map: the whole layout, the conflict area, or auto (None)."""
+        if map_focus in ("full", "no_scale"):
+            return self.stationary_rects + self.moved_rects if include_moved else list(self.stationary_rects)
+        if map_focus == "conflict":
+            return self.overlap_rects
+        return None
+
+    def details(self, verb: str, limit: int = 10) -> str:
+        """The first few conflicts, as quoted in the abort message."""
+        sample = list(self.by_mid.items())[:limit]
+        details = "; ".join(
+            f"{verb} id={mid} conflicts at r{entries[0][1][0]}..{entries[0][1][1]},c{entries[0][1][2]}..{entries[0][1][3]} with {[sid for sid, _ in entries]}"
+            for mid, entries in sample
+        )
+        more = "" if len(self.by_mid) <= limit else f" (and {len(self.by_mid) - limit} more)"
+        return details + more
+
+    # -- groups --
+
+    def tile(self, node: Node) -> Dict[str, Any]:
+        """The moving or stationary tile behind a group node (the last one, for a repeated id)."""
+        if self._tiles_by_id is None:
+            self._tiles_by_id = {
+                "moving": {as_int(t, "id"): t for t in self.moving},
+                "stationary": {as_int(t, "id"): t for t in self.stationary},
+            }
+        kind, tid = node
+        return self._tiles_by_id[kind][tid]
+
+    @property
+    def groups(self) -> List[ConflictGroup]:
+        """Connected conflict groups, ordered by their smallest (kind, id) node."""
+        if self._groups is None:
+            self._groups = self._build_groups()
+        return self._groups
+
+    def _build_groups(self) -> List[ConflictGroup]:
+        node_ix: Dict[Node, int] = {}
+        edges: Dict[Tuple[int, int], List[Rect]] = {}
+        for mid, entries in self.by_mid.items():
+            a = node_ix.setdefault(("moving", mid), len(node_ix))
+            for sid, orect in entries:
+                b = node_ix.setdefault(("stationary", sid), len(node_ix))
+                edges.setdefault((a, b), []).append(orect)
+        nodes = list(node_ix)
+        uf = UnionFind(len(nodes))
+        for a, b in edges:
+            uf.union(a, b)
+        members: Dict[int, List[int]] = {}
+        for i in range(len(nodes)):
+            members.setdefault(uf.find(i), []).append(i)
+        comp_edges: Dict[int, List[Tuple[int, int]]] = {}
+        for a, b in edges:
+            comp_edges.setdefault(uf.find(a), []).append((a, b))
+
+        def order(ids: List[int], kind: str) -> List[int]:
+            return sorted(ids, key=lambda tid: (as_int(self.tile((kind, tid)), "row"), as_int(self.tile((kind, tid)), "col"), tid))
+
+        out: List[Tuple[Node, ConflictGroup]] = []
+        for root, comp in members.items():
+            comp_nodes = [nodes[i] for i in comp]
+            group_edges = comp_edges.get(root, [])
+            overlaps = [orect for e in group_edges for orect in edges[e]]
+            tile_bounds = _bounds([rect(self.tile(n)) for n in comp_nodes])
+            kind, severity = self._classify([(rect(self.tile(nodes[a])), rect(self.tile(nodes[b]))) for a, b in group_edges])
+            out.append((min(comp_nodes), ConflictGroup(
+                moving_ids=order([tid for k, tid in comp_nodes if k == "moving"], "moving"),
+                stationary_ids=order([tid for k, tid in comp_nodes if k == "stationary"], "stationary"),
+                tile_bounds=tile_bounds,
+                overlap_bounds=_bounds(overlaps) if overlaps else tile_bounds,
+                kind=kind,
+                severity=severity,
+            )))
+        out.sort(key=lambda kv: kv[0])
+        return [g for _, g in out]
+
+    @staticmethod
+    def _classify(pairs: List[Tuple[Rect, Rect]]) -> Tuple[str, str]:
+        same_origin = exact_dup = partial = False
+        for ra, rb in pairs:
+            if ra[0] == rb[0] and ra[2] == rb[2]:
+                same_origin = True
+            if ra == rb:
+                exact_dup = True
+            elif not _contains(ra, rb) and not _contains(rb, ra):
+                partial = True
+        if exact_dup:
+            return ("exact duplicate footprint", "high")
+        if partial and same_origin:
+            return ("same-origin overlap cluster", "high")
+        if same_origin:
+            return ("same-origin cluster", "medium")
+        if partial:
+            return ("partial overlap cluster", "high")
+        return ("nested/contained conflict cluster", "medium")
+
+    def blocked_by(self) -> Dict[int, List[Tuple[int, Rect]]]:
+        """stationary id -> [(moving id, overlap rect)], by moving id."""
+        out: Dict[int, List[Tuple[int, Rect]]] = {}
+        for mid, entries in sorted(self.by_mid.items()):
+            for sid, orect in entries:
+                out.setdefault(sid, []).append((mid, orect))
+        return out
+
+
+def _contains(a: Rect, b: Rect) -> bool:
+    return a[0] <= b[0] and a[1] >= b[1] and a[2] <= b[2] and a[3] >= b[3]
+
+
+@profiled("conflicts.scan")
+def scan_conflicts(
+    moving_tiles: List[Dict[str, Any]],
+    stationary_tiles: List[Dict[str, Any]],
+    moved_rect_fn: Callable[[Dict[str, Any]], Rect],
+    *,
+    stationary_rect_fn: Callable[[Dict[str, Any]], Rect] = rect,
+    pair_filter: Optional[Callable[[int, int], bool]] = None,
+) -> ConflictModel:
+    """Overlaps between the moving tiles at their destinations and the stationary tiles.
+
+    stationary_rect_fn places the other side (default: where it is now); pair_filter(mi, si),
+    when given, keeps only the (moving index, stationary index) pairs it returns True for.
+    """
+    stationary_rects = [stationary_rect_fn(t) for t in stationary_tiles]
+    moved_rects = [moved_rect_fn(t) for t in moving_tiles]
+    index = RectIndex(stationary_rects)
+    pairs: List[Tuple[int, int, Rect]] = []
+    for mi, mrect in enumerate(moved_rects):
+        for si in index.query(mrect):
+            if pair_filter is None or pair_filter(mi, si):
+                pairs.append((mi, si, overlap_rect(mrect, stationary_rects[si])))
+    return ConflictModel(moving_tiles, stationary_tiles, moved_rects, stationary_rects, pairs)
@@ -1,10 +1,11 @@
 from __future__ import annotations
 
-from dataclasses import dataclass
-from typing import Dict, Iterable, List, Optional, Sequence, Set, Tuple
+from typing import Callable, Dict, FrozenSet, Iterable, List, NamedTuple, Optional, Sequence, Set, Tuple
 
 import re
 
+from .profiling import profiled
+
 _TILE_ID_PATTERNS = [
     re.compile(r"#tile-(\d+)\b"),
     re.compile(r"\.tile-(\d+)\b"),
@@ -20,6 +21,24 @@ _COMMENT_TILE_ID_PATTERNS = [
 ]
 
 
+# Scanners jump straight to the next significant token instead of walking characters.
+_SELECTOR_TOKEN_RX = re.compile(r"""['"()\[\]{},]|/\*""")
+_QUOTE_OR_COMMENT_RX = re.compile(r"""['"]|/\*""")
+_QUOTE_COMMENT_OR_WS_RX = re.compile(r"""['"]|/\*|\s+""")
+_WS_RUN_RX = re.compile(r"\s+")
+# Rest of a quoted string after its opening quote; a backslash escapes any character.
+_STRING_TAIL_RX = {
+    "'": re.compile(r"[^'\\]*+(?:\\.[^'\\]*+)*+'", re.S),
+    '"': re.compile(r'[^"\\]*+(?:\\.[^"\\]*+)*+"', re.S),
+}
+
+
+def _string_end(text: str, pos: int, quote: str, end: int) -> int:
+    """Offset just past the string opened by quote at pos - 1 (end when unterminated)."""
+    m = _STRING_TAIL_RX[quote].match(text, pos, end)
+    return m.end() if m else end
+
+
 def _split_selector_list(prelude: str) -> List[str]:
     """Split a selector list into items.
 
@@ -34,72 +53,45 @@ def _split_selector_list(prelude: str) -> List[str]:
     """
     s = prelude
     out: List[str] = []
-    buf: List[str] = []
-    i = 0
     n = len(s)
-    in_str: Optional[str] = None
+    start = pos = 0
     depth_paren = 0
     depth_brack = 0
     depth_brace = 0
 
-    while i < n:
-        ch = s[i]
-
-        # comment
-        if in_str is None and ch == "/" and (i + 1) < n and s[i + 1] == "*":
-            endc = s.find("*/", i + 2)
+    while True:
+        m = _SELECTOR_TOKEN_RX.search(s, pos)
+        if m is None:
+            break
+        tok = m.group()
+        pos = m.end()
+        if tok == "/*":
+            endc = s.find("*/", pos)
             if endc == -1:
-                buf.append(s[i:])
-                i = n
                 break
-            buf.append(s[i : endc + 2])
-            i = endc + 2
-            continue
-
-        # strings
-        if in_str is not None:
-            buf.append(ch)
-            if ch == "\\" and (i + 1) < n:
-                buf.append(s[i + 1])
-                i += 2
-                continue
-            if ch == in_str:
-                in_str = None
-            i += 1
-            continue
-        if ch in ("'", '"'):
-            in_str = ch
-            buf.append(ch)
-            i += 1
-            continue
-
-        # nesting
-        if ch == "(":
+            pos = endc + 2
+        elif tok == "'" or tok == '"':
+            pos = _string_end(s, pos, tok, n)
+        elif tok == "(":
             depth_paren += 1
-        elif ch == ")":
+        elif tok == ")":
             depth_paren = max(0, depth_paren - 1)
-        elif ch == "[":
+        elif tok == "[":
             depth_brack += 1
-        elif ch == "]":
+        elif tok == "]":
             depth_brack = max(0, depth_brack - 1)
-        elif ch == "{":
+        elif tok == "{":
             depth_brace += 1
-        elif ch == "}":
+        elif tok == "}":
             depth_brace = max(0, depth_brace - 1)
-
-        # top-level selector separator
-        if ch == "," and depth_paren == 0 and depth_brack == 0 and depth_brace == 0:
-            item = "".join(buf).strip()
+        elif depth_paren == 0 and depth_brack == 0 and depth_brace == 0:
+            # top-level selector separator
+            item = s[start : m.start()].strip()
             if item:
                 out.append(item)
-            buf = []
-            i += 1
-            continue
-
-        buf.append(ch)
-        i += 1
+            start = pos
 
-    tail = "".join(buf).strip()
+    tail = s[start:].strip()
     if tail:
         out.append(tail)
     return out
@@ -116,32 +108,61 @@ def _selector_tile_ids(selector: str) -> Set[int]:
                 pass
     return ids
 
-def _replace_tile_id_in_selector(selector: str, old: int, new: int) -> str:
-    # Common forms: #tile-123, .tile-123, 'tile-123', "tile-123"
-    selector = re.sub(rf"(#tile-){old}\b", rf"\g<1>{new}", selector)
-    selector = re.sub(rf"(\.tile-){old}\b", rf"\g<1>{new}", selector)
-    selector = re.sub(rf"(['\"]tile-){old}(['\"])", rf"\g<1>{new}\2", selector)
-    # Also handle bare tile-123 tokens (commonly found inside selector comments).
-    selector = re.sub(rf"(tile-){old}\b", rf"\g<1>{new}", selector)
-    return selector
+# Every tile-N token, also when glued to other text (selector items: #tile-N, .tile-N,
+# 'tile-N', bare tile-N in selector comments, ...).
+_TILE_TOKEN_RX = re.compile(r"tile-(\d+)\b")
+# tile-N as a whole word (declaration bodies and standalone comments).
+_TILE_WORD_RX = re.compile(r"\btile-(\d+)\b")
 
 
-def _replace_tile_id_in_body(body: str, old: int, new: int) -> str:
-    """Rewrite tile-id references inside a declaration body.
+class _TileIdRewriter:
+    """Rewrites tile-OLD -> tile-NEW for the old ids of one id map.
 
-    Used when duplicating a selector rule for a specific tile id. If the rule
-    is selector-tied to OLD, then occurrences of "tile-OLD" inside the body
-    (including inside strings, url(...), and comments) are safe to rewrite to
-    "tile-NEW".
+    Each text is scanned once, with one compiled pattern, for the tile-N tokens whose N
+    is in the map; every (old -> new) copy of it is then spliced from those offsets, so
+    emitting one rule per matched (old, new) pair costs no further regex work.
 
-    Notes:
-      - Orphan detection ignores comments globally; this rewrite only affects
-        the duplicated rule's body.
-      - This is intentionally conservative: only tile-OLD is rewritten.
+    Selector items rewrite every tile-OLD token. Declaration bodies and comments only
+    rewrite tile-OLD words: when a rule is duplicated because its selector is tied to
+    OLD, tile-OLD inside its body (strings, url(...), comments) is safe to rewrite, and
+    only tile-OLD is touched.
     """
-    if not body:
-        return body
-    return re.sub(rf"\btile-{old}\b", f"tile-{new}", body)
+
+    def __init__(self, old_ids: Iterable[int]) -> None:
+        self.digits = {str(old) for old in old_ids}
+        self._hits: Dict[Tuple[str, bool], List[Tuple[int, int, str]]] = {}
+
+    def _scan(self, text: str, word: bool) -> List[Tuple[int, int, str]]:
+        key = (text, word)
+        hits = self._hits.get(key)
+        if hits is None:
+            hits = []
+            if "tile-" in text:
+                digits = self.digits
+                rx = _TILE_WORD_RX if word else _TILE_TOKEN_RX
+                for m in rx.finditer(text):
+                    if m.group(1) in digits:
+                        hits.append((m.start(1), m.end(1), m.group(1)))
+            self._hits[key] = hits
+        return hits
+
+    def rewrite(self, text: str, old: int, new: int, *, word: bool = False) -> str:
+        """text with tile-OLD replaced by tile-NEW; other ids are left alone."""
+        if not text:
+            return text
+        old_s = str(old)
+        new_s = str(new)
+        parts: List[str] = []
+        last = 0
+        for start, end, found in self._scan(text, word):
+            if found == old_s:
+                parts.append(text[last:start])
+                parts.append(new_s)
+                last = end
+        if not parts:
+            return text
+        parts.append(text[last:])
+        return "".join(parts)
 
 
 def _tile_ids_in_text(text: str) -> Set[int]:
@@ -165,36 +186,26 @@ def _strip_block_comments_outside_strings(text: str) -> str:
     """
     if not text:
         return ""
+    if "/*" not in text:
+        return text
     out: List[str] = []
-    i = 0
     n = len(text)
-    in_str: Optional[str] = None
-    while i < n:
-        ch = text[i]
-        if in_str is not None:
-            out.append(ch)
-            if ch == "\\" and (i + 1) < n:
-                out.append(text[i + 1])
-                i += 2
-                continue
-            if ch == in_str:
-                in_str = None
-            i += 1
-            continue
-        if ch in ("'", '"'):
-            in_str = ch
-            out.append(ch)
-            i += 1
-            continue
-        if ch == "/" and (i + 1) < n and text[i + 1] == "*":
-            endc = text.find("*/", i + 2)
+    start = pos = 0
+    while True:
+        m = _QUOTE_OR_COMMENT_RX.search(text, pos)
+        if m is None:
+            break
+        tok = m.group()
+        if tok == "/*":
+            out.append(text[start : m.start()])
+            endc = text.find("*/", m.end())
             if endc == -1:
                 # Unterminated comment: drop the remainder.
-                break
-            i = endc + 2
-            continue
-        out.append(ch)
-        i += 1
+                return "".join(out)
+            start = pos = endc + 2
+        else:
+            pos = _string_end(text, m.end(), tok, n)
+    out.append(text[start:])
     return "".join(out)
 
 
@@ -207,20 +218,10 @@ def _tile_ids_in_css_stylesheet(css: str) -> Set[int]:
       - ALL block comments are ignored (top-level, inside @media, and inside
         declaration bodies).
     """
-    ids: Set[int] = set()
-    nodes = _parse_css_nodes(css)
-    for node in nodes:
-        if isinstance(node, CssStmt):
-            ids |= _tile_ids_in_text(_strip_block_comments_outside_strings(node.text))
-            continue
+    return set(CssDocument.of(css).tile_ids())
 
-        pre = _strip_block_comments_outside_strings(node.prelude or "")
-        ids |= _tile_ids_in_text(pre)
-        if (node.prelude or "").strip().startswith("@"):
-            ids |= _tile_ids_in_css_stylesheet(node.body)
-        else:
-            ids |= _tile_ids_in_text(_strip_block_comments_outside_strings(node.body))
-    return ids
+
+@profiled("css.tile_ids", cat="phase")
 def tile_ids_in_css(css: str) -> Set[int]:
     """Return tile ids referenced in CSS.
 
@@ -245,7 +246,7 @@ def _tile_ids_in_comment_text(comment_text: str) -> Set[int]:
     return ids
 
 
-def _duplicate_standalone_comment(comment_text: str, old_id: int, new_id: int) -> str:
+def _duplicate_standalone_comment(comment_text: str, old_id: int, new_id: int, rewriter: _TileIdRewriter) -> str:
     """Duplicate a standalone comment for a copied/merged tile id."""
     text = comment_text.strip()
     if text.startswith("/*") and text.endswith("*/"):
@@ -253,11 +254,8 @@ def _duplicate_standalone_comment(comment_text: str, old_id: int, new_id: int) -
     else:
         inner = text
 
-    # Replace common tile-id forms, including bare tile-123.
-    inner2 = re.sub(rf"(#tile-){old_id}\b", rf"\g<1>{new_id}", inner)
-    inner2 = re.sub(rf"(\.tile-){old_id}\b", rf"\g<1>{new_id}", inner2)
-    inner2 = re.sub(rf"(['\"]tile-){old_id}(['\"])", rf"\g<1>{new_id}\2", inner2)
-    inner2 = re.sub(rf"\btile-{old_id}\b", f"tile-{new_id}", inner2)
+    # Replace common tile-id forms (#tile-, .tile-, quoted), including bare tile-123.
+    inner2 = rewriter.rewrite(inner, old_id, new_id, word=True)
 
     note = f"[hubitat_tile_mover] duplicated from tile-{old_id} to tile-{new_id}."
     return f"/* {note} {inner2} */"
@@ -296,52 +294,40 @@ def _looks_like_css_rules(text: str) -> bool:
     return False
 
 
-def _duplicate_comment_css_rules(comment_text: str, id_map: Dict[int, int], *, skip_new: Set[int]) -> str:
+def _duplicate_comment_css_rules(comment_text: str, id_targets: Dict[int, List[int]], *, skip_new: Set[int], rewriter: _TileIdRewriter) -> str:
     """Duplicate commented-out CSS selector rules contained inside a standalone comment.
 
     Example:
       /* #tile-40 { background: url('tile-40.png'); } */
 
-    When 40->123 is in id_map, this returns a new comment containing duplicated
+    When 40->123 is in id_targets, this returns a new comment containing duplicated
     rules as if they were active (selector-item splitting + body tile-id
     rewrite), but still commented out.
 
     If no duplicable rules are found, returns an empty string.
     """
     inner = _comment_inner_text(comment_text)
-    if not _looks_like_css_rules(inner):
+    if "{" not in inner or "}" not in inner:
+        return ""
+    doc = CssDocument(inner)
+    if not any(isinstance(n, CssBlock) for n in doc.nodes):
         return ""
 
-    def dup_blocks_only(css_text: str) -> List[CssNode]:
+    def dup_blocks_only(d: CssDocument) -> List[CssNode]:
         out: List[CssNode] = []
-        for node in _parse_css_nodes(css_text or ""):
+        for i, node in enumerate(d.nodes):
             if isinstance(node, CssStmt):
                 # Ignore nested statements inside the commented fragment.
                 continue
-
-            pre0 = (node.prelude or "").strip()
-            if pre0.startswith("@"):
-                inner_nodes = dup_blocks_only(node.body)
+            if _is_at_block(node):
+                inner_nodes = dup_blocks_only(d.child(i))
                 if inner_nodes:
                     out.append(CssBlock(prelude=node.prelude, body=_render_css_nodes(inner_nodes).rstrip()))
                 continue
-
-            selectors0 = _split_selector_list(pre0)
-            for sel0 in selectors0:
-                sel_ids0 = _selector_tile_ids(sel0)
-                matched_old = [oid for oid in sel_ids0 if oid in id_map]
-                if not matched_old:
-                    continue
-                for oid in matched_old:
-                    nid = id_map[oid]
-                    if nid in skip_new:
-                        continue
-                    new_sel = _replace_tile_id_in_selector(sel0, oid, nid)
-                    new_body = _replace_tile_id_in_body(node.body, oid, nid)
-                    out.append(CssBlock(prelude=new_sel, body=new_body))
+            out.extend(_duplicate_selector_rule(d, i, id_targets, skip_new, rewriter))
         return out
 
-    dup_nodes = dup_blocks_only(inner)
+    dup_nodes = dup_blocks_only(doc)
     if not dup_nodes:
         return ""
     dup_css = _render_css_nodes(dup_nodes).strip()
@@ -356,21 +342,7 @@ def find_standalone_comment_tile_refs(css: str, target_ids: Set[int]) -> List[Tu
     """
     if not css or not target_ids:
         return []
-    nodes = _parse_css_nodes(css)
-    hits: List[Tuple[int, Set[int], str]] = []
-    for idx, node in enumerate(nodes):
-        if isinstance(node, CssStmt) and node.text.lstrip().startswith("/*"):
-            ids = _tile_ids_in_comment_text(node.text)
-            matched = ids & target_ids
-            if matched:
-                hits.append((idx, matched, node.text))
-        elif isinstance(node, CssBlock) and (node.prelude or "").strip().startswith("@"): 
-            # Recurse into at-rule blocks.
-            inner_hits = find_standalone_comment_tile_refs(node.body, target_ids)
-            # Index values aren't meaningful for nested blocks; return -1.
-            for _i, mids, txt in inner_hits:
-                hits.append((-1, mids, txt))
-    return hits
+    return CssDocument.of(css).comment_refs(target_ids)
 
 
 def _neutralize_removed_tile_ids_in_comment(comment_text: str, removed_ids: Set[int]) -> Tuple[str, Set[int]]:
@@ -414,46 +386,11 @@ def process_standalone_comments_for_removed_tiles(css: str, removed_ids: Iterabl
     if not css or not ids:
         return (css, 0, 0)
 
-    nodes = _parse_css_nodes(css)
-    new_nodes: List[CssNode] = []
-    removed_count = 0
-    rewritten_count = 0
-
-    for node in nodes:
-        if isinstance(node, CssStmt) and node.text.lstrip().startswith("/*"):
-            comment_ids = _tile_ids_in_comment_text(node.text)
-            matched = comment_ids & ids
-            if not matched:
-                new_nodes.append(node)
-                continue
-            if remove:
-                removed_count += 1
-                continue
-
-            # Keep comment but neutralize removed tile ids and annotate.
-            neutralized, affected = _neutralize_removed_tile_ids_in_comment(node.text, ids)
-            note = f"[hubitat_tile_mover] tile(s) removed; CSS rules removed for: {', '.join('tile_'+str(i) for i in sorted(affected))}."
-            txt = neutralized.strip()
-            if txt.startswith("/*") and txt.endswith("*/"):
-                inner = txt[2:-2].strip()
-                new_txt = f"/* {note} {inner} */"
-            else:
-                new_txt = f"/* {note} {txt} */"
-            new_nodes.append(CssStmt(new_txt))
-            rewritten_count += 1
-            continue
-
-        if isinstance(node, CssBlock) and (node.prelude or "").strip().startswith("@"): 
-            # Recurse into at-rule bodies.
-            inner_css, r1, r2 = process_standalone_comments_for_removed_tiles(node.body, ids, remove=remove)
-            removed_count += r1
-            rewritten_count += r2
-            new_nodes.append(CssBlock(prelude=node.prelude, body=inner_css.rstrip()))
-            continue
-
-        new_nodes.append(node)
+    def note(affected: Set[int]) -> str:
+        return f"[hubitat_tile_mover] tile(s) removed; CSS rules removed for: {', '.join('tile_'+str(i) for i in sorted(affected))}."
 
-    return (_render_css_nodes(new_nodes), removed_count, rewritten_count)
+    doc, removed_count, rewritten_count = CssDocument.of(css).rewrite_tile_comments(ids, remove=remove, note=note)
+    return (doc.text, removed_count, rewritten_count)
 
 
 def process_standalone_comments_for_css_cleared_tiles(css: str, tile_ids: Iterable[int], *, remove: bool) -> Tuple[str, int, int]:
@@ -473,47 +410,14 @@ def process_standalone_comments_for_css_cleared_tiles(css: str, tile_ids: Iterab
     if not css or not ids:
         return (css, 0, 0)
 
-    nodes = _parse_css_nodes(css)
-    new_nodes: List[CssNode] = []
-    removed_count = 0
-    rewritten_count = 0
+    def note(affected: Set[int]) -> str:
+        return (
+            f"[hubitat_tile_mover] CSS rules cleared for: "
+            f"{', '.join('tile_'+str(i) for i in sorted(affected))}."
+        )
 
-    for node in nodes:
-        if isinstance(node, CssStmt) and node.text.lstrip().startswith("/*"):
-            comment_ids = _tile_ids_in_comment_text(node.text)
-            matched = comment_ids & ids
-            if not matched:
-                new_nodes.append(node)
-                continue
-            if remove:
-                removed_count += 1
-                continue
-
-            neutralized, affected = _neutralize_removed_tile_ids_in_comment(node.text, ids)
-            note = (
-                f"[hubitat_tile_mover] CSS rules cleared for: "
-                f"{', '.join('tile_'+str(i) for i in sorted(affected))}."
-            )
-            txt = neutralized.strip()
-            if txt.startswith("/*") and txt.endswith("*/"):
-                inner = txt[2:-2].strip()
-                new_txt = f"/* {note} {inner} */"
-            else:
-                new_txt = f"/* {note} {txt} */"
-            new_nodes.append(CssStmt(new_txt))
-            rewritten_count += 1
-            continue
-
-        if isinstance(node, CssBlock) and (node.prelude or "").strip().startswith("@"): 
-            inner_css, r1, r2 = process_standalone_comments_for_css_cleared_tiles(node.body, ids, remove=remove)
-            removed_count += r1
-            rewritten_count += r2
-            new_nodes.append(CssBlock(prelude=node.prelude, body=inner_css.rstrip()))
-            continue
-
-        new_nodes.append(node)
-
-    return (_render_css_nodes(new_nodes), removed_count, rewritten_count)
+    doc, removed_count, rewritten_count = CssDocument.of(css).rewrite_tile_comments(ids, remove=remove, note=note)
+    return (doc.text, removed_count, rewritten_count)
 
 
 def tile_has_selector_rules(css: str, tile_id: int) -> bool:
@@ -627,23 +531,23 @@ def collect_selector_item_bodies(css: str) -> Dict[Tuple[Tuple[str, ...], str],
     """
     out: Dict[Tuple[Tuple[str, ...], str], List[str]] = {}
 
-    def rec(css_text: str, stack: Tuple[str, ...] = ()) -> None:
-        for node in _parse_css_nodes(css_text or ""):
+    def rec(doc: CssDocument, stack: Tuple[str, ...] = ()) -> None:
+        for i, node in enumerate(doc.nodes):
             if isinstance(node, CssStmt):
                 continue
             pre0 = (node.prelude or "").strip()
             if pre0.startswith("@"):
-                rec(node.body, stack + (normalize_at_prelude(pre0),))
+                rec(doc.child(i), stack + (normalize_at_prelude(pre0),))
                 continue
 
-            for item in _split_selector_list(pre0):
+            for item, _ids in doc.selector_items(i):
                 k = normalize_selector_item(item)
                 if not k:
                     continue
                 key = (stack, k)
                 out.setdefault(key, []).append(node.body)
 
-    rec(css)
+    rec(CssDocument.of(css or ""))
     return out
 
 
@@ -657,24 +561,23 @@ def remove_selector_items_by_keys(css: str, keys_to_remove: Set[Tuple[Tuple[str,
     if not css or not keys_to_remove:
         return css
 
-    def rec(nodes: List[CssNode], stack: Tuple[str, ...] = ()) -> Tuple[List[CssNode], bool]:
+    def rec(doc: CssDocument, stack: Tuple[str, ...] = ()) -> Tuple[List[CssNode], bool]:
         changed = False
         out_nodes: List[CssNode] = []
-        for node in nodes:
+        for i, node in enumerate(doc.nodes):
             if isinstance(node, CssStmt):
                 out_nodes.append(node)
                 continue
 
             pre0 = (node.prelude or "").strip()
             if pre0.startswith("@"):
-                inner_nodes = _parse_css_nodes(node.body)
-                inner_out, inner_changed = rec(inner_nodes, stack + (normalize_at_prelude(pre0),))
+                inner_out, inner_changed = rec(doc.child(i), stack + (normalize_at_prelude(pre0),))
                 if inner_out:
                     out_nodes.append(CssBlock(prelude=node.prelude, body=_render_css_nodes(inner_out).rstrip()))
                 changed = changed or inner_changed
                 continue
 
-            items = _split_selector_list(pre0)
+            items = [it for it, _ids in doc.selector_items(i)]
             kept: List[str] = []
             for it in items:
                 k = normalize_selector_item(it)
@@ -694,8 +597,7 @@ def remove_selector_items_by_keys(css: str, keys_to_remove: Set[Tuple[Tuple[str,
 
         return out_nodes, changed
 
-    nodes0 = _parse_css_nodes(css)
-    nodes1, _changed = rec(nodes0)
+    nodes1, _changed = rec(CssDocument.of(css))
     return _render_css_nodes(nodes1)
 
 
@@ -711,26 +613,24 @@ def drop_selector_items_by_keys(css: str, keys_to_drop: Set[Tuple[Tuple[str, ...
 
     kept_blocks = 0
 
-    def rec(nodes: List[CssNode], stack: Tuple[str, ...] = ()) -> List[CssNode]:
+    def rec(doc: CssDocument, stack: Tuple[str, ...] = ()) -> List[CssNode]:
         nonlocal kept_blocks
         out_nodes: List[CssNode] = []
-        for node in nodes:
+        for i, node in enumerate(doc.nodes):
             if isinstance(node, CssStmt):
                 out_nodes.append(node)
                 continue
 
             pre0 = (node.prelude or "").strip()
             if pre0.startswith("@"):
-                inner_nodes = _parse_css_nodes(node.body)
-                inner_out = rec(inner_nodes, stack + (normalize_at_prelude(pre0),))
+                inner_out = rec(doc.child(i), stack + (normalize_at_prelude(pre0),))
                 # Keep @-rule blocks only if they contain at least one CssBlock after filtering.
                 if any(isinstance(n, CssBlock) for n in inner_out):
                     out_nodes.append(CssBlock(prelude=node.prelude, body=_render_css_nodes(inner_out).rstrip()))
                 continue
 
-            items = _split_selector_list(pre0)
             kept: List[str] = []
-            for it in items:
+            for it, _ids in doc.selector_items(i):
                 k = normalize_selector_item(it)
                 if (stack, k) in keys_to_drop:
                     continue
@@ -743,15 +643,23 @@ def drop_selector_items_by_keys(css: str, keys_to_drop: Set[Tuple[Tuple[str, ...
 
         return out_nodes
 
-    nodes0 = _parse_css_nodes(css)
-    nodes1 = rec(nodes0)
+    nodes1 = rec(CssDocument.of(css))
     return (_render_css_nodes(nodes1).strip(), kept_blocks)
 
+def append_css_fragment(css: str, frag: str) -> str:
+    """Append duplicated CSS after a blank line: css.rstrip() + frag.strip().
+
+    The combined stylesheet's document reuses the parses of both parts.
+    """
+    return CssDocument.of(css).appended(CssDocument.of(frag)).text
+
+
 def max_tile_id_in_css(css: str) -> int:
     ids = tile_ids_in_css(css)
     return max(ids) if ids else 0
 
 
+@profiled("css.orphans", cat="phase")
 def orphan_tile_ids_in_css(css: str, existing_tile_ids: Set[int]) -> Set[int]:
     """Return tile IDs referenced in CSS that are not present in the layout tiles."""
     if not css:
@@ -767,32 +675,109 @@ def selector_tile_ids_in_css(css: str) -> Set[int]:
     """
     if not css:
         return set()
+    return set(CssDocument.of(css).selector_tile_ids())
 
-    def collect(css_text: str) -> Set[int]:
-        out: Set[int] = set()
-        for node in _parse_css_nodes(css_text):
-            if isinstance(node, CssStmt):
-                continue
-            prelude = (node.prelude or "").strip()
-            if prelude.startswith("@"):
-                out |= collect(node.body)
-                continue
-            pre_no_comments = _strip_block_comments_outside_strings(node.prelude or "")
-            for sel in _split_selector_list(pre_no_comments.strip()):
-                out |= _selector_tile_ids(sel)
-        return out
 
-    return collect(css)
+class CssStmt:
+    """A statement or comment kept verbatim (includes the trailing ';' when present).
+
+    Parsed statements hold an offset span into the stylesheet; the text is sliced on
+    first use.
+    """
 
+    __slots__ = ("_text", "_src", "_start", "_end")
+
+    def __init__(self, text: str) -> None:
+        self._text: Optional[str] = text
+        self._src: Optional[str] = None
+        self._start = self._end = 0
+
+    @classmethod
+    def span(cls, src: str, start: int, end: int) -> "CssStmt":
+        node = cls.__new__(cls)
+        node._text = None
+        node._src = src
+        node._start = start
+        node._end = end
+        return node
+
+    @property
+    def text(self) -> str:
+        if self._text is None:
+            self._text = self._src[self._start : self._end]  # type: ignore[index]
+        return self._text
+
+    def __repr__(self) -> str:
+        return f"CssStmt(text={self.text!r})"
 
-@dataclass
-class CssStmt:
-    text: str  # includes trailing ; or comments/whitespace as captured
 
-@dataclass
 class CssBlock:
-    prelude: str  # selector list or at-rule prelude
-    body: str     # contents inside braces
+    """A brace block: prelude (selector list or at-rule prelude) and the body inside the braces.
+
+    Parsed blocks hold offset spans into the stylesheet (the prelude span already
+    stripped). For @-blocks the parser also records the body's nodes, found in the same
+    pass, so nested rules are never re-tokenized.
+    """
+
+    __slots__ = ("_prelude", "_body", "_src", "_p0", "_p1", "_b0", "_b1", "children", "children_closed")
+
+    def __init__(
+        self,
+        prelude: str,
+        body: str,
+        children: Optional[List["CssNode"]] = None,
+        children_closed: bool = False,
+    ) -> None:
+        self._prelude: Optional[str] = prelude
+        self._body: Optional[str] = body
+        self._src: Optional[str] = None
+        self._p0 = self._p1 = self._b0 = self._b1 = 0
+        self.children = children
+        self.children_closed = children_closed
+
+    @classmethod
+    def span(
+        cls,
+        src: str,
+        p0: int,
+        p1: int,
+        b0: int,
+        b1: int,
+        children: Optional[List["CssNode"]] = None,
+        children_closed: bool = False,
+    ) -> "CssBlock":
+        node = cls.__new__(cls)
+        node._prelude = node._body = None
+        node._src = src
+        node._p0, node._p1, node._b0, node._b1 = p0, p1, b0, b1
+        node.children = children
+        node.children_closed = children_closed
+        return node
+
+    @property
+    def prelude(self) -> str:
+        if self._prelude is None:
+            self._prelude = self._src[self._p0 : self._p1]  # type: ignore[index]
+        return self._prelude
+
+    @property
+    def body(self) -> str:
+        if self._body is None:
+            self._body = self._src[self._b0 : self._b1]  # type: ignore[index]
+        return self._body
+
+    def _rendered_body(self) -> str:
+        """body.rstrip(), sliced straight from the source when the body was not needed yet."""
+        if self._body is not None or self._src is None:
+            return self.body.rstrip()
+        src, b0, b1 = self._src, self._b0, self._b1
+        while b1 > b0 and src[b1 - 1].isspace():
+            b1 -= 1
+        return src[b0:b1]
+
+    def __repr__(self) -> str:
+        return f"CssBlock(prelude={self.prelude!r}, body={self.body!r})"
+
 
 CssNode = CssStmt | CssBlock
 
@@ -804,105 +789,150 @@ def _parse_css_nodes(css: str) -> List[CssNode]:
       - Parses brace blocks with correct nesting and returns (prelude, body).
     Designed to be resilient for Hubitat customCSS; not a full CSS grammar.
     """
-    nodes: List[CssNode] = []
-    i = 0
-    n = len(css)
+    return _parse_css(css)[0]
 
-    def skip_ws(j: int) -> int:
-        while j < n and css[j].isspace():
-            j += 1
-        return j
 
-    while i < n:
-        i = skip_ws(i)
-        if i >= n:
-            break
+def _parse_css(css: str) -> Tuple[List[CssNode], bool]:
+    """_parse_css_nodes plus a flag: True when every node was terminated.
+
+    Only the last node can be unterminated (unclosed comment or block, or a trailing
+    statement without ';'). For terminated nodes, parsing _render_css_nodes(nodes)
+    yields the same statements and blocks with bodies re-wrapped as in _reparsed_node.
+    """
+    nodes, closed, _stop = _parse_css_span(css, 0, len(css), False)
+    return nodes, closed
+
+
+_NON_WS_RX = re.compile(r"\S")
+# Ends a statement or prelude; nested bodies also stop at their closing brace.
+_PRELUDE_STOP_RX = re.compile(r"""['"{;]|/\*""")
+_NESTED_STOP_RX = re.compile(r"""['"{};]|/\*""")
+_BRACE_TOKEN_RX = re.compile(r"""['"{}]|/\*""")
+# Common case in one match: a selector block with no strings, comments or nested braces.
+_PLAIN_RULE_RX = re.compile(r"""((?!@)[^'"{};/}]*?)\s*\{([^'"{}/]*)\}""")
+
+
+def _match_brace(css: str, k: int, n: int) -> int:
+    """Offset just past the '}' closing the block whose body starts at k (-1 if unclosed)."""
+    depth = 1
+    while True:
+        m = _BRACE_TOKEN_RX.search(css, k, n)
+        if m is None:
+            return -1
+        tok = m.group()
+        k = m.end()
+        if tok == "{":
+            depth += 1
+        elif tok == "}":
+            depth -= 1
+            if depth == 0:
+                return k
+        elif tok == "/*":
+            endc = css.find("*/", k, n)
+            if endc == -1:
+                return -1
+            k = endc + 2
+        else:
+            k = _string_end(css, k, tok, n)
+
+
+def _parse_css_span(css: str, i: int, n: int, nested: bool) -> Tuple[List[CssNode], bool, int]:
+    """Parse css[i:n] in one forward pass, without slicing.
+
+    With nested=True the span is the body of an @-block: parsing stops at the brace
+    closing it, whose offset is returned (n when the block is unclosed). @-block bodies
+    are parsed by recursion from the same offsets, so each character is tokenized once.
+    """
+    nodes: List[CssNode] = []
+    closed = True
+    stop_rx = _NESTED_STOP_RX if nested else _PRELUDE_STOP_RX
+
+    while True:
+        m = _NON_WS_RX.search(css, i, n)
+        if m is None:
+            return nodes, closed, n
+        i = m.start()
 
         # comment
-        if css.startswith("/*", i):
-            j = css.find("*/", i + 2)
+        if css.startswith("/*", i, n):
+            j = css.find("*/", i + 2, n)
             if j == -1:
-                nodes.append(CssStmt(css[i:]))
-                break
-            nodes.append(CssStmt(css[i : j + 2]))
+                nodes.append(CssStmt.span(css, i, n))
+                return nodes, False, n
+            nodes.append(CssStmt.span(css, i, j + 2))
             i = j + 2
             continue
 
-        # find next top-level '{' or ';'
+        m = _PLAIN_RULE_RX.match(css, i, n)
+        if m is not None:
+            nodes.append(CssBlock.span(css, i, m.end(1), m.start(2), m.end(2)))
+            i = m.end()
+            continue
+
+        # find next '{' or ';' outside strings (or the enclosing block's '}')
         j = i
-        in_str: Optional[str] = None
-        while j < n:
-            ch = css[j]
-            if in_str:
-                if ch == "\\":
-                    j += 2
-                    continue
-                if ch == in_str:
-                    in_str = None
-                j += 1
-                continue
-            if ch in ("'", '"'):
-                in_str = ch
-                j += 1
-                continue
-            if ch == "{":
+        while True:
+            m = stop_rx.search(css, j, n)
+            if m is None:
+                j = n
                 break
-            if ch == ";":
-                break
-            if ch == "/" and j + 1 < n and css[j + 1] == "*":
-                break
-            j += 1
+            tok = m.group()
+            if tok == "'" or tok == '"':
+                j = _string_end(css, m.end(), tok, n)
+                continue
+            j = m.start()
+            break
 
         if j >= n:
-            nodes.append(CssStmt(css[i:]))
-            break
+            nodes.append(CssStmt.span(css, i, n))
+            return nodes, False, n
 
-        if css[j] == ";":
-            nodes.append(CssStmt(css[i : j + 1]))
+        ch = css[j]
+        if ch == ";":
+            nodes.append(CssStmt.span(css, i, j + 1))
             i = j + 1
             continue
 
-        if css[j] == "{":
-            prelude = css[i:j].strip()
-            # find matching brace
-            depth = 1
-            k = j + 1
-            in_str = None
-            while k < n and depth > 0:
-                ch = css[k]
-                if in_str:
-                    if ch == "\\":
-                        k += 2
-                        continue
-                    if ch == in_str:
-                        in_str = None
-                    k += 1
-                    continue
-                if ch in ("'", '"'):
-                    in_str = ch
-                    k += 1
-                    continue
-                if css.startswith("/*", k):
-                    endc = css.find("*/", k + 2)
-                    if endc == -1:
-                        k = n
-                        break
-                    k = endc + 2
-                    continue
-                if ch == "{":
-                    depth += 1
-                elif ch == "}":
-                    depth -= 1
-                k += 1
-            body = css[j + 1 : k - 1] if depth == 0 else css[j + 1 :]
-            nodes.append(CssBlock(prelude=prelude, body=body))
+        if ch == "}":
+            # The enclosing block ends here.
+            if j > i:
+                nodes.append(CssStmt.span(css, i, j))
+                closed = False
+            return nodes, closed, j
+
+        if ch == "{":
+            p1 = j
+            while p1 > i and css[p1 - 1].isspace():
+                p1 -= 1
+            if css[i] == "@":
+                children, children_closed, stop = _parse_css_span(css, j + 1, n, True)
+                k = stop + 1 if stop < n else -1
+                block = CssBlock.span(css, i, p1, j + 1, stop, children, children_closed)
+            else:
+                k = _match_brace(css, j + 1, n)
+                block = CssBlock.span(css, i, p1, j + 1, k - 1 if k != -1 else n)
+            nodes.append(block)
+            if k == -1:
+                return nodes, False, n
             i = k
             continue
 
-        nodes.append(CssStmt(css[i:]))
-        break
+        # A comment starts inside a statement or selector: keep the rest as-is.
+        if nested:
+            k = _match_brace(css, j, n)
+            stop = k - 1 if k != -1 else n
+            nodes.append(CssStmt.span(css, i, stop))
+            return nodes, False, stop
+        nodes.append(CssStmt.span(css, i, n))
+        return nodes, False, n
 
-    return nodes
+
+def _reparsed_node(node: CssNode) -> CssNode:
+    """The node _parse_css returns for a terminated node after _render_css_nodes."""
+    if isinstance(node, CssStmt):
+        return node
+    children = node.children if node.children_closed else None
+    return CssBlock(node.prelude.strip(), "\n" + node._rendered_body() + "\n", children, children is not None)
 
 def _render_css_nodes(nodes: Sequence[CssNode]) -> str:
     out_parts: List[str] = []
@@ -914,62 +944,382 @@ def _render_css_nodes(nodes: Sequence[CssNode]) -> str:
         else:
             out_parts.append(node.prelude.strip())
             out_parts.append(" {\n")
-            out_parts.append(node.body.rstrip())
+            out_parts.append(node._rendered_body())
             out_parts.append("\n}\n")
     return "".join(out_parts).rstrip() + "\n"
 
+
+class CssRef(NamedTuple):
+    """One tile-id reference inside a CssDocument.
+
+    path: node indexes from the top level down (one more per enclosing @-block).
+    kind: "selector" (a selector item), "body" (declaration body, comments ignored),
+    "comment" (standalone comment) or "statement" (any other statement).
+    """
+
+    path: Tuple[int, ...]
+    kind: str
+
+
+_DOC_CACHE: Dict[str, "CssDocument"] = {}
+_DOC_CACHE_SIZE = 16
+
+
+def _remember_document(text: str, doc: "CssDocument") -> None:
+    if text in _DOC_CACHE:
+        return
+    if len(_DOC_CACHE) >= _DOC_CACHE_SIZE:
+        del _DOC_CACHE[next(iter(_DOC_CACHE))]
+    _DOC_CACHE[text] = doc
+
+
+def clear_css_document_cache() -> None:
+    _DOC_CACHE.clear()
+
+
+def _is_at_block(node: CssNode) -> bool:
+    return isinstance(node, CssBlock) and (node.prelude or "").strip().startswith("@")
+
+
+def _is_comment_stmt(node: CssNode) -> bool:
+    return isinstance(node, CssStmt) and node.text.lstrip().startswith("/*")
+
+
+class CssDocument:
+    """A customCSS stylesheet parsed once, with a tile id -> rule index.
+
+    CssDocument.of(css) returns the cached document for a stylesheet, so the CSS helpers
+    handed the same text during a run share one parse and the per-rule selector/id
+    scans. Edits (without_tile_selectors, rewrite_tile_comments) return a new document
+    built from the untouched nodes; its text is rendered only when asked for, and its
+    nodes are derived from the edit instead of re-parsing that text.
+    """
+
+    def __init__(self, css: Optional[str] = None, *, source: Optional[List[CssNode]] = None, closed: bool = False) -> None:
+        # Either parsed from css, or rendered on demand from source (nodes as built by an edit).
+        self._text = css
+        self._source = source
+        self._closed = closed
+        self._nodes: Optional[List[CssNode]] = None
+        self._items: Dict[int, Tuple[Tuple[str, Tuple[int, ...]], ...]] = {}
+        self._children: Dict[int, CssDocument] = {}
+        self._node_ids: Dict[int, FrozenSet[int]] = {}
+        self._comment_ids: Dict[int, FrozenSet[int]] = {}
+        self._tile_ids: Optional[FrozenSet[int]] = None
+        self._selector_ids: Optional[FrozenSet[int]] = None
+        self._index: Optional[Dict[int, List[CssRef]]] = None
+        self._normalized: Optional[CssDocument] = None
+
+    @classmethod
+    def of(cls, css: str) -> "CssDocument":
+        """Return the shared document for css (parsed on first use)."""
+        doc = _DOC_CACHE.get(css)
+        if doc is None:
+            doc = cls(css)
+            _remember_document(css, doc)
+        return doc
+
+    @property
+    def text(self) -> str:
+        if self._text is None:
+            self._text = _render_css_nodes(self._source or [])
+            _remember_document(self._text, self)
+        return self._text
+
+    @property
+    def nodes(self) -> List[CssNode]:
+        if self._nodes is None:
+            if self._source is not None and self._closed:
+                self._nodes = [_reparsed_node(n) for n in self._source]
+            else:
+                self._nodes, self._closed = _parse_css(self.text)
+        return self._nodes
+
+    def _is_closed(self) -> bool:
+        # True when every node was terminated, so re-rendering re-parses predictably.
+        self.nodes
+        return self._closed
+
+    def child(self, i: int) -> "CssDocument":
+        """Document for the body of the @-block at index i."""
+        doc = self._children.get(i)
+        if doc is None:
+            node = self.nodes[i]
+            doc = CssDocument(node.body)
+            if node.children is not None:
+                # Nodes found while parsing the parent: no second pass over the body.
+                doc._nodes, doc._closed = node.children, node.children_closed
+            self._children[i] = doc
+        return doc
+
+    def selector_items(self, i: int) -> Tuple[Tuple[str, Tuple[int, ...]], ...]:
+        """(selector item, tile ids) for each item of the selector block at index i."""
+        items = self._items.get(i)
+        if items is None:
+            pre = self.nodes[i].prelude.strip()
+            # Ids keep the set's iteration order: duplicated rules are emitted in that order.
+            items = tuple((sel, tuple(_selector_tile_ids(sel))) for sel in _split_selector_list(pre))
+            self._items[i] = items
+        return items
+
+    def comment_ids(self, i: int) -> FrozenSet[int]:
+        """Tile ids mentioned by the standalone comment at index i (any tile-N form)."""
+        ids = self._comment_ids.get(i)
+        if ids is None:
+            ids = frozenset(_tile_ids_in_comment_text(self.nodes[i].text))
+            self._comment_ids[i] = ids
+        return ids
+
+    def _text_ids(self, i: int) -> FrozenSet[int]:
+        # Ids in a statement, or in a block's prelude + body, with all comments ignored.
+        ids = self._node_ids.get(i)
+        if ids is None:
+            node = self.nodes[i]
+            if isinstance(node, CssStmt):
+                ids = frozenset(_tile_ids_in_text(_strip_block_comments_outside_strings(node.text)))
+            else:
+                found = _tile_ids_in_text(_strip_block_comments_outside_strings(node.prelude or ""))
+                if _is_at_block(node):
+                    found |= self.child(i).tile_ids()
+                else:
+                    found |= _tile_ids_in_text(_strip_block_comments_outside_strings(node.body))
+                ids = frozenset(found)
+            self._node_ids[i] = ids
+        return ids
+
+    def tile_ids(self) -> FrozenSet[int]:
+        """Tile ids referenced anywhere outside comments (see tile_ids_in_css)."""
+        if self._tile_ids is None:
+            ids: Set[int] = set()
+            for i in range(len(self.nodes)):
+                ids |= self._text_ids(i)
+            self._tile_ids = frozenset(ids)
+        return self._tile_ids
+
+    def selector_tile_ids(self) -> FrozenSet[int]:
+        """Tile ids referenced by selector items (see selector_tile_ids_in_css)."""
+        if self._selector_ids is None:
+            ids: Set[int] = set()
+            for i, node in enumerate(self.nodes):
+                if isinstance(node, CssStmt):
+                    continue
+                if _is_at_block(node):
+                    ids |= self.child(i).selector_tile_ids()
+                    continue
+                for _sel, sel_ids in self.selector_items(i):
+                    ids.update(sel_ids)
+            self._selector_ids = frozenset(ids)
+        return self._selector_ids
+
+    def selector_rule_counts(self) -> Dict[int, int]:
+        """tile id -> number of selector blocks (at any depth) that reference it."""
+        counts: Dict[int, int] = {}
+        for tid, refs in self.index.items():
+            rules = {r.path for r in refs if r.kind == "selector"}
+            if rules:
+                counts[tid] = len(rules)
+        return counts
+
+    @property
+    def index(self) -> Dict[int, List[CssRef]]:
+        """Inverted index: tile id -> references in document order."""
+        if self._index is None:
+            index: Dict[int, List[CssRef]] = {}
+            self._index_into(index, ())
+            self._index = index
+        return self._index
+
+    def _index_into(self, index: Dict[int, List[CssRef]], path: Tuple[int, ...]) -> None:
+        for i, node in enumerate(self.nodes):
+            here = path + (i,)
+            if isinstance(node, CssStmt):
+                if _is_comment_stmt(node):
+                    for tid in sorted(self.comment_ids(i)):
+                        index.setdefault(tid, []).append(CssRef(here, "comment"))
+                else:
+                    for tid in sorted(self._text_ids(i)):
+                        index.setdefault(tid, []).append(CssRef(here, "statement"))
+                continue
+            if _is_at_block(node):
+                self.child(i)._index_into(index, here)
+                continue
+            sel_ids: Set[int] = set()
+            for _sel, ids in self.selector_items(i):
+                sel_ids.update(ids)
+            for tid in sorted(sel_ids):
+                index.setdefault(tid, []).append(CssRef(here, "selector"))
+            body_ids = _tile_ids_in_text(_strip_block_comments_outside_strings(node.body))
+            for tid in sorted(body_ids):
+                index.setdefault(tid, []).append(CssRef(here, "body"))
+
+    def refs(self, tile_id: int) -> List[CssRef]:
+        return self.index.get(int(tile_id), [])
+
+    def comment_refs(self, target_ids: Set[int]) -> List[Tuple[int, Set[int], str]]:
+        """Standalone comments mentioning target_ids (see find_standalone_comment_tile_refs)."""
+        if not any(r.kind == "comment" for tid in target_ids for r in self.refs(tid)):
+            return []
+        hits: List[Tuple[int, Set[int], str]] = []
+        for i, node in enumerate(self.nodes):
+            if _is_comment_stmt(node):
+                matched = self.comment_ids(i) & target_ids
+                if matched:
+                    hits.append((i, set(matched), node.text))
+            elif _is_at_block(node):
+                # Index values aren't meaningful for nested blocks; return -1.
+                for _i, mids, txt in self.child(i).comment_refs(target_ids):
+                    hits.append((-1, mids, txt))
+        return hits
+
+    def normalized(self) -> "CssDocument":
+        """Document for _render_css_nodes(self.nodes), i.e. this stylesheet re-rendered."""
+        if self._normalized is None:
+            doc = CssDocument(source=self.nodes, closed=self._is_closed())
+            if doc._closed:
+                doc._items = self._items
+                doc._children = {i: c for i, c in self._children.items() if c._closed}
+            self._normalized = doc
+        return self._normalized
+
+    def _derive(
+        self,
+        out: List[CssNode],
+        closed: bool,
+        items: Dict[int, Tuple[Tuple[str, Tuple[int, ...]], ...]],
+        children: Dict[int, "CssDocument"],
+    ) -> "CssDocument":
+        doc = CssDocument(source=out, closed=closed)
+        if closed:
+            doc._items = items
+            doc._children = children
+        return doc
+
+    def without_tile_selectors(self, ids: Set[int]) -> "CssDocument":
+        """Drop selector items referencing ids; blocks left without selectors are removed.
+
+        This is cleanup_css_for_tile_ids: the result is re-rendered even where nothing
+        matched (selector lists joined with ", ", @-block bodies normalized).
+        """
+        if not ids:
+            return self
+        out: List[CssNode] = []
+        closed = self._is_closed()
+        items: Dict[int, Tuple[Tuple[str, Tuple[int, ...]], ...]] = {}
+        children: Dict[int, CssDocument] = {}
+        for i, node in enumerate(self.nodes):
+            if isinstance(node, CssStmt):
+                out.append(node)
+                continue
+            if _is_at_block(node):
+                inner = self.child(i).normalized().without_tile_selectors(ids)
+                if inner._is_closed():
+                    children[len(out)] = inner
+                else:
+                    closed = False
+                out.append(CssBlock(prelude=node.prelude, body=inner.text.rstrip()))
+                continue
+            kept = tuple((sel, sel_ids) for sel, sel_ids in self.selector_items(i) if ids.isdisjoint(sel_ids))
+            if not kept:
+                continue
+            items[len(out)] = kept
+            out.append(CssBlock(prelude=", ".join(sel for sel, _ids in kept), body=node.body))
+        return self._derive(out, closed, items, children)
+
+    def rewrite_tile_comments(
+        self, ids: Set[int], *, remove: bool, note: Callable[[Set[int]], str]
+    ) -> Tuple["CssDocument", int, int]:
+        """Remove, or neutralize and annotate, standalone comments that mention ids.
+
+        Returns (document, removed_count, rewritten_count); see
+        process_standalone_comments_for_removed_tiles.
+        """
+        out: List[CssNode] = []
+        closed = self._is_closed()
+        items: Dict[int, Tuple[Tuple[str, Tuple[int, ...]], ...]] = {}
+        children: Dict[int, CssDocument] = {}
+        removed_count = 0
+        rewritten_count = 0
+        for i, node in enumerate(self.nodes):
+            if _is_comment_stmt(node):
+                if not (self.comment_ids(i) & ids):
+                    out.append(node)
+                    continue
+                if remove:
+                    removed_count += 1
+                    continue
+                neutralized, affected = _neutralize_removed_tile_ids_in_comment(node.text, ids)
+                txt = neutralized.strip()
+                if txt.startswith("/*") and txt.endswith("*/"):
+                    txt = txt[2:-2].strip()
+                out.append(CssStmt(f"/* {note(affected)} {txt} */"))
+                rewritten_count += 1
+                continue
+            if _is_at_block(node):
+                inner, r1, r2 = self.child(i).rewrite_tile_comments(ids, remove=remove, note=note)
+                removed_count += r1
+                rewritten_count += r2
+                if inner._is_closed():
+                    children[len(out)] = inner
+                else:
+                    closed = False
+                out.append(CssBlock(prelude=node.prelude, body=inner.text.rstrip()))
+                continue
+            if isinstance(node, CssBlock) and i in self._items:
+                items[len(out)] = self._items[i]
+            out.append(node)
+        return (self._derive(out, closed, items, children), removed_count, rewritten_count)
+
+    def appended(self, frag: "CssDocument") -> "CssDocument":
+        """Document for css.rstrip() + "\\n\\n" + frag.strip() + "\\n" (how duplicated CSS is added)."""
+        text = self.text.rstrip() + "\n\n" + frag.text.strip() + "\n"
+        doc = _DOC_CACHE.get(text)
+        if doc is not None:
+            return doc
+        doc = CssDocument(text)
+        if self._is_closed() and frag._is_closed():
+            # Both halves parse independently: reuse their nodes and per-rule scans.
+            own = self.nodes
+            doc._nodes = list(own) + list(frag.nodes)
+            doc._closed = True
+            for i, v in self._items.items():
+                doc._items[i] = v
+            for i, c in self._children.items():
+                doc._children[i] = c
+            for i, v in frag._items.items():
+                doc._items[len(own) + i] = v
+            for i, c in frag._children.items():
+                doc._children[len(own) + i] = c
+        _remember_document(text, doc)
+        return doc
+
 def _collapse_ws_one_line(text: str) -> str:
     """Collapse whitespace to a single line, preserving strings and comment blocks."""
     if not text:
         return ""
     s = text
     out: List[str] = []
-    i = 0
+    pos = 0
     n = len(s)
-    in_str: Optional[str] = None
-    while i < n:
-        ch = s[i]
-        # strings
-        if in_str is not None:
-            out.append(ch)
-            if ch == "\\" and (i + 1) < n:
-                out.append(s[i + 1])
-                i += 2
-                continue
-            if ch == in_str:
-                in_str = None
-            i += 1
-            continue
-        if ch in ("'", '"'):
-            in_str = ch
-            out.append(ch)
-            i += 1
-            continue
-
-        # comment
-        if ch == "/" and (i + 1) < n and s[i + 1] == "*":
-            endc = s.find("*/", i + 2)
-            if endc == -1:
-                seg = s[i:]
-                seg = re.sub(r"\s+", " ", seg)
-                out.append(seg)
-                break
-            seg = s[i : endc + 2]
-            seg = re.sub(r"\s+", " ", seg.replace("\r", " ").replace("\n", " "))
-            out.append(seg)
-            i = endc + 2
-            continue
-
-        # whitespace
-        if ch.isspace():
-            if out and out[-1] != " ":
+    while pos < n:
+        m = _QUOTE_COMMENT_OR_WS_RX.search(s, pos)
+        if m is None:
+            out.append(s[pos:])
+            break
+        if m.start() > pos:
+            out.append(s[pos : m.start()])
+        tok = m.group()
+        if tok == "/*":
+            endc = s.find("*/", m.end())
+            pos = n if endc == -1 else endc + 2
+            out.append(_WS_RUN_RX.sub(" ", s[m.start() : pos]))
+        elif tok == "'" or tok == '"':
+            pos = _string_end(s, m.end(), tok, n)
+            out.append(s[m.start() : pos])
+        else:
+            # whitespace run
+            if out:
                 out.append(" ")
-            i += 1
-            continue
-
-        out.append(ch)
-        i += 1
-
+            pos = m.end()
     return "".join(out).strip()
 
 
@@ -1075,6 +1425,7 @@ def _sort_key_for_selector(selector: str) -> str:
 
     return f"0 {s}"
 
+@profiled("css.compact", cat="phase")
 def compact_css_stylesheet(css: str) -> str:
     """Compact and sort a stylesheet.
 
@@ -1091,11 +1442,11 @@ def compact_css_stylesheet(css: str) -> str:
     if not css:
         return ""
 
-    def compact_nodes(nodes: Sequence[CssNode], indent: str = "") -> List[Tuple[str, str]]:
+    def compact_nodes(doc: CssDocument, indent: str = "") -> List[Tuple[str, str]]:
         imports: List[Tuple[str, str]] = []
         items: List[Tuple[str, str]] = []
 
-        for node in nodes:
+        for i, node in enumerate(doc.nodes):
             if isinstance(node, CssStmt):
                 t = (node.text or "").strip()
                 if not t:
@@ -1116,7 +1467,7 @@ def compact_css_stylesheet(css: str) -> str:
                 continue
 
             if pre0.startswith("@"): 
-                inner_items = compact_nodes(_parse_css_nodes(node.body), indent + "  ")
+                inner_items = compact_nodes(doc.child(i), indent + "  ")
                 # Render the block with inner lines already compacted.
                 inner_text = "\n".join([t for _k, t in inner_items])
                 block_lines = [f"{indent}{pre0} {{"]
@@ -1141,87 +1492,80 @@ def compact_css_stylesheet(css: str) -> str:
         items_sorted = sorted(items, key=lambda x: (x[0], x[1]))
         return imports_sorted + items_sorted
 
-    top = compact_nodes(_parse_css_nodes(css), indent="")
+    top = compact_nodes(CssDocument.of(css), indent="")
     out = "\n".join([t for _k, t in top]).rstrip() + "\n"
     return out
 
+@profiled("css.cleanup", cat="phase")
 def cleanup_css_for_tile_ids(css: str, removed_ids: Iterable[int]) -> str:
     ids = {int(x) for x in removed_ids}
     if not ids:
         return css
+    return CssDocument.of(css).without_tile_selectors(ids).text
 
-    nodes = _parse_css_nodes(css)
-    new_nodes: List[CssNode] = []
-
-    for node in nodes:
-        if isinstance(node, CssStmt):
-            new_nodes.append(node)
-            continue
-
-        pre = node.prelude.strip()
-        if pre.startswith("@"):
-            # Recurse into at-rule bodies (e.g. @media)
-            inner_nodes = _parse_css_nodes(node.body)
-            inner_clean = cleanup_css_for_tile_ids(_render_css_nodes(inner_nodes), ids)
-            new_nodes.append(CssBlock(prelude=node.prelude, body=inner_clean.rstrip()))
-            continue
-
-        selectors = _split_selector_list(pre)
-        kept: List[str] = []
-        for sel in selectors:
-            sel_ids = _selector_tile_ids(sel)
-            if sel_ids and (sel_ids & ids):
-                continue
-            kept.append(sel)
-
-        if not kept:
-            continue
+def generate_css_for_id_map(source_css: str, id_map: Dict[int, int], *, dest_css: Optional[str] = None) -> str:
+    return generate_css_for_id_targets(source_css, {old: [new] for old, new in id_map.items()}, dest_css=dest_css)
 
-        new_nodes.append(CssBlock(prelude=", ".join(kept), body=node.body))
 
-    return _render_css_nodes(new_nodes)
+@profiled("css.generate_for_id_map", cat="phase")
+def generate_css_for_id_targets(source_css: str, id_targets: Dict[int, List[int]], *, dest_css: Optional[str] = None) -> str:
+    """CSS for copied tiles when one old id may have several new ids (e.g. a range stamped to many places).
 
-def generate_css_for_id_map(source_css: str, id_map: Dict[int, int], *, dest_css: Optional[str] = None) -> str:
-    if not id_map:
+    The source CSS is parsed and scanned once; each matched rule is emitted once per new id, in order.
+    """
+    if not any(id_targets.values()):
         return ""
 
     skip_new: Set[int] = set()
     if dest_css:
         # Only consider selectors that already exist in dest_css.
         existing_selector_ids = selector_tile_ids_in_css(dest_css)
-        for new_id in set(id_map.values()):
-            if new_id in existing_selector_ids:
-                skip_new.add(new_id)
+        for new_ids in id_targets.values():
+            skip_new.update(n for n in new_ids if n in existing_selector_ids)
+
+    return _generate_css_for_doc(CssDocument.of(source_css), id_targets, skip_new, _TileIdRewriter(id_targets))
+
+
+def _duplicate_selector_rule(
+    doc: CssDocument, i: int, id_targets: Dict[int, List[int]], skip_new: Set[int], rewriter: _TileIdRewriter
+) -> List[CssNode]:
+    # Emit one duplicated block per (old_id -> new_id) match.
+    # This matches the documented behavior and enables safe body rewrites
+    # of tile-OLD tokens when the selector is tied to OLD.
+    out: List[CssNode] = []
+    body = doc.nodes[i].body
+    for sel, sel_ids in doc.selector_items(i):
+        for oid in sel_ids:
+            for nid in id_targets.get(oid, ()):
+                if nid in skip_new:
+                    continue
+                out.append(CssBlock(prelude=rewriter.rewrite(sel, oid, nid), body=rewriter.rewrite(body, oid, nid, word=True)))
+    return out
+
 
+def _generate_css_for_doc(doc: CssDocument, id_targets: Dict[int, List[int]], skip_new: Set[int], rewriter: _TileIdRewriter) -> str:
     # Pre-scan: determine which *new* tile ids will actually receive duplicated
     # selector rules. Standalone comments are only duplicated when a tile also
     # receives real selector rules.
-    def predict_new_ids(css_text: str) -> Set[int]:
+    def predict_new_ids(d: CssDocument) -> Set[int]:
         predicted: Set[int] = set()
-        for n in _parse_css_nodes(css_text):
+        for i, n in enumerate(d.nodes):
             if isinstance(n, CssStmt):
                 continue
-            pre0 = (n.prelude or "").strip()
-            if pre0.startswith("@"): 
-                predicted |= predict_new_ids(n.body)
+            if _is_at_block(n):
+                predicted |= predict_new_ids(d.child(i))
                 continue
-            selectors0 = _split_selector_list(pre0)
-            for sel0 in selectors0:
-                sel_ids0 = _selector_tile_ids(sel0)
+            for _sel0, sel_ids0 in d.selector_items(i):
                 for oid0 in sel_ids0:
-                    if oid0 in id_map:
-                        nid0 = id_map[oid0]
-                        if nid0 not in skip_new:
-                            predicted.add(nid0)
+                    predicted.update(n for n in id_targets.get(oid0, ()) if n not in skip_new)
         return predicted
 
-    predicted_new_ids = predict_new_ids(source_css)
+    predicted_new_ids = predict_new_ids(doc)
 
-    nodes = _parse_css_nodes(source_css)
     out_nodes: List[CssNode] = []
     dup_comment_done: Set[Tuple[int, int]] = set()
 
-    for node in nodes:
+    for i, node in enumerate(doc.nodes):
         if isinstance(node, CssStmt):
             # Standalone comments are normally not copied.
             #
@@ -1234,58 +1578,38 @@ def generate_css_for_id_map(source_css: str, id_map: Dict[int, int], *, dest_css
             #      duplicate once per (old->new) only if the new tile will receive
             #      other selector rules, and annotate.
             if node.text.lstrip().startswith("/*"):
-                dup_rules_comment = _duplicate_comment_css_rules(node.text, id_map, skip_new=skip_new)
+                cids = doc.comment_ids(i)
+                if not any(oid in id_targets for oid in cids):
+                    # Mentions no copied tile id, so there is nothing to duplicate.
+                    continue
+                dup_rules_comment = _duplicate_comment_css_rules(node.text, id_targets, skip_new=skip_new, rewriter=rewriter)
                 if dup_rules_comment:
                     out_nodes.append(CssStmt(dup_rules_comment))
                 else:
-                    cids = _tile_ids_in_comment_text(node.text)
                     for oid in sorted(cids):
-                        if oid not in id_map:
-                            continue
-                        nid = id_map[oid]
-                        if nid in skip_new:
-                            continue
-                        if nid not in predicted_new_ids:
-                            continue
-                        key = (oid, nid)
-                        if key in dup_comment_done:
-                            continue
-                        out_nodes.append(CssStmt(_duplicate_standalone_comment(node.text, oid, nid)))
-                        dup_comment_done.add(key)
+                        for nid in id_targets.get(oid, ()):
+                            if nid in skip_new:
+                                continue
+                            if nid not in predicted_new_ids:
+                                continue
+                            key = (oid, nid)
+                            if key in dup_comment_done:
+                                continue
+                            out_nodes.append(CssStmt(_duplicate_standalone_comment(node.text, oid, nid, rewriter)))
+                            dup_comment_done.add(key)
             continue
 
-        pre = node.prelude.strip()
-        if pre.startswith("@"): 
-            inner = generate_css_for_id_map(node.body, id_map, dest_css=dest_css)
+        if _is_at_block(node):
+            inner = _generate_css_for_doc(doc.child(i), id_targets, skip_new, rewriter)
             if inner.strip():
                 out_nodes.append(CssBlock(prelude=node.prelude, body=inner.rstrip()))
             continue
 
-        selectors = _split_selector_list(pre)
-
-        # Emit one duplicated block per (old_id -> new_id) match.
-        # This matches the documented behavior and enables safe body rewrites
-        # of tile-OLD tokens when the selector is tied to OLD.
-        emitted_any = False
-        for sel in selectors:
-            sel_ids = _selector_tile_ids(sel)
-            matched_old = [oid for oid in sel_ids if oid in id_map]
-            if not matched_old:
-                continue
-            for oid in matched_old:
-                nid = id_map[oid]
-                if nid in skip_new:
-                    continue
-                new_sel = _replace_tile_id_in_selector(sel, oid, nid)
-                new_body = _replace_tile_id_in_body(node.body, oid, nid)
-                out_nodes.append(CssBlock(prelude=new_sel, body=new_body))
-                emitted_any = True
-
-        if not emitted_any:
-            continue
+        out_nodes.extend(_duplicate_selector_rule(doc, i, id_targets, skip_new, rewriter))
 
     return _render_css_nodes(out_nodes).strip()
 
+
 def get_custom_css(obj: object) -> Tuple[Optional[str], str]:
     if not isinstance(obj, dict):
         return (None, "")
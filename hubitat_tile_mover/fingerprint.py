@@ -0,0 +1,185 @@
+from __future__ import annotations
+
+import threading
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional, Set, Tuple
+
+from .profiling import profiled
+
+# Roots carry a scheme prefix; fingerprints saved by older versions (SHA-256 of the
+# whole sorted layout JSON) have none and are checked with legacy_layout_fingerprint().
+FINGERPRINT_PREFIX = "m1:"
+
+TileKey = Tuple[int, Any]
+# (tile key, the tile's canonical JSON: compact, sorted keys).
+TileLeaf = Tuple[TileKey, bytes]
+
+# id(tile) -> (tile, leaf). Holding the tile keeps its id() from being reused while cached.
+_LEAF_CACHE: Dict[int, Tuple[Dict[str, Any], TileLeaf]] = {}
+
+
+class _LeafScope(threading.local):
+    # The thread's cache inside tile_leaf_scope(); the shared _LEAF_CACHE outside one.
+    cache = _LEAF_CACHE
+
+
+_leaf_scope = _LeafScope()
+
+
+@contextmanager
+def tile_leaf_scope() -> Iterator[None]:
+    """Give this thread a fresh leaf cache for the block; its tiles are released on exit."""
+    prev = _leaf_scope.cache
+    _leaf_scope.cache = {}
+    try:
+        yield
+    finally:
+        _leaf_scope.cache = prev
+
+
+def _tile_key(t: Dict[str, Any]) -> TileKey:
+    tid = t.get("id")
+    try:
+        return (0, int(tid))  # type: ignore[arg-type]
+    except Exception:
+        return (1, str(tid))
+
+
+def tile_leaves(tiles: List[Dict[str, Any]]) -> List[TileLeaf]:
+    """One leaf per tile; only tiles changed since they were last encoded are re-encoded.
+
+    A cached leaf is reused while the list holds the same tile object. Ops change tiles
+    through tiles.set_int_like(), which invalidates the leaf (ops that add tiles add new
+    dicts); code that writes to a tile any other way must call invalidate_tile_leaf().
+    """
+    from .jsoncodec import dumps_each
+
+    cache = _leaf_scope.cache
+    out: List[TileLeaf] = []
+    stale: List[int] = []
+    for t in tiles:
+        ent = cache.get(id(t))
+        if ent is not None and ent[0] is t:
+            out.append(ent[1])
+        else:
+            stale.append(len(out))
+            out.append(((0, 0), b""))
+    if stale:
+        changed = tiles if len(stale) == len(tiles) else [tiles[i] for i in stale]
+        ids = [t.get("id") for t in changed]
+        keys = [(0, tid) if type(tid) is int else _tile_key(t) for t, tid in zip(changed, ids)]
+        fresh = list(zip(keys, dumps_each(changed, sort_keys=True)))
+        cache.update(zip(map(id, changed), zip(changed, fresh)))
+        if changed is tiles:
+            return fresh
+        for i, leaf in zip(stale, fresh):
+            out[i] = leaf
+    return out
+
+
+def invalidate_tile_leaf(tile: Dict[str, Any]) -> None:
+    cache = _leaf_scope.cache
+    ent = cache.get(id(tile))
+    if ent is not None and ent[0] is tile:
+        del cache[id(tile)]
+
+
+def clear_tile_leaf_cache() -> None:
+    _leaf_scope.cache.clear()
+
+
+def retain_tile_leaves(tiles: List[Any]) -> None:
+    """Drop this thread's cached leaves for every tile not in tiles."""
+    cache = _leaf_scope.cache
+    keep = {id(t) for t in tiles}
+    for k in [k for k in cache if k not in keep]:
+        del cache[k]
+
+
+class LayoutFingerprint:
+    """Merkle-style layout fingerprint: per-tile leaves (by tile id) and the customCSS digest under one root.
+
+    Leaves are the tiles' canonical JSON rather than per-tile hashes: a tile is ~150
+    bytes, so hashing each one costs more than it saves when the root is taken. root is
+    the string saved in the last-run state; diff() gives the tile ids whose content
+    differs between two fingerprints without comparing the layouts again.
+    """
+
+    __slots__ = ("tiles", "css", "_root")
+
+    def __init__(self, tiles: Dict[TileKey, bytes], css: bytes) -> None:
+        self.tiles = tiles
+        self.css = css
+        self._root: Optional[str] = None
+
+    @property
+    def root(self) -> str:
+        if self._root is None:
+            import hashlib
+
+            tiles = self.tiles
+            leaves = b"".join(map(tiles.__getitem__, sorted(tiles)))
+            self._root = FINGERPRINT_PREFIX + hashlib.sha256(leaves + self.css).hexdigest()
+        return self._root
+
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, LayoutFingerprint):
+            return NotImplemented
+        return self.css == other.css and self.tiles == other.tiles
+
+    __hash__ = None  # type: ignore[assignment]
+
+    def diff(self, after: "LayoutFingerprint") -> Tuple[Set[Any], Set[Any]]:
+        """(ids added or changed in after, ids no longer present in after)."""
+        before_tiles = self.tiles
+        changed = {k[1] for k, leaf in after.tiles.items() if before_tiles.get(k) != leaf}
+        removed = {k[1] for k in before_tiles.keys() - after.tiles.keys()}
+        return changed, removed
+
+
+@profiled("fingerprint", cat="phase")
+def fingerprint_layout(obj: object) -> LayoutFingerprint:
+    """Fingerprint the layout content (tiles + custom CSS); tile order does not matter."""
+    import hashlib
+
+    from .css_ops import get_custom_css
+    from .jsonio import extract_tiles_container, normalize_tiles_list
+
+    _kind, _container, tiles_any = extract_tiles_container(obj, verbose=False, debug=False)
+    tiles = normalize_tiles_list(tiles_any, verbose=False, debug=False, compile_geometry=False)
+    leaves = tile_leaves(tiles)
+    groups = dict(leaves)
+    if len(groups) != len(leaves):
+        # Duplicate ids: one leaf of the group's sorted encodings, so tile order never matters.
+        dups: Dict[TileKey, List[bytes]] = {}
+        for k, enc in leaves:
+            dups.setdefault(k, []).append(enc)
+        groups = {k: b"".join(sorted(ds)) for k, ds in dups.items()}
+    _css_key, css = get_custom_css(obj)
+    return LayoutFingerprint(groups, hashlib.sha256((css or "").encode("utf-8")).digest())
+
+
+def legacy_layout_fingerprint(obj: object) -> str:
+    """The pre-Merkle fingerprint: SHA-256 of the id-sorted tiles and CSS as one JSON blob."""
+    import hashlib
+
+    from .css_ops import get_custom_css
+    from .jsoncodec import dumps_bytes
+    from .jsonio import extract_tiles_container, normalize_tiles_list
+
+    _kind, _container, tiles_any = extract_tiles_container(obj, verbose=False, debug=False)
+    tiles = normalize_tiles_list(tiles_any, verbose=False, debug=False, compile_geometry=False)
+    tiles_sorted = sorted([t for t in tiles if isinstance(t, dict)], key=_tile_key)
+    _css_key, css = get_custom_css(obj)
+    fp_obj = {
+        "tiles": tiles_sorted,
+        "customCSS": css or "",
+    }
+    return hashlib.sha256(dumps_bytes(fp_obj, sort_keys=True)).hexdigest()
+
+
+def saved_fingerprint_matches(saved: str, obj: object, fp: Optional[LayoutFingerprint] = None) -> bool:
+    """True when a fingerprint stored in the last-run state (either scheme) matches obj."""
+    if not saved.startswith(FINGERPRINT_PREFIX):
+        return legacy_layout_fingerprint(obj) == saved
+    return (fp if fp is not None else fingerprint_layout(obj)).root == saved
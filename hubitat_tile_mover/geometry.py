@@ -1,6 +1,7 @@
 from __future__ import annotations
 
-from typing import Tuple
+from bisect import bisect_left, bisect_right
+from typing import Dict, List, Sequence, Tuple
 
 
 def ranges_overlap(a1: int, a2: int, b1: int, b2: int) -> bool:
@@ -11,3 +12,63 @@ def rects_overlap(a: Tuple[int, int, int, int], b: Tuple[int, int, int, int]) ->
     ar1, ar2, ac1, ac2 = a
     br1, br2, bc1, bc2 = b
     return ranges_overlap(ar1, ar2, br1, br2) and ranges_overlap(ac1, ac2, bc1, bc2)
+
+
+class InsertPoints:
+    """Several (count, at) insertions on one axis, all given in the original coordinates.
+
+    offset(x) is the total count inserted at or before x: a tile starting at x moves by
+    offset(x), a straddler ending at x2 by offset(x2). One bisect per lookup.
+    """
+
+    def __init__(self, inserts: Sequence[Tuple[int, int]]) -> None:
+        merged: Dict[int, int] = {}
+        for count, at in inserts:
+            merged[at] = merged.get(at, 0) + count
+        self.points: List[int] = sorted(merged)
+        self.counts: List[int] = [merged[p] for p in self.points]
+        self._cum: List[int] = [0]
+        for c in self.counts:
+            self._cum.append(self._cum[-1] + c)
+
+    def offset(self, x: int) -> int:
+        return self._cum[bisect_right(self.points, x)]
+
+
+class DeleteBands:
+    """Several inclusive (start, end) bands deleted from one axis, in the original coordinates.
+
+    Bands are sorted and overlapping or touching bands are merged, so each coordinate is in
+    at most one band. shift(x) is the number of deleted positions before x.
+    """
+
+    def __init__(self, bands: Sequence[Tuple[int, int]]) -> None:
+        merged: List[List[int]] = []
+        for s, e in sorted((min(a, b), max(a, b)) for a, b in bands):
+            if merged and s <= merged[-1][1] + 1:
+                merged[-1][1] = max(merged[-1][1], e)
+            else:
+                merged.append([s, e])
+        self.starts: List[int] = [s for s, _ in merged]
+        self.ends: List[int] = [e for _, e in merged]
+        self._cum: List[int] = [0]
+        for s, e in merged:
+            self._cum.append(self._cum[-1] + e - s + 1)
+
+    @property
+    def bands(self) -> List[Tuple[int, int]]:
+        return list(zip(self.starts, self.ends))
+
+    def contains(self, x: int) -> bool:
+        i = bisect_right(self.starts, x) - 1
+        return i >= 0 and x <= self.ends[i]
+
+    def overlaps(self, a: int, b: int) -> bool:
+        i = bisect_left(self.ends, a)
+        return i < len(self.starts) and self.starts[i] <= b
+
+    def shift(self, x: int) -> int:
+        return self._cum[bisect_left(self.ends, x)]
+
+    def label(self, sep: str = "..") -> str:
+        return ", ".join(f"{s}{sep}{e}" for s, e in self.bands)
@@ -0,0 +1,237 @@
+from __future__ import annotations
+
+import os
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from .profiling import profiled
+from .snapshot import LayoutSnapshot
+
+# Snapshot compression: zlib (default; ~10:1 on layout JSON at a few tens of ms for
+# multi-MB layouts) or lzma (a little smaller, several times slower).
+HISTORY_CODEC_ENV = "HUBITAT_TILE_MOVER_HISTORY_CODEC"
+_SUFFIXES = {"zlib": ".json.z", "lzma": ".json.xz"}
+
+# Eviction: the oldest steps go first once any limit is exceeded; the newest step is always kept.
+HISTORY_MAX_ENTRIES = 50
+HISTORY_MAX_BYTES = 64 * 1024 * 1024
+HISTORY_MAX_AGE_SECONDS = 30 * 24 * 60 * 60
+
+_INDEX_NAME = "index.json"
+_OBJECTS_DIR = "objects"
+
+
+def _codec() -> str:
+    name = os.environ.get(HISTORY_CODEC_ENV, "zlib").strip().lower()
+    return name if name in _SUFFIXES else "zlib"
+
+
+def _compress(data: bytes, codec: str) -> bytes:
+    if codec == "lzma":
+        import lzma
+
+        return lzma.compress(data)
+    import zlib
+
+    return zlib.compress(data, 3)
+
+
+def _decompress(data: bytes, codec: str) -> bytes:
+    if codec == "lzma":
+        import lzma
+
+        return lzma.decompress(data)
+    import zlib
+
+    return zlib.decompress(data)
+
+
+def _write_atomic(path: str, data: bytes) -> None:
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+
+class HistoryStore:
+    """Undo history: a list of steps over content-addressed, compressed layout snapshots.
+
+    Each changing run appends one step {before, after, ...} where before/after are layout
+    fingerprint roots. A snapshot is stored once per root (objects/<root>.json.z), so the
+    input of a run that continues from the previous run's output costs nothing; the index
+    is a small JSON file. cursor is the number of steps currently applied: --undo:N moves
+    it back, --redo moves it forward, and a new run drops any steps past it.
+    """
+
+    def __init__(self, root: str) -> None:
+        self.root = root
+        self.objects = os.path.join(root, _OBJECTS_DIR)
+        self.index_path = os.path.join(root, _INDEX_NAME)
+
+    # -- snapshots --
+
+    def _object_path(self, fp_root: str, codec: str) -> str:
+        return os.path.join(self.objects, fp_root.replace(":", "-") + _SUFFIXES[codec])
+
+    def _find_object(self, fp_root: str) -> Optional[Tuple[str, str]]:
+        for codec in _SUFFIXES:
+            path = self._object_path(fp_root, codec)
+            if os.path.exists(path):
+                return path, codec
+        return None
+
+    def put(self, fp_root: str, text: str) -> bool:
+        """Store a snapshot under its fingerprint root; False when it was already stored."""
+        if self._find_object(fp_root) is not None:
+            return False
+        os.makedirs(self.objects, exist_ok=True)
+        codec = _codec()
+        _write_atomic(self._object_path(fp_root, codec), _compress(text.encode("utf-8"), codec))
+        return True
+
+    def get(self, fp_root: str) -> Optional[LayoutSnapshot]:
+        found = self._find_object(fp_root)
+        if found is None:
+            return None
+        path, codec = found
+        with open(path, "rb") as f:
+            return LayoutSnapshot(_decompress(f.read(), codec).decode("utf-8"))
+
+    # -- index --
+
+    def load_index(self) -> Dict[str, Any]:
+        from .jsoncodec import loads
+
+        try:
+            with open(self.index_path, "r", encoding="utf-8") as f:
+                idx = loads(f.read())
+        except FileNotFoundError:
+            idx = None
+        if not isinstance(idx, dict) or not isinstance(idx.get("entries"), list):
+            idx = {"entries": [], "cursor": 0, "cursor_at": None}
+        idx["cursor"] = max(0, min(int(idx.get("cursor") or 0), len(idx["entries"])))
+        return idx
+
+    def save_index(self, idx: Dict[str, Any]) -> None:
+        from .jsoncodec import dumps_bytes
+
+        os.makedirs(self.root, exist_ok=True)
+        _write_atomic(self.index_path, dumps_bytes(idx, indent=2))
+
+    @staticmethod
+    def current_root(idx: Dict[str, Any]) -> Optional[str]:
+        """Fingerprint root of the layout the outputs should hold at the cursor."""
+        entries, cursor = idx["entries"], idx["cursor"]
+        if cursor < len(entries):
+            return entries[cursor]["before"]
+        return entries[-1]["after"] if entries else None
+
+    @profiled("history.record", cat="phase")
+    def record(
+        self,
+        before: Tuple[str, str],
+        after: Tuple[str, str],
+        meta: Dict[str, Any],
+        *,
+        now: Optional[int] = None,
+    ) -> Dict[str, Any]:
+        """Append one step ((root, text) before and after, plus meta) and apply the eviction policy."""
+        now = int(time.time()) if now is None else now
+        self.put(*before)
+        self.put(*after)
+        idx = self.load_index()
+        entries = idx["entries"][: idx["cursor"]]
+        entries.append(dict(meta, before=before[0], after=after[0], at=now))
+        idx.update(entries=entries, cursor=len(entries), cursor_at=now)
+        self.evict(idx, now=now)
+        self.save_index(idx)
+        self.collect_garbage(idx)
+        return idx
+
+    # -- eviction --
+
+    def _sizes(self, roots: List[str]) -> Dict[str, int]:
+        out: Dict[str, int] = {}
+        for r in roots:
+            if r in out:
+                continue
+            found = self._find_object(r)
+            out[r] = os.path.getsize(found[0]) if found is not None else 0
+        return out
+
+    def evict(self, idx: Dict[str, Any], *, now: Optional[int] = None) -> int:
+        """Drop the oldest steps while over the entry, size or age limit; returns the count dropped."""
+        now = int(time.time()) if now is None else now
+        entries = idx["entries"]
+        sizes = self._sizes([r for e in entries for r in (e["before"], e["after"])])
+        refs: Dict[str, int] = {}
+        for e in entries:
+            for r in {e["before"], e["after"]}:
+                refs[r] = refs.get(r, 0) + 1
+        total = sum(sizes[r] for r in refs)
+        dropped = 0
+        while len(entries) - dropped > 1:
+            e = entries[dropped]
+            too_old = now - int(e.get("at") or 0) > HISTORY_MAX_AGE_SECONDS
+            if not (too_old or len(entries) - dropped > HISTORY_MAX_ENTRIES or total > HISTORY_MAX_BYTES):
+                break
+            for r in {e["before"], e["after"]}:
+                refs[r] -= 1
+                if not refs[r]:
+                    total -= sizes[r]
+            dropped += 1
+        if dropped:
+            del entries[:dropped]
+            idx["cursor"] = max(0, idx["cursor"] - dropped)
+        return dropped
+
+    def collect_garbage(self, idx: Dict[str, Any]) -> int:
+        """Remove snapshots no step refers to; returns the count removed."""
+        live = {self._object_path(r, c) for e in idx["entries"] for r in (e["before"], e["after"]) for c in _SUFFIXES}
+        try:
+            names = os.listdir(self.objects)
+        except FileNotFoundError:
+            return 0
+        removed = 0
+        for name in names:
+            path = os.path.join(self.objects, name)
+            if path in live or name.endswith(".tmp"):
+                continue
+            try:
+                os.remove(path)
+                removed += 1
+            except OSError:
+                pass
+        return removed
+
+    def stored_bytes(self, idx: Dict[str, Any]) -> Tuple[int, int]:
+        """(snapshot count, compressed bytes) referenced by the index."""
+        sizes = self._sizes([r for e in idx["entries"] for r in (e["before"], e["after"])])
+        return len(sizes), sum(sizes.values())
+
+
+def _short(fp_root: str) -> str:
+    return fp_root.rsplit(":", 1)[-1][:8]
+
+
+def format_history(store: HistoryStore, idx: Dict[str, Any]) -> str:
+    """--history listing: newest step first, with the switch that returns to each point."""
+    import datetime as _dt
+
+    entries, cursor = idx["entries"], idx["cursor"]
+    if not entries:
+        return "Undo history is empty."
+    count, size = store.stored_bytes(idx)
+    lines = [f"Undo history: {cursor} of {len(entries)} step(s) applied; {count} snapshot(s), {size / 1024:.1f} KiB stored."]
+    for i in range(len(entries) - 1, -1, -1):
+        e = entries[i]
+        when = _dt.datetime.fromtimestamp(int(e.get("at") or 0)).isoformat(sep=" ", timespec="seconds")
+        where = ", ".join(f"{k}:{p}" if p else k for k, p in (e.get("outputs") or []))
+        if i < cursor:
+            how = f"--undo:{cursor - i}"
+        else:
+            how = f"--redo:{i - cursor + 1}"
+        mark = "*" if i == cursor - 1 else " "
+        lines.append(f"{mark} {i + 1:>3}  {when}  {how:<10} {_short(e['before'])} -> {_short(e['after'])}  {where}")
+    lines.append("(* = current; --undo:N restores the layout from before that step, --redo:N reapplies it)")
+    return "\n".join(lines)
@@ -1,28 +1,33 @@
 # hubio.py - Hubitat dashboard layout import/export helpers (local LAN)
 from __future__ import annotations
 
+import contextlib
+import http.client
 import json
 import re
+import threading
+import time
+import urllib.error
 import urllib.parse
-import urllib.request
-from dataclasses import dataclass
-from typing import Any, Tuple
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
 
+from .jsoncodec import dumps_bytes, loads as json_loads
+from .profiling import span
 from .util import die, ilog, wlog, dlog
 
 _REQUEST_TOKEN_RE = re.compile(r"javascriptRequestToken\s*=\s*['\"]([^'\"]+)['\"]")
 
+_USER_AGENT = "hubitat_tile_mover/rc"
+_REDIRECT_CODES = (301, 302, 303, 307, 308)
+
 @dataclass(frozen=True)
 class HubUrls:
     dashboard_url: str
     layout_url: str
     request_token: str
-
-def _read_url_text(url: str, *, timeout: int = 20) -> str:
-    req = urllib.request.Request(url, headers={"User-Agent": "hubitat_tile_mover/rc"})
-    with urllib.request.urlopen(req, timeout=timeout) as resp:
-        data = resp.read()
-    return data.decode("utf-8", errors="replace")
+    # The layout response as received (a restore point that needs no deepcopy).
+    layout_text: str = field(default="", repr=False, compare=False)
 
 def _build_layout_url(dashboard_url: str, request_token: str) -> str:
     u = urllib.parse.urlparse(dashboard_url)
@@ -41,54 +46,242 @@ def _build_layout_url(dashboard_url: str, request_token: str) -> str:
 
     return urllib.parse.urlunparse((u.scheme, netloc, path, "", query, ""))
 
-def fetch_request_token(dashboard_url: str, *, verbose: bool = False, debug: bool = False) -> str:
-    html = _read_url_text(dashboard_url)
-    m = _REQUEST_TOKEN_RE.search(html)
-    if not m:
-        if debug or verbose:
-            dlog(debug, f"dashboard html (first 400 chars): {html[:400]}")
-        die("Could not find requestToken in the dashboard HTML. Make sure the URL is a local dashboard URL.")
-    token = m.group(1).strip()
-    if not token:
-        die("requestToken was found but empty.")
-    return token
-
-def hub_import_layout(dashboard_url: str, *, verbose: bool = False, debug: bool = False) -> Tuple[HubUrls, Any]:
-    token = fetch_request_token(dashboard_url, verbose=verbose, debug=debug)
-    layout_url = _build_layout_url(dashboard_url, token)
-    if verbose:
-        ilog(f"Hub import: layout URL = {layout_url}")
-    text = _read_url_text(layout_url)
-    try:
-        obj = json.loads(text)
-    except json.JSONDecodeError:
-        if verbose or debug:
-            dlog(debug, f"layout response (first 400 chars): {text[:400]}")
-        die("Hub layout response was not valid JSON.")
-    return HubUrls(dashboard_url=dashboard_url, layout_url=layout_url, request_token=token), obj
-
-def _hub_post_once(layout_url: str, obj: Any, *, verbose: bool = False, debug: bool = False) -> None:
-    data = json.dumps(obj, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
-    req = urllib.request.Request(
-        layout_url,
-        data=data,
-        method="POST",
-        headers={
-            "Content-Type": "application/json; charset=utf-8",
-            "User-Agent": "hubitat_tile_mover/rc",
-        },
-    )
-    with urllib.request.urlopen(req, timeout=25) as resp:
-        resp.read()
-
-def hub_post_layout_with_refresh(dashboard_url: str, last_layout_url: str, obj: Any, *, verbose: bool = False, debug: bool = False) -> str:
+
+class HubSession:
+    """Shared HTTP state for one run (or one interactive session) against Hubitat hubs.
+
+    - Keep-alive http.client connections are pooled per scheme/host/port, so the
+      dashboard page, layout GET and layout POST reuse sockets.
+    - Request tokens are cached per dashboard URL for token_ttl seconds and are only
+      re-fetched when the hub rejects a request (or the entry expires).
+    - Safe to share between threads; max_per_host caps concurrent requests to one hub.
+    """
+
+    def __init__(self, *, token_ttl: float = 600.0, timeout: float = 20.0, max_per_host: Optional[int] = None) -> None:
+        self.token_ttl = token_ttl
+        self.timeout = timeout
+        self.max_per_host = max_per_host
+        self._lock = threading.Lock()
+        self._idle: Dict[Tuple[str, str, int], List[http.client.HTTPConnection]] = {}
+        self._slots: Dict[str, threading.BoundedSemaphore] = {}
+        self._tokens: Dict[str, Tuple[str, float]] = {}
+
+    def close(self) -> None:
+        with self._lock:
+            conns = [c for idle in self._idle.values() for c in idle]
+            self._idle.clear()
+        for conn in conns:
+            try:
+                conn.close()
+            except Exception:
+                pass
+
+    def __enter__(self) -> "HubSession":
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self.close()
+
+    # -- HTTP -----------------------------------------------------------------
+
+    def _slot(self, key: Tuple[str, str, int]) -> Any:
+        if not self.max_per_host:
+            return contextlib.nullcontext()
+        # Keyed by host only: the dashboard page (:80) and /layout (:8080) hit the same hub.
+        host = key[1]
+        with self._lock:
+            sem = self._slots.get(host)
+            if sem is None:
+                sem = threading.BoundedSemaphore(self.max_per_host)
+                self._slots[host] = sem
+        return sem
+
+    def _checkout(self, key: Tuple[str, str, int], timeout: float) -> http.client.HTTPConnection:
+        with self._lock:
+            idle = self._idle.get(key)
+            conn = idle.pop() if idle else None
+        if conn is None:
+            scheme, host, port = key
+            if scheme == "https":
+                conn = http.client.HTTPSConnection(host, port, timeout=timeout)
+            else:
+                conn = http.client.HTTPConnection(host, port, timeout=timeout)
+        else:
+            conn.timeout = timeout
+            if conn.sock is not None:
+                conn.sock.settimeout(timeout)
+        return conn
+
+    def _checkin(self, key: Tuple[str, str, int], conn: http.client.HTTPConnection) -> None:
+        with self._lock:
+            self._idle.setdefault(key, []).append(conn)
+
+    @staticmethod
+    def _discard(conn: http.client.HTTPConnection) -> None:
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+    def request(
+        self,
+        method: str,
+        url: str,
+        *,
+        body: Optional[bytes] = None,
+        headers: Optional[Dict[str, str]] = None,
+        timeout: Optional[float] = None,
+    ) -> bytes:
+        """Send one request and return the response body. Non-2xx raises urllib.error.HTTPError."""
+        for _hop in range(6):
+            u = urllib.parse.urlsplit(url)
+            scheme = (u.scheme or "http").lower()
+            if scheme not in ("http", "https"):
+                die(f"Unsupported URL scheme: {url}")
+            host = u.hostname or ""
+            port = u.port or (443 if scheme == "https" else 80)
+            target = (u.path or "/") + (f"?{u.query}" if u.query else "")
+            hdrs = {"User-Agent": _USER_AGENT, "Connection": "keep-alive"}
+            if headers:
+                hdrs.update(headers)
+            key = (scheme, host, port)
+
+            # A pooled connection may have been closed by the hub since its last use;
+            # retry once on a fresh socket before giving up.
+            with self._slot(key):
+                for attempt in (0, 1):
+                    conn = self._checkout(key, timeout or self.timeout)
+                    reused = conn.sock is not None
+                    try:
+                        conn.request(method, target, body=body, headers=hdrs)
+                        resp = conn.getresponse()
+                        data = resp.read()
+                    except (http.client.HTTPException, ConnectionError, OSError):
+                        self._discard(conn)
+                        if attempt == 0 and reused:
+                            continue
+                        raise
+                    break
+                if resp.will_close:
+                    self._discard(conn)
+                else:
+                    self._checkin(key, conn)
+
+            if resp.status in _REDIRECT_CODES and method == "GET":
+                loc = resp.getheader("Location")
+                if loc:
+                    url = urllib.parse.urljoin(url, loc)
+                    continue
+            if not (200 <= resp.status < 300):
+                raise urllib.error.HTTPError(url, resp.status, resp.reason, resp.msg, None)
+            return data
+        die(f"Too many redirects fetching {url}")
+        return b""  # unreachable
+
+    def get_text(self, url: str, *, timeout: Optional[float] = None) -> str:
+        return self.request("GET", url, timeout=timeout).decode("utf-8", errors="replace")
+
+    # -- Tokens ---------------------------------------------------------------
+
+    def request_token(self, dashboard_url: str, *, refresh: bool = False, verbose: bool = False, debug: bool = False) -> str:
+        cached = self._tokens.get(dashboard_url)
+        if cached is not None and not refresh and (time.monotonic() - cached[1]) < self.token_ttl:
+            dlog(debug, f"Hub: reusing cached requestToken for {dashboard_url}")
+            return cached[0]
+        with span("hub.token", url=dashboard_url):
+            html = self.get_text(dashboard_url)
+        m = _REQUEST_TOKEN_RE.search(html)
+        if not m:
+            if debug or verbose:
+                dlog(debug, f"dashboard html (first 400 chars): {html[:400]}")
+            die("Could not find requestToken in the dashboard HTML. Make sure the URL is a local dashboard URL.")
+        token = m.group(1).strip()
+        if not token:
+            die("requestToken was found but empty.")
+        self._tokens[dashboard_url] = (token, time.monotonic())
+        return token
+
+    def forget_token(self, dashboard_url: str) -> None:
+        self._tokens.pop(dashboard_url, None)
+
+    # -- Layout ---------------------------------------------------------------
+
+    def import_layout(self, dashboard_url: str, *, verbose: bool = False, debug: bool = False) -> Tuple[HubUrls, Any]:
+        token = self.request_token(dashboard_url, verbose=verbose, debug=debug)
+        layout_url = _build_layout_url(dashboard_url, token)
+        if verbose:
+            ilog(f"Hub import: layout URL = {layout_url}")
+        try:
+            with span("hub.layout_get", url=dashboard_url):
+                text = self.get_text(layout_url)
+        except urllib.error.HTTPError:
+            # Cached token rejected: fetch a fresh one and retry once.
+            if verbose:
+                wlog("Layout GET failed once; refreshed requestToken and retrying.")
+            token = self.request_token(dashboard_url, refresh=True, verbose=verbose, debug=debug)
+            layout_url = _build_layout_url(dashboard_url, token)
+            with span("hub.layout_get", url=dashboard_url):
+                text = self.get_text(layout_url)
+        try:
+            with span("json.decode"):
+                obj = json_loads(text)
+        except json.JSONDecodeError:
+            if verbose or debug:
+                dlog(debug, f"layout response (first 400 chars): {text[:400]}")
+            die("Hub layout response was not valid JSON.")
+        return HubUrls(dashboard_url=dashboard_url, layout_url=layout_url, request_token=token, layout_text=text), obj
+
+    def _post_once(self, layout_url: str, obj: Any) -> None:
+        with span("json.encode"):
+            data = dumps_bytes(obj)
+        with span("hub.post"):
+            self.request(
+                "POST",
+                layout_url,
+                body=data,
+                headers={"Content-Type": "application/json; charset=utf-8"},
+                timeout=25,
+            )
+
+    def post_layout(self, dashboard_url: str, obj: Any, *, verbose: bool = False, debug: bool = False) -> str:
+        """POST a FULL layout to the dashboard; returns the layout URL used."""
+        token = self.request_token(dashboard_url, verbose=verbose, debug=debug)
+        layout_url = _build_layout_url(dashboard_url, token)
+        try:
+            self._post_once(layout_url, obj)
+            return layout_url
+        except urllib.error.HTTPError:
+            if verbose:
+                wlog("POST failed once; refreshed requestToken and retrying.")
+        token = self.request_token(dashboard_url, refresh=True, verbose=verbose, debug=debug)
+        new_layout_url = _build_layout_url(dashboard_url, token)
+        self._post_once(new_layout_url, obj)
+        return new_layout_url
+
+
+def fetch_request_token(dashboard_url: str, *, verbose: bool = False, debug: bool = False, session: Optional[HubSession] = None) -> str:
+    return (session or HubSession()).request_token(dashboard_url, verbose=verbose, debug=debug)
+
+def hub_import_layout(dashboard_url: str, *, verbose: bool = False, debug: bool = False, session: Optional[HubSession] = None) -> Tuple[HubUrls, Any]:
+    return (session or HubSession()).import_layout(dashboard_url, verbose=verbose, debug=debug)
+
+def hub_post_layout_with_refresh(
+    dashboard_url: str,
+    last_layout_url: str,
+    obj: Any,
+    *,
+    verbose: bool = False,
+    debug: bool = False,
+    session: Optional[HubSession] = None,
+) -> str:
+    s = session or HubSession()
     try:
-        _hub_post_once(last_layout_url, obj, verbose=verbose, debug=debug)
+        s._post_once(last_layout_url, obj)
         return last_layout_url
     except Exception:
         if verbose:
             wlog("POST failed once; refreshed requestToken and retrying.")
-        token = fetch_request_token(dashboard_url, verbose=verbose, debug=debug)
+        token = s.request_token(dashboard_url, refresh=True, verbose=verbose, debug=debug)
         new_layout_url = _build_layout_url(dashboard_url, token)
-        _hub_post_once(new_layout_url, obj, verbose=verbose, debug=debug)
+        s._post_once(new_layout_url, obj)
         return new_layout_url
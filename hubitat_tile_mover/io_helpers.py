@@ -2,20 +2,26 @@ from __future__ import annotations
 
 from typing import List, Optional, Tuple
 
-from .clipboard import clipboard_get_text, clipboard_set_text
 from .util import die, normalize_newlines
+from .profiling import profiled
 
 
 def normalize_argv(argv: List[str]) -> List[str]:
     """
     Supports colon variants and quoted/separate sort specs:
       --import:clipboard
+      --import:stdin
       --import:file <path>
       --import:hub <dashboard_url>
       --merge_source:file <path>
       --merge_source:hub <dashboard_url>
+      --targets:hub <dashboard_url> [<dashboard_url> ...]
+      --targets:file <path>
+      --jobs:4 / --per_hub:2
+      --undo:2 / --redo:1
       --output_format:full|minimal|bare (legacy: container/list; also accepts legacy --output_shape:*)
       --output_to:terminal
+      --output_to:stdout
       --output_to:file <path>
       --output_to:hub <dashboard_url>
       --sort_json:rci
@@ -84,6 +90,11 @@ def normalize_argv(argv: List[str]) -> List[str]:
             out += ["--import", a.split(":", 1)[1]]
         elif a.startswith("--merge_source:") or a.startswith("--merge-source:"):
             out += ["--merge_source", a.split(":", 1)[1]]
+        elif a.startswith("--targets:"):
+            out += ["--targets", a.split(":", 1)[1]]
+        elif a.startswith("--jobs:") or a.startswith("--per_hub:") or a.startswith("--undo:") or a.startswith("--redo:"):
+            head, val = a.split(":", 1)
+            out += [head, val]
         elif a.startswith("--output_format:") or a.startswith("--output-format:"):
             out += ["--output_format", a.split(":", 1)[1]]
         elif a.startswith("--output_shape:") or a.startswith("--output-shape:"):
@@ -96,6 +107,16 @@ def normalize_argv(argv: List[str]) -> List[str]:
     return out
 
 
+def split_step_line(line: str) -> List[str]:
+    """Split one --pipeline / --shell line into switches ('#' starts a comment; backslashes are literal)."""
+    import shlex
+
+    lex = shlex.shlex(line, posix=True)
+    lex.whitespace_split = True
+    lex.commenters = "#"
+    lex.escape = ""  # keep Windows paths intact
+    return list(lex)
+
 
 def assert_singleton_flags(argv: List[str], names: List[str]) -> None:
     counts = {n: 0 for n in names}
@@ -112,8 +133,8 @@ def parse_import_spec(spec: Optional[List[str]]) -> Tuple[str, Optional[str]]:
     if spec is None:
         return ("clipboard", None)
 
-    if len(spec) == 1 and spec[0] == "clipboard":
-        return ("clipboard", None)
+    if len(spec) == 1 and spec[0] in ("clipboard", "stdin"):
+        return (spec[0], None)
 
     if len(spec) == 2 and spec[0] == "hub":
         return ("hub", spec[1])
@@ -121,7 +142,7 @@ def parse_import_spec(spec: Optional[List[str]]) -> Tuple[str, Optional[str]]:
     if len(spec) == 2 and spec[0] == "file":
         return ("file", spec[1])
 
-    die("Invalid import. Use --import:clipboard OR --import:file <filename> OR --import:hub <dashboard_url>.")
+    die("Invalid import. Use --import:clipboard OR --import:stdin OR --import:file <filename> OR --import:hub <dashboard_url>.")
 
 
 def parse_merge_source_spec(spec: Optional[List[str]]) -> Tuple[str, Optional[str]]:
@@ -140,13 +161,30 @@ def parse_merge_source_spec(spec: Optional[List[str]]) -> Tuple[str, Optional[st
     die("Invalid merge source. Use --merge_source:file <filename> OR --merge_source:hub <dashboard_url>.")
 
 
+def parse_targets_spec(spec: Optional[List[str]]) -> List[str]:
+    """Parse --targets <kind> <arg...> into a list of dashboard URLs.
+
+    Supported:
+      --targets:hub <dashboard_url> [<dashboard_url> ...]
+      --targets:file <filename>   (one URL per line; '#' comments)
+    """
+    if not spec:
+        return []
+    if len(spec) >= 2 and spec[0] in ("hub", "url"):
+        return list(spec[1:])
+    if len(spec) == 2 and spec[0] == "file":
+        from .targets import read_targets_file
+        return read_targets_file(spec[1])
+    die("Invalid targets. Use --targets:hub <dashboard_url> [<dashboard_url> ...] OR --targets:file <filename>.")
+
+
 def parse_output_to_specs(specs: Optional[List[List[str]]]) -> List[Tuple[str, Optional[str]]]:
     if specs is None:
         return [("clipboard", None)]
 
     outs: List[Tuple[str, Optional[str]]] = []
     for s in specs:
-        if len(s) == 1 and s[0] in ("terminal", "clipboard"):
+        if len(s) == 1 and s[0] in ("terminal", "stdout", "clipboard"):
             outs.append((s[0], None))
             continue
         if len(s) == 1 and s[0] == "hub":
@@ -158,16 +196,76 @@ def parse_output_to_specs(specs: Optional[List[List[str]]]) -> List[Tuple[str, O
         if len(s) == 2 and s[0] == "file":
             outs.append(("file", s[1]))
             continue
-        die("Invalid output. Use --output:terminal OR --output:clipboard OR --output:file <filename> OR --output:hub [dashboard_url].")
+        die("Invalid output. Use --output:terminal OR --output:stdout OR --output:clipboard OR --output:file <filename> OR --output:hub [dashboard_url].")
 
     if not outs:
         return [("clipboard", None)]
     return outs
 
 
+# Pipe reads/writes move at most this much at a time.
+_STREAM_CHUNK = 1 << 20
+
+
+def _read_stdin_text() -> str:
+    """Read all of stdin as UTF-8, chunk by chunk as it arrives from the pipe."""
+    import codecs
+    import sys
+
+    stream = getattr(sys.stdin, "buffer", None)
+    if stream is None:
+        # stdin was replaced by a text stream (embedding/IDE).
+        return sys.stdin.read()
+    if sys.stdin.isatty():
+        die("--import:stdin reads the layout JSON from a pipe or redirect (stdin is a terminal).")
+    # utf-8-sig: Windows shells may prepend a BOM when piping text.
+    decoder = codecs.getincrementaldecoder("utf-8-sig")()
+    read = getattr(stream, "read1", stream.read)
+    parts: List[str] = []
+    try:
+        while True:
+            chunk = read(_STREAM_CHUNK)
+            if not chunk:
+                break
+            parts.append(decoder.decode(chunk))
+        parts.append(decoder.decode(b"", final=True))
+    except UnicodeDecodeError as e:
+        die(f"Standard input is not valid UTF-8: {e}")
+    except OSError as e:
+        die(f"Unable to read standard input: {e}")
+    return "".join(parts)
+
+
+def _write_stdout_bytes(text: str) -> None:
+    """Write text to stdout as UTF-8 bytes, chunk by chunk, with no newline translation."""
+    import sys
+
+    stream = getattr(sys.stdout, "buffer", None)
+    try:
+        sys.stdout.flush()
+        if stream is None:
+            sys.stdout.write(text)
+            sys.stdout.flush()
+            return
+        for i in range(0, len(text), _STREAM_CHUNK):
+            stream.write(text[i : i + _STREAM_CHUNK].encode("utf-8"))
+        stream.flush()
+    except BrokenPipeError:
+        # The reader exited early (e.g. `| head`); keep the interpreter's exit flush quiet.
+        import os
+
+        devnull = os.open(os.devnull, os.O_WRONLY)
+        os.dup2(devnull, sys.stdout.fileno())
+        die("--output:stdout: the reading end of the pipe was closed.")
+
+
+@profiled("input.read", cat="phase")
 def read_input_text(import_kind: str, import_path: Optional[str]) -> str:
     if import_kind == "clipboard":
+        from .clipboard import clipboard_get_text
         return clipboard_get_text()
+    if import_kind == "stdin":
+        return _read_stdin_text()
     if import_kind == "file":
         if not import_path:
             die("Import kind is file but no filename was provided.")
@@ -182,6 +280,7 @@ def read_input_text(import_kind: str, import_path: Optional[str]) -> str:
     return ""
 
 
+@profiled("output.write", cat="phase")
 def write_outputs(outputs: List[Tuple[str, Optional[str]]], newline_mode: str, text: str) -> None:
     text = normalize_newlines(text, newline_mode)
     for kind, arg in outputs:
@@ -190,7 +289,10 @@ def write_outputs(outputs: List[Tuple[str, Optional[str]]], newline_mode: str, t
 
             sys.stdout.write(text)
             sys.stdout.flush()
+        elif kind == "stdout":
+            _write_stdout_bytes(text)
         elif kind == "clipboard":
+            from .clipboard import clipboard_set_text
             clipboard_set_text(text)
         elif kind == "file":
             if not arg:
@@ -0,0 +1,229 @@
+from __future__ import annotations
+
+import json
+import os
+from itertools import chain
+from typing import Any, Callable, Dict, List, Optional, Set
+
+# Backend selection: auto (fastest installed), orjson or stdlib.
+JSON_BACKEND_ENV = "HUBITAT_TILE_MOVER_JSON"
+
+# Integers with this many digits may not fit orjson's 64-bit range (it would load them as floats).
+_LONG_INT_DIGITS = 19
+_DIGIT_MASK = bytes.maketrans(b"0123456789", b"0000000000")
+_ALL_ZERO = b"0" * _LONG_INT_DIGITS
+
+# Values the stdlib and orjson encode identically; floats are checked separately.
+_SCALARS = frozenset((str, int, bool, type(None)))
+_CONTAINERS = frozenset((dict, list, tuple))
+_FLAT_VALUES = _SCALARS | {float}
+
+
+class JsonBackend:
+    """One JSON implementation. Every backend must produce exactly the stdlib's text.
+
+    loads(text) -> object; dumps(obj, indent, sort_keys) -> UTF-8 bytes, or None when
+    the backend cannot guarantee identical output (the stdlib encoder is used instead).
+    The base class is the stdlib itself.
+    """
+
+    name = "stdlib"
+
+    def loads(self, text: str) -> Any:
+        return json.loads(text)
+
+    def dumps(self, obj: Any, indent: Optional[int], sort_keys: bool) -> Optional[bytes]:
+        return None
+
+    def dumps_each(self, objs: List[Any], sort_keys: bool) -> Optional[List[bytes]]:
+        return None
+
+
+class _OrjsonBackend(JsonBackend):
+    name = "orjson"
+
+    def __init__(self) -> None:
+        import orjson
+
+        self._orjson = orjson
+
+    def loads(self, text: str) -> Any:
+        try:
+            data = text.encode("utf-8")
+        except UnicodeEncodeError:
+            # Lone surrogates: only the stdlib accepts them.
+            return json.loads(text)
+        if _ALL_ZERO not in data.translate(_DIGIT_MASK):
+            try:
+                return self._orjson.loads(data)
+            except self._orjson.JSONDecodeError:
+                pass
+        # Long integers, NaN/Infinity, BOMs and malformed input: the stdlib decides (and words the error).
+        return json.loads(text)
+
+    def dumps(self, obj: Any, indent: Optional[int], sort_keys: bool) -> Optional[bytes]:
+        if indent not in (None, 2) or not _orjson_exact(obj):
+            return None
+        option = (self._orjson.OPT_INDENT_2 if indent == 2 else 0) | (self._orjson.OPT_SORT_KEYS if sort_keys else 0)
+        try:
+            return self._orjson.dumps(obj, option=option)
+        except TypeError:
+            # Non-str keys, out-of-range ints, lone surrogates, unsupported types.
+            return None
+
+    def dumps_each(self, objs: List[Any], sort_keys: bool) -> Optional[List[bytes]]:
+        enc = self._orjson.dumps
+        option = self._orjson.OPT_SORT_KEYS if sort_keys else 0
+        kinds = _record_kinds(objs) if len(objs) > 1 else {dict}
+        if kinds <= _SCALARS or (kinds <= _FLAT_VALUES and _orjson_exact(objs)):
+            try:
+                out = _split_records(enc(objs, option=option), len(objs))
+            except TypeError:
+                out = None
+            if out is not None:
+                return out
+        # One exactness check for the whole batch; objects orjson rejects fall back one by one.
+        if not _orjson_exact(objs):
+            return None
+        out = []
+        for o in objs:
+            try:
+                out.append(enc(o, option=option))
+            except TypeError:
+                out.append(_stdlib_dumps(o, None, sort_keys).encode("utf-8"))
+        return out
+
+
+def _orjson_exact(obj: Any) -> bool:
+    """True when orjson renders obj exactly like json.dumps.
+
+    The two differ only on floats outside [1e-4, 1e16) (exponent spelling), NaN/Infinity
+    and container/scalar subclasses. The check walks one nesting level at a time so the
+    per-value work (type collection) runs in C.
+    """
+    values: List[Any] = [obj]
+    while True:
+        kinds = set(map(type, values))
+        if float in kinds:
+            for v in values:
+                if type(v) is float and not (v == 0.0 or 1e-4 <= abs(v) < 1e16):
+                    return False
+            kinds.discard(float)
+        nested = kinds - _SCALARS
+        if not nested:
+            return True
+        if not nested <= _CONTAINERS:
+            return False
+        dicts = [v for v in values if type(v) is dict]
+        seqs = [v for v in values if type(v) is list or type(v) is tuple]
+        values = list(chain(chain.from_iterable(map(dict.values, dicts)), chain.from_iterable(seqs)))
+
+
+def _record_kinds(objs: List[Any]) -> Set[type]:
+    """Types of the values of objs when they are all non-empty dicts, else {dict}."""
+    if set(map(type, objs)) != {dict} or not all(objs):
+        return {dict}
+    return set(map(type, chain.from_iterable(map(dict.values, objs))))
+
+
+def _split_records(data: bytes, n: int) -> Optional[List[bytes]]:
+    """Cut the compact JSON array of n flat, non-empty objects into the objects' texts.
+
+    Every boundary reads '},{"'; a string value ending in '},{' adds a match, so an
+    exact count means every cut is a boundary. None when the count is off.
+    """
+    parts = data[1:-1].split(b'},{"')
+    if len(parts) != n:
+        return None
+    last = parts.pop()
+    out = [parts[0] + b"}"]
+    out += [b'{"' + p + b"}" for p in parts[1:]]
+    out.append(b'{"' + last)
+    return out
+
+
+def _stdlib_dumps(obj: Any, indent: Optional[int], sort_keys: bool) -> str:
+    if indent is None:
+        return json.dumps(obj, ensure_ascii=False, separators=(",", ":"), sort_keys=sort_keys)
+    return json.dumps(obj, ensure_ascii=False, indent=indent, sort_keys=sort_keys)
+
+
+_FACTORIES: Dict[str, Callable[[], JsonBackend]] = {
+    "orjson": _OrjsonBackend,
+    "stdlib": JsonBackend,
+}
+# Tried in order by "auto".
+_PREFERRED = ("orjson", "stdlib")
+
+_ACTIVE: Optional[JsonBackend] = None
+
+
+def available_backends() -> List[str]:
+    """Names of the backends that can be loaded here."""
+    out = []
+    for name in _PREFERRED:
+        try:
+            _FACTORIES[name]()
+        except ImportError:
+            continue
+        out.append(name)
+    return out
+
+
+def set_backend(name: str = "auto") -> str:
+    """Select the JSON backend (auto, orjson or stdlib) and return the one in use."""
+    global _ACTIVE
+    if name == "auto":
+        for cand in _PREFERRED:
+            try:
+                _ACTIVE = _FACTORIES[cand]()
+                break
+            except ImportError:
+                continue
+    elif name in _FACTORIES:
+        try:
+            _ACTIVE = _FACTORIES[name]()
+        except ImportError:
+            # A requested-but-missing backend silently degrades to the stdlib.
+            _ACTIVE = JsonBackend()
+    else:
+        _ACTIVE = JsonBackend()
+    return _ACTIVE.name  # type: ignore[union-attr]
+
+
+def backend() -> JsonBackend:
+    if _ACTIVE is None:
+        set_backend(os.environ.get(JSON_BACKEND_ENV, "auto").strip().lower() or "auto")
+    return _ACTIVE  # type: ignore[return-value]
+
+
+def loads(text: str) -> Any:
+    """json.loads(text) through the active backend."""
+    return backend().loads(text)
+
+
+def dumps_bytes(obj: Any, *, indent: Optional[int] = None, sort_keys: bool = False) -> bytes:
+    """UTF-8 bytes of json.dumps(obj, ensure_ascii=False, ...): compact when indent is None."""
+    data = backend().dumps(obj, indent, sort_keys)
+    if data is None:
+        data = _stdlib_dumps(obj, indent, sort_keys).encode("utf-8")
+    return data
+
+
+def dumps_each(objs: List[Any], *, sort_keys: bool = False) -> List[bytes]:
+    """[dumps_bytes(o, sort_keys=sort_keys) for o in objs], batched (compact)."""
+    out = backend().dumps_each(objs, sort_keys)
+    if out is None and len(objs) > 1 and _record_kinds(objs) <= _FLAT_VALUES:
+        # Flat records: one encode of the batch, cut at the record boundaries.
+        out = _split_records(_stdlib_dumps(objs, None, sort_keys).encode("utf-8"), len(objs))
+    if out is None:
+        out = [_stdlib_dumps(o, None, sort_keys).encode("utf-8") for o in objs]
+    return out
+
+
+def dumps(obj: Any, *, indent: Optional[int] = None, sort_keys: bool = False) -> str:
+    """json.dumps(obj, ensure_ascii=False, ...) through the active backend: compact when indent is None."""
+    data = backend().dumps(obj, indent, sort_keys)
+    if data is None:
+        return _stdlib_dumps(obj, indent, sort_keys)
+    return data.decode("utf-8")
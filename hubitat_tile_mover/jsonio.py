@@ -3,7 +3,9 @@ from __future__ import annotations
 import json
 from typing import Any, List, Literal, Tuple, Optional
 
-from .util import die
+from .util import die, dlog
+from .jsoncodec import dumps as _codec_dumps, loads as _codec_loads
+from .profiling import profiled
 
 # Import input "shape" / level:
 #   full_object      -> { ..., "tiles": [..], ... }   (other fields exist)
@@ -12,6 +14,7 @@ from .util import die
 ContainerKind = Literal["full_object", "minimal_container", "bare_tiles_list"]
 
 
+@profiled("json.decode", cat="phase")
 def load_json_from_text(text: str, *, verbose: bool = False, debug: bool = False) -> Any:
     """Parse JSON with user-friendly errors unless verbose/debug.
 
@@ -21,7 +24,7 @@ def load_json_from_text(text: str, *, verbose: bool = False, debug: bool = False
     looks_jsonish = text.lstrip().startswith(("{", "["))
     looks_dashboardish = ("\"tiles\"" in text) or ("\"customCSS\"" in text)
     try:
-        return json.loads(text)
+        return _codec_loads(text)
     except json.JSONDecodeError as e:
         if looks_dashboardish:
             die(f"The input looks like a dashboard layout, but the JSON is malformed: {e}")
@@ -49,8 +52,19 @@ def extract_tiles_container(obj: Any, *, verbose: bool = False, debug: bool = Fa
     return ("full_object", obj, [])  # unreachable
 
 
-def normalize_tiles_list(tiles_any: Any, *, verbose: bool = False, debug: bool = False) -> List[dict]:
-    """Validate and normalize tiles list. Ensures at least one tile has id/row/col."""
+@profiled("normalize", cat="phase")
+def normalize_tiles_list(
+    tiles_any: Any,
+    *,
+    verbose: bool = False,
+    debug: bool = False,
+    compile_geometry: bool = True,
+) -> List[dict]:
+    """Validate and normalize tiles list. Ensures at least one tile has id/row/col.
+
+    With compile_geometry, the layout's span schema is detected and every tile's
+    geometry is resolved (and synonym conflicts checked) once, up front.
+    """
     if not isinstance(tiles_any, list):
         die("'tiles' must be a list.")
     if len(tiles_any) == 0:
@@ -65,8 +79,19 @@ def normalize_tiles_list(tiles_any: Any, *, verbose: bool = False, debug: bool =
             saw_valid = True
     if not saw_valid:
         die("No tiles found with required fields 'id', 'row', and 'col'.")
+    if compile_geometry:
+        from .tiles import detect_span_schema
+        schema = detect_span_schema(tiles)
+        dlog(debug, f"Span schema: {_describe_span_schema(schema)}")
     return tiles
 
+
+def _describe_span_schema(schema: Optional[Tuple[Optional[str], Optional[str]]]) -> str:
+    if schema is None:
+        return "mixed (strict per-tile resolution)"
+    rk, ck = schema
+    return f"rows={rk or '(none)'} cols={ck or '(none)'}"
+
 def _level_for_kind(kind: ContainerKind) -> int:
     # Higher means "richer" (can output more)
     if kind == "full_object":
@@ -131,7 +156,8 @@ def build_output_object(
     return full_container
 
 
+@profiled("json.encode", cat="phase")
 def dump_json(obj: Any, indent: int, minify: bool) -> str:
     if minify:
-        return json.dumps(obj, ensure_ascii=False, separators=(",", ":"))
-    return json.dumps(obj, ensure_ascii=False, indent=indent)
+        return _codec_dumps(obj)
+    return _codec_dumps(obj, indent=indent)
@@ -1,12 +1,17 @@
 from __future__ import annotations
 
-from typing import Any, Dict, List, Tuple, Set
+from typing import TYPE_CHECKING, Any, Dict, List, Tuple, Set
 
 from .sort_tiles import sort_tiles
 from .tiles import as_int, rect
-from .geometry import rects_overlap, ranges_overlap
+from .geometry import ranges_overlap
+from .overlaps import overlap_components, overlap_relations
 from .util import die
-from .css_ops import CssStmt, _parse_css_nodes, _selector_tile_ids, _split_selector_list, _strip_block_comments_outside_strings
+from .css_ops import CssDocument
+from .profiling import profiled
+
+if TYPE_CHECKING:
+    from .conflicts import ConflictModel
 
 Rect = Tuple[int, int, int, int]
 
@@ -18,23 +23,6 @@ def _area(t: Dict[str, Any]) -> int:
     r1, r2, c1, c2 = _span(t)
     return (r2-r1+1)*(c2-c1+1)
 
-def _contains(a: Rect, b: Rect) -> bool:
-    return a[0] <= b[0] and a[1] >= b[1] and a[2] <= b[2] and a[3] >= b[3]
-
-def _same(a: Rect, b: Rect) -> bool:
-    return a == b
-
-def _pair_relation(a: Rect, b: Rect) -> str | None:
-    if not rects_overlap(a, b):
-        return None
-    if _same(a,b):
-        return 'same'
-    if _contains(a,b):
-        return 'contains'
-    if _contains(b,a):
-        return 'inside'
-    return 'overlaps'
-
 def parse_list_tiles_spec(spec: str | None) -> tuple[str, str]:
     raw = (spec or 'plain:rci').strip()
     if not raw:
@@ -50,27 +38,9 @@ def parse_list_tiles_spec(spec: str | None) -> tuple[str, str]:
 
 
 def _count_tile_scoped_rules(css: str) -> Dict[int, int]:
-    counts: Dict[int, int] = {}
     if not css:
-        return counts
-
-    def rec(css_text: str) -> None:
-        for node in _parse_css_nodes(css_text):
-            if isinstance(node, CssStmt):
-                continue
-            prelude = (node.prelude or '').strip()
-            if prelude.startswith('@'):
-                rec(node.body)
-                continue
-            pre_no_comments = _strip_block_comments_outside_strings(node.prelude or '')
-            ids: Set[int] = set()
-            for sel in _split_selector_list(pre_no_comments.strip()):
-                ids |= _selector_tile_ids(sel)
-            for tid in ids:
-                counts[tid] = counts.get(tid, 0) + 1
-
-    rec(css)
-    return counts
+        return {}
+    return CssDocument.of(css).selector_rule_counts()
 
 
 def _placement_map(tiles: List[Dict[str, Any]]) -> Dict[int, str]:
@@ -80,20 +50,18 @@ def _placement_map(tiles: List[Dict[str, Any]]) -> Dict[int, str]:
     has_child = {tid: False for tid in ids}
     has_partial = {tid: False for tid in ids}
 
-    for i, aid in enumerate(ids):
-        ra = rects[aid]
-        for bid in ids[i+1:]:
-            rb = rects[bid]
-            rel = _pair_relation(ra, rb)
-            if rel == 'contains':
-                has_child[aid] = True
-                has_parent[bid] = True
-            elif rel == 'inside':
-                has_parent[aid] = True
-                has_child[bid] = True
-            elif rel in ('overlaps', 'same'):
-                has_partial[aid] = True
-                has_partial[bid] = True
+    id_rects = [rects[tid] for tid in ids]
+    for i, j, rel in overlap_relations(id_rects):
+        aid, bid = ids[i], ids[j]
+        if rel == 'contains':
+            has_child[aid] = True
+            has_parent[bid] = True
+        elif rel == 'inside':
+            has_parent[aid] = True
+            has_child[bid] = True
+        elif rel in ('overlaps', 'same'):
+            has_partial[aid] = True
+            has_partial[bid] = True
 
     placement: Dict[int, str] = {}
     for tid in ids:
@@ -236,74 +204,62 @@ def _tile_line(t: Dict[str, Any], prefix: str = '') -> str:
     extra_s = ('  ' + '  '.join(extra)) if extra else ''
     return f"{prefix}tile-{as_int(t,'id')}  r={r1} c={c1}  rs={rs} cs={cs}  span=r{r1}..{r2},c{c1}..{c2}{extra_s}"
 
-def _components(tiles: List[Dict[str, Any]], include_contains: bool=True, conflicts_only: bool=False) -> List[List[Dict[str, Any]]]:
-    n = len(tiles)
-    adj = {i:set() for i in range(n)}
-    rects = [_span(t) for t in tiles]
-    for i in range(n):
-        for j in range(i+1,n):
-            rel = _pair_relation(rects[i], rects[j])
-            if rel is None:
-                continue
-            if conflicts_only and rel in ('contains','inside'):
-                continue
-            if (not include_contains) and rel in ('contains','inside','same'):
-                continue
-            adj[i].add(j); adj[j].add(i)
-    seen=set(); out=[]
-    for i in range(n):
-        if i in seen or not adj[i]:
-            continue
-        stack=[i]; seen.add(i); comp=[]
-        while stack:
-            cur=stack.pop(); comp.append(tiles[cur])
-            for nb in adj[cur]:
-                if nb not in seen:
-                    seen.add(nb); stack.append(nb)
-        out.append(comp)
-    return out
+Relation = Tuple[int, int, str]  # (index, index, relation of the first to the second)
+
+def _components(rects: List[Rect], relations: List[Relation], conflicts_only: bool=False) -> List[Tuple[List[int], List[Relation]]]:
+    """Overlap groups (index lists), each with every relation between its members."""
+    accept = (lambda i, j, rel: rel not in ('contains','inside')) if conflicts_only else None
+    comps = overlap_components(rects, accept=accept, include_singletons=False, relations=relations)
+    comp_of: Dict[int, int] = {i: ci for ci, comp in enumerate(comps) for i in comp}
+    comp_rels: List[List[Relation]] = [[] for _ in comps]
+    for i, j, rel in relations:
+        ci = comp_of.get(i)
+        if ci is not None and ci == comp_of.get(j):
+            comp_rels[ci].append((i, j, rel))
+    return list(zip(comps, comp_rels))
 
 def _build_nested_roots(comp: List[Dict[str, Any]], sort_spec: str) -> List[Dict[str, Any]]:
     ordered = sort_tiles(comp, sort_spec)
     ordered = sorted(ordered, key=lambda t: (-_area(t), as_int(t,'row'), as_int(t,'col'), as_int(t,'id')))
     return ordered
 
-def _render_nested_tree(comp: List[Dict[str, Any]], sort_spec: str, include_overlap_notes: bool=True) -> List[str]:
-    rects = {id(t): _span(t) for t in comp}
-    by_id = {as_int(t,'id'): t for t in comp}
+def _render_nested_tree(tiles: List[Dict[str, Any]], group: Tuple[List[int], List[Relation]], sort_spec: str, include_overlap_notes: bool=True) -> List[str]:
+    idxs, relations = group
+    comp = [tiles[i] for i in idxs]
     children: dict[int, list[tuple[Dict[str, Any], str]]] = {as_int(t,'id'): [] for t in comp}
     parent: dict[int, int] = {}
     overlap_notes: dict[int, list[str]] = {as_int(t,'id'): [] for t in comp}
 
+    def parent_key(p: Dict[str, Any]) -> tuple[int, int, int, int]:
+        return (_area(p), as_int(p,'row'), as_int(p,'col'), as_int(p,'id'))
+
+    # Each tile hangs under the smallest tile that strictly contains it.
+    best: Dict[int, Dict[str, Any]] = {}
+    for i, j, rel in relations:
+        if rel == 'contains':
+            outer, inner = tiles[i], tiles[j]
+        elif rel == 'inside':
+            outer, inner = tiles[j], tiles[i]
+        else:
+            if include_overlap_notes:
+                aid, bid = as_int(tiles[i],'id'), as_int(tiles[j],'id')
+                overlap_notes[aid].append(f"tile-{bid} [{rel}]")
+                overlap_notes[bid].append(f"tile-{aid} [{rel}]")
+            continue
+        tid = as_int(inner,'id')
+        cur = best.get(tid)
+        if cur is None or parent_key(outer) < parent_key(cur):
+            best[tid] = outer
+
     ordered = sorted(comp, key=lambda t: (_area(t), as_int(t,'row'), as_int(t,'col'), as_int(t,'id')))
     for t in ordered:
         tid = as_int(t,'id')
-        tr = rects[id(t)]
-        candidates = []
-        for p in comp:
+        p = best.get(tid)
+        if p is not None:
             pid = as_int(p,'id')
-            if pid == tid:
-                continue
-            pr = rects[id(p)]
-            if _contains(pr, tr) and not _same(pr, tr):
-                candidates.append(p)
-        if candidates:
-            best = min(candidates, key=lambda p: (_area(p), as_int(p,'row'), as_int(p,'col'), as_int(p,'id')))
-            pid = as_int(best,'id')
             parent[tid] = pid
             children[pid].append((t, 'inside'))
 
-    if include_overlap_notes:
-        ids = [as_int(t,'id') for t in comp]
-        for i, aid in enumerate(ids):
-            for bid in ids[i+1:]:
-                if parent.get(aid) == bid or parent.get(bid) == aid:
-                    continue
-                rel = _pair_relation(rects[id(by_id[aid])], rects[id(by_id[bid])])
-                if rel in ('overlaps', 'same'):
-                    overlap_notes[aid].append(f"tile-{bid} [{rel}]")
-                    overlap_notes[bid].append(f"tile-{aid} [{rel}]")
-
     for k in children:
         children[k].sort(key=lambda item: (as_int(item[0],'row'), as_int(item[0],'col'), as_int(item[0],'id'), item[1]))
 
@@ -334,26 +290,26 @@ def _render_nested_tree(comp: List[Dict[str, Any]], sort_spec: str, include_over
         walk(t, '', idx == len(roots)-1, None, True)
     return lines
 
+@profiled("list.render", cat="phase")
 def render_list_tiles(tiles: List[Dict[str, Any]], spec: str | None, css_text: str = "") -> str:
     kind, sort_spec = parse_list_tiles_spec(spec)
     lines: List[str] = []
     if kind == 'plain':
         return _render_plain_table(tiles, sort_spec, css_text)
     ordered = sort_tiles(list(tiles), sort_spec)
-    comps_all = _components(ordered, include_contains=True, conflicts_only=False)
-    comps_nested = []
-    for comp in comps_all:
-        rects = [_span(t) for t in comp]
-        if any((_contains(rects[i], rects[j]) or _contains(rects[j], rects[i])) and not _same(rects[i],rects[j]) for i in range(len(comp)) for j in range(i+1,len(comp)) if rects_overlap(rects[i], rects[j])):
-            comps_nested.append(comp)
-    comps_conflicts = _components(ordered, include_contains=True, conflicts_only=True)
+    rects = [_span(t) for t in ordered]
+    relations = list(overlap_relations(rects))
+    comps_all = _components(rects, relations)
+    nested_ids = {k for i, j, rel in relations if rel in ('contains','inside') for k in (i, j)}
+    comps_nested = [g for g in comps_all if nested_ids.intersection(g[0])]
+    comps_conflicts = _components(rects, relations, conflicts_only=True)
     if kind == 'overlap':
         lines.append(f"TILE LIST ({kind}, sort={sort_spec})")
         if not comps_all:
             lines.append('(no overlap groups)')
         for idx,comp in enumerate(comps_all):
             lines.append(f"Group {idx+1}")
-            for line in _render_nested_tree(comp, sort_spec, include_overlap_notes=True):
+            for line in _render_nested_tree(ordered, comp, sort_spec, include_overlap_notes=True):
                 lines.append(line)
         return "\n".join(lines) + "\n"
     if kind == 'nested':
@@ -362,7 +318,7 @@ def render_list_tiles(tiles: List[Dict[str, Any]], spec: str | None, css_text: s
             lines.append('(no nested groups)')
         for idx,comp in enumerate(comps_nested):
             lines.append(f"Group {idx+1}")
-            for line in _render_nested_tree(comp, sort_spec, include_overlap_notes=False):
+            for line in _render_nested_tree(ordered, comp, sort_spec, include_overlap_notes=False):
                 lines.append(line)
         return "\n".join(lines) + "\n"
     if kind == 'conflicts':
@@ -371,21 +327,21 @@ def render_list_tiles(tiles: List[Dict[str, Any]], spec: str | None, css_text: s
             lines.append('(no conflict groups)')
         for idx,comp in enumerate(comps_conflicts):
             lines.append(f"Group {idx+1}")
-            for line in _render_nested_tree(comp, sort_spec, include_overlap_notes=True):
+            for line in _render_nested_tree(ordered, comp, sort_spec, include_overlap_notes=True):
                 lines.append(line)
         return "\n".join(lines) + "\n"
     # tree
     lines.append(f"TILE LIST ({kind}, sort={sort_spec})")
     if comps_all:
-        involved = {id(t) for comp in comps_all for t in comp}
-        roots = [t for t in ordered if id(t) not in involved]
+        involved = {i for comp, _rels in comps_all for i in comp}
+        roots = [t for i, t in enumerate(ordered) if i not in involved]
         if roots:
             lines.append('Independent tiles')
             for t in roots:
                 lines.append(_tile_line(t))
         for idx,comp in enumerate(comps_all):
             lines.append(f"Group {idx+1}")
-            for line in _render_nested_tree(comp, sort_spec, include_overlap_notes=True):
+            for line in _render_nested_tree(ordered, comp, sort_spec, include_overlap_notes=True):
                 lines.append(line)
     else:
         for t in ordered:
@@ -393,10 +349,9 @@ def render_list_tiles(tiles: List[Dict[str, Any]], spec: str | None, css_text: s
     return "\n".join(lines) + "\n"
 
 
+@profiled("list.conflicts", cat="phase")
 def render_abort_conflicts(
-    moving_tiles: List[Dict[str, Any]],
-    stationary_tiles: List[Dict[str, Any]],
-    conflicts_by_mid: Dict[int, List[Tuple[int, Rect]]],
+    model: "ConflictModel",
     *,
     action_word: str = 'move',
     sort_spec: str = 'rci',
@@ -441,9 +396,7 @@ def render_abort_conflicts(
         return "rows " + ", ".join(parts[:-1]) + f", and {parts[-1]}"
 
     def _build_summary_lines() -> List[str]:
-        rects: List[Rect] = []
-        for entries in conflicts_by_mid.values():
-            rects.extend(orect for _, orect in entries)
+        rects = model.overlap_rects
         if not rects:
             return [f"The {action_word} operation could not complete because of conflicts."]
         by_cols: Dict[Tuple[int, int], Set[int]] = {}
@@ -463,95 +416,10 @@ def render_abort_conflicts(
         lines.append('Use --verbose for detailed conflict pairs, or --debug for full diagnostic output.')
         return lines
 
-    def _build_legacy_lines() -> List[str]:
-        sample = list(conflicts_by_mid.items())[:10]
-        details = '; '.join([
-            f"{action_word} id={mid} conflicts at r{entries[0][1][0]}..{entries[0][1][1]},c{entries[0][1][2]}..{entries[0][1][3]} with {[sid for sid,_ in entries]}"
-            for mid, entries in sample
-        ])
-        more = '' if len(conflicts_by_mid) <= 10 else f" (and {len(conflicts_by_mid) - 10} more)"
-        return [
-            f"Destination conflicts detected. Re-run with --allow_overlap or --skip_overlap. {details}{more}"
-        ]
-
     if detail_level == 'summary':
         return '\n'.join(_build_summary_lines()) + '\n'
     if detail_level == 'legacy':
-        return '\n'.join(_build_legacy_lines()) + '\n'
-
-    moving_by_id = {as_int(t, 'id'): t for t in moving_tiles}
-    stationary_by_id = {as_int(t, 'id'): t for t in stationary_tiles}
-
-    nodes: Set[tuple[str, int]] = set()
-    adj: Dict[tuple[str, int], Set[tuple[str, int]]] = {}
-    overlap_rects: Dict[frozenset, List[Rect]] = {}
-
-    def add_edge(a: tuple[str, int], b: tuple[str, int], orect: Rect) -> None:
-        nodes.add(a); nodes.add(b)
-        adj.setdefault(a, set()).add(b)
-        adj.setdefault(b, set()).add(a)
-        overlap_rects.setdefault(frozenset((a, b)), []).append(orect)
-
-    for mid, entries in conflicts_by_mid.items():
-        for sid, orect in entries:
-            add_edge(('moving', int(mid)), ('stationary', int(sid)), orect)
-
-    comps: List[List[tuple[str, int]]] = []
-    seen: Set[tuple[str, int]] = set()
-    for node in sorted(nodes):
-        if node in seen:
-            continue
-        stack = [node]
-        seen.add(node)
-        comp: List[tuple[str, int]] = []
-        while stack:
-            cur = stack.pop()
-            comp.append(cur)
-            for nb in adj.get(cur, set()):
-                if nb not in seen:
-                    seen.add(nb)
-                    stack.append(nb)
-        comps.append(comp)
-
-    def node_tile(node: tuple[str, int]) -> Dict[str, Any]:
-        kind, tid = node
-        return moving_by_id[tid] if kind == 'moving' else stationary_by_id[tid]
-
-    def rect_bounds(rects: List[Rect]) -> Rect:
-        return (
-            min(r[0] for r in rects),
-            max(r[1] for r in rects),
-            min(r[2] for r in rects),
-            max(r[3] for r in rects),
-        )
-
-    def classify_group(comp: List[tuple[str, int]]) -> tuple[str, str]:
-        same_origin = False
-        exact_dup = False
-        partial = False
-        overlap_count = 0
-        for a in comp:
-            for b in adj.get(a, set()):
-                if a >= b:
-                    continue
-                ta = node_tile(a); tb = node_tile(b)
-                ra = _span(ta); rb = _span(tb)
-                overlap_count += 1
-                if ra[0] == rb[0] and ra[2] == rb[2]:
-                    same_origin = True
-                if _same(ra, rb):
-                    exact_dup = True
-                elif not _contains(ra, rb) and not _contains(rb, ra):
-                    partial = True
-        if exact_dup:
-            return ('exact duplicate footprint', 'high')
-        if partial and same_origin:
-            return ('same-origin overlap cluster', 'high')
-        if same_origin:
-            return ('same-origin cluster', 'medium')
-        if partial:
-            return ('partial overlap cluster', 'high')
-        return ('nested/contained conflict cluster', 'medium')
+        return f"Destination conflicts detected. Re-run with --allow_overlap or --skip_overlap. {model.details(action_word)}\n"
 
     def tile_summary_line(t: Dict[str, Any], role: str, rel_notes: List[str] | None = None) -> str:
         r1, r2, c1, c2 = _span(t)
@@ -562,47 +430,30 @@ def render_abort_conflicts(
             note = '  ' + '; '.join(rel_notes)
         return f"  - tile-{as_int(t,'id'):>4}  {role:<8} row={r1} col={c1} rs={rs} cs={cs}  span=r{r1}..{r2},c{c1}..{c2}{note}"
 
+    groups = model.groups
+    blocked_by = model.blocked_by()
     lines: List[str] = []
-    total_moving = len(conflicts_by_mid)
-    total_pairs = sum(len(v) for v in conflicts_by_mid.values())
     lines.append('CONFLICT DETAILS')
     lines.append(f"Action aborted: destination conflicts detected during {action_word}.")
-    lines.append(f"Groups: {len(comps)}  {action_word.title()} tile(s) blocked: {total_moving}  Overlap pair(s): {total_pairs}")
+    lines.append(f"Groups: {len(groups)}  {action_word.title()} tile(s) blocked: {len(model.by_mid)}  Overlap pair(s): {model.total_pairs}")
     lines.append('')
 
-    for idx, comp in enumerate(comps, 1):
-        moving_nodes = sorted([n for n in comp if n[0] == 'moving'], key=lambda n: (as_int(node_tile(n),'row'), as_int(node_tile(n),'col'), n[1]))
-        stationary_nodes = sorted([n for n in comp if n[0] == 'stationary'], key=lambda n: (as_int(node_tile(n),'row'), as_int(node_tile(n),'col'), n[1]))
-        group_overlap_rects: List[Rect] = []
-        all_tile_rects: List[Rect] = []
-        for node in comp:
-            all_tile_rects.append(_span(node_tile(node)))
-            for nb in adj.get(node, set()):
-                if node < nb:
-                    group_overlap_rects.extend(overlap_rects.get(frozenset((node, nb)), []))
-        gb = rect_bounds(all_tile_rects) if all_tile_rects else (0,0,0,0)
-        ob = rect_bounds(group_overlap_rects) if group_overlap_rects else gb
-        gtype, severity = classify_group(comp)
-        lines.append(f"[{idx}] {gtype}  |  severity: {severity}")
+    for idx, g in enumerate(groups, 1):
+        gb, ob = g.tile_bounds, g.overlap_bounds
+        lines.append(f"[{idx}] {g.kind}  |  severity: {g.severity}")
         lines.append(f"    Tile bounds:    rows {gb[0]}..{gb[1]}, cols {gb[2]}..{gb[3]}")
         lines.append(f"    Overlap bounds: rows {ob[0]}..{ob[1]}, cols {ob[2]}..{ob[3]}")
-        lines.append(f"    {action_word.title()} tile(s): " + (', '.join(f"tile-{n[1]}" for n in moving_nodes) if moving_nodes else '(none)'))
-        lines.append(f"    Blocking tile(s): " + (', '.join(f"tile-{n[1]}" for n in stationary_nodes) if stationary_nodes else '(none)'))
+        lines.append(f"    {action_word.title()} tile(s): " + (', '.join(f"tile-{tid}" for tid in g.moving_ids) if g.moving_ids else '(none)'))
+        lines.append(f"    Blocking tile(s): " + (', '.join(f"tile-{tid}" for tid in g.stationary_ids) if g.stationary_ids else '(none)'))
         lines.append('    Members:')
-        for n in moving_nodes:
-            tid = n[1]
+        for tid in g.moving_ids:
             rels = []
-            for sid, orect in sorted(conflicts_by_mid.get(tid, []), key=lambda x: x[0]):
+            for sid, orect in sorted(model.by_mid.get(tid, []), key=lambda x: x[0]):
                 rels.append(f"hits tile-{sid} at r{orect[0]}..{orect[1]},c{orect[2]}..{orect[3]}")
-            lines.append(tile_summary_line(node_tile(n), action_word, rels))
-        for n in stationary_nodes:
-            sid = n[1]
-            blockers = []
-            for mid, entries in sorted(conflicts_by_mid.items()):
-                hits = [orect for sid2, orect in entries if sid2 == sid]
-                for orect in hits:
-                    blockers.append(f"blocks tile-{mid} at r{orect[0]}..{orect[1]},c{orect[2]}..{orect[3]}")
-            lines.append(tile_summary_line(node_tile(n), 'blocking', blockers))
+            lines.append(tile_summary_line(model.tile(('moving', tid)), action_word, rels))
+        for sid in g.stationary_ids:
+            blockers = [f"blocks tile-{mid} at r{orect[0]}..{orect[1]},c{orect[2]}..{orect[3]}" for mid, orect in blocked_by.get(sid, [])]
+            lines.append(tile_summary_line(model.tile(('stationary', sid)), 'blocking', blockers))
         lines.append('')
 
     lines.append('Re-run with --allow_overlap to force the action, or --skip_overlap to skip only the blocked tiles.')
@@ -1,50 +1,41 @@
 from __future__ import annotations
 
+import argparse
 import os
 import sys
-from typing import Dict, List, Optional, Tuple
+import time
+from typing import TYPE_CHECKING, Any, Dict, List, NamedTuple, Optional, Tuple
 
-from .util import die, ilog, prompt_yes_no, prompt_yes_no_or_die, format_id_sample, ok, warn, wlog, layout_fingerprint
-from .list_views import render_list_tiles
+from .util import die, ilog, prompt_yes_no, prompt_yes_no_or_die, format_id_sample, ok, warn, wlog
+
+if TYPE_CHECKING:
+    from .conflicts import ConflictModel
+    from .fingerprint import LayoutFingerprint
+    from .hubio import HubSession
+    from .snapshot import LayoutSnapshot
+
+# Op modules, CSS helpers, map/list renderers and hub I/O are imported where they are
+# used, so a run only pays for the modules its action needs (see tools/check_startup.py).
 
 def vlog(enabled: bool, msg: str) -> None:
     """Verbose logger."""
     if enabled:
         ilog(msg)
 
-from .cli import build_parser
-from .hubio import hub_import_layout, hub_post_layout_with_refresh
+from .cli import StepParseError, build_parser
+from .profiling import enable_profile, finish_profile, profiled, span
 from .io_helpers import (
     assert_singleton_flags,
     normalize_argv,
     parse_import_spec,
     parse_output_to_specs,
     read_input_text,
+    split_step_line,
     write_outputs,
 )
-from .jsonio import build_output_object, dump_json, extract_tiles_container, load_json_from_text
-from .ops_clear import clear_cols, clear_range, clear_rows
-from .ops_copy import copy_cols, copy_rows, copy_range
-from .ops_delete import delete_cols, delete_rows
-from .ops_crop import (
-    crop_to_cols,
-    crop_to_range,
-    crop_to_rows,
-    prune_devices,
-    prune_except_devices,
-    prune_except_ids,
-    prune_ids,
-    parse_prune_device_spec,
-    parse_prune_id_spec,
-)
-from .ops_insert import insert_cols, insert_rows
-from .ops_merge import merge_cols, merge_range, merge_rows
-from .ops_move import move_cols, move_range, move_rows
-from .ops_trim import trim_tiles
-from .ops_spacing import adjust_tile_spacing, set_tile_spacing
-from .map_view import render_tile_map
+from .jsonio import build_output_object, dump_json, extract_tiles_container, load_json_from_text, normalize_tiles_list
 from .sort_tiles import complete_sort_spec, sort_tiles
-from .geometry import ranges_overlap, rects_overlap
+from .geometry import DeleteBands, InsertPoints, ranges_overlap, rects_overlap
 from .selectors import (
     select_tiles_by_col_range,
     select_tiles_by_rect_range,
@@ -52,23 +43,7 @@ from .selectors import (
     tile_matches_col_range,
     tile_matches_row_range,
 )
-from .tiles import verify_tiles_minimum, as_int, tile_row_extent, tile_col_extent, rect as tile_rect
-from .css_ops import (
-    cleanup_css_for_tile_ids,
-    collect_selector_item_bodies,
-    drop_selector_items_by_keys,
-    filter_css_fragment_duplicates,
-    find_standalone_comment_tile_refs,
-    generate_css_for_id_map,
-    get_custom_css,
-    normalize_css_body,
-    orphan_tile_ids_in_css,
-    process_standalone_comments_for_css_cleared_tiles,
-    remove_selector_items_by_keys,
-    set_custom_css,
-    tile_has_selector_rules,
-    tile_ids_in_css,
-)
+from .tiles import verify_tiles_minimum, as_int, tile_row_extent, tile_col_extent, rect as tile_rect, retain_tile_caches, tile_cache_scope
 # # # from .util import die, ilog, vlog, ok, wlog, prompt_yes_no, prompt_yes_no_or_die, layout_fingerprint  # removed: avoid local binding  # removed: avoid local binding  # removed: avoid local binding
 
 
@@ -100,6 +75,21 @@ def _parse_inclusive_range(name: str, pair: Optional[List[int]]) -> Optional[Tup
     return (a, b)
 
 
+def _int_groups(name: str, values: Optional[List[int]], size: int = 2) -> List[Tuple[int, ...]]:
+    """Split a repeatable switch (e.g. --insert:rows 2 5 1 20) into groups of size integers."""
+    if not values:
+        return []
+    if len(values) % size:
+        what = "pairs of integers" if size == 2 else f"groups of {size} integers"
+        die(f"{name} takes {what}; got {len(values)} value(s).")
+    return [tuple(values[i:i + size]) for i in range(0, len(values), size)]
+
+
+def _move_switch(args, dest: str) -> str:
+    """The switch that set a --move:* value (--move:rows, or --swap:rows for a swap)."""
+    return getattr(args, dest + "_switch", None) or "--" + dest.replace("_", ":", 1)
+
+
 def _compute_before_map_mark_rects(
     args,
     tiles: List[Dict],
@@ -109,6 +99,7 @@ def _compute_before_map_mark_rects(
     has_trim: bool,
 ) -> List[Tuple[int, int, int, int]]:
     """Return rects (r1,r2,c1,c2) to mark in the BEFORE map as affected by the requested action(s)."""
+    from .ops_crop import parse_prune_device_spec, parse_prune_id_spec
 
     include_overlap = _selection_include_partial(args)
 
@@ -129,49 +120,39 @@ def _compute_before_map_mark_rects(
 
     # Insert shifts tiles at/after the insertion point (and straddlers when include_overlap).
     if getattr(args, "insert_rows", None):
-        _count, at_row = args.insert_rows
+        points = InsertPoints(_int_groups("--insert:rows", args.insert_rows))
         for t in tiles:
             if not tile_matches_col_range(t, col_range, include_overlap):
                 continue
-            r0 = as_int(t, "row")
-            if r0 >= at_row:
+            if points.offset(tile_row_extent(t)[1] if include_overlap else as_int(t, "row")):
                 add([t])
-            elif include_overlap:
-                r1, r2 = tile_row_extent(t)
-                if r1 < at_row <= r2:
-                    add([t])
 
     if getattr(args, "insert_cols", None):
-        _count, at_col = args.insert_cols
+        points = InsertPoints(_int_groups("--insert:cols", args.insert_cols))
         for t in tiles:
             if not tile_matches_row_range(t, row_range, include_overlap):
                 continue
-            c0 = as_int(t, "col")
-            if c0 >= at_col:
+            if points.offset(tile_col_extent(t)[1] if include_overlap else as_int(t, "col")):
                 add([t])
-            elif include_overlap:
-                c1, c2 = tile_col_extent(t)
-                if c1 < at_col <= c2:
-                    add([t])
 
     # Move / Copy: mark the selected source tiles.
     if getattr(args, "move_cols", None):
-        s, e, _d = args.move_cols
-        if s > e:
-            s, e = e, s
-        add(select_tiles_by_col_range(tiles, s, e, include_overlap=include_overlap))
+        for s, e, _d in _int_groups(_move_switch(args, "move_cols"), args.move_cols, 3):
+            if s > e:
+                s, e = e, s
+            add(select_tiles_by_col_range(tiles, s, e, include_overlap=include_overlap))
 
     if getattr(args, "move_rows", None):
-        s, e, _d = args.move_rows
-        if s > e:
-            s, e = e, s
-        add(select_tiles_by_row_range(tiles, s, e, include_overlap=include_overlap))
+        for s, e, _d in _int_groups(_move_switch(args, "move_rows"), args.move_rows, 3):
+            if s > e:
+                s, e = e, s
+            add(select_tiles_by_row_range(tiles, s, e, include_overlap=include_overlap))
 
     if getattr(args, "move_range", None):
-        r1, c1, r2, c2, _dr, _dc = args.move_range
-        tr, br = (r1, r2) if r1 <= r2 else (r2, r1)
-        lc, rc = (c1, c2) if c1 <= c2 else (c2, c1)
-        add(select_tiles_by_rect_range(tiles, tr, lc, br, rc, include_overlap=include_overlap))
+        for r1, c1, r2, c2, _dr, _dc in _int_groups(_move_switch(args, "move_range"), args.move_range, 6):
+            tr, br = (r1, r2) if r1 <= r2 else (r2, r1)
+            lc, rc = (c1, c2) if c1 <= c2 else (c2, c1)
+            add(select_tiles_by_rect_range(tiles, tr, lc, br, rc, include_overlap=include_overlap))
 
     if getattr(args, "copy_cols", None):
         s, e, _d = args.copy_cols
@@ -186,33 +167,29 @@ def _compute_before_map_mark_rects(
         add(select_tiles_by_row_range(tiles, s, e, include_overlap=include_overlap))
 
     if getattr(args, "copy_range", None):
-        r1, c1, r2, c2, _dr, _dc = args.copy_range
+        r1, c1, r2, c2 = args.copy_range[:4]
         tr, br = (r1, r2) if r1 <= r2 else (r2, r1)
         lc, rc = (c1, c2) if c1 <= c2 else (c2, c1)
         add(select_tiles_by_rect_range(tiles, tr, lc, br, rc, include_overlap=include_overlap))
 
     # Delete / Clear: mark tiles selected for removal (not the shifted tiles).
     if getattr(args, "delete_rows", None):
-        s, e = args.delete_rows
-        if s > e:
-            s, e = e, s
-        selected = [
-            t
-            for t in select_tiles_by_row_range(tiles, s, e, include_overlap=include_overlap)
-            if tile_matches_col_range(t, col_range, include_overlap)
-        ]
-        add(selected)
+        for s, e in DeleteBands(_int_groups("--delete:rows", args.delete_rows)).bands:
+            selected = [
+                t
+                for t in select_tiles_by_row_range(tiles, s, e, include_overlap=include_overlap)
+                if tile_matches_col_range(t, col_range, include_overlap)
+            ]
+            add(selected)
 
     if getattr(args, "delete_cols", None):
-        s, e = args.delete_cols
-        if s > e:
-            s, e = e, s
-        selected = [
-            t
-            for t in select_tiles_by_col_range(tiles, s, e, include_overlap=include_overlap)
-            if tile_matches_row_range(t, row_range, include_overlap)
-        ]
-        add(selected)
+        for s, e in DeleteBands(_int_groups("--delete:cols", args.delete_cols)).bands:
+            selected = [
+                t
+                for t in select_tiles_by_col_range(tiles, s, e, include_overlap=include_overlap)
+                if tile_matches_row_range(t, row_range, include_overlap)
+            ]
+            add(selected)
 
     if getattr(args, "clear_rows", None):
         s, e = args.clear_rows
@@ -419,25 +396,27 @@ def _backup_path_for_url(dashboard_url: str) -> str:
     dash = m.group(1) if m else "dashboard"
     return os.path.join(_app_data_dir(), f"hubitat_tile_mover_backup_{host}_{dash}.json")
 
+@profiled("backup.write", cat="phase")
 def _write_backup(path: str, obj: object) -> None:
-    import json
+    from .jsoncodec import dumps
     with open(path, "w", encoding="utf-8") as f:
-        json.dump(obj, f, indent=2, ensure_ascii=False)
+        f.write(dumps(obj, indent=2))
 
 def _read_backup(path: str) -> object:
-    import json
+    from .jsoncodec import loads
     with open(path, "r", encoding="utf-8") as f:
-        return json.load(f)
+        return loads(f.read())
 
 
 def _write_temp_merge_source(obj: object) -> str:
     """Write a temporary JSON file for merge_url imports; returns filename."""
-    import json
     import tempfile
+
+    from .jsoncodec import dumps
     fd, path = tempfile.mkstemp(prefix="hubitat_tile_mover_merge_", suffix=".json")
     # mkstemp returns an OS-level fd; wrap it in a file object
     with open(fd, "w", encoding="utf-8") as f:  # type: ignore[arg-type]
-        json.dump(obj, f, indent=2, ensure_ascii=False)
+        f.write(dumps(obj, indent=2))
     return path
 
 
@@ -463,14 +442,87 @@ def _state_path() -> str:
     return os.path.join(_app_data_dir(), "hubitat_tile_mover_last_run.json")
 
 def _write_state(state: dict) -> None:
-    import json
+    from .jsoncodec import dumps
+    from .snapshot import LayoutSnapshot
+
+    snap = state.get("backup_obj")
     with open(_state_path(), "w", encoding="utf-8") as f:
-        json.dump(state, f, indent=2, ensure_ascii=False)
+        if isinstance(snap, LayoutSnapshot):
+            # Splice the snapshot's JSON text in as is; decoding it just to re-encode it
+            # would rebuild the whole layout in memory.
+            rest = dumps({k: v for k, v in state.items() if k != "backup_obj"}, indent=2)
+            f.write('{\n  "backup_obj": ' + snap.text.strip() + "," + rest[1:])
+        else:
+            f.write(dumps(state, indent=2))
+
+def _history_store():
+    from .history import HistoryStore
+
+    return HistoryStore(os.path.join(_app_data_dir(), "history"))
+
+def _record_last_run(
+    args,
+    *,
+    before: "LayoutSnapshot",
+    fp_before: Optional["LayoutFingerprint"],
+    fp_after: Optional["LayoutFingerprint"],
+    out_text: str,
+    outputs: List[Tuple[str, Optional[str]]],
+    url: Optional[str],
+    backup_path: Optional[str],
+    import_kind: str,
+    posted: bool,
+) -> None:
+    """Write the last-run state (--undo_last) and add the run to the undo history (--undo / --redo)."""
+    import time as _time
+    import datetime as _dt
+
+    now_epoch = int(_time.time())
+    state = {
+        # Global last-run backup (works for file/clipboard/hub imports)
+        "backup_obj": before,
+        # Optional per-dashboard backup path (only meaningful when a hub URL is in use)
+        "backup_path": backup_path,
+        "last_outputs": outputs,
+        "last_url": url,
+        "last_output_format": args.output_format,
+        "last_import_kind": import_kind,
+        "state_written_at_epoch": now_epoch,
+        "state_written_at": _dt.datetime.fromtimestamp(now_epoch).isoformat(sep=" ", timespec="seconds"),
+    }
+
+    if posted and url and fp_after is not None:
+        # Fingerprint the last layout saved to hub so --undo_last can detect external changes.
+        state["last_hub_saved_hash"] = fp_after.root
+        state["last_hub_saved_at_epoch"] = now_epoch
+    else:
+        state["last_hub_saved_hash"] = None
+
+    if fp_before is not None and fp_after is not None:
+        # The undo history keeps the input and output as compressed snapshots (stored
+        # once per layout content); the last-run state then only refers to the input.
+        try:
+            _history_store().record(
+                (fp_before.root, before.text),
+                (fp_after.root, out_text),
+                {
+                    "url": url,
+                    "outputs": outputs,
+                    "output_format": args.output_format,
+                    "import_kind": import_kind,
+                },
+                now=now_epoch,
+            )
+            state["backup_ref"] = fp_before.root
+            del state["backup_obj"]
+        except Exception as e:
+            vlog(args.verbose, f"Undo history not updated: {e}")
+    _write_state(state)
 
 def _read_state() -> dict:
-    import json
+    from .jsoncodec import loads
     with open(_state_path(), "r", encoding="utf-8") as f:
-        return json.load(f)
+        return loads(f.read())
 
 def kind_to_default_output_format(kind: str) -> str:
     if kind == "full_object":
@@ -479,63 +531,8 @@ def kind_to_default_output_format(kind: str) -> str:
         return "minimal"
     return "bare"
 
-def main(argv: Optional[List[str]] = None) -> None:
-    import sys as _sys
-    import copy as _copy
-
-    did_undo = False
-    if argv is None:
-        argv = _sys.argv[1:]
-
-    argv = normalize_argv(argv)
-
-    # If invoked with no switches/args, show very brief help instead of attempting to parse input.
-    if not argv:
-        p = build_parser()
-        p.print_brief_help()
-        return
-
-
-    # Guard singletons (track legacy tokens too)
-    assert_singleton_flags(argv, ["--import"])
-    assert_singleton_flags(argv, ["--output_format", "--output-format", "--output_shape", "--output-shape"])
-
-    parser = build_parser()
-    args = parser.parse_args(argv)
-
-    # Option sanity checks
-    if getattr(args, "select_include_partial", False) and (getattr(args, "spacing_add", None) is not None or getattr(args, "spacing_set", None) is not None):
-        die("ERROR: --select:include_partial is not valid with --spacing_add:* or --spacing_set:*. The current spacing overlap-group behavior still uses legacy --include_overlap.")
-    if getattr(args, "remove_overlap", False) and _spacing_include_overlap(args):
-        die("ERROR: --overlaps:remove and legacy --include_overlap cannot be used together.")
-
-    # --overlaps:remove scope: only valid with --spacing_set:*
-    if getattr(args, "remove_overlap", False) and getattr(args, "spacing_set", None) is None:
-        die("ERROR: --overlaps:remove is only valid with --spacing_set:rows|cols|all.")
-    if getattr(args, "remove_overlap", False) and getattr(args, "spacing_add", None) is not None:
-        die("ERROR: --overlaps:remove cannot be used with --spacing_add:*. Use --spacing_set:* instead.")
-
-    if args.indent < 0:
-        die("--indent must be >= 0.")
-
-    import_kind, import_path = parse_import_spec(args.import_spec)
-    outputs = parse_output_to_specs(args.output_to)
-
-    # Standalone tile reports use the normal output destinations, but never hub.
-    if getattr(args, "list_tiles", None) and any(k == "hub" for (k, _) in outputs):
-        die("--output:hub is not valid with --list_tiles. Use --output:terminal, --output:clipboard, or --output:file.")
-
-    # Resolve hub URLs:
-    # - import_path is the dashboard URL when import_kind == 'hub'
-    # - output entries may include ('hub', None) or ('hub', url)
-    #   If omitted, inherit from hub import URL when available.
-    if any(k == 'hub' and p is None for (k, p) in outputs):
-        if import_kind == 'hub' and import_path:
-            outputs = [(k, (import_path if (k == 'hub' and p is None) else p)) for (k, p) in outputs]
-
-    if any(k == 'hub' and p is None for (k, p) in outputs):
-        die("--output:hub requires a dashboard URL unless importing from hub with --import:hub <dashboard_url>.")
-
+def _resolve_map_options(args) -> Tuple[bool, str, bool, bool, str]:
+    """Return (show_map, map_focus, no_scale, show_ids, show_axes) for the parsed switches."""
     # Map printing: prefer new --show_map[:MODE] interface.
     show_map_mode = getattr(args, 'show_map_mode', None)
     legacy_map_focus = getattr(args, 'map_focus', None)
@@ -555,202 +552,120 @@ def main(argv: Optional[List[str]] = None) -> None:
         die("--show_ids requires --show_map.")
     if show_axes != 'none' and not show_map:
         die("--show_axis:* requires --show_map. (legacy --show_axes:* also accepted)")
-    list_tiles_spec = getattr(args, "list_tiles", None)
-
-    # --undo_last is a standalone restore action.
-    # It restores the previous backup and writes it to the last output destinations unless --output/--output_to is provided.
-    if args.undo_last:
-        forbidden = [
-            args.insert_rows, args.insert_cols, args.move_cols, args.move_rows, args.move_range,
-            args.delete_rows, args.delete_cols, args.clear_rows, args.clear_cols, args.clear_range,
-            args.crop_to_rows, args.crop_to_cols, args.crop_to_range,
-            args.prune_except_ids, args.prune_except_devices, args.prune_ids, args.prune_devices,
-            getattr(args, 'copy_tile_css_merge', None),
-            getattr(args, 'copy_tile_css_overwrite', None),
-            getattr(args, 'copy_tile_css_replace', None),
-            getattr(args, 'copy_tile_css_add', None),
-            args.clear_tile_css,
-            args.copy_cols, args.copy_rows, args.copy_range,
-            args.merge_cols, args.merge_rows, args.merge_range,
-            args.trim, args.sort, args.scrub_css,
-        ]
-        if any(x for x in forbidden if x):
-            die("--undo_last cannot be combined with other actions. Use -h for help.")
-
-        # Load last-run state (new location). Fall back to legacy CWD file if present.
-        st_path = _state_path()
-        if not os.path.exists(st_path) and os.path.exists("hubitat_tile_mover_last_run.json"):
-            st_path = "hubitat_tile_mover_last_run.json"
-        if not os.path.exists(st_path):
-            die("No last-run state found; nothing to undo.")
-        try:
-            import json as _json
-            with open(st_path, "r", encoding="utf-8") as f:
-                st = _json.load(f)
-        except Exception:
-            die("Last-run state file exists but could not be read. Try re-running your last command, or delete the state file.")
-
-        # Prefer embedded backup object (global last-run) so undo works for file/clipboard imports.
-        obj = st.get("backup_obj")
-        if obj is None:
-            backup_path = st.get("backup_path")
-            # If the user specified a hub output URL this run, try the derived per-dashboard backup path.
-            out_url = None
-            if args.output_to:
-                outs_tmp = parse_output_to_specs(args.output_to)
-                for k, p in outs_tmp:
-                    if k == 'hub' and p:
-                        out_url = p
-                        break
-            if (not backup_path or not os.path.exists(backup_path)) and out_url:
-                cand = _backup_path_for_url(out_url)
-                if os.path.exists(cand):
-                    backup_path = cand
-            if not backup_path or not os.path.exists(backup_path):
-                die("Backup file not found; nothing to undo.")
-            obj = _read_backup(backup_path)
-        kind, full_container, tiles_any = extract_tiles_container(obj, verbose=args.verbose, debug=args.debug)
-        from .jsonio import normalize_tiles_list as _ntl
-        tiles = _ntl(tiles_any, verbose=args.verbose, debug=args.debug)
-
-        # Default outputs to last outputs, unless user provided outputs this run
-        outputs = parse_output_to_specs(args.output_to) if args.output_to else st.get("last_outputs", [("clipboard", None)])
-        # Resolve dashboard URL for hub undo: prefer explicit hub output URL, else last_url.
-        url = None
-        for k, p in outputs:
-            if k == 'hub' and p:
-                url = p
-                break
-        if url is None:
-            url = st.get("last_url")
-        using_hub_output = any((k == "hub") for (k, _) in outputs)
-        if using_hub_output and not url:
-            die("Undo restore requires a dashboard URL (either --output:hub <dashboard_url> or a prior hub run with stored URL).")
-
-        # Output format: for hub output force FULL; otherwise default to kind unless user explicitly requested.
-        output_format = args.output_format or st.get("last_output_format") or kind_to_default_output_format(kind)
-        if using_hub_output:
-            if kind != "full_object":
-                die("Cannot restore to hub because the backup is not FULL dashboard JSON.")
-            output_format = "full"
-
-        out_obj = build_output_object(kind, full_container, tiles, output_format)
-        out_text = dump_json(out_obj, indent=args.indent, minify=args.minify)
-        if not out_text.endswith("\n"):
-            out_text += "\n"
-        non_hub = [(k, p) for (k, p) in outputs if k != "hub"]
-
-        # Safety confirmation: if the dashboard has likely changed since the last run (or if the
-        # backup is "stale"), require explicit confirmation before overwriting via --undo_last.
-        hub_ctx_current = None
-        if using_hub_output:
-            import time as _time
-            import datetime as _dt
-
-            last_url = st.get("last_url")
-            last_saved_hash = st.get("last_hub_saved_hash")
-            st_epoch = st.get("state_written_at_epoch")
-            if st_epoch is None:
-                try:
-                    st_epoch = int(os.path.getmtime(st_path))
-                except Exception:
-                    st_epoch = None
-            now_epoch = int(_time.time())
-            age_sec = (now_epoch - int(st_epoch)) if st_epoch is not None else None
-
-            # Always fetch current hub layout once (needed for POST token/layout_url too).
-            hub_ctx_current, cur_obj = hub_import_layout(url, verbose=args.verbose, debug=args.debug)
-            cur_hash = layout_fingerprint(cur_obj)
-
-            needs_prompt = False
-            reason = None
-
-            # If the user is undoing onto a different dashboard URL than last run, always confirm.
-            if last_url and url and (last_url != url):
-                needs_prompt = True
-                reason = f"target URL differs from last run ({last_url})"
-            else:
-                # If we have a saved fingerprint from the last hub save, confirm when the hub no longer matches.
-                if last_saved_hash and last_url and url and (last_url == url) and (cur_hash != last_saved_hash):
-                    needs_prompt = True
-                    reason = "dashboard layout has changed since your last run"
-                # If enough time has passed since the last run, confirm even if the hash matches.
-                elif age_sec is not None and age_sec >= UNDO_STALE_SECONDS:
-                    needs_prompt = True
-                    reason = f"last run was {int(age_sec // 60)} minute(s) ago"
-                # If we can't determine age/hash context, be conservative.
-                elif (last_saved_hash is None) and (age_sec is None):
-                    needs_prompt = True
-                    reason = "cannot determine when the backup was created"
-
-            if needs_prompt:
-                when_s = st.get("state_written_at")
-                if not when_s and st_epoch is not None:
-                    try:
-                        when_s = _dt.datetime.fromtimestamp(int(st_epoch)).isoformat(sep=" ", timespec="seconds")
-                    except Exception:
-                        when_s = None
-                age_s = "unknown"
-                if age_sec is not None:
-                    mins = int(age_sec // 60)
-                    hrs = int(mins // 60)
-                    if hrs:
-                        age_s = f"{hrs}h {mins % 60}m"
-                    else:
-                        age_s = f"{mins}m"
-
-                details = (
-                    f"Undo will overwrite the dashboard layout at:\n  {url}\n"
-                    f"Backup created: {when_s or 'unknown'} (age {age_s}).\n"
-                    f"Reason: {reason}.\n"
-                )
-                prompt_yes_no_or_die(
-                    args.force,
-                    "Proceed with overwrite?",
-                    what="the dashboard layout",
-                    details=details,
-                    show_details=True,
-                )
-
-        # Proceed with the undo outputs.
-        write_outputs(non_hub, args.newline, out_text)
-        if using_hub_output:
-            assert hub_ctx_current is not None
-            hub_post_layout_with_refresh(url, hub_ctx_current.layout_url, out_obj, verbose=args.verbose, debug=args.debug)
+    return (show_map, map_focus, no_scale, show_ids, show_axes)
+
+
+class _StepPlan(NamedTuple):
+    """One validated set of action switches (a single run, or one --pipeline step)."""
+    args: argparse.Namespace
+    show_map: bool
+    map_focus: str
+    no_scale: bool
+    show_ids: bool
+    show_axes: str
+    list_tiles_spec: Optional[str]
+    do_left: bool
+    do_top: bool
+    has_trim: bool
+    merge_source_kind: Optional[str]
+    merge_source_arg: Optional[str]
+    merge_source_path: str
+    merge_css_source_path: str
+    list_tiles_only: bool
+    view_only: bool
+    col_range: Optional[Tuple[int, int]]
+    row_range: Optional[Tuple[int, int]]
+
+
+# Switches that belong to the whole run and may not appear inside a --pipeline step.
+_PIPELINE_GLOBAL_ONLY = (
+    "--import", "--output", "--output_to", "--output-to", "--output_format", "--output-format",
+    "--output_shape", "--output-shape", "--indent", "--minify", "--newline",
+    "--undo_last", "--undo", "--redo", "--history", "--confirm_keep", "--lock_backup", "--pipeline", "--shell",
+    "--targets", "--jobs", "--per_hub", "--profile", "--profile_out",
+    "-h", "--help", "--help_full", "--version",
+)
 
-        dests = ", ".join([(k if k != "file" else f"file:{p}") for (k, p) in outputs])
-#         from .util import ok as _ok  # removed: avoid local binding
-        import sys as _sys
-        print(f"{ok('OK:')} undo applied. Output written to {dests}.", file=sys.stderr)
-        return
 
+def _load_pipeline_steps(parser, argv: List[str], args, path: str) -> List[argparse.Namespace]:
+    """Parse a --pipeline file into one argparse namespace per step.
 
-    using_hub_import = (import_kind == "hub")
-    using_hub_output = any(k == "hub" for (k, _p) in outputs)
+    Each non-blank line is one step written with the same switches as the command line
+    ('#' starts a comment). Run-level switches given on the command line (--force,
+    --show_map, --css:cleanup, ...) apply to every step.
+    """
+    if _has_requested_action(args):
+        die("--pipeline cannot be combined with action switches on the command line; put every action in the pipeline file.")
+    if args.undo_last or args.undo_steps is not None or args.redo_steps is not None or args.history:
+        die("--pipeline cannot be combined with --undo_last, --undo, --redo or --history.")
+    try:
+        with open(path, "r", encoding="utf-8-sig") as f:
+            lines = f.read().splitlines()
+    except FileNotFoundError:
+        die(f"Pipeline file not found: {path}")
+    except OSError as e:
+        die(f"Unable to read pipeline file: {e}")
+
+    steps: List[argparse.Namespace] = []
+    parser.raise_errors = True
+    try:
+        for line_no, line in enumerate(lines, start=1):
+            try:
+                tokens = split_step_line(line)
+            except ValueError as e:
+                die(f"{path}:{line_no}: {e}")
+            if not tokens:
+                continue
+            for tok in tokens:
+                name = tok.split("=", 1)[0].split(":", 1)[0]
+                if name in _PIPELINE_GLOBAL_ONLY:
+                    die(f"{path}:{line_no}: {tok} is not allowed in a pipeline step; give it on the command line.")
+            tokens = normalize_argv(tokens)
+            try:
+                steps.append(parser.parse_args(argv + tokens))
+            except (StepParseError, argparse.ArgumentTypeError) as e:
+                die(f"{path}:{line_no}: invalid pipeline step: {line.strip()} ({e})")
+    finally:
+        parser.raise_errors = False
+    if not steps:
+        die(f"Pipeline file has no steps: {path}")
+    return steps
+
+
+def _has_requested_action(args) -> bool:
+    """True if any layout action, trim/sort, CSS action, map or report switch was given."""
+    names = (
+        "insert_rows", "insert_cols", "move_cols", "move_rows", "move_range",
+        "copy_cols", "copy_rows", "copy_range", "merge_cols", "merge_rows", "merge_range",
+        "delete_rows", "delete_cols", "clear_rows", "clear_cols", "clear_range",
+        "crop_to_rows", "crop_to_cols", "crop_to_range",
+        "prune_except_ids", "prune_except_devices", "prune_ids", "prune_devices",
+        "copy_tile_css_merge", "copy_tile_css_overwrite", "copy_tile_css_replace", "copy_tile_css_add",
+        "clear_tile_css", "spacing_add", "spacing_set", "trim", "sort", "order",
+        "scrub_css", "compact_css", "list_tiles",
+    )
+    return any(getattr(args, n, None) not in (None, False) for n in names) or bool(
+        getattr(args, "trim_left", False) or getattr(args, "trim_top", False)
+    )
 
-    # Load input JSON (file/clipboard/hub)
-    hub_ctx = None
-    if using_hub_import:
-        if not import_path:
-            die("--import:hub requires a dashboard URL. Use -h for help.")
-        hub_ctx, obj = hub_import_layout(import_path, verbose=args.verbose, debug=args.debug)
-    else:
-        from .io_helpers import read_input_text
-        from .jsonio import load_json_from_text
-        input_text = read_input_text(import_kind, import_path)
-        obj = load_json_from_text(input_text, verbose=args.verbose, debug=args.debug)
 
-    # Keep an immutable copy of the imported JSON for --undo_last.
-    # (The main flow mutates `obj` in-place.)
-    original_obj = _copy.deepcopy(obj)
+def _plan_step(
+    args,
+    *,
+    outputs: List[Tuple[str, Optional[str]]],
+    import_kind: str,
+    import_path: Optional[str],
+    using_hub_import: bool,
+    hub: HubSession,
+) -> _StepPlan:
+    """Validate one set of action switches and resolve what it needs (merge source, ranges, maps)."""
+    show_map, map_focus, no_scale, show_ids, show_axes = _resolve_map_options(args)
+    list_tiles_spec = getattr(args, "list_tiles", None)
 
     # Determine if any operation was requested
     do_left, do_top = _parse_trim_modes(args.trim, getattr(args, "trim_left", False), getattr(args, "trim_top", False))
     has_trim = bool(do_left or do_top)
 
-    deleted_ids: list[int] = []
-    cleared_ids: list[int] = []
-    created_id_map: dict[int, int] = {}
     merge_css_source_path: str = ""
     merge_source_path: str = ""
     from .io_helpers import parse_merge_source_spec
@@ -761,7 +676,7 @@ def main(argv: Optional[List[str]] = None) -> None:
         # Merge from a Hubitat dashboard URL. Fetch the source layout JSON and
         # write it to a temp file so the merge ops (and optional CSS handling)
         # can reuse the same path-based loading flow.
-        _, mobj = hub_import_layout(merge_source_arg, verbose=args.verbose, debug=args.debug)
+        _, mobj = hub.import_layout(merge_source_arg, verbose=args.verbose, debug=args.debug)
         merge_source_path = _write_temp_merge_source(mobj)
         merge_css_source_path = merge_source_path
 
@@ -819,6 +734,18 @@ def main(argv: Optional[List[str]] = None) -> None:
         die("--col_range is only valid with --insert_rows or --delete_rows.")
     if args.row_range and not (args.insert_cols or args.delete_cols):
         die("--row_range is only valid with --insert_cols or --delete_cols.")
+    for name, values, size in (
+        ("--insert:rows", args.insert_rows, 2),
+        ("--insert:cols", args.insert_cols, 2),
+        ("--delete:rows", args.delete_rows, 2),
+        ("--delete:cols", args.delete_cols, 2),
+        (_move_switch(args, "move_cols"), args.move_cols, 3),
+        (_move_switch(args, "move_rows"), args.move_rows, 3),
+        (_move_switch(args, "move_range"), args.move_range, 6),
+    ):
+        _int_groups(name, values, size)
+    if args.copy_range and (len(args.copy_range) < 6 or len(args.copy_range) % 2):
+        die("--copy:range takes SRC_TOP SRC_LEFT SRC_BOTTOM SRC_RIGHT and one or more DEST_TOP DEST_LEFT pairs.")
 
     # Validate conflict policy usage
     if args.skip_overlap and args.allow_overlap:
@@ -882,33 +809,104 @@ def main(argv: Optional[List[str]] = None) -> None:
         vlog(True, f"Debug per-tile: {bool(args.debug)}")
         vlog(True, "====================================")
 
-    # Determine primary hub URL for backup bookkeeping (hub import URL or first hub output URL)
-    hub_url_for_backup = None
-    if using_hub_import and import_path:
-        hub_url_for_backup = import_path
-    else:
-        for k, p in outputs:
-            if k == 'hub' and p:
-                hub_url_for_backup = p
-                break
+    return _StepPlan(
+        args=args,
+        show_map=show_map,
+        map_focus=map_focus,
+        no_scale=no_scale,
+        show_ids=show_ids,
+        show_axes=show_axes,
+        list_tiles_spec=list_tiles_spec,
+        do_left=do_left,
+        do_top=do_top,
+        has_trim=has_trim,
+        merge_source_kind=merge_source_kind,
+        merge_source_arg=merge_source_arg,
+        merge_source_path=merge_source_path,
+        merge_css_source_path=merge_css_source_path,
+        list_tiles_only=list_tiles_only,
+        view_only=view_only,
+        col_range=col_range,
+        row_range=row_range,
+    )
+
+
+def _outcome_overlaps(
+    final_tiles: List[Dict[str, Any]], changed_ids: set
+) -> "Tuple[ConflictModel, Optional[Tuple[int, int, Tuple[int, int, int, int]]]]":
+    """Overlaps between changed/new and unchanged tiles of a step's result.
+
+    Returns the conflict model and the first overlapping pair in layout order as
+    (earlier tile id, later tile id, overlap rect), or None when there is none.
+    """
+    from .conflicts import scan_conflicts
+
+    changed_ix: List[int] = []
+    unchanged_ix: List[int] = []
+    for i, t in enumerate(final_tiles):
+        (changed_ix if as_int(t, "id") in changed_ids else unchanged_ix).append(i)
+    model = scan_conflicts([final_tiles[i] for i in changed_ix], [final_tiles[i] for i in unchanged_ix], tile_rect)
+    if not model:
+        return model, None
+    mi, si, orect = min(model.pairs, key=lambda p: sorted((changed_ix[p[0]], unchanged_ix[p[1]])))
+    i, j = sorted((changed_ix[mi], unchanged_ix[si]))
+    return model, (as_int(final_tiles[i], "id"), as_int(final_tiles[j], "id"), orect)
+
+
+def _apply_step(
+    plan: _StepPlan,
+    obj,
+    *,
+    outputs: List[Tuple[str, Optional[str]]],
+    using_hub_output: bool,
+    in_pipeline: bool = False,
+    final_step: bool = True,
+) -> Optional[Tuple[str, object, List[Dict]]]:
+    """Apply one validated step to the in-memory layout.
+
+    Returns (kind, full_container, final_tiles), or None when a standalone view
+    (--show_map / --list_tiles) already wrote its own output.
+    """
+    from .css_ops import (
+        append_css_fragment,
+        cleanup_css_for_tile_ids,
+        collect_selector_item_bodies,
+        drop_selector_items_by_keys,
+        find_standalone_comment_tile_refs,
+        generate_css_for_id_map,
+        generate_css_for_id_targets,
+        get_custom_css,
+        normalize_css_body,
+        orphan_tile_ids_in_css,
+        process_standalone_comments_for_css_cleared_tiles,
+        remove_selector_items_by_keys,
+        set_custom_css,
+        tile_has_selector_rules,
+        tile_ids_in_css,
+    )
+
+    args = plan.args
+    show_map = plan.show_map
+    map_focus = plan.map_focus
+    no_scale = plan.no_scale
+    show_ids = plan.show_ids
+    show_axes = plan.show_axes
+    list_tiles_spec = plan.list_tiles_spec
+    do_left, do_top, has_trim = plan.do_left, plan.do_top, plan.has_trim
+    merge_source_kind = plan.merge_source_kind
+    merge_source_path = plan.merge_source_path
+    merge_css_source_path = plan.merge_css_source_path
+    list_tiles_only = plan.list_tiles_only
+    view_only = plan.view_only
+    col_range = plan.col_range
+    row_range = plan.row_range
+
+    deleted_ids: list[int] = []
+    cleared_ids: list[int] = []
+    created_id_map: dict[int, int] = {}
+    # Ops that can create several copies of one source tile (multi-destination --copy:range).
+    created_id_targets: dict[int, list[int]] = {}
 
-    backup_path = None
-    backup_obj = None
-    backup_tmp_path = None
-    # Backup is required for hub output and for --confirm_keep (and for hub import, as a restore point).
-    # In standalone map view mode, do not create/overwrite backups.
-    if (not view_only) and hub_url_for_backup and (using_hub_import or using_hub_output or args.confirm_keep) and (not args.undo_last):
-        backup_path = _backup_path_for_url(hub_url_for_backup)
-        if args.lock_backup and os.path.exists(backup_path):
-            # Use existing backup as the restore point and do not overwrite it.
-            backup_obj = _read_backup(backup_path)
-        else:
-            # Write to a temporary file; only commit if the run completes successfully.
-            import tempfile
-            fd, backup_tmp_path = tempfile.mkstemp(prefix="hubitat_tile_mover_backup_", suffix=".json")
-            os.close(fd)
-            _write_backup(backup_tmp_path, obj)
-            backup_obj = _copy.deepcopy(obj)  # immutable snapshot
     kind, full_container, tiles_any = extract_tiles_container(obj, verbose=args.verbose, debug=args.debug)
     if using_hub_output and kind != "full_object":
         die("--output:hub requires FULL layout JSON input (cannot use minimal/bare).")
@@ -944,8 +942,11 @@ def main(argv: Optional[List[str]] = None) -> None:
     ])
     if has_tiles or (not (merge_like or scrub_like or show_map_only)):
         verify_tiles_minimum(tiles_any)
+    if has_tiles:
+        normalize_tiles_list(tiles_any, verbose=args.verbose, debug=args.debug)
     tiles: List[Dict] = tiles_any  # type: ignore[assignment]
-    tiles_before_map = [dict(t) for t in tiles]
+    # Read only before any op runs (maps, view-only output, tile report), so no per-tile copies.
+    tiles_before_map = list(tiles)
     def _span_len(ext):
         return int(ext[1]) - int(ext[0]) + 1
 
@@ -995,6 +996,7 @@ def main(argv: Optional[List[str]] = None) -> None:
                 title = 'BEFORE MAP (TO BE SHIFTED)'
             else:
                 title = 'BEFORE MAP (AFFECTED)'
+        from .map_view import render_tile_map
         print(
             render_tile_map(
                 tiles_before_map,
@@ -1025,9 +1027,12 @@ def main(argv: Optional[List[str]] = None) -> None:
                 )
 
         # Explicit hub output in view-only mode is disallowed (avoid no-op POSTs).
-        if using_hub_output:
+        if using_hub_output and not in_pipeline:
             die("--output:hub requires an action; it is not supported with standalone --show_map.")
 
+        if in_pipeline:
+            return (kind, full_container, tiles)
+
         # If the user explicitly requested non-hub outputs, write the imported JSON unchanged.
         if args.output_to:
             output_obj0 = build_output_object(kind, full_container, tiles_before_map, args.output_format)
@@ -1036,14 +1041,22 @@ def main(argv: Optional[List[str]] = None) -> None:
                 out_text0 += "\n"
             non_hub_outputs0 = [(k, p) for (k, p) in outputs if k != 'hub']
             write_outputs(non_hub_outputs0, args.newline, out_text0)
-        return
+        return None
 
     if list_tiles_only:
-        report_outputs = outputs if args.output_to else [('terminal', None)]
+        # Inside a pipeline (or the shell) the report is a progress view; outputs are reserved for the
+        # final layout, and when that layout goes to stdout the report goes to stderr beside the maps.
+        report_outputs = outputs if (args.output_to and not in_pipeline) else [('terminal', None)]
         _, css_text0 = get_custom_css(obj)
+        from .list_views import render_list_tiles
         tile_report_text = render_list_tiles(tiles_before_map, list_tiles_spec, css_text0 or '')
-        write_outputs(report_outputs, args.newline, tile_report_text)
-        return
+        if in_pipeline and any(k in ('stdout', 'terminal') for k, _p in outputs):
+            print(tile_report_text, end='', file=sys.stderr)
+        else:
+            write_outputs(report_outputs, args.newline, tile_report_text)
+        if in_pipeline:
+            return (kind, full_container, tiles)
+        return None
 
     # Treat tile ids referenced in customCSS as reserved for id assignment (avoids collisions with orphaned CSS).
     css_key_pre, css_text_pre = get_custom_css(obj)
@@ -1053,11 +1066,10 @@ def main(argv: Optional[List[str]] = None) -> None:
 
     # One movement/edit operation (mutually exclusive)
     if args.insert_rows:
-        count, at_row = args.insert_rows
+        from .ops_insert import insert_rows
         insert_rows(
             tiles,
-            count=count,
-            at_row=at_row,
+            inserts=_int_groups("--insert:rows", args.insert_rows),
             include_overlap=_selection_include_partial(args),
             col_range=col_range,
             allow_overlap=args.allow_overlap,
@@ -1069,11 +1081,10 @@ def main(argv: Optional[List[str]] = None) -> None:
         )
 
     elif args.insert_cols:
-        count, at_col = args.insert_cols
+        from .ops_insert import insert_cols
         insert_cols(
             tiles,
-            count=count,
-            at_col=at_col,
+            inserts=_int_groups("--insert:cols", args.insert_cols),
             include_overlap=_selection_include_partial(args),
             row_range=row_range,
             allow_overlap=args.allow_overlap,
@@ -1087,6 +1098,7 @@ def main(argv: Optional[List[str]] = None) -> None:
 
 
     elif getattr(args, "spacing_add", None) is not None:
+        from .ops_spacing import adjust_tile_spacing
         mode, cells = args.spacing_add
         if getattr(args, "verbose", False):
             _before_pos = {t.get("id"): (t.get("row"), t.get("col")) for t in tiles}
@@ -1103,6 +1115,7 @@ def main(argv: Optional[List[str]] = None) -> None:
             ilog(f"--spacing_add:{mode} {cells}: shifted {_changed} tile(s).")
 
     elif getattr(args, "spacing_set", None) is not None:
+        from .ops_spacing import set_tile_spacing
         mode, gap = args.spacing_set
         mode = str(mode)
         gap = int(gap)
@@ -1124,28 +1137,30 @@ def main(argv: Optional[List[str]] = None) -> None:
             mode=mode,
         )
         # Defensive: ensure axis-only modes do not alter the other axis, regardless of ops implementation.
+        from .fingerprint import invalidate_tile_leaf
+
         if _cols_snapshot is not None:
             for t in tiles:
                 tid = t.get("id")
                 if tid in _cols_snapshot:
                     t["col"] = _cols_snapshot[tid]
+                    invalidate_tile_leaf(t)
         if _rows_snapshot is not None:
             for t in tiles:
                 tid = t.get("id")
                 if tid in _rows_snapshot:
                     t["row"] = _rows_snapshot[tid]
+                    invalidate_tile_leaf(t)
         if getattr(args, "verbose", False):
             _after_pos = {t.get("id"): (t.get("row"), t.get("col")) for t in tiles}
             _changed = sum(1 for k, v in _after_pos.items() if _before_pos.get(k) != v)
             ilog(f"--spacing_set:{mode} {gap}: shifted {_changed} tile(s).")
 
     elif args.move_cols:
-        s, e, d = args.move_cols
+        from .ops_move import move_cols
         move_cols(
             tiles,
-            start_col=s,
-            end_col=e,
-            dest_start_col=d,
+            moves=_int_groups(_move_switch(args, "move_cols"), args.move_cols, 3),
             include_overlap=_selection_include_partial(args),
             allow_overlap=args.allow_overlap,
             skip_overlap=args.skip_overlap,
@@ -1155,15 +1170,14 @@ def main(argv: Optional[List[str]] = None) -> None:
             show_axes=show_axes,
             verbose=args.verbose,
             debug=args.debug,
+            switch=_move_switch(args, "move_cols"),
         )
 
     elif args.move_rows:
-        s, e, d = args.move_rows
+        from .ops_move import move_rows
         move_rows(
             tiles,
-            start_row=s,
-            end_row=e,
-            dest_start_row=d,
+            moves=_int_groups(_move_switch(args, "move_rows"), args.move_rows, 3),
             include_overlap=_selection_include_partial(args),
             allow_overlap=args.allow_overlap,
             skip_overlap=args.skip_overlap,
@@ -1173,18 +1187,14 @@ def main(argv: Optional[List[str]] = None) -> None:
             show_axes=show_axes,
             verbose=args.verbose,
             debug=args.debug,
+            switch=_move_switch(args, "move_rows"),
         )
 
     elif args.move_range:
-        r1, c1, r2, c2, dr, dc = args.move_range
+        from .ops_move import move_range
         move_range(
             tiles,
-            src_top_row=r1,
-            src_left_col=c1,
-            src_bottom_row=r2,
-            src_right_col=c2,
-            dest_top_row=dr,
-            dest_left_col=dc,
+            moves=_int_groups(_move_switch(args, "move_range"), args.move_range, 6),
             include_overlap=_selection_include_partial(args),
             allow_overlap=args.allow_overlap,
             skip_overlap=args.skip_overlap,
@@ -1194,10 +1204,12 @@ def main(argv: Optional[List[str]] = None) -> None:
             show_axes=show_axes,
             verbose=args.verbose,
             debug=args.debug,
+            switch=_move_switch(args, "move_range"),
         )
 
 
     elif args.copy_cols:
+        from .ops_copy import copy_cols
         s, e, d = args.copy_cols
         created_id_map = copy_cols(
             tiles,
@@ -1217,6 +1229,7 @@ def main(argv: Optional[List[str]] = None) -> None:
         )
 
     elif args.copy_rows:
+        from .ops_copy import copy_rows
         s, e, d = args.copy_rows
         created_id_map = copy_rows(
             tiles,
@@ -1236,15 +1249,15 @@ def main(argv: Optional[List[str]] = None) -> None:
         )
 
     elif args.copy_range:
-        r1, c1, r2, c2, dr, dc = args.copy_range
-        created_id_map = copy_range(
+        from .ops_copy import copy_range
+        r1, c1, r2, c2 = args.copy_range[:4]
+        created_id_targets = copy_range(
             tiles,
             src_top_row=r1,
             src_left_col=c1,
             src_bottom_row=r2,
             src_right_col=c2,
-            dest_top_row=dr,
-            dest_left_col=dc,
+            dests=_int_groups("--copy:range destinations", args.copy_range[4:]),
             include_overlap=_selection_include_partial(args),
             allow_overlap=args.allow_overlap,
             skip_overlap=args.skip_overlap,
@@ -1258,6 +1271,7 @@ def main(argv: Optional[List[str]] = None) -> None:
         )
 
     elif args.merge_cols:
+        from .ops_merge import merge_cols
         s, e, d = args.merge_cols
         created_id_map = merge_cols(
             tiles,
@@ -1280,6 +1294,7 @@ def main(argv: Optional[List[str]] = None) -> None:
 
 
     elif args.merge_rows:
+        from .ops_merge import merge_rows
         s, e, d = args.merge_rows
         created_id_map = merge_rows(
             tiles,
@@ -1302,6 +1317,7 @@ def main(argv: Optional[List[str]] = None) -> None:
 
 
     elif args.merge_range:
+        from .ops_merge import merge_range
         r1, c1, r2, c2, dr, dc = args.merge_range
         created_id_map = merge_range(
             tiles,
@@ -1327,11 +1343,10 @@ def main(argv: Optional[List[str]] = None) -> None:
 
 
     elif args.delete_rows:
-        s, e = args.delete_rows
+        from .ops_delete import delete_rows
         deleted_ids = delete_rows(
             tiles,
-            start_row=s,
-            end_row=e,
+            bands=_int_groups("--delete:rows", args.delete_rows),
             include_overlap=_selection_include_partial(args),
             col_range=col_range,
             force=args.force,
@@ -1345,11 +1360,10 @@ def main(argv: Optional[List[str]] = None) -> None:
         )
 
     elif args.delete_cols:
-        s, e = args.delete_cols
+        from .ops_delete import delete_cols
         deleted_ids = delete_cols(
             tiles,
-            start_col=s,
-            end_col=e,
+            bands=_int_groups("--delete:cols", args.delete_cols),
             include_overlap=_selection_include_partial(args),
             row_range=row_range,
             force=args.force,
@@ -1363,6 +1377,7 @@ def main(argv: Optional[List[str]] = None) -> None:
         )
 
     elif args.clear_rows:
+        from .ops_clear import clear_rows
         s, e = args.clear_rows
         cleared_ids = clear_rows(
             tiles,
@@ -1375,6 +1390,7 @@ def main(argv: Optional[List[str]] = None) -> None:
         )
 
     elif args.clear_cols:
+        from .ops_clear import clear_cols
         s, e = args.clear_cols
         cleared_ids = clear_cols(
             tiles,
@@ -1387,6 +1403,7 @@ def main(argv: Optional[List[str]] = None) -> None:
         )
 
     elif args.clear_range:
+        from .ops_clear import clear_range
         tr, lc, br, rc = args.clear_range
         cleared_ids = clear_range(
             tiles,
@@ -1401,6 +1418,7 @@ def main(argv: Optional[List[str]] = None) -> None:
         )
 
     elif args.crop_to_rows:
+        from .ops_crop import crop_to_rows
         s, e = args.crop_to_rows
         deleted_ids = crop_to_rows(
             tiles,
@@ -1413,6 +1431,7 @@ def main(argv: Optional[List[str]] = None) -> None:
         )
 
     elif args.crop_to_cols:
+        from .ops_crop import crop_to_cols
         s, e = args.crop_to_cols
         deleted_ids = crop_to_cols(
             tiles,
@@ -1425,6 +1444,7 @@ def main(argv: Optional[List[str]] = None) -> None:
         )
 
     elif args.crop_to_range:
+        from .ops_crop import crop_to_range
         tr, lc, br, rc = args.crop_to_range
         deleted_ids = crop_to_range(
             tiles,
@@ -1439,6 +1459,7 @@ def main(argv: Optional[List[str]] = None) -> None:
         )
 
     elif args.prune_except_ids:
+        from .ops_crop import prune_except_ids
         deleted_ids = prune_except_ids(
             tiles,
             ids_csv=args.prune_except_ids,
@@ -1448,6 +1469,7 @@ def main(argv: Optional[List[str]] = None) -> None:
         )
 
     elif args.prune_except_devices:
+        from .ops_crop import prune_except_devices
         deleted_ids = prune_except_devices(
             tiles,
             devices_csv=args.prune_except_devices,
@@ -1457,6 +1479,7 @@ def main(argv: Optional[List[str]] = None) -> None:
         )
 
     elif args.prune_ids:
+        from .ops_crop import prune_ids
         deleted_ids = prune_ids(
             tiles,
             ids_csv=args.prune_ids,
@@ -1466,6 +1489,7 @@ def main(argv: Optional[List[str]] = None) -> None:
         )
 
     elif args.prune_devices:
+        from .ops_crop import prune_devices
         deleted_ids = prune_devices(
             tiles,
             devices_csv=args.prune_devices,
@@ -1518,13 +1542,13 @@ def main(argv: Optional[List[str]] = None) -> None:
         else:
             if copy_mode == 'replace':
                 css_text2 = cleanup_css_for_tile_ids(css_text, [to_id])
-                css_text2 = css_text2.rstrip() + "\n\n" + frag.strip() + "\n"
+                css_text2 = append_css_fragment(css_text2, frag)
                 css_text = css_text2
                 set_custom_css(obj, css_key, css_text)
 
             elif copy_mode == 'add':
                 # Add everything regardless of conflicts.
-                css_text2 = css_text.rstrip() + "\n\n" + frag.strip() + "\n"
+                css_text2 = append_css_fragment(css_text, frag)
                 css_text = css_text2
                 set_custom_css(obj, css_key, css_text)
 
@@ -1588,7 +1612,7 @@ def main(argv: Optional[List[str]] = None) -> None:
                     css_text2 = css_text
                     if keys_to_remove:
                         css_text2 = remove_selector_items_by_keys(css_text2, keys_to_remove)
-                    css_text2 = css_text2.rstrip() + "\n\n" + frag2.strip() + "\n"
+                    css_text2 = append_css_fragment(css_text2, frag2)
                     css_text = css_text2
                     set_custom_css(obj, css_key, css_text)
 
@@ -1604,6 +1628,7 @@ def main(argv: Optional[List[str]] = None) -> None:
 
         # Parse using the same syntax as --prune:ids (comma list, ranges, comparisons).
         # Comparisons are bounded to the highest tile id present in the current layout.
+        from .ops_crop import parse_prune_id_spec
         matched = parse_prune_id_spec(spec, tiles, op_label="--clear_css")
         target_ids = sorted(int(i) for i in matched if int(i) in existing_ids)
 
@@ -1686,24 +1711,27 @@ def main(argv: Optional[List[str]] = None) -> None:
 
         set_custom_css(obj, css_key, css_text)
 
-    if (not args.ignore_css) and css_key is not None and created_id_map:
+    if created_id_map and not created_id_targets:
+        created_id_targets = {old: [new] for old, new in created_id_map.items()}
+    if (not args.ignore_css) and css_key is not None and created_id_targets:
         source_css = css_text
         if merge_css_source_path:
             try:
-                import json
+                from .jsoncodec import loads as _json_loads
                 with open(merge_css_source_path, "r", encoding="utf-8") as f:
-                    mo = json.load(f)
+                    mo = _json_loads(f.read())
                 _, source_css = get_custom_css(mo)
             except Exception:
                 source_css = css_text
 
-        frag = generate_css_for_id_map(source_css or "", created_id_map, dest_css=css_text or "")
+        frag = generate_css_for_id_targets(source_css or "", created_id_targets, dest_css=css_text or "")
         if frag.strip():
-            css_text = (css_text or "").rstrip() + "\n\n" + frag.strip() + "\n"
+            css_text = append_css_fragment(css_text or "", frag)
             set_custom_css(obj, css_key, css_text)
 
     # Trim AFTER movement but BEFORE sort (can be used alone too)
     if has_trim:
+        from .ops_trim import trim_tiles
         trim_tiles(tiles, do_left=do_left, do_top=do_top, debug=args.debug)
 
     # Legacy: map hidden --order to --sort_json if needed.
@@ -1726,45 +1754,30 @@ def main(argv: Optional[List[str]] = None) -> None:
     }
     changed_ids = {tid for tid, apos in after_pos.items() if before_pos.get(tid) != apos}
 
-    # Backstop overlap detector: find the first overlap pair between a changed/new tile
-    # and an unchanged tile. Overlaps *within* the moved/copied/merged set are allowed
-    # (e.g., already-overlapped source tiles should remain overlapped after move/copy).
-    def _first_overlap_changed_vs_unchanged(ts: List[Dict[str, Any]]) -> Tuple[int, int, Tuple[int, int, int, int]] | None:
-        rects = [(as_int(t, "id"), tile_rect(t)) for t in ts]
-        n = len(rects)
-        for i in range(n):
-            id1, r1 = rects[i]
-            for j in range(i + 1, n):
-                id2, r2 = rects[j]
-                # Only detect overlaps where exactly one tile is changed/new.
-                if (id1 in changed_ids) == (id2 in changed_ids):
-                    continue
-                if rects_overlap(r1, r2):
-                    or1 = max(r1[0], r2[0])
-                    or2 = min(r1[1], r2[1])
-                    oc1 = max(r1[2], r2[2])
-                    oc2 = min(r1[3], r2[3])
-                    return id1, id2, (or1, or2, oc1, oc2)
-        return None
+    # Strict overlap guard (extra safety): for move/copy/merge in strict mode, ensure the result has no overlaps
+    # involving any changed tile. (Pre-flight checks should normally prevent this; this is a backstop.)
+    overlap_ops = bool(
+        args.move_cols
+        or args.move_rows
+        or args.move_range
+        or args.copy_cols
+        or args.copy_rows
+        or args.copy_range
+        or args.merge_cols
+        or args.merge_rows
+        or args.merge_range
+    )
+    strict_overlap = overlap_ops and (not args.allow_overlap) and (not args.skip_overlap)
+    # One indexed scan of changed/new tiles against unchanged ones serves both the outcome map
+    # and the backstop. Overlaps *within* the moved/copied/merged set are allowed (e.g.,
+    # already-overlapped source tiles should remain overlapped after move/copy).
+    outcome = _outcome_overlaps(final_tiles, changed_ids) if changed_ids and (show_map or strict_overlap) else None
 
     if show_map:
-        conflict_rects: List[Tuple[int, int, int, int]] = []
-        if changed_ids:
-            changed_tiles = [t for t in final_tiles if as_int(t, "id") in changed_ids]
-            unchanged_tiles = [t for t in final_tiles if as_int(t, "id") not in changed_ids]
-            for mt in changed_tiles:
-                mrect = tile_rect(mt)
-                for st in unchanged_tiles:
-                    srect = tile_rect(st)
-                    if rects_overlap(mrect, srect):
-                        or1 = max(mrect[0], srect[0])
-                        or2 = min(mrect[1], srect[1])
-                        oc1 = max(mrect[2], srect[2])
-                        oc2 = min(mrect[3], srect[3])
-                        conflict_rects.append((or1, or2, oc1, oc2))
-
+        conflict_rects = outcome[0].overlap_rects if outcome is not None else []
         focus_color = "yellow" if getattr(args, "allow_overlap", False) else "red"
         outcome_no_scale = no_scale or bool(conflict_rects)
+        from .map_view import render_tile_map
         print(
             render_tile_map(
                 final_tiles,
@@ -1795,7 +1808,7 @@ def main(argv: Optional[List[str]] = None) -> None:
             )
             css_text2 = cleanup_css_for_tile_ids(css_text2, list(orphans))
             set_custom_css(obj, css_key, css_text2)
-        elif orphans and not args.quiet:
+        elif orphans and not args.quiet and final_step:
 #             from .util import wlog, format_id_sample  # removed: avoid local binding
 
             wlog(
@@ -1811,24 +1824,12 @@ def main(argv: Optional[List[str]] = None) -> None:
                 css_text2 = css_compact
                 set_custom_css(obj, css_key, css_text2)
 
-    # Strict overlap guard (extra safety): for move/copy/merge in strict mode, ensure the result has no overlaps
-    # involving any changed tile. (Pre-flight checks should normally prevent this; this is a backstop.)
-    overlap_ops = bool(
-        args.move_cols
-        or args.move_rows
-        or args.move_range
-        or args.copy_cols
-        or args.copy_rows
-        or args.copy_range
-        or args.merge_cols
-        or args.merge_rows
-        or args.merge_range
-    )
-    if overlap_ops and (not args.allow_overlap) and (not args.skip_overlap):
-        ov = _first_overlap_changed_vs_unchanged(final_tiles)
+    if strict_overlap and outcome is not None:
+        ov = outcome[1]
         if ov is not None:
             id1, id2, orect = ov
             if show_map:
+                from .map_view import render_tile_map
                 print(
                     render_tile_map(
                         final_tiles,
@@ -1847,6 +1848,667 @@ def main(argv: Optional[List[str]] = None) -> None:
                 "Re-run with --overlaps:allow or --overlaps:skip."
             )
 
+    # Later pipeline steps (and the final output) see the post-sort tile order.
+    if final_tiles is not tiles:
+        tiles[:] = final_tiles
+    return (kind, full_container, final_tiles)
+
+
+def _restore_layout(
+    args,
+    hub: "HubSession",
+    obj: object,
+    *,
+    default_outputs: List[Tuple[str, Optional[str]]],
+    last_url: Optional[str],
+    last_output_format: Optional[str],
+    saved_fingerprint: Optional[str],
+    saved_at_epoch: Optional[int],
+    saved_at: Optional[str],
+) -> str:
+    """Write a restored layout (--undo_last, --undo:N, --redo) to the outputs; returns the destinations text.
+
+    Outputs default to the restored run's outputs unless --output is given. Before a hub
+    layout is overwritten, confirm when the URL differs from last_url, the hub no longer
+    holds saved_fingerprint, or the restore point is older than UNDO_STALE_SECONDS.
+    """
+    kind, full_container, tiles_any = extract_tiles_container(obj, verbose=args.verbose, debug=args.debug)
+    from .jsonio import normalize_tiles_list as _ntl
+    tiles = _ntl(tiles_any, verbose=args.verbose, debug=args.debug)
+
+    # Default outputs to last outputs, unless user provided outputs this run
+    outputs = parse_output_to_specs(args.output_to) if args.output_to else default_outputs
+    # Resolve dashboard URL for hub undo: prefer explicit hub output URL, else last_url.
+    url = None
+    for k, p in outputs:
+        if k == 'hub' and p:
+            url = p
+            break
+    if url is None:
+        url = last_url
+    using_hub_output = any((k == "hub") for (k, _) in outputs)
+    if using_hub_output and not url:
+        die("Undo restore requires a dashboard URL (either --output:hub <dashboard_url> or a prior hub run with stored URL).")
+
+    # Output format: for hub output force FULL; otherwise default to kind unless user explicitly requested.
+    output_format = args.output_format or last_output_format or kind_to_default_output_format(kind)
+    if using_hub_output:
+        if kind != "full_object":
+            die("Cannot restore to hub because the backup is not FULL dashboard JSON.")
+        output_format = "full"
+
+    out_obj = build_output_object(kind, full_container, tiles, output_format)
+    out_text = dump_json(out_obj, indent=args.indent, minify=args.minify)
+    if not out_text.endswith("\n"):
+        out_text += "\n"
+    non_hub = [(k, p) for (k, p) in outputs if k != "hub"]
+
+    # Safety confirmation: if the dashboard has likely changed since the last run (or if the
+    # backup is "stale"), require explicit confirmation before overwriting it.
+    if using_hub_output:
+        import time as _time
+        import datetime as _dt
+
+        now_epoch = int(_time.time())
+        age_sec = (now_epoch - int(saved_at_epoch)) if saved_at_epoch is not None else None
+
+        # Always fetch current hub layout once (the POST below reuses its token and connection).
+        _hub_ctx_current, cur_obj = hub.import_layout(url, verbose=args.verbose, debug=args.debug)
+        from .fingerprint import saved_fingerprint_matches
+
+        needs_prompt = False
+        reason = None
+
+        # If the user is undoing onto a different dashboard URL than last run, always confirm.
+        if last_url and url and (last_url != url):
+            needs_prompt = True
+            reason = f"target URL differs from last run ({last_url})"
+        else:
+            # If we have a saved fingerprint from the last hub save, confirm when the hub no longer matches.
+            if saved_fingerprint and last_url and url and (last_url == url) and not saved_fingerprint_matches(saved_fingerprint, cur_obj):
+                needs_prompt = True
+                reason = "dashboard layout has changed since your last run"
+            # If enough time has passed since the last run, confirm even if the hash matches.
+            elif age_sec is not None and age_sec >= UNDO_STALE_SECONDS:
+                needs_prompt = True
+                reason = f"last run was {int(age_sec // 60)} minute(s) ago"
+            # If we can't determine age/hash context, be conservative.
+            elif (saved_fingerprint is None) and (age_sec is None):
+                needs_prompt = True
+                reason = "cannot determine when the backup was created"
+
+        if needs_prompt:
+            when_s = saved_at
+            if not when_s and saved_at_epoch is not None:
+                try:
+                    when_s = _dt.datetime.fromtimestamp(int(saved_at_epoch)).isoformat(sep=" ", timespec="seconds")
+                except Exception:
+                    when_s = None
+            age_s = "unknown"
+            if age_sec is not None:
+                mins = int(age_sec // 60)
+                hrs = int(mins // 60)
+                if hrs:
+                    age_s = f"{hrs}h {mins % 60}m"
+                else:
+                    age_s = f"{mins}m"
+
+            details = (
+                f"Undo will overwrite the dashboard layout at:\n  {url}\n"
+                f"Backup created: {when_s or 'unknown'} (age {age_s}).\n"
+                f"Reason: {reason}.\n"
+            )
+            prompt_yes_no_or_die(
+                args.force,
+                "Proceed with overwrite?",
+                what="the dashboard layout",
+                details=details,
+                show_details=True,
+            )
+
+    # Proceed with the undo outputs.
+    write_outputs(non_hub, args.newline, out_text)
+    if using_hub_output:
+        hub.post_layout(url, out_obj, verbose=args.verbose, debug=args.debug)
+
+    return ", ".join([(k if k != "file" else f"file:{p}") for (k, p) in outputs])
+
+
+def _restore_from_history(args, hub: "HubSession") -> None:
+    """--undo[:N] / --redo[:N]: move the undo history cursor and write the layout found there."""
+    import time as _time
+
+    store = _history_store()
+    idx = store.load_index()
+    entries, cursor = idx["entries"], idx["cursor"]
+    if args.undo_steps is not None:
+        n = args.undo_steps
+        if n < 1:
+            die("--undo:N requires N >= 1.")
+        if n > cursor:
+            die("Nothing to undo in the undo history." if not cursor else f"Only {cursor} step(s) can be undone (see --history).")
+        steps = entries[cursor - n:cursor]
+        new_cursor, target, label = cursor - n, steps[0]["before"], "undo"
+    else:
+        n = args.redo_steps
+        if n < 1:
+            die("--redo:N requires N >= 1.")
+        avail = len(entries) - cursor
+        if n > avail:
+            die("Nothing to redo in the undo history." if not avail else f"Only {avail} step(s) can be redone (see --history).")
+        steps = entries[cursor:cursor + n]
+        new_cursor, target, label = cursor + n, steps[-1]["after"], "redo"
+
+    # The steps' outputs hold the layout being replaced; they must all be the same destination.
+    dest_keys = {(e.get("url"), tuple(tuple(o) for o in (e.get("outputs") or []))) for e in steps}
+    if len(dest_keys) > 1 and not args.output_to:
+        die(f"--{label}:{n} spans runs written to different outputs; {label} fewer steps, or give --output.")
+    snap = store.get(target)
+    if snap is None:
+        die("The undo history snapshot for that step is missing; see --history.")
+    ref = steps[-1]
+    dests = _restore_layout(
+        args, hub, snap.load(),
+        default_outputs=ref.get("outputs") or [("clipboard", None)],
+        last_url=ref.get("url"),
+        last_output_format=ref.get("output_format"),
+        saved_fingerprint=store.current_root(idx),
+        saved_at_epoch=idx.get("cursor_at"),
+        saved_at=None,
+    )
+    idx["cursor"] = new_cursor
+    idx["cursor_at"] = int(_time.time())
+    store.save_index(idx)
+    print(f"{ok('OK:')} {label} applied ({n} step(s); history at {new_cursor} of {len(entries)}). Output written to {dests}.", file=sys.stderr)
+
+
+def _run_shell(
+    parser,
+    argv: List[str],
+    args,
+    obj: object,
+    *,
+    snap: "LayoutSnapshot",
+    fp: Optional["LayoutFingerprint"],
+    import_kind: str,
+    import_path: Optional[str],
+    outputs: List[Tuple[str, Optional[str]]],
+    hub: "HubSession",
+) -> None:
+    """--shell: keep the imported layout in memory and run commands against it until quit."""
+    from .fingerprint import fingerprint_layout
+    from .shell import LayoutShell
+    from .snapshot import LayoutSnapshot
+
+    using_hub_import = import_kind == "hub"
+    using_hub_output = any(k == "hub" for (k, _p) in outputs)
+    # The layout as last written (or imported): the "before" of the next write's undo history step.
+    saved = {"snap": snap, "fp": fp}
+    backups_written: set = set()
+
+    def step(obj: object, tokens: List[str]) -> bool:
+        for tok in tokens:
+            name = tok.split("=", 1)[0].split(":", 1)[0]
+            if name in _PIPELINE_GLOBAL_ONLY:
+                die(f"{tok} is not available as a shell command; use write [--output:...] to write the layout.")
+        step_args = parser.parse_args(argv + normalize_argv(tokens))
+        plan = _plan_step(
+            step_args,
+            outputs=outputs,
+            import_kind=import_kind,
+            import_path=import_path,
+            using_hub_import=using_hub_import,
+            hub=hub,
+        )
+        if plan.view_only or plan.list_tiles_only:
+            _apply_step(plan, obj, outputs=outputs, using_hub_output=using_hub_output, in_pipeline=True)
+            return False
+        fp0 = fingerprint_layout(obj)
+        _kind, _container, final_tiles = _apply_step(plan, obj, outputs=outputs, using_hub_output=using_hub_output, in_pipeline=True)
+        fp1 = fingerprint_layout(obj)
+        changed, removed = fp0.diff(fp1)
+        if not args.quiet:
+            bits = [f"{len(changed)} changed"] + ([f"{len(removed)} removed"] if removed else [])
+            print(f"{ok('OK:')} {len(final_tiles)} tile(s) ({', '.join(bits)}; not written yet).", file=sys.stderr)
+        return fp1.root != fp0.root
+
+    def write(obj: object, tokens: List[str]) -> None:
+        outs = outputs
+        if tokens:
+            for tok in tokens:
+                if tok.startswith("-") and not tok.startswith("--output"):
+                    die(f"write takes output switches only (--output:...), not {tok}.")
+            outs = parse_output_to_specs(parser.parse_args(normalize_argv(tokens)).output_to)
+            if using_hub_import:
+                outs = [(k, (import_path if (k == "hub" and p is None) else p)) for (k, p) in outs]
+            if any(k == "hub" and p is None for (k, p) in outs):
+                die("--output:hub requires a dashboard URL unless importing from hub with --import:hub <dashboard_url>.")
+        hub_out_url = next((p for (k, p) in outs if k == "hub"), None)
+
+        kind, full_container, tiles_any = extract_tiles_container(obj, verbose=args.verbose, debug=args.debug)
+        tiles = normalize_tiles_list(tiles_any, verbose=args.verbose, debug=args.debug)
+        output_format = args.output_format
+        if hub_out_url:
+            if kind != "full_object":
+                die("--output:hub requires FULL layout JSON input (cannot use minimal/bare).")
+            output_format = "full"
+        output_obj = build_output_object(kind, full_container, tiles, output_format)
+        out_text = dump_json(output_obj, indent=args.indent, minify=args.minify)
+        if not out_text.endswith("\n"):
+            out_text += "\n"
+        write_outputs([(k, p) for (k, p) in outs if k != "hub"], args.newline, out_text)
+
+        backup_path = None
+        if hub_out_url:
+            hub.post_layout(hub_out_url, output_obj, verbose=args.verbose, debug=args.debug)
+            # Like a normal run, keep the dashboard's layout from before the first change as its backup.
+            backup_path = _backup_path_for_url(hub_out_url)
+            if backup_path not in backups_written and not (args.lock_backup and os.path.exists(backup_path)):
+                _write_backup(backup_path, snap.load())
+            backups_written.add(backup_path)
+
+        try:
+            fp_out = fingerprint_layout(output_obj)
+        except Exception:
+            fp_out = None
+        if fp_out is None or saved["fp"] is None or fp_out.root != saved["fp"].root:
+            _record_last_run(
+                args,
+                before=saved["snap"],
+                fp_before=saved["fp"],
+                fp_after=fp_out,
+                out_text=out_text,
+                outputs=outs,
+                url=hub_out_url or (import_path if using_hub_import else None),
+                backup_path=backup_path,
+                import_kind=import_kind,
+                posted=bool(hub_out_url),
+            )
+        saved["snap"], saved["fp"] = LayoutSnapshot(out_text), fp_out
+        dests = ", ".join([f"{k}" if k != "file" else f"file:{p}" for k, p in outs])
+        print(f"{ok('OK:')} {len(tiles)} tile(s) written to {dests}.", file=sys.stderr)
+
+    def reload() -> object:
+        if using_hub_import:
+            ctx, new_obj = hub.import_layout(import_path, verbose=args.verbose, debug=args.debug)
+            text = ctx.layout_text
+        else:
+            text = read_input_text(import_kind, import_path)
+            new_obj = load_json_from_text(text, verbose=args.verbose, debug=args.debug)
+        saved["snap"] = LayoutSnapshot(text) if text else LayoutSnapshot.of(new_obj)
+        saved["fp"] = fingerprint_layout(new_obj)
+        return new_obj
+
+    LayoutShell(obj, step=step, write=write, reload=reload).run()
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    try:
+        with tile_cache_scope():
+            _run(argv)
+    finally:
+        # --profile: report even when the run stops early (die / view-only return).
+        finish_profile()
+
+
+def _targets_sub_argv(argv: List[str]) -> List[str]:
+    """Normalized argv with the multi-target switches removed (shared by every dashboard run)."""
+    out: List[str] = []
+    i = 0
+    while i < len(argv):
+        a = argv[i]
+        if a == "--targets":
+            i += 1
+            while i < len(argv) and not argv[i].startswith("--"):
+                i += 1
+            continue
+        if a in ("--jobs", "--per_hub"):
+            i += 2
+            continue
+        if a.startswith("--jobs=") or a.startswith("--per_hub="):
+            i += 1
+            continue
+        out.append(a)
+        i += 1
+    return out
+
+
+def _run_targets(argv: List[str], args) -> None:
+    """--targets: run the same actions against many dashboards (hub import -> hub output each)."""
+    from .io_helpers import parse_targets_spec
+    from .targets import print_target_summary, run_targets
+
+    urls: List[str] = []
+    for u in parse_targets_spec(args.targets):
+        if u not in urls:
+            urls.append(u)
+    if not urls:
+        die("--targets did not name any dashboard URLs.")
+    if args.import_spec is not None or args.output_to is not None:
+        die("--targets imports from and saves to each dashboard; do not combine it with --import or --output.")
+    if args.undo_last or args.confirm_keep or args.undo_steps is not None or args.redo_steps is not None or args.history or args.shell:
+        die("--targets cannot be combined with --undo_last, --undo, --redo, --history, --confirm_keep or --shell.")
+    if not (_has_requested_action(args) or getattr(args, "pipeline", None) or _resolve_map_options(args)[0]):
+        die("--targets requires an action (or --pipeline) to run against each dashboard.")
+    if not args.force:
+        die("--targets runs dashboards in parallel and cannot prompt for each one. Re-run with --force to proceed.")
+    if args.jobs < 1 or args.per_hub < 1:
+        die("--jobs and --per_hub must be >= 1.")
+    seen_backups: dict = {}
+    for u in urls:
+        bp = _backup_path_for_url(u)
+        if bp in seen_backups:
+            die(f"--targets entries share one backup file (same hub and dashboard id): {seen_backups[bp]} and {u}")
+        seen_backups[bp] = u
+
+    sub_argv = _targets_sub_argv(argv)
+    from .hubio import HubSession
+    hub = HubSession(max_per_host=args.per_hub)
+    vlog(args.verbose, f"Targets: {len(urls)} dashboard(s), jobs={args.jobs}, per_hub={args.per_hub}")
+    try:
+        results = run_targets(
+            urls,
+            lambda url: _run_target(sub_argv + ["--import", "hub", url, "--output_to", "hub"], hub),
+            jobs=min(args.jobs, len(urls)),
+            debug=args.debug,
+            backup_path_for=_backup_path_for_url,
+        )
+    finally:
+        hub.close()
+    print_target_summary(results)
+    if any(not r.ok for r in results):
+        raise SystemExit(2)
+
+
+def _run_target(argv: List[str], hub: "HubSession") -> None:
+    """One --targets dashboard, with tile caches of its own that go away when it is done."""
+    with tile_cache_scope():
+        _run(argv, hub=hub, fan_out=True)
+
+
+def _run(argv: Optional[List[str]] = None, *, hub: Optional[HubSession] = None, fan_out: bool = False) -> None:
+    import sys as _sys
+
+    did_undo = False
+    if argv is None:
+        argv = _sys.argv[1:]
+
+    argv = normalize_argv(argv)
+
+    # If invoked with no switches/args, show very brief help instead of attempting to parse input.
+    if not argv:
+        p = build_parser()
+        p.print_brief_help()
+        return
+
+
+    # Guard singletons (track legacy tokens too)
+    assert_singleton_flags(argv, ["--import"])
+    assert_singleton_flags(argv, ["--output_format", "--output-format", "--output_shape", "--output-shape"])
+    assert_singleton_flags(argv, ["--pipeline"])
+    assert_singleton_flags(argv, ["--targets"])
+
+    t_parse = time.perf_counter()
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if getattr(args, "profile", None) and not fan_out:
+        enable_profile(args.profile, getattr(args, "profile_out", None)).add("cli.parse", t_parse, time.perf_counter() - t_parse)
+
+    if getattr(args, "targets", None):
+        if fan_out:
+            die("--targets cannot be used inside a --targets run.")
+        return _run_targets(argv, args)
+
+    # Option sanity checks
+    if getattr(args, "select_include_partial", False) and (getattr(args, "spacing_add", None) is not None or getattr(args, "spacing_set", None) is not None):
+        die("ERROR: --select:include_partial is not valid with --spacing_add:* or --spacing_set:*. The current spacing overlap-group behavior still uses legacy --include_overlap.")
+    if getattr(args, "remove_overlap", False) and _spacing_include_overlap(args):
+        die("ERROR: --overlaps:remove and legacy --include_overlap cannot be used together.")
+
+    # --overlaps:remove scope: only valid with --spacing_set:*
+    if getattr(args, "remove_overlap", False) and getattr(args, "spacing_set", None) is None:
+        die("ERROR: --overlaps:remove is only valid with --spacing_set:rows|cols|all.")
+    if getattr(args, "remove_overlap", False) and getattr(args, "spacing_add", None) is not None:
+        die("ERROR: --overlaps:remove cannot be used with --spacing_add:*. Use --spacing_set:* instead.")
+
+    if args.indent < 0:
+        die("--indent must be >= 0.")
+
+    import_kind, import_path = parse_import_spec(args.import_spec)
+    outputs = parse_output_to_specs(args.output_to)
+
+    # Standalone tile reports use the normal output destinations, but never hub.
+    if getattr(args, "list_tiles", None) and any(k == "hub" for (k, _) in outputs):
+        die("--output:hub is not valid with --list_tiles. Use --output:terminal, --output:clipboard, or --output:file.")
+
+    # Resolve hub URLs:
+    # - import_path is the dashboard URL when import_kind == 'hub'
+    # - output entries may include ('hub', None) or ('hub', url)
+    #   If omitted, inherit from hub import URL when available.
+    if any(k == 'hub' and p is None for (k, p) in outputs):
+        if import_kind == 'hub' and import_path:
+            outputs = [(k, (import_path if (k == 'hub' and p is None) else p)) for (k, p) in outputs]
+
+    if any(k == 'hub' and p is None for (k, p) in outputs):
+        die("--output:hub requires a dashboard URL unless importing from hub with --import:hub <dashboard_url>.")
+
+    _resolve_map_options(args)
+
+    # One session per run: pooled keep-alive connections and cached request tokens are
+    # shared by the hub import, hub merge source, hub output and any restore POST.
+    # (--targets passes in one session shared by every dashboard.)
+    if hub is None:
+        from .hubio import HubSession
+        hub = HubSession()
+
+    # --undo_last, --undo[:N] and --redo[:N] are standalone restore actions; --history is a standalone report.
+    # A restore writes to the restored run's output destinations unless --output/--output_to is provided.
+    undo_switches = [
+        name for name, on in (
+            ("--undo_last", args.undo_last),
+            ("--undo", args.undo_steps is not None),
+            ("--redo", args.redo_steps is not None),
+            ("--history", args.history),
+        ) if on
+    ]
+    if args.shell:
+        if undo_switches or _has_requested_action(args) or getattr(args, "pipeline", None) or args.confirm_keep or _resolve_map_options(args)[0]:
+            die("--shell takes its actions as commands; it cannot be combined with actions, --pipeline, --confirm_keep, --undo_last, --undo, --redo or --history.")
+        if import_kind == "stdin":
+            die("--shell reads its commands from stdin; import the layout with --import:file, --import:clipboard or --import:hub.")
+    if undo_switches:
+        forbidden = [
+            args.insert_rows, args.insert_cols, args.move_cols, args.move_rows, args.move_range,
+            args.delete_rows, args.delete_cols, args.clear_rows, args.clear_cols, args.clear_range,
+            args.crop_to_rows, args.crop_to_cols, args.crop_to_range,
+            args.prune_except_ids, args.prune_except_devices, args.prune_ids, args.prune_devices,
+            getattr(args, 'copy_tile_css_merge', None),
+            getattr(args, 'copy_tile_css_overwrite', None),
+            getattr(args, 'copy_tile_css_replace', None),
+            getattr(args, 'copy_tile_css_add', None),
+            args.clear_tile_css,
+            args.copy_cols, args.copy_rows, args.copy_range,
+            args.merge_cols, args.merge_rows, args.merge_range,
+            args.trim, args.sort, args.scrub_css,
+        ]
+        if any(x for x in forbidden if x):
+            die(f"{undo_switches[0]} cannot be combined with other actions. Use -h for help.")
+        if len(undo_switches) > 1:
+            die(f"{' and '.join(undo_switches)} cannot be combined.")
+        if args.history:
+            from .history import format_history
+            store = _history_store()
+            print(format_history(store, store.load_index()))
+            return
+        if not args.undo_last:
+            _restore_from_history(args, hub)
+            return
+
+        # Load last-run state (new location). Fall back to legacy CWD file if present.
+        st_path = _state_path()
+        if not os.path.exists(st_path) and os.path.exists("hubitat_tile_mover_last_run.json"):
+            st_path = "hubitat_tile_mover_last_run.json"
+        if not os.path.exists(st_path):
+            die("No last-run state found; nothing to undo.")
+        try:
+            from .jsoncodec import loads as _json_loads
+            with open(st_path, "r", encoding="utf-8") as f:
+                st = _json_loads(f.read())
+        except Exception:
+            die("Last-run state file exists but could not be read. Try re-running your last command, or delete the state file.")
+
+        # Prefer the last run's snapshot (embedded, or in the undo history) so undo works for file/clipboard imports.
+        obj = st.get("backup_obj")
+        if obj is None and st.get("backup_ref"):
+            snap = _history_store().get(st["backup_ref"])
+            if snap is not None:
+                obj = snap.load()
+        if obj is None:
+            backup_path = st.get("backup_path")
+            # If the user specified a hub output URL this run, try the derived per-dashboard backup path.
+            out_url = None
+            if args.output_to:
+                outs_tmp = parse_output_to_specs(args.output_to)
+                for k, p in outs_tmp:
+                    if k == 'hub' and p:
+                        out_url = p
+                        break
+            if (not backup_path or not os.path.exists(backup_path)) and out_url:
+                cand = _backup_path_for_url(out_url)
+                if os.path.exists(cand):
+                    backup_path = cand
+            if not backup_path or not os.path.exists(backup_path):
+                die("Backup file not found; nothing to undo.")
+            obj = _read_backup(backup_path)
+        st_epoch = st.get("state_written_at_epoch")
+        if st_epoch is None:
+            try:
+                st_epoch = int(os.path.getmtime(st_path))
+            except Exception:
+                st_epoch = None
+        dests = _restore_layout(
+            args, hub, obj,
+            default_outputs=st.get("last_outputs", [("clipboard", None)]),
+            last_url=st.get("last_url"),
+            last_output_format=st.get("last_output_format"),
+            saved_fingerprint=st.get("last_hub_saved_hash"),
+            saved_at_epoch=st_epoch,
+            saved_at=st.get("state_written_at"),
+        )
+        print(f"{ok('OK:')} undo applied. Output written to {dests}.", file=sys.stderr)
+        return
+
+
+    using_hub_import = (import_kind == "hub")
+    using_hub_output = any(k == "hub" for (k, _p) in outputs)
+
+    # Load input JSON (file/clipboard/hub)
+    if using_hub_import:
+        if not import_path:
+            die("--import:hub requires a dashboard URL. Use -h for help.")
+        _hub_ctx, obj = hub.import_layout(import_path, verbose=args.verbose, debug=args.debug)
+        input_text = _hub_ctx.layout_text
+    else:
+        from .io_helpers import read_input_text
+        from .jsonio import load_json_from_text
+        input_text = read_input_text(import_kind, import_path)
+        obj = load_json_from_text(input_text, verbose=args.verbose, debug=args.debug)
+
+    # The imported JSON text is the restore point for --undo_last and --confirm_keep.
+    # (The main flow mutates `obj` in-place.)
+    from .snapshot import LayoutSnapshot
+
+    with span("snapshot"):
+        original_snap = LayoutSnapshot(input_text) if input_text else LayoutSnapshot.of(obj)
+    # Fingerprint the input before any op runs: the per-tile leaves are cached against obj's
+    # tiles, so the output fingerprint below only re-encodes the tiles the ops touched.
+    from .fingerprint import fingerprint_layout
+
+    try:
+        fp_in = fingerprint_layout(obj)
+    except Exception:
+        fp_in = None
+
+    if args.shell:
+        return _run_shell(
+            parser, argv, args, obj,
+            snap=original_snap,
+            fp=fp_in,
+            import_kind=import_kind,
+            import_path=import_path,
+            outputs=outputs,
+            hub=hub,
+        )
+
+    pipeline_path = getattr(args, "pipeline", None)
+    if pipeline_path:
+        step_args = _load_pipeline_steps(parser, argv, args, pipeline_path)
+    else:
+        step_args = [args]
+    with span("plan"):
+        plans = [
+            _plan_step(
+                a,
+                outputs=outputs,
+                import_kind=import_kind,
+                import_path=import_path,
+                using_hub_import=using_hub_import,
+                hub=hub,
+            )
+            for a in step_args
+        ]
+    view_only = all(pl.view_only for pl in plans)
+    if pipeline_path and all(pl.view_only or pl.list_tiles_only for pl in plans):
+        die("--pipeline needs at least one step that changes the layout (maps and tile reports alone do not).")
+
+    # Determine primary hub URL for backup bookkeeping (hub import URL or first hub output URL)
+    hub_url_for_backup = None
+    if using_hub_import and import_path:
+        hub_url_for_backup = import_path
+    else:
+        for k, p in outputs:
+            if k == 'hub' and p:
+                hub_url_for_backup = p
+                break
+
+    backup_path = None
+    backup_snap = None
+    backup_tmp_path = None
+    # Backup is required for hub output and for --confirm_keep (and for hub import, as a restore point).
+    # In standalone map view mode, do not create/overwrite backups.
+    if (not view_only) and hub_url_for_backup and (using_hub_import or using_hub_output or args.confirm_keep) and (not args.undo_last):
+        backup_path = _backup_path_for_url(hub_url_for_backup)
+        if args.lock_backup and os.path.exists(backup_path):
+            # Use existing backup as the restore point and do not overwrite it.
+            backup_snap = LayoutSnapshot.from_file(backup_path)
+        else:
+            # Write to a temporary file; only commit if the run completes successfully.
+            import tempfile
+            fd, backup_tmp_path = tempfile.mkstemp(prefix="hubitat_tile_mover_backup_", suffix=".json")
+            os.close(fd)
+            _write_backup(backup_tmp_path, obj)
+            backup_snap = original_snap  # same content: no op has run yet
+    result = None
+    for step_no, plan in enumerate(plans, start=1):
+        if pipeline_path:
+            vlog(args.verbose, f"--- pipeline step {step_no}/{len(plans)} ---")
+        with span("step", step=step_no):
+            result = _apply_step(
+                plan,
+                obj,
+                outputs=outputs,
+                using_hub_output=using_hub_output,
+                in_pipeline=bool(pipeline_path),
+                final_step=(step_no == len(plans)),
+            )
+        if result is None:
+            return
+        if pipeline_path and step_no < len(plans):
+            retain_tile_caches(result[2])
+    kind, full_container, final_tiles = result
+    sort_used = next((pl.args.sort for pl in reversed(plans) if pl.args.sort is not None), None)
+
+
     output_obj = build_output_object(kind, full_container, final_tiles, args.output_format)
 
     out_text = dump_json(output_obj, indent=args.indent, minify=args.minify)
@@ -1868,12 +2530,9 @@ def main(argv: Optional[List[str]] = None) -> None:
         if not hub_out_url:
             die("--output:hub requires a dashboard URL (or import from hub with --import:hub <dashboard_url>).")
 
-        # Use the import hub context only if it matches the output URL; otherwise fetch a new context.
-        hub_ctx_out = hub_ctx if (hub_ctx is not None and using_hub_import and import_path and import_path == hub_out_url) else None
-        if hub_ctx_out is None:
-            hub_ctx_out, _tmp = hub_import_layout(hub_out_url, verbose=False, debug=False)
-
-        post_url_used = hub_post_layout_with_refresh(hub_out_url, hub_ctx_out.layout_url, output_obj, verbose=args.verbose, debug=args.debug)
+        # The session reuses the import's token when the URLs match; a different dashboard
+        # only costs a token fetch (not a full layout download).
+        post_url_used = hub.post_layout(hub_out_url, output_obj, verbose=args.verbose, debug=args.debug)
         posted = True
 
     # Optional: write changes first, then prompt to keep; if not kept, restore the backup to the same outputs.
@@ -1886,8 +2545,7 @@ def main(argv: Optional[List[str]] = None) -> None:
         if not keep:
             did_undo = True
 
-            restore_src = backup_obj if backup_obj is not None else original_obj
-            restore_obj = _copy.deepcopy(restore_src)
+            restore_obj = (backup_snap if backup_snap is not None else original_snap).load()
             r_kind, r_container, r_tiles_any = extract_tiles_container(restore_obj, verbose=args.verbose, debug=args.debug)
 
             r_output_format = args.output_format
@@ -1913,12 +2571,7 @@ def main(argv: Optional[List[str]] = None) -> None:
                         break
                 if not hub_out_url:
                     die("--output:hub requires a dashboard URL (or import from hub with --import:hub <dashboard_url>).")
-                hub_ctx_out = hub_ctx if (hub_ctx is not None and using_hub_import and import_path and import_path == hub_out_url) else None
-                if hub_ctx_out is None:
-                    hub_ctx_out, _tmp = hub_import_layout(hub_out_url, verbose=False, debug=False)
-                post_url_used = hub_post_layout_with_refresh(
-                    hub_out_url, hub_ctx_out.layout_url, restore_output_obj, verbose=args.verbose, debug=args.debug
-                )
+                post_url_used = hub.post_layout(hub_out_url, restore_output_obj, verbose=args.verbose, debug=args.debug)
                 posted = True
 
             # Update status counters to reflect the final (restored) content.
@@ -1932,46 +2585,35 @@ def main(argv: Optional[List[str]] = None) -> None:
     # To avoid losing undo history on no-op runs, only update the last-run state when
     # the layout content (tiles and/or customCSS) actually changed.
     net_changed = False
+    fp_out = None
     try:
-        net_changed = (layout_fingerprint(original_obj) != layout_fingerprint(output_obj))
+        fp_out = fingerprint_layout(output_obj)
+        net_changed = fp_in is None or fp_in.root != fp_out.root
     except Exception:
         # Be conservative: if we can't fingerprint, assume it changed.
         net_changed = True
 
     try:
-        import time as _time
-        import datetime as _dt
-
         if net_changed:
             # If we created a new backup this run, commit it only after all outputs (and hub POST) succeeded.
             if backup_tmp_path and backup_path and (not (args.lock_backup and os.path.exists(backup_path))):
                 os.replace(backup_tmp_path, backup_path)
 
-            now_epoch = int(_time.time())
-            state = {
-                # Global last-run backup (works for file/clipboard/hub imports)
-                "backup_obj": original_obj,
-                # Optional per-dashboard backup path (only meaningful when a hub URL is in use)
-                "backup_path": backup_path,
-                "last_outputs": outputs,
-                "last_url": hub_url_for_backup,
-                "last_output_format": args.output_format,
-                "last_import_kind": import_kind,
-                "state_written_at_epoch": now_epoch,
-                "state_written_at": _dt.datetime.fromtimestamp(now_epoch).isoformat(sep=" ", timespec="seconds"),
-            }
-
-            if posted and hub_url_for_backup:
-                # Fingerprint the last layout saved to hub so --undo_last can detect external changes.
-                try:
-                    state["last_hub_saved_hash"] = layout_fingerprint(output_obj)
-                    state["last_hub_saved_at_epoch"] = now_epoch
-                except Exception:
-                    state["last_hub_saved_hash"] = None
-            else:
-                state["last_hub_saved_hash"] = None
-
-            _write_state(state)
+            # --targets keeps per-dashboard backups only; the single last-run record would
+            # just name whichever dashboard finished last.
+            if not fan_out:
+                _record_last_run(
+                    args,
+                    before=original_snap,
+                    fp_before=fp_in,
+                    fp_after=fp_out,
+                    out_text=out_text,
+                    outputs=outputs,
+                    url=hub_url_for_backup,
+                    backup_path=backup_path,
+                    import_kind=import_kind,
+                    posted=posted,
+                )
         else:
             # No net change: do not overwrite last-run state or backup. Remove any uncommitted temp backup.
             if backup_tmp_path and os.path.exists(backup_tmp_path):
@@ -1984,12 +2626,19 @@ def main(argv: Optional[List[str]] = None) -> None:
 
     if not args.quiet:
         dests = ", ".join([f"{k}" if k != "file" else f"file:{p}" for k, p in outputs])
-        sort_msg = "original order (restored)" if did_undo else (f"sorted ({args.sort})" if args.sort is not None else "original order")
+        sort_msg = "original order (restored)" if did_undo else (f"sorted ({sort_used})" if sort_used is not None else "original order")
         status_bits = []
+        if pipeline_path:
+            status_bits.append(f"{len(plans)} pipeline step(s) applied")
         if posted:
             status_bits.append("saved to hub")
         if did_undo:
             status_bits.append("then undone")
         status = "; ".join(status_bits) if status_bits else "completed"
+        change_msg = ""
+        if fp_in is not None and fp_out is not None:
+            # Content changes (any tile property), straight from the per-tile fingerprints.
+            changed, removed = fp_in.diff(fp_out)
+            change_msg = f"; {len(changed)} changed" + (f", {len(removed)} removed" if removed else "")
 
-        print(f"{ok('OK:')} {status}. {len(final_tiles)} tile(s) written to {dests} ({sort_msg}).", file=sys.stderr)
+        print(f"{ok('OK:')} {status}. {len(final_tiles)} tile(s) written to {dests} ({sort_msg}{change_msg}).", file=sys.stderr)
@@ -1,9 +1,11 @@
 from __future__ import annotations
 
+import re
 from typing import Any, Dict, List, Optional, Sequence, Tuple, Set
 
 from .tiles import rect, as_int
 from .util import _use_color
+from .profiling import profiled
 
 Rect = Tuple[int, int, int, int]  # (r1, r2, c1, c2) inclusive
 
@@ -25,12 +27,31 @@ def _expand_bounds(b: Rect, pad: int = 1) -> Rect:
     return (r1, r2 + pad, c1, c2 + pad)
 
 
-def _c(code: str, s: str) -> str:
-    if not _use_color():
-        return s
-    return f"\x1b[{code}m{s}\x1b[0m"
+# Cell values painted into the grid, in paint order (a later layer wins).
+_EMPTY, _TILE, _CHANGED, _FOCUS, _MARK = 0, 1, 2, 3, 4
+_EMPTY_CH = "·"
+_FILL_CH = "█"
+# Uncoloured rows: one str.translate over the row's cell values.
+_PLAIN_ROW = {_EMPTY: _EMPTY_CH, _TILE: _FILL_CH, _CHANGED: _FILL_CH, _FOCUS: _FILL_CH, _MARK: _FILL_CH}
+_RUN_RE = re.compile(rb"(.)\1*", re.S)
 
 
+def _row_text(row: bytearray, a: int, b: int, codes: Optional[Dict[int, str]]) -> str:
+    """Cells a..b-1 of a grid row: one escape sequence per run of same-valued cells when colouring."""
+    if codes is None:
+        return row[a:b].decode("latin-1").translate(_PLAIN_ROW)
+    parts: List[str] = []
+    for m in _RUN_RE.finditer(row, a, b):
+        v = row[m.start()]
+        n = m.end() - m.start()
+        if v == _EMPTY:
+            parts.append(_EMPTY_CH * n)
+        else:
+            parts.append(f"\x1b[{codes[v]}m{_FILL_CH * n}\x1b[0m")
+    return "".join(parts)
+
+
+@profiled("map.render", cat="phase")
 def render_tile_map(
     tiles: List[Dict[str, Any]],
     *,
@@ -74,6 +95,16 @@ def render_tile_map(
         w = max(10, width - 2)
         h = max(5, height - 2)
 
+    # Colour support is decided once per map, not once per cell.
+    color = _use_color()
+
+    def paint(code: str, s: str) -> str:
+        return f"\x1b[{code}m{s}\x1b[0m" if color else s
+
+    focus_code = "33;1" if focus_color == 'yellow' else "31;1"
+    mark_code = "38;5;208;1" if mark_color == 'orange' else "33;1"
+    codes = {_TILE: "90", _CHANGED: "32;1", _FOCUS: focus_code, _MARK: mark_code} if color else None
+
     def to_xy(r: int, c: int) -> Tuple[int, int]:
         if no_scale:
             return (r - br1, c - bc1)
@@ -81,84 +112,61 @@ def render_tile_map(
         x = round((c - bc1) * (w - 1) / max(1, cols - 1))
         return (y, x)
 
-    grid: List[List[int]] = [[0 for _ in range(w)] for _ in range(h)]
-
-    for t in tiles:
-        tid = None
-        try:
-            tid = as_int(t, 'id')
-        except Exception:
-            tid = None
-        r1, r2, c1, c2 = rect(t)
+    def cells_of(rr: Rect) -> Optional[Tuple[int, int, int, int]]:
+        """Grid span (y1, y2, x1, x2), end-exclusive, of a rect clipped to the bounds."""
+        r1, r2, c1, c2 = rr
         r1, r2 = max(r1, br1), min(r2, br2)
         c1, c2 = max(c1, bc1), min(c2, bc2)
         if r2 < r1 or c2 < c1:
-            continue
+            return None
         y1, x1 = to_xy(r1, c1)
         y2, x2 = to_xy(r2, c2)
-        val = 2 if (tid is not None and tid in changed_ids) else 1
-        for y in range(min(y1, y2), max(y1, y2) + 1):
-            for x in range(min(x1, x2), max(x1, x2) + 1):
-                if 0 <= y < h and 0 <= x < w:
-                    if val > grid[y][x]:
-                        grid[y][x] = val
-
+        y1, y2 = max(0, min(y1, y2)), min(h, max(y1, y2) + 1)
+        x1, x2 = max(0, min(x1, x2)), min(w, max(x1, x2) + 1)
+        if y2 <= y1 or x2 <= x1:
+            return None
+        return (y1, y2, x1, x2)
+
+    grid: List[bytearray] = [bytearray(w) for _ in range(h)]
+
+    def fill(spans: List[Tuple[int, int, int, int]], val: int) -> None:
+        for y1, y2, x1, x2 in spans:
+            run = bytes((val,)) * (x2 - x1)
+            for y in range(y1, y2):
+                grid[y][x1:x2] = run
+
+    def spans_of(rects: Sequence[Rect]) -> List[Tuple[int, int, int, int]]:
+        out = []
+        for rr in rects:
+            sp = cells_of(rr)
+            if sp is not None:
+                out.append(sp)
+        return out
+
+    # Layers go down lowest value first, so plain slice assignment gives the same
+    # result as taking the highest value per cell (tiles, changed tiles, highlights),
+    # then conflicts and affected cells on top.
+    plain: List[Rect] = []
+    changed: List[Rect] = []
+    for t, rr in zip(tiles, tile_rects):
+        tid = None
+        try:
+            tid = as_int(t, 'id')
+        except Exception:
+            tid = None
+        (changed if (tid is not None and tid in changed_ids) else plain).append(rr)
+    fill(spans_of(plain), _TILE)
+    fill(spans_of(changed), _CHANGED)
     if highlight_rects:
-        for rr in highlight_rects:
-            r1, r2, c1, c2 = rr
-            r1, r2 = max(r1, br1), min(r2, br2)
-            c1, c2 = max(c1, bc1), min(c2, bc2)
-            if r2 < r1 or c2 < c1:
-                continue
-            y1, x1 = to_xy(r1, c1)
-            y2, x2 = to_xy(r2, c2)
-            for y in range(min(y1, y2), max(y1, y2) + 1):
-                for x in range(min(x1, x2), max(x1, x2) + 1):
-                    if 0 <= y < h and 0 <= x < w:
-                        grid[y][x] = max(grid[y][x], 2)
-
+        fill(spans_of(highlight_rects), _CHANGED)
     if focus_rects:
-        for rr in focus_rects:
-            r1, r2, c1, c2 = rr
-            r1, r2 = max(r1, br1), min(r2, br2)
-            c1, c2 = max(c1, bc1), min(c2, bc2)
-            if r2 < r1 or c2 < c1:
-                continue
-            y1, x1 = to_xy(r1, c1)
-            y2, x2 = to_xy(r2, c2)
-            for y in range(min(y1, y2), max(y1, y2) + 1):
-                for x in range(min(x1, x2), max(x1, x2) + 1):
-                    if 0 <= y < h and 0 <= x < w:
-                        grid[y][x] = 3
-
+        fill(spans_of(focus_rects), _FOCUS)
     if mark_rects:
-        for rr in mark_rects:
-            r1, r2, c1, c2 = rr
-            r1, r2 = max(r1, br1), min(r2, br2)
-            c1, c2 = max(c1, bc1), min(c2, bc2)
-            if r2 < r1 or c2 < c1:
-                continue
-            y1, x1 = to_xy(r1, c1)
-            y2, x2 = to_xy(r2, c2)
-            for y in range(min(y1, y2), max(y1, y2) + 1):
-                for x in range(min(x1, x2), max(x1, x2) + 1):
-                    if 0 <= y < h and 0 <= x < w:
-                        grid[y][x] = 4
+        fill(spans_of(mark_rects), _MARK)
 
     top = "┌" + ("─" * w) + "┐"
     bot = "└" + ("─" * w) + "┘"
 
-    def cell_char(v: int) -> str:
-        if v == 0:
-            return "·"
-        if v == 1:
-            return _c("90", "█")
-        if v == 2:
-            return _c("32;1", "█")
-        if v == 4:
-            return _c("38;5;208;1", "█") if mark_color == 'orange' else _c("33;1", "█")
-        return _c("33;1", "█") if focus_color == 'yellow' else _c("31;1", "█")
-
     def _group_name(idx: int) -> str:
         idx += 1
         parts: List[str] = []
@@ -170,9 +178,9 @@ def render_tile_map(
     header = (
         f"{title}\n"
         f"Bounds: rows {br1}..{br2}, cols {bc1}..{bc2} | tiles: {len(tiles)}\n"
-        f"Legend: {_c('90','█')} tile  {_c('32;1','█')} changed  "
-        f"{(_c('38;5;208;1','█') + ' affected  ') if mark_rects else ''}"
-        f"{(_c('33;1','█') if focus_color=='yellow' else _c('31;1','█'))} conflict  · empty"
+        f"Legend: {paint('90','█')} tile  {paint('32;1','█')} changed  "
+        f"{(paint('38;5;208;1','█') + ' affected  ') if mark_rects else ''}"
+        f"{paint(focus_code,'█')} conflict  · empty"
         f"{'  ids shown' if show_ids else ''}"
         f"{'  axis=' + show_axes if show_axes != 'none' else ''}\n"
     )
@@ -203,36 +211,31 @@ def render_tile_map(
             start = max(0, min(start, max(0, w - len(label))))
             placements.append({'tile_id': int(tid), 'label': label, 'row': row, 'start': start, 'end': start + len(label) - 1, 'center_x': center_x})
 
-        parents = list(range(len(placements)))
-
-        def find(i: int) -> int:
-            while parents[i] != i:
-                parents[i] = parents[parents[i]]
-                i = parents[i]
-            return i
-
-        def union(a: int, b: int) -> None:
-            ra = find(a)
-            rb = find(b)
-            if ra != rb:
-                parents[rb] = ra
-
-        for i in range(len(placements)):
-            pi = placements[i]
-            for j in range(i + 1, len(placements)):
-                pj = placements[j]
-                if pi['row'] != pj['row']:
-                    continue
-                if pi['end'] < pj['start'] or pj['end'] < pi['start']:
-                    continue
-                union(i, j)
-
-        clusters: Dict[int, List[int]] = {}
-        for i in range(len(placements)):
-            clusters.setdefault(find(i), []).append(i)
+        # Labels whose spans touch on the same map row form one group: sort each row's
+        # labels by start and sweep, instead of comparing every pair of labels.
+        by_row: Dict[int, List[int]] = {}
+        for i, p in enumerate(placements):
+            by_row.setdefault(p['row'], []).append(i)
+        clusters: List[List[int]] = []
+        for members in by_row.values():
+            members.sort(key=lambda i: placements[i]['start'])
+            cur: List[int] = []
+            cur_end = 0
+            for i in members:
+                p = placements[i]
+                if cur and p['start'] <= cur_end:
+                    cur.append(i)
+                    cur_end = max(cur_end, p['end'])
+                else:
+                    if cur:
+                        clusters.append(cur)
+                    cur = [i]
+                    cur_end = p['end']
+            if cur:
+                clusters.append(cur)
 
         group_counter = 0
-        for _, members in sorted(clusters.items(), key=lambda kv: min(placements[i]['row'] for i in kv[1])):
+        for members in sorted(clusters, key=lambda m: (placements[m[0]]['row'], min(m))):
             if len(members) == 1:
                 p0 = placements[members[0]]
                 overlays_by_row.setdefault(p0['row'], []).append({'start': p0['start'], 'text': p0['label'], 'bold': False})
@@ -243,7 +246,7 @@ def render_tile_map(
             center_x = sum(placements[i]['center_x'] for i in members) // len(members)
             start = center_x - (len(tag) // 2)
             start = max(0, min(start, max(0, w - len(tag))))
-            row = min(placements[i]['row'] for i in members)
+            row = placements[members[0]]['row']
             overlays_by_row.setdefault(row, []).append({'start': start, 'text': tag, 'bold': True})
             group_lines.append(f"  {tag}: " + ", ".join(f"tile-{tid}" for tid in member_tiles))
         for row_items in overlays_by_row.values():
@@ -287,10 +290,13 @@ def render_tile_map(
         top_line = (' ' * row_label_width) + ' ' + top_line
     body_lines.append(top_line)
     for y, row in enumerate(grid):
-        cells = [cell_char(v) for v in row]
-        if show_ids:
-            occupied = [False] * w
-            for item in overlays_by_row.get(y, []):
+        items = overlays_by_row.get(y) if show_ids else None
+        if not items:
+            text = _row_text(row, 0, w, codes)
+        else:
+            # Label characters replace cells; the first label to claim a cell keeps it.
+            labels: Dict[int, str] = {}
+            for item in items:
                 text = item['text']
                 bold = bool(item.get('bold', False))
                 start = int(item['start'])
@@ -302,12 +308,18 @@ def render_tile_map(
                 if start + len(text) > w:
                     text = text[: w - start]
                 for idx, ch in enumerate(text):
-                    pos = start + idx
-                    if occupied[pos]:
-                        continue
-                    cells[pos] = _c('1', ch) if bold else ch
-                    occupied[pos] = True
-        line = '│' + ''.join(cells) + '│'
+                    labels.setdefault(start + idx, paint('1', ch) if bold else ch)
+            parts: List[str] = []
+            x = 0
+            for pos in sorted(labels):
+                if pos > x:
+                    parts.append(_row_text(row, x, pos, codes))
+                parts.append(labels[pos])
+                x = pos + 1
+            if x < w:
+                parts.append(_row_text(row, x, w, codes))
+            text = ''.join(parts)
+        line = '│' + text + '│'
         if show_row_axes:
             line = str(axis_row_value(y)).rjust(row_label_width) + ' ' + line
         body_lines.append(line)
@@ -319,11 +331,3 @@ def render_tile_map(
         body_lines.append('Groups:')
         body_lines.extend(group_lines)
     return header + '\n'.join(body_lines) + '\n'
-
-
-def conflict_rects_from_details(conflicts: Dict[int, List[Tuple[int, Rect]]]) -> List[Rect]:
-    rects: List[Rect] = []
-    for _, entries in conflicts.items():
-        for _, orect in entries:
-            rects.append(orect)
-    return rects
@@ -10,6 +10,7 @@ from .selectors import (
 from .tiles import as_int, rect
 from .map_view import render_tile_map
 from .util import format_id_sample, prompt_yes_no_or_die, vlog
+from .profiling import profiled
 
 
 def _maybe_show_remove_map(tiles: List[Dict[str, Any]], selected: List[Dict[str, Any]], *, show_map: bool, map_focus: str) -> None:
@@ -31,6 +32,7 @@ def _maybe_show_remove_map(tiles: List[Dict[str, Any]], selected: List[Dict[str,
     )
 
 
+@profiled("op.clear_rows")
 def clear_rows(
     tiles: List[Dict[str, Any]],
     *,
@@ -66,6 +68,7 @@ def clear_rows(
     return selected_ids
 
 
+@profiled("op.clear_cols")
 def clear_cols(
     tiles: List[Dict[str, Any]],
     *,
@@ -101,6 +104,7 @@ def clear_cols(
     return selected_ids
 
 
+@profiled("op.clear_range")
 def clear_range(
     tiles: List[Dict[str, Any]],
     *,
@@ -1,13 +1,14 @@
 from __future__ import annotations
 
 import copy
-from typing import Any, Dict, List, Optional, Set
+from typing import Any, Dict, List, Optional, Sequence, Set, Tuple
 
-from .ops_move import scan_move_conflicts
+from .conflicts import scan_conflicts
 from .selectors import select_tiles_by_col_range, select_tiles_by_row_range, select_tiles_by_rect_range
 from .tiles import as_int, rect, set_int_like
 from .util import die, dlog, vlog
-from .map_view import render_tile_map, conflict_rects_from_details
+from .map_view import render_tile_map
+from .profiling import profiled
 
 def _next_id_state(dest_tiles: List[Dict[str, Any]], *, reserved_ids: Optional[Set[int]] = None) -> tuple[set[int], int]:
     used = {as_int(t, "id") for t in dest_tiles}
@@ -41,30 +42,38 @@ def _conflict_scan_and_append(
     verbose: bool,
     debug: bool,
     label: str,
+    stamp_of: Optional[List[int]] = None,
 ) -> Set[int]:
     stationary = dest_tiles  # tiles present before copy
 
     def moved_rect(t: Dict[str, Any]):
         return rect(t)
 
-    conflicts_by_mid, total_pairs = scan_move_conflicts(copies, stationary, moved_rect)
-    if conflicts_by_mid:
-        vlog(verbose, f"[{label}] conflicts detected: {len(conflicts_by_mid)} copied tiles, {total_pairs} overlap pair(s)")
+    # Several stamps (stamp_of[i] = stamp of copies[i]): copies are also checked against the
+    # copies of other stamps, each pair once; copies within one stamp keep the source layout.
+    n_stationary = len(stationary)
+    others = stationary + copies if stamp_of and max(stamp_of) > 0 else stationary
+    conflicts = scan_conflicts(
+        copies,
+        others,
+        moved_rect,
+        pair_filter=None if others is stationary else (
+            lambda mi, si: si < n_stationary or (mi < si - n_stationary and stamp_of[mi] != stamp_of[si - n_stationary])
+        ),
+    )
+    blocked = set(conflicts.by_mid)
+    blocked.update(as_int(others[si], "id") for _mi, si, _o in conflicts.pairs if si >= n_stationary)
+    if conflicts:
+        vlog(verbose, f"[{label}] conflicts detected: {len(conflicts.by_mid)} copied tiles, {conflicts.total_pairs} overlap pair(s)")
 
-    if conflicts_by_mid and not allow_overlap and not skip_overlap:
-        sample = list(conflicts_by_mid.items())[:10]
-        details = "; ".join([f"copy id={mid} conflicts at r{entries[0][1][0]}..{entries[0][1][1]},c{entries[0][1][2]}..{entries[0][1][3]} with {[sid for sid,_ in entries]}" for mid, entries in sample])
-        more = "" if len(conflicts_by_mid) <= 10 else f" (and {len(conflicts_by_mid) - 10} more)"
+    if conflicts and not allow_overlap and not skip_overlap:
         if show_map:
-            focus = conflict_rects_from_details(conflicts_by_mid)
+            focus = conflicts.overlap_rects
             try:
-                focus_arg = focus if map_focus == 'conflict' else None
-                tiles_for_map = dest_tiles if (map_focus == 'full' or map_focus == 'no_scale') else (stationary + copies)
                 # Conflict map: gray=stationary, green=moving/copied (non-conflict), red=conflict
-                tiles_for_map = stationary
-                hi_rects = [rect(t) for t in copies]
-                full_like = (map_focus == 'full' or map_focus == 'no_scale')
-                bounds_rects = [rect(t) for t in dest_tiles] if full_like else (focus if map_focus == 'conflict' else None)
+                tiles_for_map = stationary + [others[si] for si in sorted({si for _mi, si, _o in conflicts.pairs if si >= n_stationary})]
+                hi_rects = conflicts.moved_rects
+                bounds_rects = conflicts.map_bounds(map_focus, include_moved=False)
                 print(
                     render_tile_map(
                         tiles_for_map,
@@ -80,14 +89,14 @@ def _conflict_scan_and_append(
                 )
             except Exception:
                 pass
-        die(f"Destination conflicts detected. Re-run with --overlaps:allow or --overlaps:skip. {details}{more}")
+        die(f"Destination conflicts detected. Re-run with --overlaps:allow or --overlaps:skip. {conflicts.details('copy')}")
 
     added = 0
     appended_ids: Set[int] = set()
     for ct in copies:
         tid = as_int(ct, "id")
-        if conflicts_by_mid.get(tid) and skip_overlap and not allow_overlap:
-            dlog(debug, f"[{label}] id={tid}: SKIP COPY (conflicts with {conflicts_by_mid[tid]})")
+        if tid in blocked and skip_overlap and not allow_overlap:
+            dlog(debug, f"[{label}] id={tid}: SKIP COPY (conflicts with {conflicts.by_mid.get(tid, 'another copy')})")
             continue
         dest_tiles.append(ct)
         appended_ids.add(tid)
@@ -97,6 +106,7 @@ def _conflict_scan_and_append(
 
     return appended_ids
 
+@profiled("op.copy_cols")
 def copy_cols(
     dest_tiles: List[Dict[str, Any]],
     *,
@@ -158,6 +168,7 @@ def copy_cols(
 
     return {k: v for k, v in id_map.items() if v in appended_ids}
 
+@profiled("op.copy_rows")
 def copy_rows(
     dest_tiles: List[Dict[str, Any]],
     *,
@@ -219,6 +230,7 @@ def copy_rows(
 
     return {k: v for k, v in id_map.items() if v in appended_ids}
 
+@profiled("op.copy_range")
 def copy_range(
     dest_tiles: List[Dict[str, Any]],
     *,
@@ -226,8 +238,7 @@ def copy_range(
     src_left_col: int,
     src_bottom_row: int,
     src_right_col: int,
-    dest_top_row: int,
-    dest_left_col: int,
+    dests: Sequence[Tuple[int, int]],
     include_overlap: bool,
     allow_overlap: bool,
     skip_overlap: bool,
@@ -238,16 +249,17 @@ def copy_range(
     verbose: bool,
     debug: bool,
     reserved_ids: Optional[Set[int]] = None,
-) -> Dict[int, int]:
-    if min(src_top_row, src_left_col, src_bottom_row, src_right_col, dest_top_row, dest_left_col) <= 0:
+) -> Dict[int, List[int]]:
+    """Copy a region to one or more (dest_top_row, dest_left_col) origins.
+
+    Returns source id -> new ids (one per appended copy, in destination order).
+    """
+    if min(src_top_row, src_left_col, src_bottom_row, src_right_col, *(v for d in dests for v in d)) <= 0:
         die("--copy_range values must be positive (1-based).")
 
     top_row, bottom_row = (src_top_row, src_bottom_row) if src_top_row <= src_bottom_row else (src_bottom_row, src_top_row)
     left_col, right_col = (src_left_col, src_right_col) if src_left_col <= src_right_col else (src_right_col, src_left_col)
 
-    delta_r = dest_top_row - top_row
-    delta_c = dest_left_col - left_col
-
     selected = select_tiles_by_rect_range(
         dest_tiles,
         top_row=top_row,
@@ -260,26 +272,32 @@ def copy_range(
 
     used_ids, next_id = _next_id_state(dest_tiles, reserved_ids=reserved_ids)
 
-    id_map: Dict[int, int] = {}
+    # Every stamp draws its ids from the same running counter, so all new ids form one block.
+    new_src: Dict[int, int] = {}
+    stamp_of: List[int] = []
 
     copies: List[Dict[str, Any]] = []
-    for t in selected:
-        src_id = as_int(t, "id")
-        ct = copy.deepcopy(t)
-        next_id = _ensure_unique_id(ct, used_ids, next_id, debug, "copy_range")
-
-        tid = as_int(ct, "id")
-        id_map[src_id] = tid
-        r0 = as_int(ct, "row")
-        c0 = as_int(ct, "col")
-        r1 = r0 + delta_r
-        c1 = c0 + delta_c
-        if r1 < 1 or c1 < 1:
-            die(f"copy_range would move copied tile id={tid} to invalid position row={r1}, col={c1}")
-        set_int_like(ct, "row", r1)
-        set_int_like(ct, "col", c1)
-        copies.append(ct)
-        dlog(debug, f"[copy_range] copy id={tid}: (row,col) ({r0},{c0}) -> ({r1},{c1})")
+    for stamp, (dest_top_row, dest_left_col) in enumerate(dests):
+        delta_r = dest_top_row - top_row
+        delta_c = dest_left_col - left_col
+        for t in selected:
+            src_id = as_int(t, "id")
+            ct = copy.deepcopy(t)
+            next_id = _ensure_unique_id(ct, used_ids, next_id, debug, "copy_range")
+
+            tid = as_int(ct, "id")
+            new_src[tid] = src_id
+            r0 = as_int(ct, "row")
+            c0 = as_int(ct, "col")
+            r1 = r0 + delta_r
+            c1 = c0 + delta_c
+            if r1 < 1 or c1 < 1:
+                die(f"copy_range would move copied tile id={tid} to invalid position row={r1}, col={c1}")
+            set_int_like(ct, "row", r1)
+            set_int_like(ct, "col", c1)
+            copies.append(ct)
+            stamp_of.append(stamp)
+            dlog(debug, f"[copy_range] copy id={tid}: (row,col) ({r0},{c0}) -> ({r1},{c1})")
 
     appended_ids = _conflict_scan_and_append(
         dest_tiles,
@@ -291,6 +309,12 @@ def copy_range(
         label="copy_range",
         show_map=show_map,
         map_focus=map_focus,
+        stamp_of=stamp_of,
     )
 
-    return {k: v for k, v in id_map.items() if v in appended_ids}
+    id_targets: Dict[int, List[int]] = {}
+    for ct in copies:
+        tid = as_int(ct, "id")
+        if tid in appended_ids:
+            id_targets.setdefault(new_src[tid], []).append(tid)
+    return id_targets
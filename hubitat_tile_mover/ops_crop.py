@@ -8,6 +8,7 @@ from .tiles import as_int, rect, tile_col_extent, tile_row_extent
 from .util import format_id_sample, prompt_yes_no_or_die, vlog, ilog
 from .util import die as _die
 from .map_view import render_tile_map
+from .profiling import profiled
 
 
 def _warn_and_prompt(
@@ -62,6 +63,7 @@ def _warn_and_prompt(
     )
 
 
+@profiled("op.crop_to_rows")
 def crop_to_rows(
     tiles: List[Dict[str, Any]],
     *,
@@ -117,6 +119,7 @@ def crop_to_rows(
     return removed_ids
 
 
+@profiled("op.crop_to_cols")
 def crop_to_cols(
     tiles: List[Dict[str, Any]],
     *,
@@ -169,6 +172,7 @@ def crop_to_cols(
     return removed_ids
 
 
+@profiled("op.crop_to_range")
 def crop_to_range(
     tiles: List[Dict[str, Any]],
     *,
@@ -371,6 +375,7 @@ def _device_matches_spec(tile: Dict[str, Any], nums: Set[int], lits: Set[str]) -
 
 
 
+@profiled("op.prune_except_ids")
 def prune_except_ids(
     tiles: List[Dict[str, Any]],
     *,
@@ -411,6 +416,7 @@ def prune_except_ids(
 
 
 
+@profiled("op.prune_except_devices")
 def prune_except_devices(
     tiles: List[Dict[str, Any]],
     *,
@@ -452,6 +458,7 @@ def prune_except_devices(
     return removed_ids
 
 
+@profiled("op.prune_ids")
 def prune_ids(
     tiles: List[Dict[str, Any]],
     *,
@@ -495,6 +502,7 @@ def prune_ids(
     return removed_ids
 
 
+@profiled("op.prune_devices")
 def prune_devices(
     tiles: List[Dict[str, Any]],
     *,
@@ -1,9 +1,9 @@
 from __future__ import annotations
 
-from typing import Any, Dict, List, Optional, Tuple
+from typing import Any, Dict, List, Optional, Sequence, Tuple
 
-from .geometry import ranges_overlap
-from .ops_move import scan_move_conflicts
+from .geometry import DeleteBands
+from .conflicts import scan_conflicts
 from .selectors import (
     find_straddlers_cols,
     find_straddlers_rows,
@@ -14,13 +14,14 @@ from .tiles import as_int, set_int_like, tile_col_extent, tile_row_extent, rect
 from .map_view import render_tile_map
 from .util import dlog, format_id_sample, prompt_yes_no_or_die, vlog
 from .util import die as _die
+from .profiling import profiled
 
 
+@profiled("op.delete_rows")
 def delete_rows(
     tiles: List[Dict[str, Any]],
     *,
-    start_row: int,
-    end_row: int,
+    bands: Sequence[Tuple[int, int]],
     include_overlap: bool,
     col_range: Optional[Tuple[int, int]],
     force: bool,
@@ -32,12 +33,10 @@ def delete_rows(
     show_ids: bool = False,
     show_axes: str = 'none',
 ) -> List[int]:
-    if start_row <= 0 or end_row <= 0:
+    if any(s <= 0 or e <= 0 for s, e in bands):
         _die("--delete_rows values must be positive (1-based).")
-    if start_row > end_row:
-        start_row, end_row = end_row, start_row
-
-    delete_count = end_row - start_row + 1
+    # Overlapping bands merge; every remaining tile shifts once, by the rows deleted before it.
+    deleted = DeleteBands(bands)
 
     selected: List[Dict[str, Any]] = []
     for t in tiles:
@@ -46,11 +45,11 @@ def delete_rows(
 
         if include_overlap:
             r1, r2 = tile_row_extent(t)
-            if ranges_overlap(r1, r2, start_row, end_row):
+            if deleted.overlaps(r1, r2):
                 selected.append(t)
         else:
             r0 = as_int(t, "row")
-            if start_row <= r0 <= end_row:
+            if deleted.contains(r0):
                 selected.append(t)
 
     selected_ids = [as_int(t, "id") for t in selected]
@@ -59,32 +58,52 @@ def delete_rows(
     remaining = [t for t in tiles if id(t) not in selected_obj_ids]
     shifting: List[Dict[str, Any]] = []
     stationary: List[Dict[str, Any]] = []
+    shift_of: Dict[int, int] = {}
     for t in remaining:
-        if tile_matches_col_range(t, col_range, include_overlap) and as_int(t, "row") > end_row:
+        shift = deleted.shift(as_int(t, "row")) if tile_matches_col_range(t, col_range, include_overlap) else 0
+        if shift:
             shifting.append(t)
+            shift_of[id(t)] = shift
         else:
             stationary.append(t)
 
     def shifted_rect_rows(t: Dict[str, Any]) -> Tuple[int, int, int, int]:
         r1, r2, c1, c2 = rect(t)
-        return (r1 - delete_count, r2 - delete_count, c1, c2)
-
-    conflicts_by_mid, total_pairs = scan_move_conflicts(shifting, stationary, shifted_rect_rows)
-    if conflicts_by_mid and not allow_overlap:
-        sample = list(conflicts_by_mid.items())[:10]
-        details = '; '.join([f"shift id={mid} conflicts at r{entries[0][1][0]}..{entries[0][1][1]},c{entries[0][1][2]}..{entries[0][1][3]} with {[sid for sid,_ in entries]}" for mid, entries in sample])
-        more = "" if len(conflicts_by_mid) <= 10 else f" (and {len(conflicts_by_mid) - 10} more)"
+        shift = shift_of[id(t)]
+        return (r1 - shift, r2 - shift, c1, c2)
+
+    def final_rect(t: Dict[str, Any]) -> Tuple[int, int, int, int]:
+        return shifted_rect_rows(t) if id(t) in shift_of else rect(t)
+
+    # With several bands, shifted tiles are checked against each other too (at their final places,
+    # each pair once) unless both moved by the same amount: tiles between bands close up less.
+    others = stationary + shifting if len(deleted.starts) > 1 else stationary
+    n_stationary = len(stationary)
+    conflicts = scan_conflicts(
+        shifting,
+        others,
+        shifted_rect_rows,
+        stationary_rect_fn=final_rect,
+        pair_filter=lambda mi, si: si < n_stationary or (
+            mi < si - n_stationary and shift_of[id(others[si])] != shift_of[id(shifting[mi])]
+        ),
+    )
+    if conflicts and not allow_overlap:
         if show_map:
             import sys as _sys
-            focus = []
-            for entries in conflicts_by_mid.values():
-                for _, orect in entries:
-                    focus.append(orect)
-            projected_rects = [shifted_rect_rows(t) for t in shifting]
-            bounds_rects = ([rect(t) for t in stationary] + projected_rects) if (map_focus == 'full' or map_focus == 'no_scale') else (focus if map_focus == 'conflict' else None)
+            focus = conflicts.overlap_rects
+            projected_rects = conflicts.moved_rects
+            bounds_rects = conflicts.map_bounds(map_focus)
+            # Shifted tiles hit by other shifted tiles are drawn where they end up.
+            blockers = {id(others[si]): others[si] for _mi, si, _o in conflicts.pairs if si >= n_stationary}
+            placed = []
+            for t in blockers.values():
+                cp = dict(t)
+                cp["row"] = as_int(t, "row") - shift_of[id(t)]
+                placed.append(cp)
             print(
                 render_tile_map(
-                    stationary,
+                    stationary + placed,
                     title="CONFLICT MAP",
                     focus_rects=focus or None,
                     bounds_rects=bounds_rects,
@@ -94,13 +113,13 @@ def delete_rows(
                 end="",
                 file=_sys.stderr,
             )
-        _die(f"Destination conflicts detected after delete_rows shift. Re-run with --overlaps:allow. {details}{more}")
+        _die(f"Destination conflicts detected after delete_rows shift. Re-run with --overlaps:allow. {conflicts.details('shift')}")
     if selected:
         details_lines = [
-            f"WARNING: --delete_rows {start_row}..{end_row} will delete {len(selected)} tile(s).",
+            f"WARNING: --delete_rows {deleted.label()} will delete {len(selected)} tile(s).",
             f"IDs: {format_id_sample(selected_ids)}",
         ]
-        friendly = f"There are {len(selected)} tiles in rows {start_row}–{end_row}."
+        friendly = f"There are {len(selected)} tiles in rows {deleted.label('–')}."
         friendly += " Are you sure you want to delete these tiles?"
 
         if show_map:
@@ -133,26 +152,22 @@ def delete_rows(
     after = len(tiles)
     vlog(verbose, f"[delete_rows] deleted {before - after} tile(s); shifting remaining tiles")
 
-    for t in tiles:
-        if not tile_matches_col_range(t, col_range, include_overlap):
-            continue
-
+    for t in shifting:
         tid = as_int(t, "id")
         r0 = as_int(t, "row")
-        if r0 > end_row:
-            r1 = r0 - delete_count
-            if r1 < 1:
-                _die(f"delete_rows shift would move tile id={tid} to invalid row {r1}")
-            set_int_like(t, "row", r1)
-            dlog(debug, f"[delete_rows] id={tid}: row {r0} -> {r1}")
+        r1 = r0 - shift_of[id(t)]
+        if r1 < 1:
+            _die(f"delete_rows shift would move tile id={tid} to invalid row {r1}")
+        set_int_like(t, "row", r1)
+        dlog(debug, f"[delete_rows] id={tid}: row {r0} -> {r1}")
 
     return selected_ids
 
+@profiled("op.delete_cols")
 def delete_cols(
     tiles: List[Dict[str, Any]],
     *,
-    start_col: int,
-    end_col: int,
+    bands: Sequence[Tuple[int, int]],
     include_overlap: bool,
     row_range: Optional[Tuple[int, int]],
     force: bool,
@@ -164,12 +179,10 @@ def delete_cols(
     show_ids: bool = False,
     show_axes: str = 'none',
 ) -> List[int]:
-    if start_col <= 0 or end_col <= 0:
+    if any(s <= 0 or e <= 0 for s, e in bands):
         _die("--delete_cols values must be positive (1-based).")
-    if start_col > end_col:
-        start_col, end_col = end_col, start_col
-
-    delete_count = end_col - start_col + 1
+    # Overlapping bands merge; every remaining tile shifts once, by the columns deleted before it.
+    deleted = DeleteBands(bands)
 
     selected: List[Dict[str, Any]] = []
     for t in tiles:
@@ -178,11 +191,11 @@ def delete_cols(
 
         if include_overlap:
             c1, c2 = tile_col_extent(t)
-            if ranges_overlap(c1, c2, start_col, end_col):
+            if deleted.overlaps(c1, c2):
                 selected.append(t)
         else:
             c0 = as_int(t, "col")
-            if start_col <= c0 <= end_col:
+            if deleted.contains(c0):
                 selected.append(t)
 
     selected_ids = [as_int(t, "id") for t in selected]
@@ -191,32 +204,52 @@ def delete_cols(
     remaining = [t for t in tiles if id(t) not in selected_obj_ids]
     shifting: List[Dict[str, Any]] = []
     stationary: List[Dict[str, Any]] = []
+    shift_of: Dict[int, int] = {}
     for t in remaining:
-        if tile_matches_row_range(t, row_range, include_overlap) and as_int(t, "col") > end_col:
+        shift = deleted.shift(as_int(t, "col")) if tile_matches_row_range(t, row_range, include_overlap) else 0
+        if shift:
             shifting.append(t)
+            shift_of[id(t)] = shift
         else:
             stationary.append(t)
 
     def shifted_rect_cols(t: Dict[str, Any]) -> Tuple[int, int, int, int]:
         r1, r2, c1, c2 = rect(t)
-        return (r1, r2, c1 - delete_count, c2 - delete_count)
-
-    conflicts_by_mid, total_pairs = scan_move_conflicts(shifting, stationary, shifted_rect_cols)
-    if conflicts_by_mid and not allow_overlap:
-        sample = list(conflicts_by_mid.items())[:10]
-        details = '; '.join([f"shift id={mid} conflicts at r{entries[0][1][0]}..{entries[0][1][1]},c{entries[0][1][2]}..{entries[0][1][3]} with {[sid for sid,_ in entries]}" for mid, entries in sample])
-        more = "" if len(conflicts_by_mid) <= 10 else f" (and {len(conflicts_by_mid) - 10} more)"
+        shift = shift_of[id(t)]
+        return (r1, r2, c1 - shift, c2 - shift)
+
+    def final_rect(t: Dict[str, Any]) -> Tuple[int, int, int, int]:
+        return shifted_rect_cols(t) if id(t) in shift_of else rect(t)
+
+    # With several bands, shifted tiles are checked against each other too (at their final places,
+    # each pair once) unless both moved by the same amount: tiles between bands close up less.
+    others = stationary + shifting if len(deleted.starts) > 1 else stationary
+    n_stationary = len(stationary)
+    conflicts = scan_conflicts(
+        shifting,
+        others,
+        shifted_rect_cols,
+        stationary_rect_fn=final_rect,
+        pair_filter=lambda mi, si: si < n_stationary or (
+            mi < si - n_stationary and shift_of[id(others[si])] != shift_of[id(shifting[mi])]
+        ),
+    )
+    if conflicts and not allow_overlap:
         if show_map:
             import sys as _sys
-            focus = []
-            for entries in conflicts_by_mid.values():
-                for _, orect in entries:
-                    focus.append(orect)
-            projected_rects = [shifted_rect_cols(t) for t in shifting]
-            bounds_rects = ([rect(t) for t in stationary] + projected_rects) if (map_focus == 'full' or map_focus == 'no_scale') else (focus if map_focus == 'conflict' else None)
+            focus = conflicts.overlap_rects
+            projected_rects = conflicts.moved_rects
+            bounds_rects = conflicts.map_bounds(map_focus)
+            # Shifted tiles hit by other shifted tiles are drawn where they end up.
+            blockers = {id(others[si]): others[si] for _mi, si, _o in conflicts.pairs if si >= n_stationary}
+            placed = []
+            for t in blockers.values():
+                cp = dict(t)
+                cp["col"] = as_int(t, "col") - shift_of[id(t)]
+                placed.append(cp)
             print(
                 render_tile_map(
-                    stationary,
+                    stationary + placed,
                     title="CONFLICT MAP",
                     focus_rects=focus or None,
                     bounds_rects=bounds_rects,
@@ -226,13 +259,13 @@ def delete_cols(
                 end="",
                 file=_sys.stderr,
             )
-        _die(f"Destination conflicts detected after delete_cols shift. Re-run with --overlaps:allow. {details}{more}")
+        _die(f"Destination conflicts detected after delete_cols shift. Re-run with --overlaps:allow. {conflicts.details('shift')}")
     if selected:
         details_lines = [
-            f"WARNING: --delete_cols {start_col}..{end_col} will delete {len(selected)} tile(s).",
+            f"WARNING: --delete_cols {deleted.label()} will delete {len(selected)} tile(s).",
             f"IDs: {format_id_sample(selected_ids)}",
         ]
-        friendly = f"There are {len(selected)} tiles in columns {start_col}–{end_col}."
+        friendly = f"There are {len(selected)} tiles in columns {deleted.label('–')}."
         friendly += " Are you sure you want to delete these tiles?"
 
         if show_map:
@@ -265,18 +298,14 @@ def delete_cols(
     after = len(tiles)
     vlog(verbose, f"[delete_cols] deleted {before - after} tile(s); shifting remaining tiles")
 
-    for t in tiles:
-        if not tile_matches_row_range(t, row_range, include_overlap):
-            continue
-
+    for t in shifting:
         tid = as_int(t, "id")
         c0 = as_int(t, "col")
-        if c0 > end_col:
-            c1 = c0 - delete_count
-            if c1 < 1:
-                _die(f"delete_cols shift would move tile id={tid} to invalid col {c1}")
-            set_int_like(t, "col", c1)
-            dlog(debug, f"[delete_cols] id={tid}: col {c0} -> {c1}")
+        c1 = c0 - shift_of[id(t)]
+        if c1 < 1:
+            _die(f"delete_cols shift would move tile id={tid} to invalid col {c1}")
+        set_int_like(t, "col", c1)
+        dlog(debug, f"[delete_cols] id={tid}: col {c0} -> {c1}")
 
     return selected_ids
 
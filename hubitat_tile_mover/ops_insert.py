@@ -1,19 +1,21 @@
 from __future__ import annotations
 
-from typing import Any, Dict, List, Optional, Tuple
+from typing import Any, Dict, List, Optional, Sequence, Tuple
 
 from .selectors import tile_matches_col_range, tile_matches_row_range
 from .tiles import as_int, set_int_like, tile_col_extent, tile_row_extent, rect
-from .ops_move import scan_move_conflicts
+from .conflicts import scan_conflicts
+from .geometry import InsertPoints
 from .map_view import render_tile_map
 from .util import die, dlog
+from .profiling import profiled
 
 
+@profiled("op.insert_rows")
 def insert_rows(
     tiles: List[Dict[str, Any]],
     *,
-    count: int,
-    at_row: int,
+    inserts: Sequence[Tuple[int, int]],
     include_overlap: bool,
     col_range: Optional[Tuple[int, int]],
     allow_overlap: bool = False,
@@ -23,13 +25,17 @@ def insert_rows(
     show_ids: bool = False,
     show_axes: str = 'none',
 ) -> None:
-    if count <= 0:
-        die(f"--insert_rows COUNT must be > 0, got {count}")
-    if at_row <= 0:
-        die(f"--insert_rows AT_ROW must be > 0, got {at_row}")
+    for count, at_row in inserts:
+        if count <= 0:
+            die(f"--insert_rows COUNT must be > 0, got {count}")
+        if at_row <= 0:
+            die(f"--insert_rows AT_ROW must be > 0, got {at_row}")
+    points = InsertPoints(inserts)
 
     shifting: List[Dict[str, Any]] = []
     stationary: List[Dict[str, Any]] = []
+    # Each shifting tile moves once, by every insertion at or before its start (or its end, for straddlers).
+    shift_of: Dict[int, int] = {}
 
     for t in tiles:
         tid = as_int(t, "id")
@@ -41,36 +47,26 @@ def insert_rows(
 
         row0 = as_int(t, "row")
 
-        reason = None
-        if row0 >= at_row:
-            reason = "start>=AT"
-        elif include_overlap:
-            r1, r2 = tile_row_extent(t)
-            if r1 < at_row <= r2:
-                reason = f"overlap ({r1}-{r2} crosses AT)"
+        shift = points.offset(tile_row_extent(t)[1] if include_overlap else row0)
 
-        if reason is None:
+        if not shift:
             stationary.append(t)
             dlog(debug, f"[insert_rows] id={tid}: no shift (row={row0})")
             continue
 
         shifting.append(t)
+        shift_of[id(t)] = shift
 
     def shifted_rect_rows(t: Dict[str, Any]) -> Tuple[int, int, int, int]:
         r1, r2, c1, c2 = rect(t)
-        return (r1 + count, r2 + count, c1, c2)
+        shift = shift_of[id(t)]
+        return (r1 + shift, r2 + shift, c1, c2)
 
-    conflicts_by_mid, _total_pairs = scan_move_conflicts(shifting, stationary, shifted_rect_rows)
-    if conflicts_by_mid and not allow_overlap:
-        sample = list(conflicts_by_mid.items())[:10]
-        details = '; '.join([f"shift id={mid} conflicts at r{entries[0][1][0]}..{entries[0][1][1]},c{entries[0][1][2]}..{entries[0][1][3]} with {[sid for sid,_ in entries]}" for mid, entries in sample])
-        more = "" if len(conflicts_by_mid) <= 10 else f" (and {len(conflicts_by_mid) - 10} more)"
+    conflicts = scan_conflicts(shifting, stationary, shifted_rect_rows)
+    if conflicts and not allow_overlap:
         if show_map:
             import sys as _sys
-            focus = []
-            for entries in conflicts_by_mid.values():
-                for _, orect in entries:
-                    focus.append(orect)
+            focus = conflicts.overlap_rects
             projected = []
             projected_ids = set()
             for st in shifting:
@@ -87,8 +83,7 @@ def insert_rows(
                     projected_ids.add(as_int(cp, 'id'))
                 except Exception:
                     pass
-            full_like = (map_focus == 'full' or map_focus == 'no_scale')
-            bounds_rects = ([rect(t) for t in stationary] + [rect(t) for t in projected]) if full_like else (focus if map_focus == 'conflict' else None)
+            bounds_rects = conflicts.map_bounds(map_focus)
             print(
                 render_tile_map(
                     stationary + projected,
@@ -103,23 +98,23 @@ def insert_rows(
                 end='',
                 file=_sys.stderr,
             )
-        die(f"Destination conflicts detected after insert_rows shift. Re-run with --overlaps:allow. {details}{more}")
+        die(f"Destination conflicts detected after insert_rows shift. Re-run with --overlaps:allow. {conflicts.details('shift')}")
 
     for t in shifting:
         tid = as_int(t, "id")
         row0 = as_int(t, "row")
-        row1 = row0 + count
+        row1 = row0 + shift_of[id(t)]
         if row1 < 1:
             die(f"insert_rows would move tile id={tid} to invalid row {row1}")
         set_int_like(t, "row", row1)
         dlog(debug, f"[insert_rows] id={tid}: row {row0} -> {row1}")
 
 
+@profiled("op.insert_cols")
 def insert_cols(
     tiles: List[Dict[str, Any]],
     *,
-    count: int,
-    at_col: int,
+    inserts: Sequence[Tuple[int, int]],
     include_overlap: bool,
     row_range: Optional[Tuple[int, int]],
     allow_overlap: bool = False,
@@ -129,13 +124,17 @@ def insert_cols(
     show_ids: bool = False,
     show_axes: str = 'none',
 ) -> None:
-    if count <= 0:
-        die(f"--insert_cols COUNT must be > 0, got {count}")
-    if at_col <= 0:
-        die(f"--insert_cols AT_COL must be > 0, got {at_col}")
+    for count, at_col in inserts:
+        if count <= 0:
+            die(f"--insert_cols COUNT must be > 0, got {count}")
+        if at_col <= 0:
+            die(f"--insert_cols AT_COL must be > 0, got {at_col}")
+    points = InsertPoints(inserts)
 
     shifting: List[Dict[str, Any]] = []
     stationary: List[Dict[str, Any]] = []
+    # Each shifting tile moves once, by every insertion at or before its start (or its end, for straddlers).
+    shift_of: Dict[int, int] = {}
 
     for t in tiles:
         tid = as_int(t, "id")
@@ -147,36 +146,26 @@ def insert_cols(
 
         col0 = as_int(t, "col")
 
-        reason = None
-        if col0 >= at_col:
-            reason = "start>=AT"
-        elif include_overlap:
-            c1, c2 = tile_col_extent(t)
-            if c1 < at_col <= c2:
-                reason = f"overlap ({c1}-{c2} crosses AT)"
+        shift = points.offset(tile_col_extent(t)[1] if include_overlap else col0)
 
-        if reason is None:
+        if not shift:
             stationary.append(t)
             dlog(debug, f"[insert_cols] id={tid}: no shift (col={col0})")
             continue
 
         shifting.append(t)
+        shift_of[id(t)] = shift
 
     def shifted_rect_cols(t: Dict[str, Any]) -> Tuple[int, int, int, int]:
         r1, r2, c1, c2 = rect(t)
-        return (r1, r2, c1 + count, c2 + count)
+        shift = shift_of[id(t)]
+        return (r1, r2, c1 + shift, c2 + shift)
 
-    conflicts_by_mid, _total_pairs = scan_move_conflicts(shifting, stationary, shifted_rect_cols)
-    if conflicts_by_mid and not allow_overlap:
-        sample = list(conflicts_by_mid.items())[:10]
-        details = '; '.join([f"shift id={mid} conflicts at r{entries[0][1][0]}..{entries[0][1][1]},c{entries[0][1][2]}..{entries[0][1][3]} with {[sid for sid,_ in entries]}" for mid, entries in sample])
-        more = "" if len(conflicts_by_mid) <= 10 else f" (and {len(conflicts_by_mid) - 10} more)"
+    conflicts = scan_conflicts(shifting, stationary, shifted_rect_cols)
+    if conflicts and not allow_overlap:
         if show_map:
             import sys as _sys
-            focus = []
-            for entries in conflicts_by_mid.values():
-                for _, orect in entries:
-                    focus.append(orect)
+            focus = conflicts.overlap_rects
             projected = []
             projected_ids = set()
             for st in shifting:
@@ -193,8 +182,7 @@ def insert_cols(
                     projected_ids.add(as_int(cp, 'id'))
                 except Exception:
                     pass
-            full_like = (map_focus == 'full' or map_focus == 'no_scale')
-            bounds_rects = ([rect(t) for t in stationary] + [rect(t) for t in projected]) if full_like else (focus if map_focus == 'conflict' else None)
+            bounds_rects = conflicts.map_bounds(map_focus)
             print(
                 render_tile_map(
                     stationary + projected,
@@ -209,12 +197,12 @@ def insert_cols(
                 end='',
                 file=_sys.stderr,
             )
-        die(f"Destination conflicts detected after insert_cols shift. Re-run with --overlaps:allow. {details}{more}")
+        die(f"Destination conflicts detected after insert_cols shift. Re-run with --overlaps:allow. {conflicts.details('shift')}")
 
     for t in shifting:
         tid = as_int(t, "id")
         col0 = as_int(t, "col")
-        col1 = col0 + count
+        col1 = col0 + shift_of[id(t)]
         if col1 < 1:
             die(f"insert_cols would move tile id={tid} to invalid col {col1}")
         set_int_like(t, "col", col1)
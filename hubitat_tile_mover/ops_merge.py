@@ -3,12 +3,13 @@ from __future__ import annotations
 import copy
 from typing import Any, Dict, List, Optional, Set, Tuple
 
-from .jsonio import extract_tiles_container, load_json_from_text
-from .ops_move import scan_move_conflicts
+from .jsonio import extract_tiles_container, load_json_from_text, normalize_tiles_list
+from .conflicts import scan_conflicts
 from .selectors import select_tiles_by_col_range, select_tiles_by_rect_range, select_tiles_by_row_range
 from .tiles import as_int, rect, set_int_like, verify_tiles_minimum
 from .util import die, dlog, vlog
-from .map_view import render_tile_map, conflict_rects_from_details
+from .map_view import render_tile_map
+from .profiling import profiled
 
 
 def _load_merge_tiles_from_file(path: str) -> List[Dict[str, Any]]:
@@ -25,6 +26,7 @@ def _load_merge_tiles_from_file(path: str) -> List[Dict[str, Any]]:
     obj = load_json_from_text(raw)
     _, _, tiles_any = extract_tiles_container(obj)
     verify_tiles_minimum(tiles_any)
+    normalize_tiles_list(tiles_any)
     return tiles_any  # type: ignore[return-value]
 
 
@@ -68,24 +70,18 @@ def _conflict_scan_and_append(
     def moved_rect(t: Dict[str, Any]):
         return rect(t)
 
-    conflicts_by_mid, total_pairs = scan_move_conflicts(copies, stationary, moved_rect)
-    if conflicts_by_mid:
-        vlog(verbose, f"[{label}] conflicts detected: {len(conflicts_by_mid)} merged tile(s), {total_pairs} overlap pair(s)")
+    conflicts = scan_conflicts(copies, stationary, moved_rect)
+    if conflicts:
+        vlog(verbose, f"[{label}] conflicts detected: {len(conflicts.by_mid)} merged tile(s), {conflicts.total_pairs} overlap pair(s)")
 
-    if conflicts_by_mid and not allow_overlap and not skip_overlap:
-        sample = list(conflicts_by_mid.items())[:10]
-        details = "; ".join([f"merge id={mid} conflicts at r{entries[0][1][0]}..{entries[0][1][1]},c{entries[0][1][2]}..{entries[0][1][3]} with {[sid for sid,_ in entries]}" for mid, entries in sample])
-        more = "" if len(conflicts_by_mid) <= 10 else f" (and {len(conflicts_by_mid) - 10} more)"
+    if conflicts and not allow_overlap and not skip_overlap:
         if show_map:
-            focus = conflict_rects_from_details(conflicts_by_mid)
+            focus = conflicts.overlap_rects
             try:
-                focus_arg = focus if map_focus == 'conflict' else None
-                tiles_for_map = dest_tiles if (map_focus == 'full' or map_focus == 'no_scale') else (stationary + copies)
                 # Conflict map: gray=stationary, green=moving/copied (non-conflict), red=conflict
                 tiles_for_map = stationary
-                hi_rects = [rect(t) for t in copies]
-                full_like = (map_focus == 'full' or map_focus == 'no_scale')
-                bounds_rects = [rect(t) for t in dest_tiles] if full_like else (focus if map_focus == 'conflict' else None)
+                hi_rects = conflicts.moved_rects
+                bounds_rects = conflicts.map_bounds(map_focus, include_moved=False)
                 print(
                     render_tile_map(
                         tiles_for_map,
@@ -101,14 +97,14 @@ def _conflict_scan_and_append(
                 )
             except Exception:
                 pass
-        die(f"Destination conflicts detected. Re-run with --overlaps:allow or --overlaps:skip. {details}{more}")
+        die(f"Destination conflicts detected. Re-run with --overlaps:allow or --overlaps:skip. {conflicts.details('merge')}")
 
     appended_ids: Set[int] = set()
     added = 0
     for ct in copies:
         tid = as_int(ct, "id")
-        if conflicts_by_mid.get(tid) and skip_overlap and not allow_overlap:
-            dlog(debug, f"[{label}] id={tid}: SKIP MERGE (conflicts with {conflicts_by_mid[tid]})")
+        if conflicts.by_mid.get(tid) and skip_overlap and not allow_overlap:
+            dlog(debug, f"[{label}] id={tid}: SKIP MERGE (conflicts with {conflicts.by_mid[tid]})")
             continue
         dest_tiles.append(ct)
         appended_ids.add(tid)
@@ -118,6 +114,7 @@ def _conflict_scan_and_append(
     return appended_ids
 
 
+@profiled("op.merge_cols")
 def merge_cols(
     dest_tiles: List[Dict[str, Any]],
     *,
@@ -182,6 +179,7 @@ def merge_cols(
     return {k: v for k, v in id_map.items() if v in appended_ids}
 
 
+@profiled("op.merge_rows")
 def merge_rows(
     dest_tiles: List[Dict[str, Any]],
     *,
@@ -246,6 +244,7 @@ def merge_rows(
     return {k: v for k, v in id_map.items() if v in appended_ids}
 
 
+@profiled("op.merge_range")
 def merge_range(
     dest_tiles: List[Dict[str, Any]],
     *,
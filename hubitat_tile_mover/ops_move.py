@@ -2,101 +2,130 @@ from __future__ import annotations
 
 import sys as _sys
 
-from typing import Any, Callable, Dict, List, Tuple
+from typing import Any, Dict, List, Sequence, Set, Tuple
 
+from .conflicts import ConflictModel, scan_conflicts
 from .geometry import rects_overlap
-from .selectors import select_tiles_by_col_range, select_tiles_by_row_range, select_tiles_by_rect_range
 from .tiles import as_int, rect, set_int_like
 from .util import die, dlog, vlog
-from .map_view import render_tile_map, conflict_rects_from_details
-
-
-def scan_move_conflicts(
-    moving_tiles: List[Dict[str, Any]],
-    stationary_tiles: List[Dict[str, Any]],
-    moved_rect_fn: Callable[[Dict[str, Any]], Tuple[int, int, int, int]],
-) -> Tuple[Dict[int, List[Tuple[int, Tuple[int, int, int, int]]]], int]:
-    stationary_rects: List[Tuple[Dict[str, Any], Tuple[int, int, int, int]]] = [(t, rect(t)) for t in stationary_tiles]
-
-    # conflicts[moving_id] -> list of (stationary_id, overlap_rect)
-    conflicts: Dict[int, List[Tuple[int, Tuple[int, int, int, int]]]] = {}
-    total_pairs = 0
-
-    for mt in moving_tiles:
-        mid = as_int(mt, "id")
-        mrect = moved_rect_fn(mt)
-
-        for st, srect in stationary_rects:
-            if rects_overlap(mrect, srect):
-                sid = as_int(st, "id")
-                # overlap rect (inclusive)
-                or1 = max(mrect[0], srect[0])
-                or2 = min(mrect[1], srect[1])
-                oc1 = max(mrect[2], srect[2])
-                oc2 = min(mrect[3], srect[3])
-                orect = (or1, or2, oc1, oc2)
-                conflicts.setdefault(mid, []).append((sid, orect))
-                total_pairs += 1
-
-    return conflicts, total_pairs
+from .map_view import render_tile_map
+from .profiling import profiled
 
-def move_cols(
+Rect = Tuple[int, int, int, int]  # inclusive (r1, r2, c1, c2)
+
+# Column (or row) extent of a whole-row (or whole-column) source band.
+_ANY = 1 << 30
+
+
+def _band_label(src: Rect) -> str:
+    r1, r2, c1, c2 = src
+    if c1 == -_ANY:
+        return f"rows {r1}-{r2}"
+    if r1 == -_ANY:
+        return f"cols {c1}-{c2}"
+    return f"r{r1}..{r2},c{c1}..{c2}"
+
+
+def _plan_moves(
+    op: str,
     tiles: List[Dict[str, Any]],
+    sources: List[Rect],
+    deltas: List[Tuple[int, int]],
     *,
-    start_col: int,
-    end_col: int,
-    dest_start_col: int,
     include_overlap: bool,
     allow_overlap: bool,
     skip_overlap: bool,
     show_map: bool,
-    map_focus: str = 'full',
-    show_ids: bool = False,
-    show_axes: str = 'none',
-    verbose: bool = False,
-    debug: bool = False,
-) -> None:
-    if start_col <= 0 or end_col <= 0 or dest_start_col <= 0:
-        die("--move_cols values must be positive (1-based).")
-    if start_col > end_col:
-        start_col, end_col = end_col, start_col
-
-    delta = dest_start_col - start_col
-    vlog(verbose, f"[move_cols] normalized source={start_col}-{end_col}, dest_start={dest_start_col}, delta={delta}")
-
-    moving = select_tiles_by_col_range(tiles, start_col, end_col, include_overlap=include_overlap)
-    moving_ids = {id(t) for t in moving}
-    stationary = [t for t in tiles if id(t) not in moving_ids]
+    map_focus: str,
+    show_ids: bool,
+    show_axes: str,
+    verbose: bool,
+    switch: str,
+) -> Tuple[List[Dict[str, Any]], Dict[int, Tuple[int, int]], ConflictModel, Set[int]]:
+    """Select the tiles of every source band in one pass and check the final arrangement once.
+
+    switch is the option the user gave (--move:rows, --swap:rows, ...), for error messages.
+    Returns (moving tiles, id(tile) -> (row delta, col delta), conflicts, ids of moving tiles
+    that take part in a conflict). Dies on conflicts unless they are allowed or skipped.
+    """
+    for i in range(len(sources)):
+        for j in range(i + 1, len(sources)):
+            if rects_overlap(sources[i], sources[j]):
+                if switch.startswith("--swap"):
+                    what = "regions" if switch.endswith("range") else "bands"
+                    die(f"{switch}: the two {what} overlap ({_band_label(sources[i])} and {_band_label(sources[j])}); swap {what} that do not overlap.")
+                die(f"{switch} source bands overlap ({_band_label(sources[i])} and {_band_label(sources[j])}); each tile can only move once.")
+
+    # A handful of bands: checking each one inline is cheaper per tile than an index query.
+    numbered = list(enumerate(sources))
+    moving: List[Dict[str, Any]] = []
+    stationary: List[Dict[str, Any]] = []
+    delta_of: Dict[int, Tuple[int, int]] = {}
+    for t in tiles:
+        if include_overlap:
+            a1, a2, b1, b2 = rect(t)
+        else:
+            a1 = a2 = as_int(t, "row")
+            b1 = b2 = as_int(t, "col")
+        hit = -1
+        for i, (r1, r2, c1, c2) in numbered:
+            if a1 <= r2 and r1 <= a2 and b1 <= c2 and c1 <= b2:
+                if hit >= 0:
+                    die(
+                        f"{switch}: tile id={as_int(t, 'id')} spans source bands {_band_label(sources[hit])} and "
+                        f"{_band_label(sources[i])}; narrow the bands or drop --select:include_partial."
+                    )
+                hit = i
+        if hit < 0:
+            stationary.append(t)
+            continue
+        moving.append(t)
+        delta_of[id(t)] = deltas[hit]
 
-    vlog(verbose, f"[move_cols] tiles selected to move: {len(moving)} (include_overlap={include_overlap})")
+    vlog(verbose, f"[{op}] tiles selected to move: {len(moving)} (include_overlap={include_overlap})")
 
-    def moved_rect(t: Dict[str, Any]) -> Tuple[int, int, int, int]:
+    def moved_rect(t: Dict[str, Any]) -> Rect:
         r1, r2, c1, c2 = rect(t)
-        return (r1, r2, c1 + delta, c2 + delta)
-
-    conflicts_by_mid, total_pairs = scan_move_conflicts(moving, stationary, moved_rect)
+        dr, dc = delta_of[id(t)]
+        return (r1 + dr, r2 + dr, c1 + dc, c2 + dc)
+
+    def final_rect(t: Dict[str, Any]) -> Rect:
+        return moved_rect(t) if id(t) in delta_of else rect(t)
+
+    # With several bands, moved tiles are also checked against each other at their final places
+    # (each pair once), unless both moved by the same delta, i.e. kept their relative layout.
+    others = stationary + moving if len(sources) > 1 else stationary
+    n_stationary = len(stationary)
+    conflicts = scan_conflicts(
+        moving,
+        others,
+        moved_rect,
+        stationary_rect_fn=final_rect,
+        pair_filter=lambda mi, si: si < n_stationary or (
+            mi < si - n_stationary and delta_of[id(others[si])] != delta_of[id(moving[mi])]
+        ),
+    )
+    blocked = set(conflicts.by_mid)
+    blocked.update(as_int(others[si], "id") for _mi, si, _o in conflicts.pairs if si >= n_stationary)
 
-    if conflicts_by_mid:
-        vlog(verbose, f"[move_cols] conflicts detected: {len(conflicts_by_mid)} moving tiles, {total_pairs} overlap pair(s)")
+    if conflicts:
+        vlog(verbose, f"[{op}] conflicts detected: {len(conflicts.by_mid)} moving tiles, {conflicts.total_pairs} overlap pair(s)")
 
-    if conflicts_by_mid and not allow_overlap and not skip_overlap:
-        sample = list(conflicts_by_mid.items())[:10]
-        details = '; '.join([f"move id={mid} conflicts at r{entries[0][1][0]}..{entries[0][1][1]},c{entries[0][1][2]}..{entries[0][1][3]} with {[sid for sid,_ in entries]}" for mid, entries in sample])
-        more = "" if len(conflicts_by_mid) <= 10 else f" (and {len(conflicts_by_mid) - 10} more)"
+    if conflicts and not allow_overlap and not skip_overlap:
         if show_map:
             try:
                 # Conflict map (pre-flight): gray=stationary, green=moved destination footprints, red=overlap region
-                focus = conflict_rects_from_details(conflicts_by_mid)
-                moved_rects = [moved_rect(t) for t in moving]
-                bounds_rects = None
-                full_like = (map_focus == 'full' or map_focus == 'no_scale')
-                if full_like:
-                    bounds_rects = [rect(t) for t in stationary] + moved_rects
-                elif map_focus == 'conflict':
-                    bounds_rects = focus
+                focus = conflicts.overlap_rects
+                moved_rects = conflicts.moved_rects
+                bounds_rects = conflicts.map_bounds(map_focus)
+                # Moved tiles hit by tiles from another band are drawn where they end up.
+                placed = []
+                for t in {id(others[si]): others[si] for _mi, si, _o in conflicts.pairs if si >= n_stationary}.values():
+                    r1, _r2, c1, _c2 = moved_rect(t)
+                    placed.append(dict(t, row=r1, col=c1))
                 print(
                     render_tile_map(
-                        stationary,
+                        stationary + placed,
                         title='CONFLICT MAP',
                         focus_rects=focus,
                         bounds_rects=bounds_rects,
@@ -110,29 +139,67 @@ def move_cols(
                 )
             except Exception:
                 pass
-        die(f"Destination conflicts detected. Re-run with --overlaps:allow or --overlaps:skip. {details}{more}")
+        die(f"Destination conflicts detected. Re-run with --overlaps:allow or --overlaps:skip. {conflicts.details('move')}")
+
+    return moving, delta_of, conflicts, blocked
+
+
+@profiled("op.move_cols")
+def move_cols(
+    tiles: List[Dict[str, Any]],
+    *,
+    moves: Sequence[Tuple[int, int, int]],
+    include_overlap: bool,
+    allow_overlap: bool,
+    skip_overlap: bool,
+    show_map: bool,
+    map_focus: str = 'full',
+    show_ids: bool = False,
+    show_axes: str = 'none',
+    verbose: bool = False,
+    debug: bool = False,
+    switch: str = "--move_cols",
+) -> None:
+    """Move one or more column bands, each given as (start_col, end_col, dest_start_col)."""
+    sources: List[Rect] = []
+    deltas: List[Tuple[int, int]] = []
+    for start_col, end_col, dest_start_col in moves:
+        if start_col <= 0 or end_col <= 0 or dest_start_col <= 0:
+            die(f"{switch} values must be positive (1-based).")
+        if start_col > end_col:
+            start_col, end_col = end_col, start_col
+
+        delta = dest_start_col - start_col
+        vlog(verbose, f"[move_cols] normalized source={start_col}-{end_col}, dest_start={dest_start_col}, delta={delta}")
+        sources.append((-_ANY, _ANY, start_col, end_col))
+        deltas.append((0, delta))
+
+    moving, delta_of, conflicts, blocked = _plan_moves(
+        "move_cols", tiles, sources, deltas,
+        include_overlap=include_overlap, allow_overlap=allow_overlap, skip_overlap=skip_overlap,
+        show_map=show_map, map_focus=map_focus, show_ids=show_ids, show_axes=show_axes, verbose=verbose, switch=switch,
+    )
 
     for t in moving:
         tid = as_int(t, "id")
 
-        if conflicts_by_mid.get(tid) and skip_overlap and not allow_overlap:
-            dlog(debug, f"[move_cols] id={tid}: SKIP (conflicts with {conflicts_by_mid[tid]})")
+        if tid in blocked and skip_overlap and not allow_overlap:
+            dlog(debug, f"[move_cols] id={tid}: SKIP (conflicts with {conflicts.by_mid.get(tid, 'a moved tile')})")
             continue
 
         c0 = as_int(t, "col")
-        c1 = c0 + delta
+        c1 = c0 + delta_of[id(t)][1]
         if c1 < 1:
             die(f"move_cols would move tile id={tid} to invalid col {c1}")
         set_int_like(t, "col", c1)
-        dlog(debug, f"[move_cols] id={tid}: col {c0} -> {c1}" + ("" if not conflicts_by_mid.get(tid) else " (conflict allowed)"))
+        dlog(debug, f"[move_cols] id={tid}: col {c0} -> {c1}" + ("" if tid not in blocked else " (conflict allowed)"))
 
 
+@profiled("op.move_rows")
 def move_rows(
     tiles: List[Dict[str, Any]],
     *,
-    start_row: int,
-    end_row: int,
-    dest_start_row: int,
+    moves: Sequence[Tuple[int, int, int]],
     include_overlap: bool,
     allow_overlap: bool,
     skip_overlap: bool,
@@ -142,87 +209,48 @@ def move_rows(
     show_axes: str = 'none',
     verbose: bool = False,
     debug: bool = False,
+    switch: str = "--move_rows",
 ) -> None:
-    if start_row <= 0 or end_row <= 0 or dest_start_row <= 0:
-        die("--move_rows values must be positive (1-based).")
-    if start_row > end_row:
-        start_row, end_row = end_row, start_row
-
-    delta = dest_start_row - start_row
-    vlog(verbose, f"[move_rows] normalized source={start_row}-{end_row}, dest_start={dest_start_row}, delta={delta}")
-
-    moving = select_tiles_by_row_range(tiles, start_row, end_row, include_overlap=include_overlap)
-    moving_ids = {id(t) for t in moving}
-    stationary = [t for t in tiles if id(t) not in moving_ids]
-
-    vlog(verbose, f"[move_rows] tiles selected to move: {len(moving)} (include_overlap={include_overlap})")
-
-    def moved_rect(t: Dict[str, Any]) -> Tuple[int, int, int, int]:
-        r1, r2, c1, c2 = rect(t)
-        return (r1 + delta, r2 + delta, c1, c2)
-
-    conflicts_by_mid, total_pairs = scan_move_conflicts(moving, stationary, moved_rect)
-
-    if conflicts_by_mid:
-        vlog(verbose, f"[move_rows] conflicts detected: {len(conflicts_by_mid)} moving tiles, {total_pairs} overlap pair(s)")
-
-    if conflicts_by_mid and not allow_overlap and not skip_overlap:
-        sample = list(conflicts_by_mid.items())[:10]
-        details = '; '.join([f"move id={mid} conflicts at r{entries[0][1][0]}..{entries[0][1][1]},c{entries[0][1][2]}..{entries[0][1][3]} with {[sid for sid,_ in entries]}" for mid, entries in sample])
-        more = "" if len(conflicts_by_mid) <= 10 else f" (and {len(conflicts_by_mid) - 10} more)"
-        if show_map:
-            try:
-                # Conflict map (pre-flight): gray=stationary, green=moved destination footprints, red=overlap region
-                focus = conflict_rects_from_details(conflicts_by_mid)
-                moved_rects = [moved_rect(t) for t in moving]
-                bounds_rects = None
-                full_like = (map_focus == 'full' or map_focus == 'no_scale')
-                if full_like:
-                    bounds_rects = [rect(t) for t in stationary] + moved_rects
-                elif map_focus == 'conflict':
-                    bounds_rects = focus
-                print(
-                    render_tile_map(
-                        stationary,
-                        title='CONFLICT MAP',
-                        focus_rects=focus,
-                        bounds_rects=bounds_rects,
-                        highlight_rects=moved_rects,
-                        no_scale=True,
-                        show_ids=show_ids,
-                        show_axes=show_axes,
-                    ),
-                    end='',
-                    file=_sys.stderr,
-                )
-            except Exception:
-                pass
-        die(f"Destination conflicts detected. Re-run with --overlaps:allow or --overlaps:skip. {details}{more}")
+    """Move one or more row bands, each given as (start_row, end_row, dest_start_row)."""
+    sources: List[Rect] = []
+    deltas: List[Tuple[int, int]] = []
+    for start_row, end_row, dest_start_row in moves:
+        if start_row <= 0 or end_row <= 0 or dest_start_row <= 0:
+            die(f"{switch} values must be positive (1-based).")
+        if start_row > end_row:
+            start_row, end_row = end_row, start_row
+
+        delta = dest_start_row - start_row
+        vlog(verbose, f"[move_rows] normalized source={start_row}-{end_row}, dest_start={dest_start_row}, delta={delta}")
+        sources.append((start_row, end_row, -_ANY, _ANY))
+        deltas.append((delta, 0))
+
+    moving, delta_of, conflicts, blocked = _plan_moves(
+        "move_rows", tiles, sources, deltas,
+        include_overlap=include_overlap, allow_overlap=allow_overlap, skip_overlap=skip_overlap,
+        show_map=show_map, map_focus=map_focus, show_ids=show_ids, show_axes=show_axes, verbose=verbose, switch=switch,
+    )
 
     for t in moving:
         tid = as_int(t, "id")
 
-        if conflicts_by_mid.get(tid) and skip_overlap and not allow_overlap:
-            dlog(debug, f"[move_rows] id={tid}: SKIP (conflicts with {conflicts_by_mid[tid]})")
+        if tid in blocked and skip_overlap and not allow_overlap:
+            dlog(debug, f"[move_rows] id={tid}: SKIP (conflicts with {conflicts.by_mid.get(tid, 'a moved tile')})")
             continue
 
         r0 = as_int(t, "row")
-        r1 = r0 + delta
+        r1 = r0 + delta_of[id(t)][0]
         if r1 < 1:
             die(f"move_rows would move tile id={tid} to invalid row {r1}")
         set_int_like(t, "row", r1)
-        dlog(debug, f"[move_rows] id={tid}: row {r0} -> {r1}" + ("" if not conflicts_by_mid.get(tid) else " (conflict allowed)"))
+        dlog(debug, f"[move_rows] id={tid}: row {r0} -> {r1}" + ("" if tid not in blocked else " (conflict allowed)"))
 
 
+@profiled("op.move_range")
 def move_range(
     tiles: List[Dict[str, Any]],
     *,
-    src_top_row: int,
-    src_left_col: int,
-    src_bottom_row: int,
-    src_right_col: int,
-    dest_top_row: int,
-    dest_left_col: int,
+    moves: Sequence[Tuple[int, int, int, int, int, int]],
     include_overlap: bool,
     allow_overlap: bool,
     skip_overlap: bool,
@@ -232,86 +260,46 @@ def move_range(
     show_axes: str = 'none',
     verbose: bool = False,
     debug: bool = False,
+    switch: str = "--move_range",
 ) -> None:
-    if min(src_top_row, src_left_col, src_bottom_row, src_right_col, dest_top_row, dest_left_col) <= 0:
-        die("--move_range values must be positive (1-based).")
-
-    top_row, bottom_row = (src_top_row, src_bottom_row) if src_top_row <= src_bottom_row else (src_bottom_row, src_top_row)
-    left_col, right_col = (src_left_col, src_right_col) if src_left_col <= src_right_col else (src_right_col, src_left_col)
-
-    delta_r = dest_top_row - top_row
-    delta_c = dest_left_col - left_col
-
-    vlog(
-        verbose,
-        f"[move_range] normalized src=({top_row},{left_col})-({bottom_row},{right_col}), "
-        f"dest_top_left=({dest_top_row},{dest_left_col}), delta=(r:{delta_r}, c:{delta_c})",
-    )
+    """Move one or more regions, each given as
+    (src_top_row, src_left_col, src_bottom_row, src_right_col, dest_top_row, dest_left_col)."""
+    sources: List[Rect] = []
+    deltas: List[Tuple[int, int]] = []
+    for src_top_row, src_left_col, src_bottom_row, src_right_col, dest_top_row, dest_left_col in moves:
+        if min(src_top_row, src_left_col, src_bottom_row, src_right_col, dest_top_row, dest_left_col) <= 0:
+            die(f"{switch} values must be positive (1-based).")
+
+        top_row, bottom_row = (src_top_row, src_bottom_row) if src_top_row <= src_bottom_row else (src_bottom_row, src_top_row)
+        left_col, right_col = (src_left_col, src_right_col) if src_left_col <= src_right_col else (src_right_col, src_left_col)
+
+        delta_r = dest_top_row - top_row
+        delta_c = dest_left_col - left_col
+
+        vlog(
+            verbose,
+            f"[move_range] normalized src=({top_row},{left_col})-({bottom_row},{right_col}), "
+            f"dest_top_left=({dest_top_row},{dest_left_col}), delta=(r:{delta_r}, c:{delta_c})",
+        )
+        sources.append((top_row, bottom_row, left_col, right_col))
+        deltas.append((delta_r, delta_c))
 
-    moving = select_tiles_by_rect_range(
-        tiles,
-        top_row=top_row,
-        left_col=left_col,
-        bottom_row=bottom_row,
-        right_col=right_col,
-        include_overlap=include_overlap,
+    moving, delta_of, conflicts, blocked = _plan_moves(
+        "move_range", tiles, sources, deltas,
+        include_overlap=include_overlap, allow_overlap=allow_overlap, skip_overlap=skip_overlap,
+        show_map=show_map, map_focus=map_focus, show_ids=show_ids, show_axes=show_axes, verbose=verbose, switch=switch,
     )
-    moving_ids = {id(t) for t in moving}
-    stationary = [t for t in tiles if id(t) not in moving_ids]
-
-    vlog(verbose, f"[move_range] tiles selected to move: {len(moving)} (include_overlap={include_overlap})")
-
-    def moved_rect(t: Dict[str, Any]) -> Tuple[int, int, int, int]:
-        r1, r2, c1, c2 = rect(t)
-        return (r1 + delta_r, r2 + delta_r, c1 + delta_c, c2 + delta_c)
-
-    conflicts_by_mid, total_pairs = scan_move_conflicts(moving, stationary, moved_rect)
-
-    if conflicts_by_mid:
-        vlog(verbose, f"[move_range] conflicts detected: {len(conflicts_by_mid)} moving tiles, {total_pairs} overlap pair(s)")
-
-    if conflicts_by_mid and not allow_overlap and not skip_overlap:
-        sample = list(conflicts_by_mid.items())[:10]
-        details = '; '.join([f"move id={mid} conflicts at r{entries[0][1][0]}..{entries[0][1][1]},c{entries[0][1][2]}..{entries[0][1][3]} with {[sid for sid,_ in entries]}" for mid, entries in sample])
-        more = "" if len(conflicts_by_mid) <= 10 else f" (and {len(conflicts_by_mid) - 10} more)"
-        if show_map:
-            try:
-                # Conflict map (pre-flight): gray=stationary, green=moved destination footprints, red=overlap region
-                focus = conflict_rects_from_details(conflicts_by_mid)
-                moved_rects = [moved_rect(t) for t in moving]
-                bounds_rects = None
-                full_like = (map_focus == 'full' or map_focus == 'no_scale')
-                if full_like:
-                    bounds_rects = [rect(t) for t in stationary] + moved_rects
-                elif map_focus == 'conflict':
-                    bounds_rects = focus
-                print(
-                    render_tile_map(
-                        stationary,
-                        title='CONFLICT MAP',
-                        focus_rects=focus,
-                        bounds_rects=bounds_rects,
-                        highlight_rects=moved_rects,
-                        no_scale=True,
-                        show_ids=show_ids,
-                        show_axes=show_axes,
-                    ),
-                    end='',
-                    file=_sys.stderr,
-                )
-            except Exception:
-                pass
-        die(f"Destination conflicts detected. Re-run with --overlaps:allow or --overlaps:skip. {details}{more}")
 
     for t in moving:
         tid = as_int(t, "id")
 
-        if conflicts_by_mid.get(tid) and skip_overlap and not allow_overlap:
-            dlog(debug, f"[move_range] id={tid}: SKIP (conflicts with {conflicts_by_mid[tid]})")
+        if tid in blocked and skip_overlap and not allow_overlap:
+            dlog(debug, f"[move_range] id={tid}: SKIP (conflicts with {conflicts.by_mid.get(tid, 'a moved tile')})")
             continue
 
         r0 = as_int(t, "row")
         c0 = as_int(t, "col")
+        delta_r, delta_c = delta_of[id(t)]
         r1 = r0 + delta_r
         c1 = c0 + delta_c
 
@@ -324,5 +312,5 @@ def move_range(
         dlog(
             debug,
             f"[move_range] id={tid}: (row,col) ({r0},{c0}) -> ({r1},{c1})"
-            + ("" if not conflicts_by_mid.get(tid) else " (conflict allowed)"),
+            + ("" if tid not in blocked else " (conflict allowed)"),
         )
@@ -3,7 +3,9 @@ from __future__ import annotations
 from typing import Any, Dict, List, Tuple, DefaultDict
 from collections import defaultdict
 
+from .overlaps import overlap_components
 from .tiles import as_int, set_int_like
+from .profiling import profiled
 
 Rect = Tuple[int, int, int, int]  # inclusive (top,bottom,left,right)
 
@@ -16,10 +18,6 @@ def _tile_rect(t: Dict[str, Any]) -> Rect:
     return (r0, r0 + rs - 1, c0, c0 + cs - 1)
 
 
-def _rects_overlap(a: Rect, b: Rect) -> bool:
-    return not (a[1] < b[0] or b[1] < a[0] or a[3] < b[2] or b[3] < a[2])
-
-
 def _group_same_origin(tiles: List[Dict[str, Any]]) -> List[List[int]]:
     groups: DefaultDict[Tuple[int, int], List[int]] = defaultdict(list)
     for i, t in enumerate(tiles):
@@ -28,28 +26,7 @@ def _group_same_origin(tiles: List[Dict[str, Any]]) -> List[List[int]]:
 
 
 def _group_overlaps(tiles: List[Dict[str, Any]]) -> List[List[int]]:
-    rects = [_tile_rect(t) for t in tiles]
-    n = len(rects)
-    seen = [False] * n
-    out: List[List[int]] = []
-    for i in range(n):
-        if seen[i]:
-            continue
-        stack = [i]
-        seen[i] = True
-        comp: List[int] = []
-        while stack:
-            k = stack.pop()
-            comp.append(k)
-            rk = rects[k]
-            for j in range(n):
-                if seen[j]:
-                    continue
-                if _rects_overlap(rk, rects[j]):
-                    seen[j] = True
-                    stack.append(j)
-        out.append(sorted(comp))
-    return out
+    return overlap_components([_tile_rect(t) for t in tiles])
 
 
 def _unit_rect(tiles: List[Dict[str, Any]], idxs: List[int]) -> Rect:
@@ -196,6 +173,7 @@ def _components_by_y(urects: List[Rect]) -> List[List[int]]:
     return _components_1d(y_ints)
 
 
+@profiled("op.adjust_tile_spacing")
 def adjust_tile_spacing(
     tiles: List[Dict[str, Any]],
     cells: int,
@@ -380,6 +358,7 @@ def adjust_tile_spacing(
         pack_units_add(atomic_units_for(union))
 
     pack_units_add(overlap_unions)
+@profiled("op.set_tile_spacing")
 def set_tile_spacing(
     tiles: List[Dict[str, Any]],
     gap: int,
@@ -4,8 +4,10 @@ from typing import Any, Dict, List
 
 from .tiles import as_int, set_int_like
 from .util import die, dlog
+from .profiling import profiled
 
 
+@profiled("op.trim_tiles")
 def trim_tiles(
     tiles: List[Dict[str, Any]],
     *,
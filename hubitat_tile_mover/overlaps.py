@@ -0,0 +1,157 @@
+from __future__ import annotations
+
+from bisect import bisect_left, bisect_right
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+Rect = Tuple[int, int, int, int]  # inclusive (r1, r2, c1, c2)
+
+
+class UnionFind:
+    """Disjoint sets over 0..n-1 (path halving, union by size)."""
+
+    __slots__ = ("parent", "size")
+
+    def __init__(self, n: int) -> None:
+        self.parent = list(range(n))
+        self.size = [1] * n
+
+    def find(self, x: int) -> int:
+        parent = self.parent
+        while parent[x] != x:
+            parent[x] = parent[parent[x]]
+            x = parent[x]
+        return x
+
+    def union(self, a: int, b: int) -> None:
+        ra = self.find(a)
+        rb = self.find(b)
+        if ra == rb:
+            return
+        if self.size[ra] < self.size[rb]:
+            ra, rb = rb, ra
+        self.parent[rb] = ra
+        self.size[ra] += self.size[rb]
+
+
+def pair_relation(a: Rect, b: Rect) -> str:
+    """How overlapping rect a relates to b: 'same', 'contains', 'inside' or 'overlaps'."""
+    if a == b:
+        return "same"
+    if a[0] <= b[0] and a[1] >= b[1] and a[2] <= b[2] and a[3] >= b[3]:
+        return "contains"
+    if b[0] <= a[0] and b[1] >= a[1] and b[2] <= a[2] and b[3] >= a[3]:
+        return "inside"
+    return "overlaps"
+
+
+def overlap_pairs(rects: Sequence[Rect]) -> Iterator[Tuple[int, int]]:
+    """Yield every overlapping index pair (i, j), i < j, via a row sweep.
+
+    Rects are visited in top-row order. The rects whose row span is still open sit in
+    two segment trees over the distinct left columns: one keyed by left column, one
+    holding each column span (past its left edge). A new rect [c1, c2] meets the open
+    rects that start inside [c1, c2] plus those that start left of c1 and reach it,
+    so each lookup costs O(log n) plus the pairs it reports. Closed rects are dropped
+    from a node's list the next time that node is read.
+    """
+    n = len(rects)
+    if n < 2:
+        return
+    cols = sorted({r[2] for r in rects})
+    size = 1
+    while size < len(cols):
+        size <<= 1
+    by_start: List[List[int]] = [[] for _ in range(2 * size)]
+    by_span: List[List[int]] = [[] for _ in range(2 * size)]
+    ends = [r[1] for r in rects]
+
+    def live(node: List[List[int]], x: int, r1: int) -> List[int]:
+        ks = node[x]
+        if ks and any(ends[k] < r1 for k in ks):
+            ks = node[x] = [k for k in ks if ends[k] >= r1]
+        return ks
+
+    for i in sorted(range(n), key=lambda i: rects[i][0]):
+        r1, _r2, c1, c2 = rects[i]
+        lo = bisect_left(cols, c1)
+        hi = bisect_right(cols, c2)
+        # Open rects whose left column is in [c1, c2]: canonical nodes of [lo, hi).
+        a, b = lo + size, hi + size
+        while a < b:
+            if a & 1:
+                for k in live(by_start, a, r1):
+                    yield (k, i) if k < i else (i, k)
+                a += 1
+            if b & 1:
+                b -= 1
+                for k in live(by_start, b, r1):
+                    yield (k, i) if k < i else (i, k)
+            a >>= 1
+            b >>= 1
+        # Open rects that start left of c1 and reach it: spans stabbed at lo.
+        x = lo + size
+        while x:
+            for k in live(by_span, x, r1):
+                yield (k, i) if k < i else (i, k)
+            x >>= 1
+        x = lo + size
+        while x:
+            by_start[x].append(i)
+            x >>= 1
+        # Store the span over the left columns strictly right of c1, up to c2.
+        a, b = lo + 1 + size, hi + size
+        while a < b:
+            if a & 1:
+                by_span[a].append(i)
+                a += 1
+            if b & 1:
+                b -= 1
+                by_span[b].append(i)
+            a >>= 1
+            b >>= 1
+
+
+def overlap_relations(rects: Sequence[Rect]) -> Iterator[Tuple[int, int, str]]:
+    """overlap_pairs with pair_relation(rects[i], rects[j]) attached to each pair."""
+    for i, j in overlap_pairs(rects):
+        yield i, j, pair_relation(rects[i], rects[j])
+
+
+def overlap_components(
+    rects: Sequence[Rect],
+    *,
+    accept: Optional[Callable[[int, int, str], bool]] = None,
+    include_singletons: bool = True,
+    relations: Optional[Iterable[Tuple[int, int, str]]] = None,
+) -> List[List[int]]:
+    """Connected components of the overlap graph, as sorted index lists.
+
+    accept(i, j, relation) can veto individual edges; relations reuses pairs already
+    taken from overlap_relations(rects). Components are ordered by their smallest
+    index, matching a DFS that starts from each unseen index in turn. Without
+    include_singletons, indices with no accepted edge are dropped.
+    """
+    n = len(rects)
+    uf = UnionFind(n)
+    linked = [False] * n
+    if relations is None:
+        relations = overlap_relations(rects) if accept is not None else ((i, j, "") for i, j in overlap_pairs(rects))
+    for i, j, rel in relations:
+        if accept is not None and not accept(i, j, rel):
+            continue
+        uf.union(i, j)
+        linked[i] = True
+        linked[j] = True
+    groups: Dict[int, List[int]] = {}
+    out: List[List[int]] = []
+    for i in range(n):
+        if not include_singletons and not linked[i]:
+            continue
+        root = uf.find(i)
+        g = groups.get(root)
+        if g is None:
+            g = []
+            groups[root] = g
+            out.append(g)
+        g.append(i)
+    return out
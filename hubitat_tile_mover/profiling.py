@@ -0,0 +1,223 @@
+from __future__ import annotations
+
+import functools
+import os
+import sys
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple, TypeVar
+
+F = TypeVar("F", bound=Callable[..., Any])
+
+DEFAULT_PSTATS_PATH = "hubitat_tile_mover.pstats"
+DEFAULT_TRACE_PATH = "hubitat_tile_mover_trace.json"
+
+
+class _Span:
+    __slots__ = ("prof", "name", "cat", "args", "t0", "c0", "tid")
+
+    def __init__(self, prof: "Profiler", name: str, cat: str, args: Optional[Dict[str, Any]]) -> None:
+        self.prof = prof
+        self.name = name
+        self.cat = cat
+        self.args = args
+        self.tid = prof._tid()
+        self.t0 = time.perf_counter()
+        self.c0 = time.thread_time()
+
+    def end(self) -> None:
+        if self.prof is None:
+            return
+        wall = time.perf_counter() - self.t0
+        cpu = time.thread_time() - self.c0
+        self.prof._open_names().discard(self.name)
+        self.prof._record(self.name, self.cat, self.t0, wall, cpu, self.tid, self.args)
+        self.prof = None  # type: ignore[assignment]
+
+    def __enter__(self) -> "_Span":
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self.end()
+
+
+class _NullSpan:
+    __slots__ = ()
+
+    def end(self) -> None:
+        pass
+
+    def __enter__(self) -> "_NullSpan":
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        pass
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class Profiler:
+    """Collects wall/CPU spans for one run (all threads) and reports them when finished.
+
+    mode: summary (per-phase table on stderr), cprofile (also dumps a .pstats file) or
+    trace (also writes Chrome-trace JSON; open it in chrome://tracing or Perfetto).
+    """
+
+    def __init__(self, mode: str = "summary", out_path: Optional[str] = None) -> None:
+        import threading
+
+        self.mode = mode
+        self.out_path = out_path
+        self.t0 = time.perf_counter()
+        self.c0 = time.process_time()
+        # (name, cat, start, wall, cpu, tid, args)
+        self.events: List[Tuple[str, str, float, float, float, int, Optional[Dict[str, Any]]]] = []
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._tid = threading.get_ident
+        self._cprof = None
+        if mode == "cprofile":
+            import cProfile
+
+            self._cprof = cProfile.Profile()
+            self._cprof.enable()
+
+    def span(self, name: str, cat: str = "phase", args: Optional[Dict[str, Any]] = None) -> Any:
+        # Recursive calls (e.g. CSS helpers descending into @media blocks) are folded into
+        # the outermost span so totals never count the same time twice.
+        opened = self._open_names()
+        if name in opened:
+            return _NULL_SPAN
+        opened.add(name)
+        return _Span(self, name, cat, args)
+
+    def _open_names(self) -> set:
+        names = getattr(self._local, "names", None)
+        if names is None:
+            names = set()
+            self._local.names = names
+        return names
+
+    def add(self, name: str, start: float, wall: float, *, cat: str = "phase", cpu: float = 0.0) -> None:
+        """Record a span that was timed before the profiler existed (e.g. argument parsing)."""
+        self._record(name, cat, start, wall, cpu, self._tid(), None)
+
+    def _record(self, name: str, cat: str, start: float, wall: float, cpu: float, tid: int, args: Optional[Dict[str, Any]]) -> None:
+        with self._lock:
+            self.events.append((name, cat, start, wall, cpu, tid, args))
+
+    def finish(self) -> None:
+        total_wall = time.perf_counter() - self.t0
+        total_cpu = time.process_time() - self.c0
+        if self._cprof is not None:
+            self._cprof.disable()
+        self._print_summary(total_wall, total_cpu)
+        if self.mode == "cprofile" and self._cprof is not None:
+            path = self.out_path or DEFAULT_PSTATS_PATH
+            self._cprof.dump_stats(path)
+            print(f"Profile: cProfile stats written to {path} (python -m pstats {path})", file=sys.stderr)
+        elif self.mode == "trace":
+            path = self.out_path or DEFAULT_TRACE_PATH
+            self._write_trace(path, total_wall)
+            print(f"Profile: Chrome trace written to {path} (open in chrome://tracing or ui.perfetto.dev)", file=sys.stderr)
+
+    def _print_summary(self, total_wall: float, total_cpu: float) -> None:
+        agg: Dict[str, List[float]] = {}
+        order: List[str] = []
+        for name, _cat, _start, wall, cpu, _tid, _args in sorted(self.events, key=lambda e: e[2]):
+            a = agg.get(name)
+            if a is None:
+                a = [0, 0.0, 0.0]
+                agg[name] = a
+                order.append(name)
+            a[0] += 1
+            a[1] += wall
+            a[2] += cpu
+        width = max([len(n) for n in order] + [len("phase")])
+        lines = [f"Profile: total wall {total_wall * 1000:.1f} ms, cpu {total_cpu * 1000:.1f} ms"]
+        lines.append(f"  {'phase':<{width}}  {'calls':>5}  {'wall ms':>10}  {'cpu ms':>10}  {'wall %':>6}")
+        for name in order:
+            calls, wall, cpu = agg[name]
+            pct = (wall / total_wall * 100.0) if total_wall > 0 else 0.0
+            lines.append(f"  {name:<{width}}  {int(calls):>5}  {wall * 1000:>10.2f}  {cpu * 1000:>10.2f}  {pct:>5.1f}%")
+        print("\n".join(lines), file=sys.stderr, flush=True)
+
+    def _write_trace(self, path: str, total_wall: float) -> None:
+        import json
+
+        pid = os.getpid()
+        events: List[Dict[str, Any]] = [
+            {"name": "process_name", "ph": "M", "pid": pid, "tid": 0, "args": {"name": "hubitat_tile_mover"}},
+            {"name": "run", "cat": "run", "ph": "X", "pid": pid, "tid": self._main_tid(), "ts": 0.0, "dur": total_wall * 1e6},
+        ]
+        for name, cat, start, wall, cpu, tid, args in sorted(self.events, key=lambda e: (e[2], -e[3])):
+            ev_args = {"cpu_ms": round(cpu * 1000, 3)}
+            if args:
+                ev_args.update(args)
+            events.append({
+                "name": name,
+                "cat": cat,
+                "ph": "X",
+                "pid": pid,
+                "tid": tid,
+                "ts": (start - self.t0) * 1e6,
+                "dur": wall * 1e6,
+                "args": ev_args,
+            })
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f)
+
+    def _main_tid(self) -> int:
+        import threading
+
+        return threading.main_thread().ident or 0
+
+
+_ACTIVE: Optional[Profiler] = None
+
+
+def enable_profile(mode: str, out_path: Optional[str] = None) -> Profiler:
+    global _ACTIVE
+    if _ACTIVE is None:
+        _ACTIVE = Profiler(mode, out_path)
+    return _ACTIVE
+
+
+def active_profiler() -> Optional[Profiler]:
+    return _ACTIVE
+
+
+def finish_profile() -> None:
+    """Report and disable the active profiler (no-op when --profile was not given)."""
+    global _ACTIVE
+    prof, _ACTIVE = _ACTIVE, None
+    if prof is not None:
+        prof.finish()
+
+
+def span(name: str, cat: str = "phase", **args: Any) -> Any:
+    """Context manager timing one phase; free when profiling is off.
+
+    Also usable without `with`: s = span(...); ...; s.end().
+    """
+    prof = _ACTIVE
+    if prof is None:
+        return _NULL_SPAN
+    return prof.span(name, cat, args or None)
+
+
+def profiled(name: str, cat: str = "op") -> Callable[[F], F]:
+    """Decorator: record every call of the function as a span named `name`."""
+
+    def deco(fn: F) -> F:
+        @functools.wraps(fn)
+        def wrapper(*a: Any, **kw: Any) -> Any:
+            prof = _ACTIVE
+            if prof is None:
+                return fn(*a, **kw)
+            with prof.span(name, cat):
+                return fn(*a, **kw)
+
+        return wrapper  # type: ignore[return-value]
+
+    return deco
@@ -0,0 +1,178 @@
+from __future__ import annotations
+
+import sys
+from typing import Any, Callable, List, Optional
+
+from .snapshot import LayoutSnapshot
+from .util import err, ok, warn
+
+# In-shell undo depth (each level holds one compact JSON snapshot of the layout).
+SHELL_UNDO_LIMIT = 100
+
+SHELL_HELP = """Shell commands (the layout stays in memory until you write it):
+  --<action> ...            any action switches, as on the command line (e.g. --move:range 1 1 4 8 1 20)
+  map [full|conflicts|no_scale]
+                            show the layout map
+  list [TYPE] [KEYS]        list tiles (types: plain, tree, overlap, nested, conflicts)
+  write [--output:...]      write / POST the layout (default: the command-line outputs)
+  undo / redo               step back / forward through this session's changes
+  reload                    discard unsaved changes and import the layout again
+  status                    tile count and unsaved changes
+  help                      this text
+  quit / exit               leave the shell (twice to discard unsaved changes)"""
+
+
+class LayoutShell:
+    """Read-eval loop over one in-memory layout.
+
+    main supplies the layout and three callbacks: step(obj, tokens) runs one set of
+    action switches against obj in place and returns True when it may have changed the
+    layout; write(obj, tokens) writes it out; reload() imports it again. Tiles stay the
+    same objects between commands, so the per-tile geometry and fingerprint caches, the
+    parsed CSS and the hub session carry over from one command to the next.
+    """
+
+    def __init__(
+        self,
+        obj: Any,
+        *,
+        step: Callable[[Any, List[str]], bool],
+        write: Callable[[Any, List[str]], None],
+        reload: Callable[[], Any],
+    ) -> None:
+        self.obj = obj
+        self._step = step
+        self._write = write
+        self._reload = reload
+        self._undo: List[LayoutSnapshot] = []
+        self._redo: List[LayoutSnapshot] = []
+        self._saved_root = self._root()
+        self._quit_armed = False
+
+    def _root(self) -> Optional[str]:
+        from .fingerprint import fingerprint_layout
+
+        try:
+            return fingerprint_layout(self.obj).root
+        except Exception:
+            return None
+
+    @property
+    def dirty(self) -> bool:
+        return self._root() != self._saved_root
+
+    def _replace(self, obj: Any) -> None:
+        from .fingerprint import clear_tile_leaf_cache
+        from .tiles import clear_tile_geom_cache
+
+        # The old tiles are gone for good; drop their cache entries instead of keeping them alive.
+        clear_tile_leaf_cache()
+        clear_tile_geom_cache()
+        self.obj = obj
+
+    def _tile_count(self) -> int:
+        from .jsonio import extract_tiles_container
+
+        _kind, _container, tiles_any = extract_tiles_container(self.obj, verbose=False, debug=False)
+        return len(tiles_any or [])
+
+    def execute(self, tokens: List[str]) -> bool:
+        """Run one command; False when the shell should exit."""
+        cmd = tokens[0].lower()
+        if cmd != "quit" and cmd != "exit":
+            self._quit_armed = False
+        if cmd in ("quit", "exit"):
+            if self.dirty and not self._quit_armed:
+                self._quit_armed = True
+                print(f"{warn('WARN:')} unsaved changes; use write, or {cmd} again to discard them.", file=sys.stderr)
+                return True
+            return False
+        if cmd == "help":
+            print(SHELL_HELP)
+        elif cmd == "status":
+            print(f"{self._tile_count()} tile(s); {'unsaved changes' if self.dirty else 'no unsaved changes'}; {len(self._undo)} undo / {len(self._redo)} redo step(s).")
+        elif cmd in ("undo", "redo"):
+            src, dst = (self._undo, self._redo) if cmd == "undo" else (self._redo, self._undo)
+            if not src:
+                print(f"Nothing to {cmd}.", file=sys.stderr)
+                return True
+            dst.append(LayoutSnapshot.of(self.obj))
+            self._replace(src.pop().load())
+            print(f"{ok('OK:')} {cmd} ({self._tile_count()} tile(s)).", file=sys.stderr)
+        elif cmd == "reload":
+            self._undo.append(LayoutSnapshot.of(self.obj))
+            self._redo.clear()
+            self._replace(self._reload())
+            self._saved_root = self._root()
+            print(f"{ok('OK:')} reloaded ({self._tile_count()} tile(s)).", file=sys.stderr)
+        elif cmd == "write":
+            self._write(self.obj, tokens[1:])
+            self._saved_root = self._root()
+        elif cmd == "map":
+            # Views never change the layout: no undo snapshot.
+            self._step(self.obj, ["--show_map" + (f":{tokens[1]}" if len(tokens) > 1 else "")] + tokens[2:])
+        elif cmd == "list":
+            self._step(self.obj, ["--list_tiles" + (f":{tokens[1]}" if len(tokens) > 1 else "")] + tokens[2:])
+        elif cmd.startswith("-"):
+            self._run_step(tokens)
+        else:
+            print(f"Unknown command: {tokens[0]} (type help).", file=sys.stderr)
+        return True
+
+    def _run_step(self, tokens: List[str]) -> None:
+        before = LayoutSnapshot.of(self.obj)
+        try:
+            changed = self._step(self.obj, tokens)
+        except BaseException:
+            # A step that stops part way (an error, a declined prompt, Ctrl+C) leaves the layout as it was.
+            self._replace(before.load())
+            raise
+        if changed:
+            self._undo.append(before)
+            del self._undo[:-SHELL_UNDO_LIMIT]
+            self._redo.clear()
+
+    def run(self, stream=None) -> None:
+        """Read commands from stream (default stdin) until quit/exit or end of input."""
+        from .io_helpers import split_step_line
+
+        stream = sys.stdin if stream is None else stream
+        interactive = stream.isatty()
+        if interactive:
+            try:
+                import readline  # noqa: F401  (line editing and history for input())
+            except ImportError:
+                pass
+            print(f"{self._tile_count()} tile(s) loaded. Type help for commands.", file=sys.stderr)
+        while True:
+            try:
+                if interactive:
+                    line = input("tiles* > " if self.dirty else "tiles > ")
+                else:
+                    line = stream.readline()
+                    if not line:
+                        break
+            except EOFError:
+                break
+            except KeyboardInterrupt:
+                print(file=sys.stderr)
+                continue
+            try:
+                tokens = split_step_line(line)
+            except ValueError as e:
+                print(f"{err('ERROR:')} {e}", file=sys.stderr)
+                continue
+            if not tokens:
+                continue
+            try:
+                if not self.execute(tokens):
+                    return
+            except SystemExit:
+                # die() already printed the error; the shell keeps going.
+                pass
+            except KeyboardInterrupt:
+                print(file=sys.stderr)
+            except Exception as e:
+                print(f"{err('ERROR:')} {e}", file=sys.stderr)
+        if self.dirty:
+            print(f"{warn('WARN:')} end of input; unsaved changes were not written.", file=sys.stderr)
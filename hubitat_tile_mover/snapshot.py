@@ -0,0 +1,37 @@
+from __future__ import annotations
+
+from typing import Any
+
+
+class LayoutSnapshot:
+    """Immutable restore point for a layout: the JSON text it was read from.
+
+    Ops edit the loaded layout in place, so a restore point has to outlive those
+    edits. Holding the source text costs one string instead of a deepcopy of every
+    tile; load() decodes a fresh, private object only when a restore actually happens.
+    """
+
+    __slots__ = ("text",)
+
+    def __init__(self, text: str) -> None:
+        self.text = text
+
+    @classmethod
+    def of(cls, obj: Any) -> "LayoutSnapshot":
+        """Snapshot an object that has no source text (compact JSON)."""
+        from .jsoncodec import dumps
+
+        return cls(dumps(obj))
+
+    @classmethod
+    def from_file(cls, path: str) -> "LayoutSnapshot":
+        with open(path, "r", encoding="utf-8") as f:
+            return cls(f.read())
+
+    def load(self) -> Any:
+        from .jsoncodec import loads
+
+        return loads(self.text)
+
+    def __repr__(self) -> str:
+        return f"LayoutSnapshot({len(self.text)} chars)"
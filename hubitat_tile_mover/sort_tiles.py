@@ -4,6 +4,7 @@ from typing import Any, Callable, Dict, List, Tuple
 
 from .tiles import as_int
 from .util import die
+from .profiling import profiled
 
 
 def _parse_sort_spec(user_spec: str) -> List[Tuple[str, bool]]:
@@ -92,6 +93,7 @@ def make_sort_key(spec: List[Tuple[str, bool]]) -> Callable[[Dict[str, Any]], Tu
     return key
 
 
+@profiled("sort", cat="phase")
 def sort_tiles(tiles: List[Dict[str, Any]], user_spec: str) -> List[Dict[str, Any]]:
     spec = complete_sort_spec(user_spec)
     key_fn = make_sort_key(spec)
@@ -0,0 +1,86 @@
+from __future__ import annotations
+
+from typing import Dict, List, Optional, Sequence, Tuple
+
+Rect = Tuple[int, int, int, int]  # inclusive (r1, r2, c1, c2)
+
+# Rects covering more buckets than this are kept in a side list and checked linearly,
+# so one huge background tile does not get copied into every bucket.
+_MAX_BUCKETS_PER_RECT = 64
+
+
+def overlap_rect(a: Rect, b: Rect) -> Rect:
+    """Intersection of two overlapping inclusive rects."""
+    return (max(a[0], b[0]), min(a[1], b[1]), max(a[2], b[2]), min(a[3], b[3]))
+
+
+class RectIndex:
+    """Uniform grid-bucket index over a fixed list of rects.
+
+    query() returns the indices (ascending, i.e. input order) of all rects that
+    overlap the probe rect, so callers see the same ordering as a linear scan.
+    """
+
+    __slots__ = ("rects", "_cell", "_buckets", "_large")
+
+    def __init__(self, rects: Sequence[Rect], cell: Optional[int] = None) -> None:
+        self.rects: List[Rect] = list(rects)
+        if cell is None:
+            cell = self._pick_cell(self.rects)
+        self._cell = max(1, int(cell))
+        self._buckets: Dict[Tuple[int, int], List[int]] = {}
+        self._large: List[int] = []
+        cs = self._cell
+        for i, (r1, r2, c1, c2) in enumerate(self.rects):
+            br1, br2, bc1, bc2 = r1 // cs, r2 // cs, c1 // cs, c2 // cs
+            if (br2 - br1 + 1) * (bc2 - bc1 + 1) > _MAX_BUCKETS_PER_RECT:
+                self._large.append(i)
+                continue
+            for br in range(br1, br2 + 1):
+                for bc in range(bc1, bc2 + 1):
+                    self._buckets.setdefault((br, bc), []).append(i)
+
+    @staticmethod
+    def _pick_cell(rects: Sequence[Rect]) -> int:
+        # About twice the average tile extent keeps most tiles in 1-4 buckets.
+        if not rects:
+            return 1
+        total = 0
+        for r1, r2, c1, c2 in rects:
+            total += max(r2 - r1, c2 - c1) + 1
+        return max(2, (2 * total) // len(rects))
+
+    def __len__(self) -> int:
+        return len(self.rects)
+
+    def query(self, probe: Rect) -> List[int]:
+        """Indices of rects overlapping probe, in input order."""
+        pr1, pr2, pc1, pc2 = probe
+        cs = self._cell
+        rects = self.rects
+        if (pr2 // cs - pr1 // cs + 1) * (pc2 // cs - pc1 // cs + 1) > len(rects):
+            # Probe spans more buckets than there are rects; a linear pass is cheaper.
+            return [
+                i for i, (r1, r2, c1, c2) in enumerate(rects)
+                if not (r2 < pr1 or pr2 < r1 or c2 < pc1 or pc2 < c1)
+            ]
+        seen = set()
+        hits: List[int] = []
+        for br in range(pr1 // cs, pr2 // cs + 1):
+            for bc in range(pc1 // cs, pc2 // cs + 1):
+                bucket = self._buckets.get((br, bc))
+                if not bucket:
+                    continue
+                for i in bucket:
+                    if i in seen:
+                        continue
+                    seen.add(i)
+                    r1, r2, c1, c2 = rects[i]
+                    if not (r2 < pr1 or pr2 < r1 or c2 < pc1 or pc2 < c1):
+                        hits.append(i)
+        for i in self._large:
+            r1, r2, c1, c2 = rects[i]
+            if not (r2 < pr1 or pr2 < r1 or c2 < pc1 or pc2 < c1):
+                hits.append(i)
+        hits.sort()
+        return hits
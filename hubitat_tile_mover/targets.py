@@ -0,0 +1,157 @@
+from __future__ import annotations
+
+import os
+import sys
+import threading
+import time
+from dataclasses import dataclass
+from typing import Callable, List, Optional
+
+from .util import die, err, ok
+
+
+def read_targets_file(path: str) -> List[str]:
+    """Dashboard URLs from a text file: one per line; blank lines and '#' comments are ignored."""
+    try:
+        with open(path, "r", encoding="utf-8-sig") as f:
+            lines = f.read().splitlines()
+    except OSError as e:
+        die(f"Cannot read targets file '{path}': {e}")
+    urls: List[str] = []
+    for line in lines:
+        s = line.strip()
+        if not s or s.startswith("#"):
+            continue
+        urls.append(s)
+    return urls
+
+
+class _RoutedStream:
+    """sys.stdout/sys.stderr stand-in that sends each worker thread's writes to its own buffer.
+
+    Threads without a registered buffer (the main thread) write straight through.
+    """
+
+    def __init__(self, real) -> None:
+        self._real = real
+        self._local = threading.local()
+
+    def capture(self, buf: Optional[List[str]]) -> None:
+        self._local.buf = buf
+
+    def write(self, s: str) -> int:
+        buf = getattr(self._local, "buf", None)
+        if buf is None:
+            return self._real.write(s)
+        buf.append(s)
+        return len(s)
+
+    def flush(self) -> None:
+        if getattr(self._local, "buf", None) is None:
+            self._real.flush()
+
+    def isatty(self) -> bool:
+        return self._real.isatty()
+
+    def __getattr__(self, name: str):
+        return getattr(self._real, name)
+
+
+@dataclass
+class TargetResult:
+    url: str
+    code: int
+    output: str
+    seconds: float
+    backup_path: Optional[str] = None
+
+    @property
+    def ok(self) -> bool:
+        return self.code == 0
+
+    def error_line(self) -> str:
+        for line in reversed(self.output.splitlines()):
+            if "ERROR:" in line:
+                return line.split("ERROR:", 1)[1].strip()
+        return f"exit code {self.code}"
+
+
+def run_targets(
+    urls: List[str],
+    run_one: Callable[[str], None],
+    *,
+    jobs: int,
+    debug: bool = False,
+    backup_path_for: Optional[Callable[[str], str]] = None,
+) -> List[TargetResult]:
+    """Run run_one(url) for every dashboard on a bounded thread pool.
+
+    Each run's terminal output is captured and printed as one block when it finishes,
+    so dashboards never interleave. Results are returned in input order.
+    """
+    from concurrent.futures import ThreadPoolExecutor, as_completed
+
+    out = _RoutedStream(sys.stdout)
+    errs = _RoutedStream(sys.stderr)
+
+    def _worker(url: str) -> TargetResult:
+        buf: List[str] = []
+        out.capture(buf)
+        errs.capture(buf)
+        t0 = time.perf_counter()
+        code = 0
+        try:
+            run_one(url)
+        except SystemExit as e:
+            code = e.code if isinstance(e.code, int) else (0 if e.code is None else 1)
+        except Exception as e:
+            code = 2
+            if debug:
+                import traceback
+                buf.append(traceback.format_exc())
+            buf.append(f"{err('ERROR:')} {str(e) or e.__class__.__name__}\n")
+        finally:
+            out.capture(None)
+            errs.capture(None)
+        bp = backup_path_for(url) if backup_path_for else None
+        return TargetResult(
+            url=url,
+            code=code,
+            output="".join(buf),
+            seconds=time.perf_counter() - t0,
+            backup_path=bp if (bp and os.path.exists(bp)) else None,
+        )
+
+    results: List[Optional[TargetResult]] = [None] * len(urls)
+    real_out, real_err = sys.stdout, sys.stderr
+    sys.stdout, sys.stderr = out, errs
+    pool = ThreadPoolExecutor(max_workers=max(1, jobs), thread_name_prefix="target")
+    try:
+        futs = {pool.submit(_worker, u): i for i, u in enumerate(urls)}
+        done = 0
+        for fut in as_completed(futs):
+            i = futs[fut]
+            res = fut.result()
+            results[i] = res
+            done += 1
+            print(f"=== [{done}/{len(urls)}] {res.url} ===", file=real_err, flush=True)
+            if res.output:
+                real_err.write(res.output if res.output.endswith("\n") else res.output + "\n")
+                real_err.flush()
+    finally:
+        # On Ctrl-C, queued dashboards are dropped but running ones finish (no half-done POSTs).
+        pool.shutdown(wait=True, cancel_futures=True)
+        sys.stdout, sys.stderr = real_out, real_err
+    return [r for r in results if r is not None]
+
+
+def print_target_summary(results: List[TargetResult]) -> None:
+    n_ok = sum(1 for r in results if r.ok)
+    n_bad = len(results) - n_ok
+    print(f"Targets: {len(results)} dashboard(s), {n_ok} OK, {n_bad} failed.", file=sys.stderr)
+    for r in results:
+        if r.ok:
+            tail = f"backup: {r.backup_path}" if r.backup_path else ""
+            print(f"  {ok('OK    ')} {r.url}  ({r.seconds:.1f}s) {tail}".rstrip(), file=sys.stderr)
+        else:
+            print(f"  {err('FAILED')} {r.url}  ({r.seconds:.1f}s) {r.error_line()}", file=sys.stderr)
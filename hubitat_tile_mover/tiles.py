@@ -1,7 +1,10 @@
 from __future__ import annotations
 
-from typing import Any, Dict, List, Tuple, Optional
+import threading
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Tuple, Optional
 
+from .fingerprint import invalidate_tile_leaf, retain_tile_leaves, tile_leaf_scope
 from .util import die
 
 
@@ -86,10 +89,11 @@ def _ci_get_pos_int(tile: Dict[str, Any], key_lower: str) -> Optional[int]:
     return _pos_int_from_value(tile, k, tile.get(k))
 
 
-def get_span(tile: Dict[str, Any], keys: List[str], default: int = 1) -> int:
-    """Strict synonym span lookup.
+def _span_with_key(tile: Dict[str, Any], keys: List[str], default: int = 1) -> Tuple[int, Optional[str]]:
+    """Strict synonym span lookup returning (span, source_key).
 
     If more than one of the provided keys exists and values differ, this errors.
+    source_key is None when no key was present and the default was used.
     """
     found: List[Tuple[str, int]] = []
     for k in keys:
@@ -97,65 +101,106 @@ def get_span(tile: Dict[str, Any], keys: List[str], default: int = 1) -> int:
             found.append((k, _pos_int_from_value(tile, k, tile[k])))
 
     if not found:
-        return default
+        return (default, None)
 
     vals = {v for _, v in found}
     if len(vals) > 1:
         die(f"Conflicting span values for {keys}: {found} in tile {tile}")
 
-    return found[0][1]
+    return (found[0][1], found[0][0])
 
 
-def get_span_with_fallback(
+def get_span(tile: Dict[str, Any], keys: List[str], default: int = 1) -> int:
+    """Strict synonym span lookup.
+
+    If more than one of the provided keys exists and values differ, this errors.
+    """
+    return _span_with_key(tile, keys, default=default)[0]
+
+
+def _span_with_fallback_and_key(
     tile: Dict[str, Any],
     primary_keys: List[str],
     fallback_keys: List[str],
     default: int = 1,
-) -> int:
-    """Span lookup with a primary and a fallback key set.
-
-    This preserves strict conflict detection within each set, but will only consult
-    the fallback keys if none of the primary keys are present.
-
-    Rationale: some dashboard exports use width/height instead of colSpan/rowSpan.
-    """
+) -> Tuple[int, Optional[str]]:
     for keys in (primary_keys, fallback_keys):
         if any(k in tile for k in keys):
-            return get_span(tile, keys, default=default)
+            return _span_with_key(tile, keys, default=default)
 
     # Case-insensitive support (some exporters vary casing).
     for k in primary_keys:
         ki = _ci_key(tile, k.lower())
         if ki is not None:
-            return get_span(tile, [ki], default=default)
+            return _span_with_key(tile, [ki], default=default)
     for k in fallback_keys:
         ki = _ci_key(tile, k.lower())
         if ki is not None:
-            return get_span(tile, [ki], default=default)
+            return _span_with_key(tile, [ki], default=default)
 
-    return default
+    return (default, None)
 
 
-def tile_row_extent(tile: Dict[str, Any]) -> Tuple[int, int]:
+def get_span_with_fallback(
+    tile: Dict[str, Any],
+    primary_keys: List[str],
+    fallback_keys: List[str],
+    default: int = 1,
+) -> int:
+    """Span lookup with a primary and a fallback key set.
+
+    This preserves strict conflict detection within each set, but will only consult
+    the fallback keys if none of the primary keys are present.
+
+    Rationale: some dashboard exports use width/height instead of colSpan/rowSpan.
+    """
+    return _span_with_fallback_and_key(tile, primary_keys, fallback_keys, default=default)[0]
+
+
+# Hubitat exports commonly use rowSpan/colSpan. Some variants (including third-party tools)
+# may instead use width/height or sizeX/sizeY style keys. We support a best-effort fallback.
+_ROW_SPAN_PRIMARY = ["rowSpan", "rowspan"]
+_ROW_SPAN_FALLBACK = [
+    "height", "Height", "h",
+    "sizeY", "sizey", "SizeY",
+    "ySpan", "yspan", "spanY", "spany",
+    "tileHeight", "tileheight",
+    "rows", "Rows",
+]
+_COL_SPAN_PRIMARY = ["colSpan", "colspan"]
+_COL_SPAN_FALLBACK = [
+    "width", "Width", "w",
+    "sizeX", "sizex", "SizeX",
+    "xSpan", "xspan", "spanX", "spanx",
+    "tileWidth", "tilewidth",
+    "cols", "Cols",
+]
+
+
+def _nested_span_key(tile: Dict[str, Any], axis: str) -> Optional[str]:
+    """Return the dotted source key (e.g. "size.y") that _nested_span() reads, if any."""
+    containers = ["size", "Size", "dimensions", "Dimensions", "dim", "Dim"]
+    x_keys = ["x", "w", "width", "cols", "col", "spanX", "xSpan"]
+    y_keys = ["y", "h", "height", "rows", "row", "spanY", "ySpan"]
+    want = x_keys if axis == "x" else y_keys
+    for ck in containers:
+        obj = tile.get(ck)
+        if isinstance(obj, dict):
+            for kk in want:
+                k_actual = _ci_key(obj, kk.lower())
+                if k_actual is not None:
+                    return f"{ck}.{k_actual}"
+    return None
+
+
+def _resolve_row_extent(tile: Dict[str, Any]) -> Tuple[int, int, Optional[str]]:
     r = as_int(tile, "row")
-    # Hubitat exports commonly use rowSpan/colSpan. Some variants (including third-party tools)
-    # may instead use width/height or sizeX/sizeY style keys. We support a best-effort fallback.
-    rs = get_span_with_fallback(
-        tile,
-        ["rowSpan", "rowspan"],
-        [
-            "height", "Height", "h",
-            "sizeY", "sizey", "SizeY",
-            "ySpan", "yspan", "spanY", "spany",
-            "tileHeight", "tileheight",
-            "rows", "Rows",
-        ],
-        default=1,
-    )
+    rs, key = _span_with_fallback_and_key(tile, _ROW_SPAN_PRIMARY, _ROW_SPAN_FALLBACK, default=1)
     if rs == 1:
         nested = _nested_span(tile, "y")
         if nested is not None:
             rs = nested
+            key = _nested_span_key(tile, "y")
     if rs == 1:
         # Some variants store an absolute end row instead of a span.
         for end_key in ("rowend", "endrow", "row2", "bottom", "r2"):
@@ -164,28 +209,19 @@ def tile_row_extent(tile: Dict[str, Any]) -> Tuple[int, int]:
                 if endv < r:
                     die(f"Tile end-row '{end_key}' must be >= row ({r}), got {endv}: {tile}")
                 rs = endv - r + 1
+                key = _ci_key(tile, end_key)
                 break
-    return (r, r + rs - 1)
+    return (r, r + rs - 1, key)
 
 
-def tile_col_extent(tile: Dict[str, Any]) -> Tuple[int, int]:
+def _resolve_col_extent(tile: Dict[str, Any]) -> Tuple[int, int, Optional[str]]:
     c = as_int(tile, "col")
-    cs = get_span_with_fallback(
-        tile,
-        ["colSpan", "colspan"],
-        [
-            "width", "Width", "w",
-            "sizeX", "sizex", "SizeX",
-            "xSpan", "xspan", "spanX", "spanx",
-            "tileWidth", "tilewidth",
-            "cols", "Cols",
-        ],
-        default=1,
-    )
+    cs, key = _span_with_fallback_and_key(tile, _COL_SPAN_PRIMARY, _COL_SPAN_FALLBACK, default=1)
     if cs == 1:
         nested = _nested_span(tile, "x")
         if nested is not None:
             cs = nested
+            key = _nested_span_key(tile, "x")
     if cs == 1:
         # Some variants store an absolute end col instead of a span.
         for end_key in ("colend", "endcol", "col2", "right", "c2"):
@@ -194,14 +230,238 @@ def tile_col_extent(tile: Dict[str, Any]) -> Tuple[int, int]:
                 if endv < c:
                     die(f"Tile end-col '{end_key}' must be >= col ({c}), got {endv}: {tile}")
                 cs = endv - c + 1
+                key = _ci_key(tile, end_key)
                 break
-    return (c, c + cs - 1)
+    return (c, c + cs - 1, key)
+
+
+def _lenient_id(tile: Dict[str, Any]) -> Optional[int]:
+    v = tile.get("id")
+    if isinstance(v, bool):
+        return None
+    if isinstance(v, int):
+        return v
+    if isinstance(v, str) and v.strip().lstrip("+-").isdigit():
+        try:
+            return int(v.strip())
+        except ValueError:
+            # isdigit() also accepts "--5" (after lstrip) and superscript digits; int() does not.
+            return None
+    return None
+
+
+# A span schema is the (row_span_key, col_span_key) pair a tile uses, e.g.
+# ("rowSpan", "colSpan") or ("height", "width"). None means the axis has no span key.
+SpanSchema = Tuple[Optional[str], Optional[str]]
+
+_ROW_SPAN_KEYS = frozenset(_ROW_SPAN_PRIMARY + _ROW_SPAN_FALLBACK)
+_COL_SPAN_KEYS = frozenset(_COL_SPAN_PRIMARY + _COL_SPAN_FALLBACK)
+_ROW_SPAN_KEYS_LOWER = frozenset(k.lower() for k in _ROW_SPAN_KEYS)
+_COL_SPAN_KEYS_LOWER = frozenset(k.lower() for k in _COL_SPAN_KEYS)
+# Keys that make a tile ineligible for the fast accessor (nested size objects, end coords).
+_OTHER_SPAN_KEYS_LOWER = frozenset([
+    "size", "dimensions", "dim",
+    "rowend", "endrow", "row2", "bottom", "r2",
+    "colend", "endcol", "col2", "right", "c2",
+])
+
+
+def _tile_span_schema(tile: Dict[str, Any]) -> Optional[SpanSchema]:
+    """Return the tile's plain span key pair, or None if it needs the strict resolver.
+
+    Strict resolution is required for synonyms (two row span keys), case variants
+    not in the known key lists, nested size objects and absolute end coordinates.
+    """
+    rk: Optional[str] = None
+    ck: Optional[str] = None
+    for k in tile.keys():
+        if not isinstance(k, str):
+            continue
+        kl = k.lower()
+        if kl in _ROW_SPAN_KEYS_LOWER:
+            if rk is not None or k not in _ROW_SPAN_KEYS:
+                return None
+            rk = k
+        elif kl in _COL_SPAN_KEYS_LOWER:
+            if ck is not None or k not in _COL_SPAN_KEYS:
+                return None
+            ck = k
+        elif kl in _OTHER_SPAN_KEYS_LOWER:
+            return None
+    return (rk, ck)
+
+
+class TileGeom:
+    """Compiled geometry for one tile.
+
+    r1..r2 / c1..c2 are inclusive extents. row_span_key / col_span_key name the
+    source key the span was read from ("rowSpan", "width", "size.y", "rowEnd", ...)
+    or None when the tile has no span key (span defaults to 1). schema is set when
+    the tile was resolved through the plain-key fast path.
+    """
+
+    __slots__ = ("id", "r1", "r2", "c1", "c2", "rect", "row_span_key", "col_span_key", "schema", "_row_raw", "_col_raw")
+
+    def __init__(self, tile: Dict[str, Any], schema: Optional[SpanSchema] = None) -> None:
+        if schema is not None:
+            rk, ck = schema
+            r1 = as_int(tile, "row")
+            rs = _pos_int_from_value(tile, rk, tile[rk]) if (rk is not None and rk in tile) else 1
+            r2 = r1 + rs - 1
+            c1 = as_int(tile, "col")
+            cs = _pos_int_from_value(tile, ck, tile[ck]) if (ck is not None and ck in tile) else 1
+            c2 = c1 + cs - 1
+            self.row_span_key = rk if (rk is not None and rk in tile) else None
+            self.col_span_key = ck if (ck is not None and ck in tile) else None
+        else:
+            r1, r2, self.row_span_key = _resolve_row_extent(tile)
+            c1, c2, self.col_span_key = _resolve_col_extent(tile)
+        self.schema = schema
+        self.r1 = r1
+        self.r2 = r2
+        self.c1 = c1
+        self.c2 = c2
+        self.rect = (r1, r2, c1, c2)
+        self.id = _lenient_id(tile)
+        self._row_raw = tile.get("row")
+        self._col_raw = tile.get("col")
+
+
+# id(tile) -> (tile, TileGeom). The tile reference keeps the id() stable while cached.
+_GEOM_CACHE: Dict[int, Tuple[Dict[str, Any], TileGeom]] = {}
+
+
+class _GeomScope(threading.local):
+    # The thread's cache inside tile_cache_scope(); the shared _GEOM_CACHE outside one.
+    cache = _GEOM_CACHE
+
+
+_geom_scope = _GeomScope()
+
+
+@contextmanager
+def tile_cache_scope() -> Iterator[None]:
+    """Give this thread fresh geometry and fingerprint-leaf caches for the block.
+
+    main runs each CLI invocation (and each --targets dashboard, on its worker thread)
+    inside one, so the cached tiles are released when that layout is done with.
+    """
+    prev = _geom_scope.cache
+    _geom_scope.cache = {}
+    try:
+        with tile_leaf_scope():
+            yield
+    finally:
+        _geom_scope.cache = prev
+
+
+def tile_geom(tile: Dict[str, Any]) -> TileGeom:
+    """Return the compiled geometry record for tile, resolving spans at most once.
+
+    Records are invalidated by set_int_like(). Direct writes to "row"/"col" are also
+    detected; callers that rewrite span keys in place must call invalidate_tile_geom().
+    """
+    cache = _geom_scope.cache
+    ent = cache.get(id(tile))
+    schema: Optional[SpanSchema] = None
+    if ent is not None and ent[0] is tile:
+        g = ent[1]
+        if tile.get("row") is g._row_raw and tile.get("col") is g._col_raw:
+            return g
+        # Only the origin moved; the span keys (and so the schema) are unchanged.
+        schema = g.schema
+    g = TileGeom(tile, schema)
+    cache[id(tile)] = (tile, g)
+    return g
+
+
+def detect_span_schema(tiles: List[Any]) -> Optional[SpanSchema]:
+    """Classify every tile's span keys once and pre-compile its geometry.
+
+    Tiles whose cached record is still current (same tile object, origin unchanged,
+    not invalidated) keep it, so a shell or pipeline reusing the layout only compiles
+    the tiles that are new or were changed.
+
+    Tiles using a single plain span key per axis get the fast accessor; everything
+    else goes through the strict resolver (which also errors on conflicting
+    synonyms), so conflicts surface here at load time rather than mid-operation.
+
+    Returns the layout-wide schema when all tiles agree (tiles with no span keys
+    agree with anything), or None for mixed layouts.
+    """
+    layout_rk: Optional[str] = None
+    layout_ck: Optional[str] = None
+    mixed = False
+    cache = _geom_scope.cache
+    for t in tiles:
+        if not isinstance(t, dict) or "row" not in t or "col" not in t:
+            continue
+        ent = cache.get(id(t))
+        cached = ent[1] if (ent is not None and ent[0] is t) else None
+        if cached is not None and (t.get("row") is not cached._row_raw or t.get("col") is not cached._col_raw):
+            cached = None
+        if cached is not None and cached.schema is not None:
+            # Compiled on an earlier load (a previous shell command or pipeline step) and untouched since.
+            schema: Optional[SpanSchema] = cached.schema
+        else:
+            schema = _tile_span_schema(t)
+            if cached is None or schema is not None:
+                cache[id(t)] = (t, TileGeom(t, schema))
+        if schema is None:
+            mixed = True
+            continue
+        rk, ck = schema
+        if rk is not None:
+            if layout_rk is None:
+                layout_rk = rk
+            elif rk != layout_rk:
+                mixed = True
+        if ck is not None:
+            if layout_ck is None:
+                layout_ck = ck
+            elif ck != layout_ck:
+                mixed = True
+    if mixed:
+        return None
+    return (layout_rk, layout_ck)
+
+
+def invalidate_tile_geom(tile: Dict[str, Any]) -> None:
+    cache = _geom_scope.cache
+    ent = cache.get(id(tile))
+    if ent is not None and ent[0] is tile:
+        del cache[id(tile)]
+
+
+def clear_tile_geom_cache() -> None:
+    _geom_scope.cache.clear()
+
+
+def retain_tile_caches(tiles: List[Any]) -> None:
+    """Drop this thread's cached geometry and leaves for every tile not in tiles.
+
+    A --pipeline step can leave tiles behind (replaced dicts, conflict-map stand-ins);
+    pruning between steps keeps them from living until the run ends.
+    """
+    cache = _geom_scope.cache
+    keep = {id(t) for t in tiles}
+    for k in [k for k in cache if k not in keep]:
+        del cache[k]
+    retain_tile_leaves(tiles)
+
+
+def tile_row_extent(tile: Dict[str, Any]) -> Tuple[int, int]:
+    g = tile_geom(tile)
+    return (g.r1, g.r2)
+
+
+def tile_col_extent(tile: Dict[str, Any]) -> Tuple[int, int]:
+    g = tile_geom(tile)
+    return (g.c1, g.c2)
 
 
 def rect(tile: Dict[str, Any]) -> Tuple[int, int, int, int]:
-    r1, r2 = tile_row_extent(tile)
-    c1, c2 = tile_col_extent(tile)
-    return (r1, r2, c1, c2)
+    return tile_geom(tile).rect
 
 
 def set_int_like(tile: Dict[str, Any], key: str, new_value: int) -> None:
@@ -214,6 +474,10 @@ def set_int_like(tile: Dict[str, Any], key: str, new_value: int) -> None:
         tile[key] = str(int(new_value))
     else:
         die(f"Tile key '{key}' must be int or str to update, got {type(old).__name__}: {tile}")
+    invalidate_tile_leaf(tile)
+    if key not in ("row", "col"):
+        # row/col writes are picked up by tile_geom()'s identity check, which keeps the schema.
+        invalidate_tile_geom(tile)
 
 
 def verify_tiles_minimum(tiles: List[Any]) -> None:
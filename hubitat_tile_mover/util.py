@@ -8,33 +8,14 @@ from typing import List
 def layout_fingerprint(obj: object) -> str:
     """Return a stable fingerprint for the layout content (tiles + custom CSS).
 
-    Used to detect whether a dashboard layout has changed since the last run.
+    Used to detect whether a dashboard layout has changed since the last run. This is
+    the root of fingerprint.fingerprint_layout(): each tile's canonical JSON encoding
+    is cached (only tiles touched since the last call are re-encoded), and every call
+    hashes all the encodings and the CSS digest into the root again.
     """
-    import hashlib
-    import json
-
-    from .css_ops import get_custom_css
-    from .jsonio import extract_tiles_container, normalize_tiles_list
-
-    _kind, _container, tiles_any = extract_tiles_container(obj, verbose=False, debug=False)
-    tiles = normalize_tiles_list(tiles_any, verbose=False, debug=False)
-
-    def _tile_key(t: dict):
-        tid = t.get("id")
-        try:
-            return (0, int(tid))
-        except Exception:
-            return (1, str(tid))
-
-    tiles_sorted = sorted([t for t in tiles if isinstance(t, dict)], key=_tile_key)
-    _css_key, css = get_custom_css(obj)
-
-    fp_obj = {
-        "tiles": tiles_sorted,
-        "customCSS": css or "",
-    }
-    blob = json.dumps(fp_obj, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
-    return hashlib.sha256(blob.encode("utf-8")).hexdigest()
+    from .fingerprint import fingerprint_layout
+
+    return fingerprint_layout(obj).root
 
 
 def _use_color() -> bool:
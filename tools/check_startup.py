@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""Startup budget check for hubitat_tile_mover.
+
+Runs `python -X importtime` on the package entry module (best of N runs) and fails when
+- the cumulative import time of hubitat_tile_mover.main exceeds the budget, or
+- a module that should only be imported on demand (op modules, CSS helpers, map/list
+  renderers, hub I/O and their heavy stdlib dependencies) is loaded at startup.
+
+Usage:
+  python tools/check_startup.py [--budget-ms 40] [--runs 5] [--top 10]
+"""
+from __future__ import annotations
+
+import argparse
+import os
+import re
+import subprocess
+import sys
+from typing import Dict, List, Tuple
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+ENTRY_MODULE = "hubitat_tile_mover.main"
+
+# Loaded by the action/output that needs them, never by `import hubitat_tile_mover.main`.
+LAZY_MODULES = (
+    "hubitat_tile_mover.hubio",
+    "hubitat_tile_mover.targets",
+    "hubitat_tile_mover.clipboard",
+    "hubitat_tile_mover.css_ops",
+    "hubitat_tile_mover.list_views",
+    "hubitat_tile_mover.map_view",
+    "hubitat_tile_mover.ops_clear",
+    "hubitat_tile_mover.ops_copy",
+    "hubitat_tile_mover.ops_crop",
+    "hubitat_tile_mover.ops_delete",
+    "hubitat_tile_mover.ops_insert",
+    "hubitat_tile_mover.ops_merge",
+    "hubitat_tile_mover.ops_move",
+    "hubitat_tile_mover.ops_spacing",
+    "hubitat_tile_mover.ops_trim",
+    "http.client",
+    "ssl",
+    "email.parser",
+    "subprocess",
+    "dataclasses",
+)
+
+_LINE_RE = re.compile(r"^import time:\s*(\d+)\s*\|\s*(\d+)\s*\|(\s*)(\S+)\s*$")
+
+
+def _import_profile() -> Tuple[Dict[str, int], Dict[str, int]]:
+    """Return ({module: self_us}, {module: cumulative_us}) for one fresh interpreter."""
+    env = dict(os.environ)
+    env.pop("PYTHONPROFILEIMPORTTIME", None)
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {ENTRY_MODULE}"],
+        cwd=REPO_ROOT,
+        env=env,
+        capture_output=True,
+        text=True,
+    )
+    if proc.returncode != 0:
+        sys.stderr.write(proc.stderr)
+        raise SystemExit(f"import {ENTRY_MODULE} failed")
+    self_us: Dict[str, int] = {}
+    cum_us: Dict[str, int] = {}
+    for line in proc.stderr.splitlines():
+        m = _LINE_RE.match(line)
+        if not m:
+            continue
+        name = m.group(4)
+        self_us[name] = int(m.group(1))
+        cum_us[name] = int(m.group(2))
+    return self_us, cum_us
+
+
+def main(argv: List[str] | None = None) -> int:
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--budget-ms", type=float, default=40.0, help="max cumulative import time of the entry module")
+    ap.add_argument("--runs", type=int, default=5, help="fresh interpreters to try; the fastest run is used")
+    ap.add_argument("--top", type=int, default=10, help="show this many slowest modules (self time)")
+    args = ap.parse_args(argv)
+
+    best_total = None
+    best_self: Dict[str, int] = {}
+    loaded: set = set()
+    for _ in range(max(1, args.runs)):
+        self_us, cum_us = _import_profile()
+        loaded.update(self_us)
+        total = cum_us.get(ENTRY_MODULE)
+        if total is None:
+            raise SystemExit(f"{ENTRY_MODULE} missing from -X importtime output")
+        if best_total is None or total < best_total:
+            best_total, best_self = total, self_us
+
+    assert best_total is not None
+    print(f"{ENTRY_MODULE}: {best_total / 1000:.1f} ms cumulative (best of {args.runs}); budget {args.budget_ms:.1f} ms")
+    for name, us in sorted(best_self.items(), key=lambda kv: kv[1], reverse=True)[: args.top]:
+        print(f"  {us / 1000:7.2f} ms  {name}")
+
+    failures: List[str] = []
+    eager = [m for m in LAZY_MODULES if m in loaded]
+    if eager:
+        failures.append("imported at startup (should be lazy): " + ", ".join(eager))
+    if best_total / 1000.0 > args.budget_ms:
+        failures.append(f"startup {best_total / 1000:.1f} ms exceeds budget {args.budget_ms:.1f} ms")
+    for f in failures:
+        print(f"FAIL: {f}", file=sys.stderr)
+    if not failures:
+        print("OK: startup within budget.")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())